@@ -1,4 +1,5 @@
-from polytropos.actions.aggregate._aggregate import Aggregate
+from polytropos.actions.aggregate._aggregate import GenericAggregate, Aggregate
+from polytropos.actions.aggregate._grouped import GroupedAggregate
 
 def register_aggregate_subclasses() -> None:
     """Import all built-in subclasses so that they can be used in tasks"""
@@ -1,7 +1,5 @@
 import itertools
 import logging
-import os
-import json
 from dataclasses import dataclass
 from abc import abstractmethod
 from typing import Dict, Optional, Any, Iterable, Tuple, Iterator, Type, List
@@ -12,21 +10,19 @@ from polytropos.actions.step import Step
 from polytropos.ontology.context import Context
 from polytropos.util.loader import load
 from polytropos.ontology.schema import Schema
-from polytropos.util.paths import find_all_composites, relpath_for
+from polytropos.util.chunking import WeightedItems
+from polytropos.util.manifest import ManifestEntry, recording_manifest
+from polytropos.util.store import CompositeStore, open_store
 
-def write_composites(emissions: List[Tuple[str, Composite]], target_base_dir: str) -> None:
-    for emission in emissions:
-        composite_id, composite = emission
-        relpath: str = relpath_for(composite_id)
-        target_dir: str = os.path.join(target_base_dir, relpath)
-        os.makedirs(target_dir, exist_ok=True)
-        with open(os.path.join(target_dir, composite_id + '.json'), 'w') as target_file:
-            json.dump(composite.content, target_file, indent=2)
+def write_composites(emissions: List[Tuple[str, Composite]], target_base_dir: str) -> List[ManifestEntry]:
+    with open_store(target_base_dir).writer() as writer:
+        return [writer.dump(composite_id, composite.content) for composite_id, composite in emissions]
 
 @dataclass  # type: ignore # https://github.com/python/mypy/issues/5374
-class Aggregate(Step):
+class GenericAggregate(Step):
     """Iterates over all composites following one schema, and produces a new set of composites, representing a different
-    kind of entity, and following a different schema."""
+    kind of entity, and following a different schema. Subclasses decide how the extracts are brought together: see
+    Aggregate and GroupedAggregate."""
     context: Context
     origin_schema: Schema
     target_schema: Schema
@@ -39,7 +35,7 @@ class Aggregate(Step):
             **kwargs
     ):
         target_schema_instance: Optional[Schema] = Schema.load(target_schema, context.schemas_dir)
-        aggregations: Dict[str, Type] = load(cls)
+        aggregations: Dict[str, Type] = load(GenericAggregate)
         return aggregations[name](context=context, origin_schema=schema, target_schema=target_schema_instance, id_var=id_var,
                                   **kwargs)
 
@@ -48,12 +44,30 @@ class Aggregate(Step):
         """Gather the information to be used in the analysis."""
         pass
 
+@dataclass  # type: ignore # https://github.com/python/mypy/issues/5374
+class Aggregate(GenericAggregate):
+    """An aggregation that gathers the extracts from every composite in the parent process, analyzes them together, and
+    then emits the target composites."""
+
+    def combine(self, extracts: List[Tuple[str, Optional[Any]]]) -> Any:
+        """Reduce the extracts from one chunk of composites to a partial result, in the worker process that extracted
+        them, so that less is sent back to the parent. By default, the extracts are passed on as they are.
+
+        :param extracts: Tuple of (composite id, whatever is returned by extract)"""
+        return extracts
+
+    def merge(self, partials: Iterable[Any]) -> Any:
+        """Merge the partial results from every chunk (see combine) into what is passed to analyze. By default, the
+        extracts from every chunk, in turn."""
+        return itertools.chain.from_iterable(partials)
+
     @abstractmethod
-    def analyze(self, extracts: Iterable[Tuple[str, Any]]) -> None:
+    def analyze(self, extracts: Any) -> None:
         """Iterate over the extracts from each composite, performing any global processing needed and storing the
         results in instance variables.
 
-        :param extracts: Tuple of (composite id, whatever is returned by extract)"""
+        :param extracts: Whatever is returned by merge; by default, tuples of (composite id, whatever is returned by
+        extract)"""
         pass
 
     @abstractmethod
@@ -61,27 +75,24 @@ class Aggregate(Step):
         """Lazily produce instances of the target entity. Yields tuples of (new entity ID, new entity composite)."""
         pass
 
-    def process_composites(self, composite_ids: List[str], origin_dir: str) -> List[Tuple[str, Optional[Any]]]:
+    def process_composites(self, composite_ids: List[str], origin_dir: str) -> Any:
         """For each composite_id: open a composite JSON file, deserialize it into a Composite object, then extract information to be used in
-        analysis."""
+        analysis. Returns the extracts as combined by combine."""
+        origin: CompositeStore = open_store(origin_dir)
         result: List[Tuple[str, Optional[Any]]] = []
         for composite_id in composite_ids:
-            relpath: str = relpath_for(composite_id)
-            with open(os.path.join(origin_dir, relpath, "%s.json" % composite_id)) as origin_file:
-                content: Dict = json.load(origin_file)
-                composite: Composite = Composite(self.origin_schema, content, composite_id=composite_id)
-                result.append((composite_id, self.extract(composite)))
-        return result
+            composite: Composite = Composite(self.origin_schema, origin.load(composite_id), composite_id=composite_id)
+            result.append((composite_id, self.extract(composite)))
+        return self.combine(result)
 
     def __call__(self, origin_dir: str, target_dir: str) -> None:
-        composite_ids: List[str] = list(find_all_composites(origin_dir))
+        composite_ids: WeightedItems[str] = open_store(origin_dir).weighted_composite_ids()
         logging.info("Spawning parallel processes to extract data from each composite for aggregation.")
-        per_composite_results: Iterable[Tuple[str, Optional[Any]]] = itertools.chain.from_iterable(
-            self.context.run_in_process_pool(self.process_composites, composite_ids, origin_dir)
-        )
+        partials: Iterable[Any] = self.context.run_in_process_pool(self.process_composites, composite_ids, origin_dir)
 
-        self.analyze(per_composite_results)
+        self.analyze(self.merge(partials))
 
         logging.info("Spawning parallel processes to aggregate extracted data from each composite.")
-        for _ in self.context.run_in_process_pool(write_composites, list(self.emit()), target_dir):
-            pass
+        with recording_manifest(target_dir) as manifest:
+            for written in self.context.run_in_process_pool(write_composites, self.emit(), target_dir):
+                manifest.extend(written)
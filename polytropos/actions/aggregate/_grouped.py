@@ -0,0 +1,135 @@
+import logging
+import math
+import os
+import pickle
+import shutil
+import tempfile
+import uuid
+import zlib
+from abc import abstractmethod
+from collections import defaultdict
+from dataclasses import dataclass
+from typing import Optional, Any, Iterator, Tuple, List, DefaultDict
+
+from polytropos.ontology.composite import Composite
+from polytropos.ontology.variable import VariableId
+
+from polytropos.actions.aggregate._aggregate import GenericAggregate
+from polytropos.util.chunking import WeightedItems
+from polytropos.util.manifest import ManifestEntry, recording_manifest
+from polytropos.util.store import CompositeStore, open_store
+
+# Extracts of one group: tuples of (composite id, whatever is returned by extract)
+GroupExtracts = List[Tuple[str, Any]]
+
+def partition_of(group: Any, n_partitions: int) -> int:
+    """The partition of a group. Python's own string hash differs from one process to the next, so groups are hashed by
+    their repr instead. Groups that compare equal must fall in the same partition, so integral numbers are hashed alike
+    whatever their type (e.g., 1, 1.0 and True); other groups that compare equal but print differently, such as tuples
+    of mixed numbers, may be split between partitions and emitted once in each."""
+    if isinstance(group, bool) or (isinstance(group, float) and group.is_integer()):
+        group = int(group)
+    return zlib.crc32(repr(group).encode("utf-8")) % n_partitions
+
+def partition_dir(shuffle_dir: str, partition: int) -> str:
+    return os.path.join(shuffle_dir, "%05i" % partition)
+
+@dataclass  # type: ignore # https://github.com/python/mypy/issues/5374
+class GroupedAggregate(GenericAggregate):
+    """An aggregation in which each target composite is produced from the origin composites sharing one value of id_var
+    (e.g., filings to the organization that filed them). Rather than gathering every extract in the parent process,
+    the extracts are shuffled through the temp directory: each worker writes the extracts from its chunk of composites
+    to spill files, hash-partitioned by group, and then each partition is grouped, emitted and written by a worker of
+    its own. Only the extracts of the partitions being grouped are held in memory at once.
+
+    The number of partitions is chosen so that, assuming the extracts to be no larger than the serialized composites,
+    the partitions grouped at once fit within the context's aggregate_memory_budget, and is at least the number of
+    workers. Subclasses implement extract and emit_group."""
+
+    def group_of(self, composite: Composite) -> Optional[Any]:
+        """The group to which a composite belongs: by default, its (immutable) value of id_var. Composites that belong
+        to no group are left out of the aggregation."""
+        return composite.get_immutable(VariableId(self.id_var), treat_missing_as_null=True)
+
+    @abstractmethod
+    def emit_group(self, group: Any, extracts: GroupExtracts) -> Iterator[Tuple[str, Composite]]:
+        """Produce the instances of the target entity for one group. Yields tuples of (new entity ID, new entity
+        composite), whose IDs must be distinct from those of every other group.
+
+        :param extracts: Tuples of (composite id, whatever is returned by extract) for the composites in the group, in
+        order of composite ID"""
+        pass
+
+    def partitions_count(self, input_size: int) -> int:
+        workers: int = 1 if self.context.steppable_mode else os.cpu_count() or 1
+        budget: Optional[int] = self.context.aggregate_memory_budget
+        if budget is None:
+            return workers
+        # Each worker groups one partition at a time
+        return max(workers, math.ceil(input_size * workers / max(budget, 1)))
+
+    def shuffle_composites(self, composite_ids: List[str], origin_dir: str, shuffle_dir: str,
+                           n_partitions: int) -> None:
+        """Write the extracts from a chunk of composites to one spill file in each partition that they fall into."""
+        origin: CompositeStore = open_store(origin_dir)
+        partitions: DefaultDict[int, List[Tuple[Any, str, Any]]] = defaultdict(list)
+        for composite_id in composite_ids:
+            composite: Composite = Composite(self.origin_schema, origin.load(composite_id), composite_id=composite_id)
+            group: Optional[Any] = self.group_of(composite)
+            if group is None:
+                continue
+            partitions[partition_of(group, n_partitions)].append((group, composite_id, self.extract(composite)))
+        spill_name: str = "%s.pickle" % uuid.uuid4().hex
+        for partition, records in partitions.items():
+            with open(os.path.join(partition_dir(shuffle_dir, partition), spill_name), "wb") as fh:
+                pickle.dump(records, fh, protocol=pickle.HIGHEST_PROTOCOL)
+
+    def emit_partitions(self, partitions: List[int], shuffle_dir: str, target_base_dir: str) -> List[ManifestEntry]:
+        """Group the extracts in each partition, and write what is emitted for each group."""
+        written: List[ManifestEntry] = []
+        with open_store(target_base_dir).writer() as writer:
+            for partition in partitions:
+                groups: DefaultDict[Any, GroupExtracts] = defaultdict(list)
+                spill_dir: str = partition_dir(shuffle_dir, partition)
+                for spill_name in os.listdir(spill_dir):
+                    with open(os.path.join(spill_dir, spill_name), "rb") as fh:
+                        for group, composite_id, extract in pickle.load(fh):  # type: Any, str, Any
+                            groups[group].append((composite_id, extract))
+                for group, extracts in groups.items():
+                    # Chunks are extracted in no particular order
+                    extracts.sort(key=lambda pair: pair[0])
+                    for composite_id, composite in self.emit_group(group, extracts):
+                        written.append(writer.dump(composite_id, composite.content))
+                # Release the partition before grouping the next
+                del groups
+        return written
+
+    def __call__(self, origin_dir: str, target_dir: str) -> None:
+        sizes: List[Tuple[str, int]] = list(open_store(origin_dir).composite_sizes())
+        n_partitions: int = self.partitions_count(sum(size for _, size in sizes))
+        shuffle_dir: str = tempfile.mkdtemp(prefix="aggregate_shuffle_", dir=self.context.temp_dir or None)
+        try:
+            for partition in range(n_partitions):
+                os.makedirs(partition_dir(shuffle_dir, partition))
+            logging.info("Spawning parallel processes to extract data from each composite into %i partitions.",
+                         n_partitions)
+            for _ in self.context.run_in_process_pool(self.shuffle_composites, WeightedItems(sizes), origin_dir,
+                                                      shuffle_dir, n_partitions):
+                pass
+            del sizes
+
+            # Partitions with the most extracts are grouped first
+            partition_sizes: List[Tuple[int, int]] = []
+            for partition in range(n_partitions):
+                spill_dir: str = partition_dir(shuffle_dir, partition)
+                size: int = sum(os.path.getsize(os.path.join(spill_dir, name)) for name in os.listdir(spill_dir))
+                if size > 0:
+                    partition_sizes.append((partition, size))
+
+            logging.info("Spawning parallel processes to aggregate each partition of the extracted data.")
+            with recording_manifest(target_dir) as manifest:
+                for written in self.context.run_in_process_pool(self.emit_partitions, WeightedItems(partition_sizes),
+                                                                shuffle_dir, target_dir, chunk_size=1):
+                    manifest.extend(written)
+        finally:
+            shutil.rmtree(shuffle_dir, ignore_errors=True)
@@ -1,5 +1,5 @@
 from dataclasses import dataclass, field
-from typing import Optional
+from typing import Optional, FrozenSet
 
 from polytropos.actions.changes.available_v2 import BestAvailableV2
 from polytropos.actions.evolve import Change
@@ -25,5 +25,17 @@ class BestAvailable(Change):
         sources.append(self.temporal_source)
         self.bestAvailableV2 = BestAvailableV2(self.schema, self.lookups, self.target, sources, not self.use_older_periods)
 
+    @property
+    def reads(self) -> Optional[FrozenSet[VariableId]]:
+        return self.bestAvailableV2.reads
+
+    @property
+    def writes(self) -> Optional[FrozenSet[VariableId]]:
+        return self.bestAvailableV2.writes
+
+    @property
+    def requires_input(self) -> bool:
+        return True
+
     def __call__(self, composite: Composite) -> None:
         self.bestAvailableV2(composite)
@@ -1,11 +1,11 @@
 from dataclasses import dataclass, field
-from typing import Optional, Any, List, Set
+from typing import Optional, Any, List, Set, Tuple, FrozenSet
 
 from polytropos.actions.evolve import Change
 from polytropos.ontology.composite import Composite
 from polytropos.ontology.schema import TrackType
 from polytropos.ontology.variable import VariableId, Variable
-from polytropos.util.nesteddicts import MissingDataError
+from polytropos.util.nesteddicts import PathAccessor
 
 
 @dataclass  # type: ignore
@@ -22,6 +22,9 @@ class BestAvailableV2(Change):
         if target_var is None:
             raise ValueError('Unknown target variable "%s"' % self.target)
 
+        self.target_accessor: PathAccessor = target_var.accessor
+        self.source_accessors: List[Tuple[PathAccessor, bool]] = []
+
         for source_var_id in self.sources:
             source_var: Optional[Variable] = self.schema.get(source_var_id)
             if source_var is None:
@@ -34,6 +37,20 @@ class BestAvailableV2(Change):
             if self.schema.is_temporal(source_var_id):
                 self.temporal_sources.add(source_var_id)
 
+            self.source_accessors.append((source_var.accessor, source_var_id in self.temporal_sources))
+
+    @property
+    def reads(self) -> Optional[FrozenSet[VariableId]]:
+        return frozenset(self.sources)
+
+    @property
+    def writes(self) -> Optional[FrozenSet[VariableId]]:
+        return frozenset({self.target})
+
+    @property
+    def requires_input(self) -> bool:
+        return True
+
     def __call__(self, composite: Composite) -> None:
         periods_to_consider: List[str] = []
         if len(self.temporal_sources) > 0:
@@ -41,34 +58,24 @@ class BestAvailableV2(Change):
             if self.use_only_current and len(periods_to_consider) > 0:
                 periods_to_consider = [periods_to_consider[0]]
 
-        for source_var_id in self.sources:
+        for accessor, temporal in self.source_accessors:
             value: Any
-            if source_var_id in self.temporal_sources:
-                value = self._get_temporal_value(composite, source_var_id, periods_to_consider)
+            if temporal:
+                value = self._get_temporal_value(composite, accessor, periods_to_consider)
             else:
-                value = self._get_immutable_value(composite, source_var_id)
+                value = self._get_immutable_value(composite, accessor)
 
             if value is not None:
-                composite.put_immutable(self.target, value)
+                self.target_accessor.put(composite.content, value, "immutable")
                 return
 
-    def _get_temporal_value(self, composite: Composite, source_var_id: VariableId, periods: List[str]) -> Any:
+    def _get_temporal_value(self, composite: Composite, accessor: PathAccessor, periods: List[str]) -> Any:
         for period in periods:
-            try:
-                value = composite.get_observation(source_var_id, period)
-                if value is not None:
-                    return value
-            except MissingDataError:
-                continue
-
-        return None
-
-    def _get_immutable_value(self, composite: Composite, source_var_id: VariableId) -> Any:
-        try:
-            value = composite.get_immutable(source_var_id)
+            value = accessor.get(composite.content, period, default=None)
             if value is not None:
                 return value
-        except MissingDataError:
-            pass
 
         return None
+
+    def _get_immutable_value(self, composite: Composite, accessor: PathAccessor) -> Any:
+        return accessor.get(composite.content, "immutable", default=None)
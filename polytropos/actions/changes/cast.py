@@ -1,63 +1,110 @@
 import logging
 from dataclasses import dataclass, field
-from typing import Dict, List, Any, Optional, Set
+from typing import Dict, List, Any, Optional, Set, Tuple, Callable
 
 from polytropos.ontology.composite import Composite
 
 from polytropos.actions.evolve import Change
-from polytropos.ontology.variable import Variable, Primitive, MultipleText
+from polytropos.ontology.schema import Schema
+from polytropos.ontology.variable import Variable, VariableId, Primitive, MultipleText
 from polytropos.util import nesteddicts
 
+# How the cast handles a variable's values
+_PRIMITIVE, _MULTIPLE_TEXT, _FOLDER, _LIST, _KEYED_LIST, _OTHER = range(6)
+
+_CONTAINER_KINDS: Dict[str, int] = {"Folder": _FOLDER, "List": _LIST, "KeyedList": _KEYED_LIST}
+
+class _CastNode:
+    """A node of the cast plan: a variable, or the root of the composite, with its children keyed by name. Each node
+    holds what is needed to handle its values, so a crawl never has to look up a path in the schema."""
+    __slots__ = ("path", "kind", "cast", "cast_type", "data_type", "children")
+
+    def __init__(self, var: Optional[Variable]):
+        self.path: Tuple[str, ...] = var.absolute_path if var is not None else ()
+        self.kind: int = _FOLDER
+        self.cast: Optional[Callable[[Any], Any]] = None
+        self.cast_type: Optional[type] = None
+        self.data_type: Optional[str] = None
+        self.children: Dict[str, "_CastNode"] = {}
+        if var is None:
+            return
+        self.data_type = var.data_type
+        # Only primitives have the "cast" method
+        if isinstance(var, Primitive):
+            self.kind = _PRIMITIVE
+            self.cast = var.cast
+            self.cast_type = var.cast_type
+        elif isinstance(var, MultipleText):
+            self.kind = _MULTIPLE_TEXT
+        else:
+            self.kind = _CONTAINER_KINDS.get(var.data_type, _OTHER)
+
+def _compile(schema: Schema) -> _CastNode:
+    """The cast plan for a schema. As with Schema.lookup, temporal and immutable variables share a single tree."""
+    root: _CastNode = _CastNode(None)
+    nodes: Dict[VariableId, _CastNode] = {var.var_id: _CastNode(var) for var in schema}
+    for var in schema:
+        parent: _CastNode = root if var.parent is None else nodes[var.parent]
+        parent.children[var.name] = nodes[var.var_id]
+    return root
+
 @dataclass
 class _Crawl:
     composite: Composite
     na_values: Set[str]
+    plan: _CastNode
 
-    def _crawl_list(self, node: List, path: List, period: Optional[str]) -> None:
+    def _crawl_list(self, node: List, plan: _CastNode, period: Optional[str]) -> None:
         for child in node:  # type: Dict
-            self._crawl_folder(child, path, period)
+            self._crawl_folder(child, plan, period)
 
-    def _crawl_keyed_list(self, node: Dict, path: List, period: Optional[str]) -> None:
+    def _crawl_keyed_list(self, node: Dict, plan: _CastNode, period: Optional[str]) -> None:
         for child in node.values():  # type: Dict
-            self._crawl_folder(child, path, period)
+            self._crawl_folder(child, plan, period)
 
-    # noinspection PyUnresolvedReferences
-    def _crawl_folder(self, node: Dict, path: List, period: Optional[str]) -> None:
+    def _crawl_folder(self, node: Dict, plan: _CastNode, period: Optional[str]) -> None:
+        children: Dict[str, _CastNode] = plan.children
         keys: List = list(node.keys())  # May need to delete a key, so create a copy
         for key in keys:
             if key.startswith("_"):
-                logging.debug("Ignoring system variable %s" % nesteddicts.path_to_str(path + [key]))
+                logging.debug("Ignoring system variable %s", nesteddicts.path_to_str(plan.path + (key,)))
                 continue
             value: Optional[Any] = node[key]
 
             if isinstance(value, str) and value in self.na_values:
                 value = None
 
-            child_path = path + [key]
-
-            var: Optional[Variable] = self.composite.schema.lookup(child_path)
-            if var is None:
+            child: Optional[_CastNode] = children.get(key)
+            if child is None:
                 logging.warning("Unknown variable path %s in period %s of composite %s" %
-                                (nesteddicts.path_to_str(path), period or "immutable", self.composite.composite_id))
-                self._record_exception("unknown_vars", child_path, value, period)
+                                (nesteddicts.path_to_str(plan.path), period or "immutable", self.composite.composite_id))
+                self._record_exception("unknown_vars", list(plan.path) + [key], value, period)
                 continue
 
-            # Only primitives have the "cast" method
-            if isinstance(var, Primitive):
+            kind: int = child.kind
+            if kind == _PRIMITIVE:
+                # Values that are already of the type that the cast produces are left as they are
+                if value.__class__ is child.cast_type and value != "":
+                    continue
                 try:
-                    casted: Any = var.cast(value)
+                    casted: Any = child.cast(value)  # type: ignore
                     node[key] = casted
                 except ValueError:
-                    logging.warning('Could not cast value "%s" into data type "%s"' % (value, var.data_type))
-                    self._record_exception("cast_errors", path, {key: value}, period)
+                    logging.warning('Could not cast value "%s" into data type "%s"' % (value, child.data_type))
+                    self._record_exception("cast_errors", list(plan.path), {key: value}, period)
                     del node[key]
-            elif isinstance(var, MultipleText):
+            elif kind == _MULTIPLE_TEXT:
                 cur_value: Optional[Any] = node[key]
                 if isinstance(cur_value, str):
                     node[key] = [cur_value]
-
+            elif kind == _FOLDER:
+                self._crawl_folder(value, child, period)  # type: ignore
+            elif kind == _LIST:
+                self._crawl_list(value, child, period)  # type: ignore
+            elif kind == _KEYED_LIST:
+                self._crawl_keyed_list(value, child, period)  # type: ignore
             else:
-                self._crawl(value, child_path, period)
+                raise ValueError
 
     def _record_exception(self, exception_type: str, path: List[str], value: Optional[Any], period: Optional[str]) -> None:
         # Note: in the event that there is a list in the path, it will be omitted; hence, if there is more than one
@@ -65,35 +112,11 @@ class _Crawl:
         error_path: List[str] = [period or "immutable", "qc", "_exceptions", exception_type] + path
         nesteddicts.put(self.composite.content, error_path, value)
 
-    def _crawl(self, node: Any, path: List, period: Optional[str]) -> None:
-        if len(path) == 0:
-            self._crawl_folder(node, path, period)
-            return
-
-        var: Optional[Variable] = self.composite.schema.lookup(path)
-        if var is None:
-            logging.warning("Unknown variable path %s in composite %s" %
-                            (nesteddicts.path_to_str(path), self.composite.composite_id))
-            self._record_exception("unknown_vars", path, node, period)
-            return
-
-        if var.data_type == "List":
-            self._crawl_list(node, path, period)
-
-        elif var.data_type == "KeyedList":
-            self._crawl_keyed_list(node, path, period)
-
-        elif var.data_type == "Folder":
-            self._crawl_folder(node, path, period)
-
-        else:
-            raise ValueError
-
     def _cast_period(self, period: str) -> None:
-        self._crawl(self.composite.content[period], [], period)
+        self._crawl_folder(self.composite.content[period], self.plan, period)
 
     def _cast_immutable(self) -> None:
-        self._crawl(self.composite.content["immutable"], [], None)
+        self._crawl_folder(self.composite.content["immutable"], self.plan, None)
 
     def __call__(self) -> None:
         for period in self.composite.periods:
@@ -109,6 +132,9 @@ class Cast(Change):
 
     na_values: Set[str] = field(default_factory=set)
 
+    def __post_init__(self) -> None:
+        self._plan: _CastNode = _compile(self.schema)
+
     def __call__(self, composite: Composite) -> None:
-        crawl: _Crawl = _Crawl(composite, self.na_values)
+        crawl: _Crawl = _Crawl(composite, self.na_values, self._plan)
         crawl()
\ No newline at end of file
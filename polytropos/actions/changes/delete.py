@@ -1,5 +1,5 @@
 from dataclasses import dataclass
-from typing import List, Dict, Union, Iterator
+from typing import List, Dict, Union, Iterator, Optional, FrozenSet
 
 from polytropos.util import nesteddicts
 
@@ -59,6 +59,18 @@ class Delete(Change):
             if var is None:
                 raise ValueError('Unknown variable "%s"' % var_id)
 
+    @property
+    def reads(self) -> Optional[FrozenSet[VariableId]]:
+        return frozenset(self.targets)
+
+    @property
+    def writes(self) -> Optional[FrozenSet[VariableId]]:
+        return frozenset(self.targets)
+
+    @property
+    def requires_input(self) -> bool:
+        return True
+
     def __call__(self, composite: Composite) -> None:
         for var_id, var in zip(self.targets, self.target_vars):
             if var.temporal:
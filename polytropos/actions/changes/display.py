@@ -14,6 +14,10 @@ class DisplayFormat(UniversalChange):
         var: Primitive = cast(Primitive, self.schema.get(self.source))  # type: ignore
         self.display_format: Callable = var.display_format  # type: ignore
 
+    @property
+    def requires_input(self) -> bool:
+        return True
+
     def _single(self, content: Dict) -> None:
         raw: Optional[Any] = nesteddicts.get(content, self.source_path, default=None)
         if raw is None:
@@ -5,8 +5,13 @@ from polytropos.tools.qc import POLYTROPOS_NA
 
 from polytropos.ontology.schema import Schema
 from polytropos.ontology.variable import VariableId, Variable, List, KeyedList, Primitive
-from polytropos.util import nesteddicts
-from polytropos.util.nesteddicts import MissingDataError
+from polytropos.util.nesteddicts import MISSING_VALUE, PathAccessor
+
+def get_variable(schema: Schema, var_id: VariableId) -> Variable:
+    variable: Optional[Variable] = schema.get(var_id)
+    if variable is None:
+        raise ValueError('Unknown variable ID "%s"' % var_id)
+    return variable
 
 class ValueIterator(ABC):
     @abstractmethod
@@ -15,18 +20,17 @@ class ValueIterator(ABC):
 
 class KeyedListIterator(ValueIterator):
     def __init__(self, schema: Schema, keyed_list_id: VariableId, argument_id: VariableId):
-        self.subjects_path: ListType[str] = schema.get(keyed_list_id).absolute_path
-        self.arg_path: ListType[str] = schema.get(argument_id).relative_path
+        self.subjects: PathAccessor = get_variable(schema, keyed_list_id).accessor
+        self.argument: PathAccessor = get_variable(schema, argument_id).relative_accessor
 
     def __call__(self, content: Dict) -> Iterator[Tuple[Optional[Any], Optional[str]]]:
-        subjects: Dict[str, Dict] = nesteddicts.get(content, self.subjects_path, default=None)
+        subjects: Dict[str, Dict] = self.subjects.get(content, default=None)
         if subjects is None:
             return
 
         for identifier, subject in subjects.items():
-            try:
-                value: Optional[Any] = nesteddicts.get(subject, self.arg_path)
-            except MissingDataError:
+            value: Optional[Any] = self.argument.get(subject)
+            if value is MISSING_VALUE:
                 continue
             yield value, identifier
 
@@ -34,27 +38,26 @@ class ListIterator(ValueIterator):
     def __init__(self, schema: Schema, list_id: VariableId, argument_id: VariableId,
                  identifier_id: Optional[VariableId]):
 
-        self.subjects_path: ListType[str] = schema.get(list_id).absolute_path
-        self.arg_path: ListType[str] = schema.get(argument_id).relative_path
+        self.subjects: PathAccessor = get_variable(schema, list_id).accessor
+        self.argument: PathAccessor = get_variable(schema, argument_id).relative_accessor
 
-        self.identifier_path: Optional[ListType[str]] = None
+        self.identifier: Optional[PathAccessor] = None
 
         if identifier_id is not None:
-            self.identifier_path = schema.get(identifier_id).relative_path
+            self.identifier = get_variable(schema, identifier_id).relative_accessor
 
     def __call__(self, content: Dict) -> Iterator[Tuple[Optional[Any], Optional[str]]]:
-        subjects: ListType[Dict] = nesteddicts.get(content, self.subjects_path, default=None)
+        subjects: ListType[Dict] = self.subjects.get(content, default=None)
         if subjects is None:
             return
 
         for subject in subjects:
-            try:
-                value: Optional[Any] = nesteddicts.get(subject, self.arg_path)
-            except MissingDataError:
+            value: Optional[Any] = self.argument.get(subject)
+            if value is MISSING_VALUE:
                 continue
             identifier: Optional[str] = POLYTROPOS_NA
-            if self.identifier_path is not None:
-                identifier = nesteddicts.get(subject, self.identifier_path, default=POLYTROPOS_NA)
+            if self.identifier is not None:
+                identifier = self.identifier.get(subject, default=POLYTROPOS_NA)
             yield value, identifier
 
 def _ad_hoc_subjects(subjects: Union[ListType, Dict]) -> Iterator[Tuple[VariableId, str]]:
@@ -70,11 +73,11 @@ def _ad_hoc_subjects(subjects: Union[ListType, Dict]) -> Iterator[Tuple[Variable
 
 class AdHocIterator(ValueIterator):
     def __init__(self, schema: Schema, subjects: Union[ListType, Dict]):
-        self.subjects: Dict[str, ListType[str]] = {}
+        self.subjects: Dict[str, PathAccessor] = {}
 
         data_type: Optional[str] = None
         for subject_id, identifier in _ad_hoc_subjects(subjects):
-            subject: Variable = schema.get(subject_id)
+            subject: Variable = get_variable(schema, subject_id)
             if not isinstance(subject, Primitive):
                 raise ValueError('Non-primitive variable "%s" supplied as ad-hoc cross-sectional subject.' %
                                  subject_id)
@@ -86,13 +89,12 @@ class AdHocIterator(ValueIterator):
                                  (data_type, subject_data_type))
             if identifier in self.subjects:
                 raise ValueError('Identifier "%s" supplied twice in ad-hoc cross sectional subjects.' % identifier)
-            self.subjects[identifier] = subject.absolute_path
+            self.subjects[identifier] = subject.accessor
 
     def __call__(self, content: Dict) -> Iterator[Tuple[Optional[Any], Optional[str]]]:
-        for identifier, argument_path in self.subjects.items():
-            try:
-                value: Optional[Any] = nesteddicts.get(content, argument_path)
-            except MissingDataError:
+        for identifier, argument in self.subjects.items():
+            value: Optional[Any] = argument.get(content)
+            if value is MISSING_VALUE:
                 continue
             yield value, identifier
 
@@ -111,7 +113,7 @@ def value_iterator(schema: Schema, subjects: Any, argument_id: Optional[Variable
         return AdHocIterator(schema, subjects)
 
     subjects_var_id: VariableId = cast(VariableId, subjects)
-    subjects_var: Variable = schema.get(subjects_var_id)
+    subjects_var: Variable = get_variable(schema, subjects_var_id)
 
     if isinstance(subjects_var, List) and identifier_id is not None and identifier_target_id is None:
         raise ValueError("Identifier specified without a target.")
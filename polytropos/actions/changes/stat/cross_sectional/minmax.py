@@ -1,10 +1,20 @@
 from abc import ABC, abstractmethod
-from typing import Optional, Any, Dict, Tuple
+from typing import Optional, Any, Dict, Tuple, List
+
+import numpy as np
+
 from polytropos.actions.changes.stat.cross_sectional.univariate import CrossSectionalUnivariateStatistic
+from polytropos.actions.changes.stat.vectorized import numeric, group_extremes, group_indices
 from polytropos.tools.qc import POLYTROPOS_NA
 from polytropos.ontology.composite import Composite
 
 class _CrossSectionalMinMax(CrossSectionalUnivariateStatistic, ABC):
+    # Whether the limit sought is a maximum (as opposed to a minimum)
+    _maximum = False
+
+    @property
+    def requires_input(self) -> bool:
+        return True
 
     @abstractmethod
     def _cmp(self, argument: Any, limit: Any) -> bool:
@@ -39,10 +49,42 @@ class _CrossSectionalMinMax(CrossSectionalUnivariateStatistic, ABC):
             limit, arg_limit = self._handle(content)
             self._assign(content, limit, arg_limit)
 
+    def batch(self, composites: List[Composite]) -> None:
+        targets: List[Dict] = []
+        for composite in composites:
+            if self.temporal:
+                targets.extend(composite.content[period] for period in composite.periods)
+            else:
+                targets.append(composite.content["immutable"])
+
+        values: List[Any] = []
+        identifiers: List[Optional[str]] = []
+        groups: List[int] = []
+        for i, content in enumerate(targets):
+            for value, identifier in self.iterate_over(content):
+                if value is not None:
+                    values.append(value)
+                    identifiers.append(identifier)
+                    groups.append(i)
+
+        array: Optional[np.ndarray] = numeric(values)
+        if array is None:
+            for content in targets:
+                limit, arg_limit = self._handle(content)
+                self._assign(content, limit, arg_limit)
+            return
+
+        positions: List[int] = group_extremes(array, group_indices(groups), len(targets), self._maximum).tolist()
+        for content, position in zip(targets, positions):
+            if position >= 0:
+                self._assign(content, values[position], identifiers[position])
+
 class CrossSectionalMinimum(_CrossSectionalMinMax):  # type: ignore
     def _cmp(self, argument: Any, limit: Any) -> bool:
         return argument < limit
 
 class CrossSectionalMaximum(_CrossSectionalMinMax):  # type: ignore
+    _maximum = True
+
     def _cmp(self, argument: Any, limit: Any) -> bool:
         return argument > limit
@@ -1,7 +1,10 @@
 from abc import ABC, abstractmethod
-from typing import Optional, Any, Dict
+from typing import Optional, Any, Dict, List
+
+import numpy as np
 
 from polytropos.actions.changes.stat.cross_sectional.univariate import CrossSectionalUnivariateStatistic
+from polytropos.actions.changes.stat.vectorized import numeric, group_sums, group_indices
 from polytropos.ontology.composite import Composite
 
 class CrossSectionalReduce(CrossSectionalUnivariateStatistic, ABC):
@@ -9,6 +12,11 @@ class CrossSectionalReduce(CrossSectionalUnivariateStatistic, ABC):
     def _handle(self, content: Dict) -> Any:
         pass
 
+    def _reduce(self, values: List[Any], groups: List[int], n_groups: int) -> Optional[List[Any]]:
+        """The statistic for every group of values gathered by batch, or None if the values are not suitable for
+        computing it in one go."""
+        return None
+
     def __call__(self, composite: Composite) -> None:
         if self.temporal:
             for period in composite.periods:
@@ -22,6 +30,28 @@ class CrossSectionalReduce(CrossSectionalUnivariateStatistic, ABC):
             value = self._handle(i_content)
             self._assign(i_content, value)
 
+    def batch(self, composites: List[Composite]) -> None:
+        targets: List[Dict] = []
+        for composite in composites:
+            if self.temporal:
+                targets.extend(composite.content[period] for period in composite.periods)
+            elif composite.content.get("immutable") is not None:
+                targets.append(composite.content["immutable"])
+
+        values: List[Any] = []
+        groups: List[int] = []
+        for i, content in enumerate(targets):
+            for value, _ in self.iterate_over(content):
+                if value is not None:
+                    values.append(value)
+                    groups.append(i)
+
+        reduced: Optional[List[Any]] = self._reduce(values, groups, len(targets))
+        if reduced is None:
+            reduced = [self._handle(content) for content in targets]
+        for content, statistic in zip(targets, reduced):
+            self._assign(content, statistic)
+
 class CrossSectionalSum(CrossSectionalReduce):
     def _handle(self, content: Dict) -> float:
         total: float = 0.0
@@ -30,6 +60,13 @@ class CrossSectionalSum(CrossSectionalReduce):
                 total += value
         return total
 
+    def _reduce(self, values: List[Any], groups: List[int], n_groups: int) -> Optional[List[Any]]:
+        array: Optional[np.ndarray] = numeric(values)
+        if array is None:
+            return None
+        sums, _ = group_sums(array, group_indices(groups), n_groups)
+        return sums.tolist()
+
 class CrossSectionalCount(CrossSectionalReduce):
     def _handle(self, content: Dict) -> int:
         count: int = 0
@@ -38,6 +75,9 @@ class CrossSectionalCount(CrossSectionalReduce):
                 count += 1
         return count
 
+    def _reduce(self, values: List[Any], groups: List[int], n_groups: int) -> Optional[List[Any]]:
+        return np.bincount(group_indices(groups), minlength=n_groups).tolist()
+
 class CrossSectionalMean(CrossSectionalReduce):
     def _handle(self, content: Dict) -> Optional[float]:
         total: float = 0.0
@@ -50,7 +90,17 @@ class CrossSectionalMean(CrossSectionalReduce):
             return None
         return total / n_non_null
 
+    @property
+    def requires_input(self) -> bool:
+        return True
+
+    def _reduce(self, values: List[Any], groups: List[int], n_groups: int) -> Optional[List[Any]]:
+        array: Optional[np.ndarray] = numeric(values)
+        if array is None:
+            return None
+        sums, counts = group_sums(array, group_indices(groups), n_groups)
+        return [total / n if n > 0 else None for total, n in zip(sums.tolist(), counts.tolist())]
+
 class CrossSectionalMedian(CrossSectionalReduce):
     def _handle(self, content: Dict) -> None:
         assert False, "Not yet implemented!"
-
@@ -1,8 +1,8 @@
 from abc import ABC, abstractmethod
 from dataclasses import dataclass, field
-from typing import Optional, Any, List as ListType, Dict, Sequence, Tuple
+from typing import Optional, Any, List as ListType, Dict, Sequence, Tuple, FrozenSet
 
-from polytropos.actions.changes.stat.cross_sectional.iterators import ValueIterator, value_iterator
+from polytropos.actions.changes.stat.cross_sectional.iterators import ValueIterator, value_iterator, get_variable
 from polytropos.ontology.schema import Schema
 
 from polytropos.tools.qc import POLYTROPOS_NA
@@ -10,7 +10,7 @@ from polytropos.tools.qc import POLYTROPOS_NA
 from polytropos.actions.evolve import Change
 from polytropos.ontology.composite import Composite
 from polytropos.ontology.variable import VariableId, Variable
-from polytropos.util import nesteddicts
+from polytropos.util.nesteddicts import PathAccessor
 
 
 class CrossSectionalUnivariateStatistic(Change, ABC):  # type: ignore
@@ -27,6 +27,27 @@ class CrossSectionalUnivariateStatistic(Change, ABC):  # type: ignore
         self.identifier_target: Optional[VariableId] = identifier_target
         self.value_target: Optional[VariableId] = value_target
         self.temporal = self._check_class_temporality(subjects, value_target, argument, identifier, identifier_target)
+        self.value_target_accessor: PathAccessor = get_variable(schema, value_target).accessor
+        self.identifier_target_accessor: Optional[PathAccessor] = None
+        if identifier_target is not None:
+            self.identifier_target_accessor = get_variable(schema, identifier_target).accessor
+
+        if isinstance(subjects, (list, dict)):
+            reads: ListType[VariableId] = list(subjects)
+        else:
+            reads = [subjects]
+        reads.extend(var_id for var_id in (argument, identifier) if var_id is not None)
+        self._reads: FrozenSet[VariableId] = frozenset(reads)
+        self._writes: FrozenSet[VariableId] = frozenset(var_id for var_id in (value_target, identifier_target)
+                                                        if var_id is not None)
+
+    @property
+    def reads(self) -> Optional[FrozenSet[VariableId]]:
+        return self._reads
+
+    @property
+    def writes(self) -> Optional[FrozenSet[VariableId]]:
+        return self._writes
 
     def _assign(self, content: Dict, value: Optional[Any], value_identifier: Optional[str] = None) -> None:
         """
@@ -35,15 +56,13 @@ class CrossSectionalUnivariateStatistic(Change, ABC):  # type: ignore
         """
         if value is None:
             return
-        target_path: ListType[str] = self.schema.get(self.value_target).absolute_path
-        nesteddicts.put(content, target_path, value)
+        self.value_target_accessor.put(content, value)
 
-        if self.identifier_target is not None and value_identifier != POLYTROPOS_NA:
-            id_target_path: ListType[str] = self.schema.get(self.identifier_target).absolute_path
-            nesteddicts.put(content, id_target_path, value_identifier)
+        if self.identifier_target_accessor is not None and value_identifier != POLYTROPOS_NA:
+            self.identifier_target_accessor.put(content, value_identifier)
 
     def _check_var_temporal(self, var_id: VariableId, status: Optional[bool]) -> bool:
-        variable: Variable = self.schema.get(var_id)
+        variable: Variable = get_variable(self.schema, var_id)
         var_temporal = variable.temporal
         if status is not None:
             assert var_temporal == status, "Cannot mix temporal and immutable parameters in %s" % \
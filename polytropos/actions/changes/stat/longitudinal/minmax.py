@@ -1,14 +1,20 @@
 from abc import ABC, abstractmethod
-from typing import Optional, Any
+from typing import Optional, Any, List
+
+import numpy as np
 
 from polytropos.tools.qc import POLYTROPOS_NA
 
 from polytropos.ontology.composite import Composite
 
-from polytropos.util.nesteddicts import MissingDataError
+from polytropos.util.nesteddicts import MISSING_VALUE
 from polytropos.actions.changes.stat.longitudinal.univariate import LongitudinalUnivariateStatistic
+from polytropos.actions.changes.stat.vectorized import numeric, group_extremes, group_indices
 
 class _LongitudinalMinMax(LongitudinalUnivariateStatistic, ABC):
+    # Whether the limit sought is a maximum (as opposed to a minimum)
+    _maximum = False
+
     @abstractmethod
     def _cmp(self, argument: Any, limit: Any) -> bool:
         pass
@@ -22,29 +28,57 @@ class _LongitudinalMinMax(LongitudinalUnivariateStatistic, ABC):
 
         return self._cmp(argument, limit)
 
+    @property
+    def requires_input(self) -> bool:
+        return True
+
     def __call__(self, composite: Composite) -> None:
         limit: Optional[Any] = None
         limit_period: Optional[str] = POLYTROPOS_NA
 
         for period in composite.periods:
-            try:
-                value: Optional[Any] = composite.get_observation(self.subject, period)
-                if value is not None and self._sets_new_limit(value, limit):
-                    limit = value
-                    limit_period = period
-            except MissingDataError:
-                continue
+            value: Optional[Any] = self.subject_accessor.get(composite.content, period)
+            if value is not MISSING_VALUE and value is not None and self._sets_new_limit(value, limit):
+                limit = value
+                limit_period = period
 
         if limit is not None:
-            composite.put_immutable(self.target, limit)
-            if self.period_id_target is not None:
+            self.target_accessor.put(composite.content, limit, "immutable")
+            if self.period_id_target_accessor is not None:
                 assert limit_period != POLYTROPOS_NA, "Non-null minimum or maximum found, yet no period identified?"
-                composite.put_immutable(self.period_id_target, limit_period)
+                self.period_id_target_accessor.put(composite.content, limit_period, "immutable")
+
+    def batch(self, composites: List[Composite]) -> None:
+        values: List[Any] = []
+        periods: List[str] = []
+        groups: List[int] = []
+        for i, composite in enumerate(composites):
+            for period in composite.periods:
+                value: Optional[Any] = self.subject_accessor.get(composite.content, period)
+                if value is not MISSING_VALUE and value is not None:
+                    values.append(value)
+                    periods.append(period)
+                    groups.append(i)
+
+        array: Optional[np.ndarray] = numeric(values)
+        if array is None:
+            super(_LongitudinalMinMax, self).batch(composites)
+            return
+
+        positions: List[int] = group_extremes(array, group_indices(groups), len(composites), self._maximum).tolist()
+        for composite, position in zip(composites, positions):
+            if position < 0:
+                continue
+            self.target_accessor.put(composite.content, values[position], "immutable")
+            if self.period_id_target_accessor is not None:
+                self.period_id_target_accessor.put(composite.content, periods[position], "immutable")
 
 class LongitudinalMinimum(_LongitudinalMinMax):
     def _cmp(self, argument: Any, limit: Any) -> bool:
         return argument < limit
 
 class LongitudinalMaximum(_LongitudinalMinMax):
+    _maximum = True
+
     def _cmp(self, argument: Any, limit: Any) -> bool:
         return argument > limit
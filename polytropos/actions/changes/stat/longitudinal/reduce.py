@@ -1,11 +1,14 @@
-from typing import Optional, Any
+from typing import Optional, Any, List
+
+import numpy as np
 
 from polytropos.ontology.variable import Variable
-from polytropos.util.nesteddicts import MissingDataError
+from polytropos.util.nesteddicts import MISSING_VALUE
 
 from polytropos.ontology.composite import Composite
 
 from polytropos.actions.changes.stat.longitudinal.univariate import LongitudinalUnivariateStatistic
+from polytropos.actions.changes.stat.vectorized import group_sums, group_indices
 
 class LongitudinalMean(LongitudinalUnivariateStatistic):
     def __post_init__(self) -> None:
@@ -25,16 +28,27 @@ class LongitudinalMean(LongitudinalUnivariateStatistic):
         total: float = 0.0
         n: int = 0
         for period in composite.periods:
-            try:
-                value: Optional[Any] = composite.get_observation(self.subject, period)
-                if value is not None:
-                    total += float(value)
-                    n += 1
-            except MissingDataError:
-                continue
+            value: Optional[Any] = self.subject_accessor.get(composite.content, period)
+            if value is not None and value is not MISSING_VALUE:
+                total += float(value)
+                n += 1
 
         if n == 0:
-            composite.put_immutable(self.target, None)
+            self.target_accessor.put(composite.content, None, "immutable")
         else:
             avg: float = total / n
-            composite.put_immutable(self.target, avg)
\ No newline at end of file
+            self.target_accessor.put(composite.content, avg, "immutable")
+
+    def batch(self, composites: List[Composite]) -> None:
+        values: List[float] = []
+        groups: List[int] = []
+        for i, composite in enumerate(composites):
+            for period in composite.periods:
+                value: Optional[Any] = self.subject_accessor.get(composite.content, period)
+                if value is not None and value is not MISSING_VALUE:
+                    values.append(float(value))
+                    groups.append(i)
+
+        sums, counts = group_sums(np.asarray(values, dtype=float), group_indices(groups), len(composites))
+        for composite, total, n in zip(composites, sums.tolist(), counts.tolist()):
+            self.target_accessor.put(composite.content, total / n if n > 0 else None, "immutable")
@@ -1,11 +1,12 @@
 from abc import ABC
 from dataclasses import dataclass, field
-from typing import Optional
+from typing import Optional, FrozenSet
 
 from polytropos.ontology.composite import Composite
 
 from polytropos.actions.evolve import Change
 from polytropos.ontology.variable import VariableId, Variable, Primitive, Text
+from polytropos.util.nesteddicts import PathAccessor
 
 @dataclass  # type: ignore
 class LongitudinalUnivariateStatistic(Change, ABC):
@@ -35,3 +36,18 @@ class LongitudinalUnivariateStatistic(Change, ABC):
             if period_id_target_var.temporal:
                 raise ValueError("Longitudinal period identifier target must be immutable.")
 
+        self.subject_accessor: PathAccessor = subject_var.accessor
+        self.target_accessor: PathAccessor = target_var.accessor
+        self.period_id_target_accessor: Optional[PathAccessor] = None
+        if self.period_id_target:
+            self.period_id_target_accessor = period_id_target_var.accessor
+
+    @property
+    def reads(self) -> Optional[FrozenSet[VariableId]]:
+        return frozenset({self.subject})
+
+    @property
+    def writes(self) -> Optional[FrozenSet[VariableId]]:
+        if self.period_id_target:
+            return frozenset({self.target, self.period_id_target})
+        return frozenset({self.target})
@@ -0,0 +1,43 @@
+"""Grouped reductions over the values gathered from a batch of composites (see Change.batch). Each value is tagged with
+the index of the group it belongs to (e.g. a composite, or one period of one composite); groups with no values are
+reported as such."""
+
+from typing import List, Optional, Any, Tuple
+
+import numpy as np
+
+def numeric(values: List[Any]) -> Optional[np.ndarray]:
+    """The values as an array of signed integers or floats, or None if they are not all of those types. Callers then
+    fall back on the per-composite implementation, which fails (or succeeds) exactly as it always has."""
+    try:
+        array: np.ndarray = np.asarray(values)
+    except (ValueError, OverflowError):
+        return None
+    if array.ndim != 1 or array.dtype.kind not in "if":
+        return None
+    return array
+
+def group_sums(values: np.ndarray, groups: np.ndarray, n_groups: int) -> Tuple[np.ndarray, np.ndarray]:
+    """The sum (as a float) and the number of values in each group. Values are summed in order, so sums are the same as
+    those accumulated one value at a time."""
+    sums: np.ndarray = np.bincount(groups, weights=values, minlength=n_groups)
+    counts: np.ndarray = np.bincount(groups, minlength=n_groups)
+    return sums, counts
+
+def group_extremes(values: np.ndarray, groups: np.ndarray, n_groups: int, maximum: bool) -> np.ndarray:
+    """The position of the least (or greatest) value in each group, or -1 if the group has no values. Where values are
+    tied, the position of the first of them is given, as when values are compared one at a time."""
+    ret: np.ndarray = np.full(n_groups, -1, dtype=np.intp)
+    if len(values) == 0:
+        return ret
+    keys: np.ndarray = -values if maximum else values
+    # lexsort is stable, so tied values keep their order
+    order: np.ndarray = np.lexsort((keys, groups))
+    sorted_groups: np.ndarray = groups[order]
+    first: np.ndarray = np.ones(len(order), dtype=bool)
+    first[1:] = sorted_groups[1:] != sorted_groups[:-1]
+    ret[sorted_groups[first]] = order[first]
+    return ret
+
+def group_indices(groups: List[int]) -> np.ndarray:
+    return np.asarray(groups, dtype=np.intp)
@@ -1,6 +1,6 @@
 from abc import ABC, abstractmethod
 from dataclasses import dataclass, field
-from typing import Optional, Dict, Callable, List, Any, cast
+from typing import Optional, Dict, Callable, List, Any, Tuple, FrozenSet, cast
 
 from polytropos.ontology.composite import Composite
 
@@ -27,12 +27,12 @@ class UniversalChange(Change, ABC):
 
         if self.list_base:
             self._act = act_options[self.schema.get(self.list_base).data_type]
-            self._list_base_path: List[str] = self.schema.get(self.list_base).absolute_path
+            self._list_base_path: Tuple[str, ...] = self.schema.get(self.list_base).absolute_path
         else:
             self._act = self._single
 
-        self.source_path: List[str] = self.schema.get(self.source).relative_path
-        self.target_path: List[str] = self.schema.get(self.target).relative_path
+        self.source_path: Tuple[str, ...] = self.schema.get(self.source).relative_path
+        self.target_path: Tuple[str, ...] = self.schema.get(self.target).relative_path
 
     def _list(self, content: Dict) -> None:
         try:
@@ -54,6 +54,26 @@ class UniversalChange(Change, ABC):
     def _single(self, content: Dict) -> None:
         pass
 
+    @property
+    def reads(self) -> Optional[FrozenSet[VariableId]]:
+        return frozenset({self.source})
+
+    @property
+    def writes(self) -> Optional[FrozenSet[VariableId]]:
+        return frozenset({self.target})
+
+    def merged_with(self, following: Change) -> Optional[Change]:
+        if not isinstance(following, UniversalChange) or self.list_base is None:
+            return None
+        if following.list_base != self.list_base or following.temporal != self.temporal:
+            return None
+        return UniversalChangeChain.of(self.links + following.links)
+
+    @property
+    def links(self) -> List["UniversalChange"]:
+        """The changes that this one applies to each element of its list base."""
+        return [self]
+
     def __call__(self, composite: Composite) -> None:
         if self.temporal:
             for period in composite.periods:
@@ -64,3 +84,35 @@ class UniversalChange(Change, ABC):
                 return
             content = composite.content["immutable"]
             self._act(content)
+
+@dataclass  # type: ignore
+class UniversalChangeChain(UniversalChange):
+    """Consecutive UniversalChanges over the same list or keyed list, applied in a single traversal of it: each element
+    is passed through every change in turn. This is equivalent to applying the changes one after another, since each
+    change only looks within the element it is given. Built by Evolve; not meant to be configured directly."""
+    chain: List[UniversalChange] = field(default_factory=list)
+
+    @classmethod
+    def of(cls, changes: List[UniversalChange]) -> "UniversalChangeChain":
+        first: UniversalChange = changes[0]
+        return cls(first.schema, first.lookups, first.source, first.target, first.list_base, chain=list(changes))
+
+    @property
+    def links(self) -> List[UniversalChange]:
+        return self.chain
+
+    def _single(self, content: Dict) -> None:
+        for change in self.chain:
+            change._single(content)
+
+    @property
+    def reads(self) -> Optional[FrozenSet[VariableId]]:
+        return frozenset().union(*(change.reads for change in self.chain))  # type: ignore
+
+    @property
+    def writes(self) -> Optional[FrozenSet[VariableId]]:
+        return frozenset().union(*(change.writes for change in self.chain))  # type: ignore
+
+    @property
+    def requires_input(self) -> bool:
+        return all(change.requires_input for change in self.chain)
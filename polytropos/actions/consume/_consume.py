@@ -1,17 +1,16 @@
 import itertools
 import logging
-import os
-import json
 from abc import abstractmethod
 from dataclasses import dataclass
-from typing import Dict, Iterable, Optional, Any, Tuple, List
+from typing import Iterable, Optional, Any, Tuple, List
 
 from polytropos.ontology.composite import Composite
 from polytropos.actions.step import Step
 from polytropos.ontology.schema import Schema
 from polytropos.util.loader import load
 from polytropos.ontology.context import Context
-from polytropos.util.paths import find_all_composites, relpath_for
+from polytropos.util.quarantine import StepQuarantine
+from polytropos.util.store import CompositeStore, open_store
 
 
 @dataclass  # type: ignore # https://github.com/python/mypy/issues/5374
@@ -51,25 +50,26 @@ class Consume(Step):
     def process_composites_chunk(self, composite_ids: List[str], origin_dir: str) -> List[Any]:
         """For each composite_id: open a composite JSON file, deserialize it into a Composite object, then extract information to be used in
         analysis."""
+        origin: CompositeStore = open_store(origin_dir)
         result: List[Any] = []
         for composite_id in composite_ids:
-            relpath: str = relpath_for(composite_id)
-            with open(os.path.join(origin_dir, relpath, "%s.json" % composite_id)) as origin_file:
-                content: Dict = json.load(origin_file)
-            composite: Composite = Composite(self.schema, content, composite_id=composite_id)
+            composite: Composite = Composite(self.schema, origin.load(composite_id), composite_id=composite_id)
             result.append(self.extract(composite))
         return result
 
-    def process_composites(self, composite_ids: Iterable[str], origin_dir: str) -> Iterable[Any]:
+    def process_composites(self, composite_ids: Iterable[str], origin_dir: str,
+                           quarantine: Optional[StepQuarantine] = None) -> Iterable[Any]:
         logging.info("Spawning parallel processes to consume composites.")
-        results: Iterable[List[Any]] = self.context.run_in_thread_pool(self.process_composites_chunk, list(composite_ids), origin_dir)
+        results: Iterable[List[Any]] = self.context.run_in_thread_pool(self.process_composites_chunk, composite_ids, origin_dir,
+                                                                       quarantine=quarantine)
         return itertools.chain.from_iterable(results)
 
     def __call__(self, origin_dir: str, target_dir: Optional[str]) -> None:
         """Generate the export file."""
         self.before()
-        composite_ids: Iterable[str] = find_all_composites(origin_dir)
-        per_composite_results: Iterable[Any] = self.process_composites(composite_ids, origin_dir)
+        origin: CompositeStore = open_store(origin_dir)
+        quarantine: Optional[StepQuarantine] = self.context.quarantine_for(self.__class__.__name__, origin)
+        per_composite_results: Iterable[Any] = self.process_composites(origin.composite_ids(), origin_dir, quarantine)
 
         self.consume(per_composite_results)
         self.after()
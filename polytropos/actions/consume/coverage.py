@@ -1,7 +1,6 @@
 import csv
 import json
 import logging
-import os
 from collections import defaultdict
 from dataclasses import dataclass, field
 from typing import Iterable, Tuple, Any, Optional, Dict, Set, List
@@ -17,7 +16,8 @@ from polytropos.util import nesteddicts
 from polytropos.actions.consume import Consume
 from polytropos.ontology.composite import Composite
 from polytropos.ontology.variable import Variable, VariableId
-from polytropos.util.paths import relpath_for
+from polytropos.util.quarantine import StepQuarantine
+from polytropos.util.store import CompositeStore, open_store
 
 
 def _get_sorted_vars(group_var_counts: Dict[Optional[str], Dict[Tuple[str, ...], int]], track: Track) \
@@ -183,9 +183,10 @@ class CoverageFile(Consume):
         self._write_temporal()
         self._write_immutable()
 
-    def process_composites(self, composite_ids: Iterable[str], origin_dir: str) -> Iterable[Any]:
+    def process_composites(self, composite_ids: Iterable[str], origin_dir: str,
+                           quarantine: Optional[StepQuarantine] = None) -> Iterable[Any]:
         extract = CoverageFileExtract(self.schema, origin_dir, self.temporal_grouping_var, self.immutable_grouping_var, self.exclude_trivial)
-        return self.context.run_in_process_pool(extract.extract, list(composite_ids))
+        return self.context.run_in_process_pool(extract.extract, composite_ids, quarantine=quarantine)
 
 
 class CoverageFileExtract:
@@ -304,13 +305,11 @@ class CoverageFileExtract:
 
     def extract(self, composite_ids: List[str]) -> CoverageFileExtractResult:
         extract_result = CoverageFileExtractResult()
+        origin: CompositeStore = open_store(self.origin_dir)
         for composite_id in composite_ids:
             logging.debug("Extracting data from composite %s", composite_id)
 
-            relpath: str = relpath_for(composite_id)
-            with open(os.path.join(self.origin_dir, relpath, "%s.json" % composite_id)) as origin_file:
-                content: Dict = json.load(origin_file)
-            composite: Composite = Composite(self.schema, content, composite_id=composite_id)
+            composite: Composite = Composite(self.schema, origin.load(composite_id), composite_id=composite_id)
 
             self._extract_temporal(composite, extract_result)
             self._extract_immutable(composite, extract_result)
@@ -1,4 +1,3 @@
-import json
 import logging
 import os
 import uuid
@@ -9,7 +8,7 @@ from polytropos.actions.consume.sourcecoverage.result import SourceCoverageResul
 from polytropos.actions.consume.sourcecoverage.crawl import Crawl
 from polytropos.ontology.composite import Composite
 from polytropos.ontology.schema import Schema
-from polytropos.util.paths import relpath_for
+from polytropos.util.store import CompositeStore, open_store
 
 class SourceCoverageExtract:
     """Produces source coverage result for a chunk of composites.
@@ -30,26 +29,25 @@ class SourceCoverageExtract:
         composite_result: SourceCoverageResult = crawl(translation, trace)
         result.update(composite_result)
 
-    def _load_composite(self, base_dir: str, composite_id: str) -> Composite:
-        relpath: str = relpath_for(composite_id)
-        composite_path = os.path.join(base_dir, relpath, "%s.json" % composite_id)
+    def _load_composite(self, store: CompositeStore, composite_id: str) -> Composite:
         content: Dict
-        if not os.path.exists(composite_path):
+        if composite_id not in store:
             content = {}
         else:
-            with open(os.path.join(base_dir, relpath, "%s.json" % composite_id)) as translate_file:
-                content = json.load(translate_file)
+            content = store.load(composite_id)
         return Composite(self.schema, content, composite_id=composite_id)
 
     def extract(self, composite_ids: List[str]) -> str:
         """Produces source coverage result for a chunk of composites."""
 
         result = SourceCoverageResult()
+        translate_store: CompositeStore = open_store(self.translate_dir)
+        trace_store: CompositeStore = open_store(self.trace_dir)
         for composite_id in composite_ids:
             logging.debug("Extracting data from composite %s", composite_id)
 
-            translate_composite: Composite = self._load_composite(self.translate_dir, composite_id)
-            trace_composite: Composite = self._load_composite(self.trace_dir, composite_id)
+            translate_composite: Composite = self._load_composite(translate_store, composite_id)
+            trace_composite: Composite = self._load_composite(trace_store, composite_id)
             self._extract(translate_composite, trace_composite, result)
 
         state_path = os.path.join(self.temp_dir, str(uuid.uuid4()))
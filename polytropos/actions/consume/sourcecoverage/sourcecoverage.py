@@ -12,7 +12,8 @@ from polytropos.ontology.context import Context
 from polytropos.ontology.schema import Schema
 from polytropos.ontology.variable import Variable
 from polytropos.util import nesteddicts
-from polytropos.util.paths import find_all_composites
+from polytropos.util.quarantine import StepQuarantine
+from polytropos.util.store import open_store
 
 
 @dataclass  # type: ignore # https://github.com/python/mypy/issues/5374
@@ -85,14 +86,15 @@ class SourceCoverage(Consume):
     def after(self) -> None:
         self._write_coverage_file()
 
-    def process_composites(self, composite_ids: Iterable[str], origin_dir: str) -> Iterable[Any]:
+    def process_composites(self, composite_ids: Iterable[str], origin_dir: str,
+                           quarantine: Optional[StepQuarantine] = None) -> Iterable[Any]:
         raise NotImplementedError
 
     def __call__(self, _origin_dir: str, _target_dir: Optional[str]) -> None:
         self.before()
 
-        translate_composite_ids = set(find_all_composites(self.translate_dir))
-        trace_composite_ids = set(find_all_composites(self.trace_dir))
+        translate_composite_ids = set(open_store(self.translate_dir).composite_ids())
+        trace_composite_ids = set(open_store(self.trace_dir).composite_ids())
         assert translate_composite_ids.issubset(trace_composite_ids)
 
         coverage = SourceCoverageExtract(self.schema, self.translate_dir, self.trace_dir, self.context.temp_dir)
@@ -1,6 +1,5 @@
 import logging
 import csv
-import json
 import os
 from typing import Iterable, Tuple, Any, Optional, List, Dict, TextIO, Callable, Iterator, TYPE_CHECKING
 
@@ -16,7 +15,8 @@ from polytropos.actions.consume import Consume
 from polytropos.actions.consume.tocsv.blocks import Block, BlockProduct
 from polytropos.actions.consume.tocsv.descriptors import fromraw
 from polytropos.ontology.composite import Composite
-from polytropos.util.paths import relpath_for
+from polytropos.util.quarantine import StepQuarantine
+from polytropos.util.store import CompositeStore, open_store
 
 if TYPE_CHECKING:
     from polytropos.actions.step import Step
@@ -75,9 +75,10 @@ class ExportToCSV(Consume):
     def after(self) -> None:
         self.fh.close()
 
-    def process_composites(self, composite_ids: Iterable[str], origin_dir: str) -> Iterable[Any]:
+    def process_composites(self, composite_ids: Iterable[str], origin_dir: str,
+                           quarantine: Optional[StepQuarantine] = None) -> Iterable[Any]:
         extract = ExportToCSVExtract(self.schema, origin_dir, self.context.temp_dir, self.filters, self.blocks)
-        return self.context.run_in_process_pool(extract.extract, list(composite_ids))
+        return self.context.run_in_process_pool(extract.extract, composite_ids, quarantine=quarantine)
 
 
 class ExportToCSVExtract:
@@ -90,12 +91,10 @@ class ExportToCSVExtract:
 
     def extract(self, composite_ids: List[str]) -> List[List[Any]]:
         result: List[List[Any]] = []
+        origin: CompositeStore = open_store(self.origin_dir)
 
         for composite_id in composite_ids:
-            relpath: str = relpath_for(composite_id)
-            with open(os.path.join(self.origin_dir, relpath, "%s.json" % composite_id)) as origin_file:
-                content: Dict = json.load(origin_file)
-            composite: Composite = Composite(self.schema, content, composite_id=composite_id)
+            composite: Composite = Composite(self.schema, origin.load(composite_id), composite_id=composite_id)
             result.extend(self._process_composite(composite))
 
         return result
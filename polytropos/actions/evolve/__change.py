@@ -1,10 +1,11 @@
 from dataclasses import dataclass
 from abc import abstractmethod
-from typing import Dict
+from typing import Dict, List, Optional, FrozenSet
 
 from polytropos.ontology.composite import Composite
 
 from polytropos.ontology.schema import Schema
+from polytropos.ontology.variable import VariableId
 
 
 @dataclass # type: ignore # https://github.com/python/mypy/issues/5374
@@ -15,7 +16,40 @@ class Change:
     schema: Schema
     lookups: Dict
 
+    @property
+    def reads(self) -> Optional[FrozenSet[VariableId]]:
+        """The variables whose values this change reads, or None if it may read any variable."""
+        return None
+
+    @property
+    def writes(self) -> Optional[FrozenSet[VariableId]]:
+        """The variables that this change may create, alter or delete, or None if it may write any variable."""
+        return None
+
+    @property
+    def requires_input(self) -> bool:
+        """True if this change leaves a composite untouched when none of the variables it reads are present in it, so
+        that it can be skipped for such composites."""
+        return False
+
+    def merged_with(self, following: "Change") -> Optional["Change"]:
+        """A single change equivalent to this change followed immediately by the one supplied, but cheaper to apply
+        (e.g. because it traverses the composite only once), or None if there is no such change."""
+        return None
+
     @abstractmethod
     def __call__(self, composite: Composite) -> None:
         """Perform the change on the supplied composite."""
         pass
+
+    def batch(self, composites: List[Composite]) -> None:
+        """Perform the change on each of the supplied composites. Changes whose work is mostly arithmetic over
+        primitive values can override this to gather those values across all of the composites and compute on them at
+        once. The result must be the same as calling the change on each composite in turn."""
+        for composite in composites:
+            self(composite)
+
+    @property
+    def batched(self) -> bool:
+        """True if this change has its own implementation of batch."""
+        return type(self).batch is not Change.batch
@@ -1,23 +1,22 @@
 import logging
-import os
-import json
 import time
-import traceback
 from collections.abc import Callable
-from typing import Dict, List, TYPE_CHECKING
+from typing import Dict, List, Optional, Tuple, FrozenSet, Iterable, TYPE_CHECKING
 
 from polytropos.actions.evolve.__factory import _EvolveFactory
+from polytropos.actions.evolve.__plan import plan, dependency_graph, Presence
 from polytropos.ontology.composite import Composite
 
 from polytropos.actions.evolve import Change
-from polytropos.actions.step import Step
-from polytropos.util.paths import find_all_composites, relpath_for
+from polytropos.actions.fused import FusedStep
+from polytropos.actions.step import Step, PerCompositeStep
+from polytropos.util import profiling
 
 if TYPE_CHECKING:
     from polytropos.ontology.context import Context
     from polytropos.ontology.schema import Schema
 
-class Evolve(Step):
+class Evolve(Step, PerCompositeStep):
     """A metamorphosis represents a series of changes that are made to a single composite, in order, and without
     reference to any other composite. Each change is defined in terms of one or more subject variables, which may be
     inputs, outputs, or both (in a case where a change alters a value in place)."""
@@ -26,6 +25,11 @@ class Evolve(Step):
         self.context = context
         self.changes = changes
         self.schema = schema
+        self.plan: List[Tuple[Change, Optional[Presence]]] = plan(schema, changes)
+        self.dependencies: Dict[int, List[int]] = dependency_graph(schema, changes)
+        for i, change in enumerate(changes):
+            logging.debug('Change %i ("%s") depends on changes %s.' % (i, change.__class__.__name__,
+                                                                       self.dependencies[i]))
 
     # noinspection PyMethodOverriding
     @classmethod
@@ -40,36 +44,63 @@ class Evolve(Step):
         do_build: Callable = _EvolveFactory(context, changes, schema, lookups)
         return do_build(cls)
 
-    def process_composite(self, origin_dir: str, base_target_dir: str, composite_id: str) -> None:
-        try:
-            relpath: str = relpath_for(composite_id)
-            origin_filename: str = os.path.join(origin_dir, relpath, "%s.json" % composite_id)
-            logging.debug("Evolving %s." % origin_filename)
-            with open(origin_filename) as origin_file:
-                content: Dict = json.load(origin_file)
-                composite: Composite = Composite(self.schema, content, composite_id=composite_id)
-                for change in self.changes:
-                    logging.debug('Applying change "%s" to %s.' % (change.__class__.__name__, origin_filename))
-                    change(composite)
-            target_dir: str = os.path.join(base_target_dir, relpath)
-            os.makedirs(target_dir, exist_ok=True)
-            target_filepath: str = os.path.join(target_dir, "%s.json" % composite_id)
-            with open(target_filepath, 'w') as target_file:
-                json.dump(composite.content, target_file, indent=2)
-        except Exception as e:
-            logging.error("Error processing composite %s during evolve step." % composite_id)
-            traceback.print_exc()
-            raise
+    @property
+    def reads(self) -> Optional[FrozenSet[str]]:
+        return _union(change.reads for change in self.changes)
 
-    def process_composites(self, chunk: List[str], origin_dir: str, target_dir: str) -> None:
-        start: float = time.time()
-        for composite_id in chunk:
-            self.process_composite(origin_dir, target_dir, composite_id)
-        elapsed: float = time.time() - start
-        logging.info("Completed batch of {:,} evolutions in {:0.2f} seconds.".format(len(chunk), elapsed))
+    @property
+    def writes(self) -> Optional[FrozenSet[str]]:
+        return _union(change.writes for change in self.changes)
+
+    def transform(self, composite_id: str, content: Dict) -> Optional[Dict]:
+        composite: Composite = Composite(self.schema, content, composite_id=composite_id)
+        timed: bool = profiling.enabled()
+        for change, presence in self.plan:
+            if presence is not None and not presence(composite):
+                if timed:
+                    profiling.add("skipped", change.__class__.__name__, 1)
+                continue
+            logging.debug('Applying change "%s" to %s.' % (change.__class__.__name__, composite_id))
+            if timed:
+                start: float = time.perf_counter()
+                change(composite)
+                profiling.add("changes", change.__class__.__name__, time.perf_counter() - start)
+            else:
+                change(composite)
+        return composite.content
+
+    @property
+    def batched(self) -> bool:
+        return any(change.batched for change in self.changes)
+
+    def transform_batch(self, composite_ids: List[str], contents: List[Dict]) -> List[Optional[Dict]]:
+        """Apply each change in turn to all of the composites, so that changes with a batch implementation see all of
+        them at once."""
+        composites: List[Composite] = [Composite(self.schema, content, composite_id=composite_id)
+                                       for composite_id, content in zip(composite_ids, contents)]
+        timed: bool = profiling.enabled()
+        for change, presence in self.plan:
+            subjects: List[Composite] = composites
+            if presence is not None:
+                subjects = [composite for composite in composites if presence(composite)]
+                if timed and len(subjects) < len(composites):
+                    profiling.add("skipped", change.__class__.__name__, len(composites) - len(subjects))
+            logging.debug('Applying change "%s" to %i composites.' % (change.__class__.__name__, len(subjects)))
+            if timed:
+                start: float = time.perf_counter()
+                change.batch(subjects)
+                profiling.add("changes", change.__class__.__name__, time.perf_counter() - start)
+            else:
+                change.batch(subjects)
+        return [composite.content for composite in composites]
 
     def __call__(self, origin_dir: str, target_dir: str) -> None:
-        composites: List[str] = list(find_all_composites(origin_dir))
-        logging.info("Spawning parallel processes to perform Evolve process on all composites.")
-        for _ in self.context.run_in_process_pool(self.process_composites, composites, origin_dir, target_dir):
-            pass
+        FusedStep(self.context, [self])(origin_dir, target_dir)
+
+def _union(var_sets: Iterable[Optional[FrozenSet[str]]]) -> Optional[FrozenSet[str]]:
+    ret: FrozenSet[str] = frozenset()
+    for var_set in var_sets:
+        if var_set is None:
+            return None
+        ret = ret | var_set
+    return ret
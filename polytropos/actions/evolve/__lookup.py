@@ -2,9 +2,12 @@ import csv
 import json
 import os
 import logging
-from typing import Type, Callable, Any, Dict, List, Optional, Sequence, cast
+from typing import Type, Callable, Any, Dict, List, Optional, Sequence, Mapping, cast
 from collections import OrderedDict
 
+from polytropos.util.lookuptable import MappedLookup, default_cache_dir, compiled_path, open_compiled, compilable, \
+    write_lookup
+
 def lookup(name: str) -> Callable[[Type], Type]:
     """Intended to be a decorator on the constructor for a Change. Verifies that the specified lookup table has been
     loaded."""
@@ -54,7 +57,7 @@ def _load_json(filename: str) -> Dict:
     with open(filename) as fh:
         return json.load(fh)
 
-def _load(filename: str, lookup_name: str) -> Dict:
+def _parse(filename: str, lookup_name: str) -> Dict:
     if filename.endswith(".csv"):
         return _load_csv(filename, lookup_name)
     elif filename.endswith(".json"):
@@ -62,15 +65,36 @@ def _load(filename: str, lookup_name: str) -> Dict:
     else:
         raise RuntimeError('Unexpected lookup filename {} for lookup "{}"'.format(filename, lookup_name))
 
+def _load(filename: str, lookup_name: str) -> Mapping:
+    """Load a lookup as compiled on disk (see MappedLookup), compiling it first if it has changed since it was last
+    compiled. Lookups are loaded into memory if compiling is disabled or fails, or if they are not keyed by strings."""
+    cache_dir: Optional[str] = default_cache_dir()
+    if cache_dir is None:
+        return _parse(filename, lookup_name)
+    path: str = compiled_path(cache_dir, filename)
+    compiled: Optional[MappedLookup] = open_compiled(path)
+    if compiled is not None:
+        return compiled
+    content: Dict = _parse(filename, lookup_name)
+    if not compilable(content):
+        return content
+    try:
+        write_lookup(path, content)
+    except OSError as e:
+        logging.warning('Could not compile lookup "{}" into {}: {}'.format(lookup_name, cache_dir, repr(e)))
+        return content
+    logging.info('Compiled lookup "{}" into {}'.format(lookup_name, path))
+    return MappedLookup(path)
+
 def load_lookups(requested: Optional[List[str]], base_dir: str) -> Dict:
     """Look for a set of lookups (.json or .csv) in a particular directory. Load them into a dictionary of
-    dictionaries, then return that. Verify that there is not both a .json and a .csv file with the same name in the
+    mappings (see _load), then return that. Verify that there is not both a .json and a .csv file with the same name in the
     same directory."""
     if requested is None or len(requested) == 0:
         return {}
     loaded_lookups: Dict = {}
     for lookup_name in requested:
         filename: str = _resolve_filename(lookup_name, base_dir)
-        content: Dict = _load(filename, lookup_name)
+        content: Mapping = _load(filename, lookup_name)
         loaded_lookups[lookup_name] = content
     return loaded_lookups
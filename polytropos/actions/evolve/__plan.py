@@ -0,0 +1,108 @@
+from typing import Dict, List, Optional, FrozenSet, Set, Tuple, Iterable
+
+from polytropos.actions.evolve.__change import Change
+from polytropos.ontology.composite import Composite
+from polytropos.ontology.schema import Schema
+from polytropos.ontology.variable import VariableId, Variable, GenericList
+from polytropos.util.nesteddicts import PathAccessor, MISSING_VALUE, IncompleteNestingError
+
+class Presence:
+    """A cheap test of whether any of a set of variables may have a value in a composite. Variables inside lists are
+    probed by their outermost list, so the test never looks inside a list; a composite passes if any probe finds a
+    value (even None) at its path. The test is conservative: it may pass a composite in which none of the variables
+    have values, but never fails one in which any of them does."""
+
+    def __init__(self, schema: Schema, var_ids: Iterable[VariableId]):
+        self.temporal: List[PathAccessor] = []
+        self.immutable: List[PathAccessor] = []
+        for var_id in sorted(set(_probe(schema, var_id) for var_id in var_ids)):
+            variable: Optional[Variable] = schema.get(var_id)
+            if variable is None:
+                raise ValueError('Unknown variable ID "%s"' % var_id)
+            if variable.temporal:
+                self.temporal.append(variable.accessor)
+            else:
+                self.immutable.append(variable.accessor)
+
+    @classmethod
+    def of(cls, schema: Schema, change: Change) -> Optional["Presence"]:
+        """The presence test of a change that can be skipped for composites in which nothing it reads is present, or
+        None if the change must always be applied."""
+        reads: Optional[FrozenSet[VariableId]] = change.reads
+        if not change.requires_input or reads is None:
+            return None
+        if any(schema.get(var_id) is None for var_id in reads):
+            return None
+        return cls(schema, reads)
+
+    def __call__(self, composite: Composite) -> bool:
+        for key, content in composite.content.items():
+            probes: List[PathAccessor] = self.immutable if key == "immutable" else self.temporal
+            for accessor in probes:
+                try:
+                    if accessor.get(content) is not MISSING_VALUE:
+                        return True
+                except IncompleteNestingError:
+                    # Malformed content is left for the change itself to complain about
+                    return True
+        return False
+
+def _probe(schema: Schema, var_id: VariableId) -> VariableId:
+    """The variable whose presence stands in for that of the one supplied: its outermost list, if it is in one. An
+    unknown variable stands for itself."""
+    variable: Optional[Variable] = schema.get(var_id)
+    if variable is None or not variable.descends_from_list:
+        return var_id
+    ret: VariableId = var_id
+    for ancestor in variable.ancestors(None):
+        if isinstance(ancestor, GenericList):
+            ret = ancestor.var_id
+    return ret
+
+def plan(schema: Schema, changes: List[Change]) -> List[Tuple[Change, Optional[Presence]]]:
+    """The changes to apply, in order, each with the presence test (if any) that a composite must pass for it to be
+    applied. Consecutive changes are merged wherever the first offers a merged equivalent (see Change.merged_with)."""
+    merged: List[Change] = []
+    for change in changes:
+        if len(merged) > 0:
+            combined: Optional[Change] = merged[-1].merged_with(change)
+            if combined is not None:
+                merged[-1] = combined
+                continue
+        merged.append(change)
+    return [(change, Presence.of(schema, change)) for change in merged]
+
+def _lineage(schema: Schema, var_ids: Optional[FrozenSet[VariableId]]) -> Optional[Dict[VariableId, Set[VariableId]]]:
+    """The IDs of each variable and of its ancestors, or None if the variables are not known."""
+    if var_ids is None:
+        return None
+    ret: Dict[VariableId, Set[VariableId]] = {}
+    for var_id in var_ids:
+        variable: Optional[Variable] = schema.get(var_id)
+        if variable is None:
+            return None
+        ret[var_id] = {ancestor.var_id for ancestor in variable.ancestors(None)}
+    return ret
+
+def _overlap(first: Optional[Dict[VariableId, Set[VariableId]]],
+             second: Optional[Dict[VariableId, Set[VariableId]]]) -> bool:
+    """True if any variable of the first set is, contains, or is contained by, a variable of the second."""
+    if first is None or second is None:
+        return True
+    for var_id, lineage in first.items():
+        for other_id, other_lineage in second.items():
+            if var_id in other_lineage or other_id in lineage:
+                return True
+    return False
+
+def dependency_graph(schema: Schema, changes: List[Change]) -> Dict[int, List[int]]:
+    """For each change (by position), the earlier changes that it must follow: those that write a variable it reads or
+    writes, or that read a variable it writes. Changes that do not declare what they read or write depend on, and are
+    depended upon by, every other change."""
+    reads: List[Optional[Dict[VariableId, Set[VariableId]]]] = [_lineage(schema, change.reads) for change in changes]
+    writes: List[Optional[Dict[VariableId, Set[VariableId]]]] = [_lineage(schema, change.writes) for change in changes]
+    graph: Dict[int, List[int]] = {}
+    for i in range(len(changes)):
+        graph[i] = [j for j in range(i) if _overlap(writes[j], reads[i]) or _overlap(writes[j], writes[i]) or
+                    _overlap(reads[j], writes[i])]
+    return graph
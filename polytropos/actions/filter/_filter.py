@@ -1,20 +1,19 @@
 import logging
-import os
-import json
 from dataclasses import dataclass
-from typing import Dict, List, Type, Any
+from typing import Dict, Type, Any, Optional
 
 from polytropos.ontology.composite import Composite
 from polytropos.ontology.context import Context
 
 from polytropos.ontology.schema import Schema
 
+from polytropos.util import profiling
 from polytropos.util.loader import load
-from polytropos.actions.step import Step
-from polytropos.util.paths import find_all_composites, relpath_for
+from polytropos.actions.fused import FusedStep
+from polytropos.actions.step import Step, PerCompositeStep
 
 @dataclass
-class Filter(Step):  # type: ignore # https://github.com/python/mypy/issues/5374
+class Filter(Step, PerCompositeStep):  # type: ignore # https://github.com/python/mypy/issues/5374
     """Iterate over each composite. If the composite returns False for the "passes" method, remove it from the dataset
     completely. If it returns True, apply the "narrow" method to it, which is intended to remove data (although in
     principle it could also add it). The purpose of this kind of action is to selectively remove data that is irrelevant
@@ -45,20 +44,14 @@ class Filter(Step):  # type: ignore # https://github.com/python/mypy/issues/5374
         """Remove or retain specific periods."""
         pass
 
-    def process_composites(self, composite_ids: List[str], origin_dir: str, target_base_dir: str) -> None:
-        for composite_id in composite_ids:
-            relpath: str = relpath_for(composite_id)
-            with open(os.path.join(origin_dir, relpath, "%s.json" % composite_id)) as origin_file:
-                content: Dict = json.load(origin_file)
-                composite: Composite = Composite(self.schema, content, composite_id=composite_id)
-                if self.passes(composite):
-                    self.narrow(composite)
-                    target_dir: str = os.path.join(target_base_dir, relpath)
-                    os.makedirs(target_dir, exist_ok=True)
-                    with open(os.path.join(target_dir, "%s.json" % composite_id), 'w') as target_file:
-                        json.dump(composite.content, target_file, indent=2)
+    def transform(self, composite_id: str, content: Dict) -> Optional[Dict]:
+        composite: Composite = Composite(self.schema, content, composite_id=composite_id)
+        if not self.passes(composite):
+            profiling.add("filters_failed", self.__class__.__name__, 1)
+            return None
+        profiling.add("filters_passed", self.__class__.__name__, 1)
+        self.narrow(composite)
+        return composite.content
 
     def __call__(self, origin_dir: str, target_dir: str) -> None:
-        composites_ids = list(find_all_composites(origin_dir))
-        for _ in self.context.run_in_thread_pool(self.process_composites, composites_ids, origin_dir, target_dir):
-            pass
+        FusedStep(self.context, [self])(origin_dir, target_dir)
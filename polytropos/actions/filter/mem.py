@@ -3,17 +3,22 @@ from typing import List, Iterable, Iterator, Optional
 
 from polytropos.actions.filter import Filter
 from polytropos.ontology.composite import Composite
+from polytropos.util import profiling
 from copy import copy
 
 @dataclass
 class InMemoryFilterIterator:
     filters: List[Filter]
 
-    def apply_all(self, composite: Composite) -> Optional[Composite]:
-        target: Composite = copy(composite)
+    def apply_all(self, composite: Composite, in_place: bool = False) -> Optional[Composite]:
+        """The composite as narrowed by every filter, or None if any filter rejects it. Unless in_place is set, the
+        composite is copied first."""
+        target: Composite = composite if in_place else copy(composite)
         for f in self.filters:
             if not f.passes(target):
+                profiling.add("filters_failed", f.__class__.__name__, 1)
                 return None
+            profiling.add("filters_passed", f.__class__.__name__, 1)
             f.narrow(target)
         return target
 
@@ -1,13 +1,9 @@
-import json
-import logging
-import os
-from typing import Dict, List, Any, Iterator
+from typing import Dict, List, Optional
 
 from polytropos.ontology.composite import Composite
 
-from polytropos.util.paths import find_all_composites, relpath_for
-
-from polytropos.actions.step import Step
+from polytropos.actions.fused import FusedStep
+from polytropos.actions.step import Step, PerCompositeStep
 
 from polytropos.actions.filter.mem import InMemoryFilterIterator
 
@@ -15,7 +11,7 @@ from polytropos.actions.filter import Filter
 from polytropos.ontology.context import Context
 from polytropos.ontology.schema import Schema
 
-class SequentialFilter(Step):  # type: ignore # https://github.com/python/mypy/issues/5374
+class SequentialFilter(Step, PerCompositeStep):  # type: ignore # https://github.com/python/mypy/issues/5374
     def __init__(self, context: Context, schema: Schema, f_iter: InMemoryFilterIterator):
         self.f_iter = f_iter
         self.context = context
@@ -35,26 +31,10 @@ class SequentialFilter(Step):  # type: ignore # https://github.com/python/mypy/i
         f_iter: InMemoryFilterIterator = InMemoryFilterIterator(filters)
         return cls(context, schema, f_iter)
 
-    def _as_composites(self, composite_ids: List[str], origin_dir: str) -> Iterator[Composite]:
-        for composite_id in composite_ids:
-            relpath: str = relpath_for(composite_id)
-            with open(os.path.join(origin_dir, relpath, "%s.json" % composite_id)) as origin_file:
-                content: Dict = json.load(origin_file)
-                composite: Composite = Composite(self.schema, content, composite_id=composite_id)
-                yield composite
-
-    def process_composites(self, composite_ids: List[str], origin_dir: str, target_base_dir: str) -> None:
-        composites: Iterator[Composite] = self._as_composites(composite_ids, origin_dir)
-        for filtered_composite in self.f_iter(composites):
-            c_id: str = filtered_composite.composite_id
-            relpath: str = relpath_for(c_id)
-            target_dir: str = os.path.join(target_base_dir, relpath)
-            os.makedirs(target_dir, exist_ok=True)
-            with open(os.path.join(target_dir, "%s.json" % c_id), 'w') as target_file:
-                json.dump(filtered_composite.content, target_file, indent=2)
+    def transform(self, composite_id: str, content: Dict) -> Optional[Dict]:
+        composite: Composite = Composite(self.schema, content, composite_id=composite_id)
+        narrowed: Optional[Composite] = self.f_iter.apply_all(composite, in_place=True)
+        return narrowed.content if narrowed is not None else None
 
     def __call__(self, origin_dir: str, target_dir: str) -> None:
-        composites_ids = list(find_all_composites(origin_dir))
-        logging.info("Spawning parallel processes to perform SequentialFilter operation.")
-        for _ in self.context.run_in_process_pool(self.process_composites, composites_ids, origin_dir, target_dir):
-            pass
+        FusedStep(self.context, [self])(origin_dir, target_dir)
@@ -4,7 +4,6 @@ from dataclasses import dataclass
 from typing import TYPE_CHECKING, Any, List
 
 from polytropos.ontology.composite import Composite
-from polytropos.util.nesteddicts import MissingDataError, MISSING_VALUE
 
 if TYPE_CHECKING:
     from polytropos.actions.filter.univariate.__univariate import UnivariateFilter
@@ -22,10 +21,7 @@ class UnivariateCompositeTester(ABC):
 
     def __call__(self, composite: Composite) -> bool:
         if not self.parent.variable.temporal:
-            try:
-                value: Any = composite.get_immutable(self.parent.var_id)
-            except MissingDataError:
-                value = MISSING_VALUE
+            value: Any = self.parent.accessor.get(composite.content, "immutable")
             return self.parent.compares_case_insensitive(value)
 
         return self.passes_temporal(composite)
@@ -40,10 +36,7 @@ class AllPeriodsCompareTrue(UnivariateCompositeTester):
             return False
 
         for period in periods:
-            try:
-                value = composite.get_observation(self.parent.var_id, period)
-            except MissingDataError:
-                value = MISSING_VALUE
+            value = self.parent.accessor.get(composite.content, period)
             if not self.parent.compares_case_insensitive(value):
                 return False
 
@@ -59,10 +52,7 @@ class AnyPeriodComparesTrue(UnivariateCompositeTester):
             return True
 
         for period in periods:
-            try:
-                value = composite.get_observation(self.parent.var_id, period)
-            except MissingDataError:
-                value = MISSING_VALUE
+            value = self.parent.accessor.get(composite.content, period)
             if self.parent.compares_case_insensitive(value):
                 return True
 
@@ -78,10 +68,7 @@ class EarliestPeriodComparesTrue(UnivariateCompositeTester):
             return self.parent.missing_value_passes()
 
         earliest: str = min(periods)
-        try:
-            value = composite.get_observation(self.parent.var_id, earliest)
-        except MissingDataError:
-            value = MISSING_VALUE
+        value = self.parent.accessor.get(composite.content, earliest)
         return self.parent.compares_case_insensitive(value)
 
 class LatestPeriodComparesTrue(UnivariateCompositeTester):
@@ -94,10 +81,7 @@ class LatestPeriodComparesTrue(UnivariateCompositeTester):
             return self.parent.missing_value_passes()
 
         latest: str = max(periods)
-        try:
-            value = composite.get_observation(self.parent.var_id, latest)
-        except MissingDataError:
-            value = MISSING_VALUE
+        value = self.parent.accessor.get(composite.content, latest)
         return self.parent.compares_case_insensitive(value)
 
 class NoPeriodComparesTrue(UnivariateCompositeTester):
@@ -110,10 +94,7 @@ class NoPeriodComparesTrue(UnivariateCompositeTester):
             return True
 
         for period in periods:
-            try:
-                value = composite.get_observation(self.parent.var_id, period)
-            except MissingDataError:
-                value = MISSING_VALUE
+            value = self.parent.accessor.get(composite.content, period)
             if self.parent.compares_case_insensitive(value):
                 return False
 
@@ -4,7 +4,7 @@ from typing import Any, cast, Dict
 from polytropos.actions.filter._nestable_filter import NestableFilter
 from polytropos.ontology.context import Context
 from polytropos.ontology.schema import Schema
-from polytropos.util.nesteddicts import MissingDataError, MISSING_VALUE
+from polytropos.util.nesteddicts import MISSING_VALUE, PathAccessor
 
 from polytropos.ontology.composite import Composite
 from polytropos.ontology.variable import VariableId, Variable, Primitive
@@ -46,6 +46,7 @@ class UnivariateFilter(NestableFilter, ABC):
             raise ValueError("Narrowing by comparison cannot be performed on an immutable variable.")
 
         self.variable: Primitive = cast(Primitive, variable)
+        self.accessor: PathAccessor = variable.accessor
 
     def passes_composite(self, composite: Composite) -> bool:
         return self.tester(composite)
@@ -73,9 +74,5 @@ class UnivariateFilter(NestableFilter, ABC):
         super().narrow(composite)
 
     def passes_period(self, composite: Composite, period: str) -> bool:
-        try:
-            value: Any = composite.get_observation(self.var_id, period)
-        except MissingDataError:
-            value = MISSING_VALUE
-
+        value: Any = self.accessor.get(composite.content, period)
         return self.compares_case_insensitive(value)
@@ -0,0 +1,205 @@
+import logging
+import time
+import traceback
+from typing import List, Dict, Optional, TYPE_CHECKING, Any, cast
+
+from polytropos.actions.step import Step, PerCompositeStep
+from polytropos.util import profiling
+from polytropos.util.chunking import WeightedItems
+from polytropos.util.manifest import ManifestEntry, recording_manifest
+from polytropos.util.quarantine import StepQuarantine
+from polytropos.util.stepcache import StepCache, chain_key, content_digest
+from polytropos.util.store import Buffer, Codec, CompositeStore, JSON, StoreWriter, open_store
+
+if TYPE_CHECKING:
+    from polytropos.ontology.context import Context
+    from polytropos.ontology.schema import Schema
+
+# Number of composites that are held in memory together and passed through the steps as one batch
+BATCH_SIZE = 500
+
+class FusedStep(Step):
+    """Applies a run of consecutive per-composite steps (Evolve, Filter, Translate...) in a single pass: each composite
+    is read once, passed through every step in memory, and written once. A step that drops a composite (e.g. a Filter)
+    ends the pass for that composite.
+
+    If the context has a cache directory, the output of each step for each composite is recorded in a StepCache, keyed
+    by the composite's input and the fingerprints of the steps applied so far. On a later run, the pass resumes from the
+    last step whose output is already cached, so only the steps downstream of a configuration change are recomputed."""
+
+    def __init__(self, context: "Context", steps: List[PerCompositeStep]):
+        self.context = context
+        self.steps = steps
+
+    # noinspection PyMethodOverriding
+    @classmethod
+    def build(cls, *, context: "Context", schema: "Schema", steps: List[PerCompositeStep],  # type: ignore
+              **kwargs: Any) -> "FusedStep":
+        """Fused steps are not specified in tasks, but formed from runs of the steps that are (see fuse)."""
+        return cls(context, steps)
+
+    def __str__(self) -> str:
+        return " + ".join(step.__class__.__name__ for step in self.steps)
+
+    def _cache_keys(self, composite_id: str, raw: Buffer) -> List[str]:
+        """Cache keys for the output of each step, up to the first step that has no fingerprint. Steps may read the
+        composite's ID as well as its content, so both go into the key."""
+        keys: List[str] = []
+        key: str = chain_key(content_digest(raw), composite_id)
+        for step in self.steps:
+            fingerprint: Optional[str] = step.fingerprint  # type: ignore
+            if fingerprint is None:
+                break
+            key = chain_key(key, fingerprint)
+            keys.append(key)
+        return keys
+
+    def _apply(self, composite_id: str, raw: Buffer, cache: Optional[StepCache], origin_codec: Codec = JSON,
+               target_codec: Codec = JSON) -> Optional[bytes]:
+        """Apply all steps to the raw input, resuming from the cache where possible. Returns the output encoded with the
+        target codec, or None if the composite was dropped."""
+        keys: List[str] = self._cache_keys(composite_id, raw) if cache is not None else []
+        content: Optional[Dict] = None
+        start: int = 0
+        for i in reversed(range(len(keys))):
+            assert cache is not None
+            cached: Optional[bytes] = cache.get(keys[i])
+            if cached is None:
+                continue
+            if cached == StepCache.DROPPED:
+                return None
+            if i == len(self.steps) - 1 and target_codec is StepCache.CODEC:
+                return cached
+            content = StepCache.CODEC.decode(cached)
+            start = i + 1
+            break
+
+        if content is None:
+            content = origin_codec.decode(raw)
+
+        encoded: Optional[bytes] = None
+        # Per-step times are only of interest when several steps share a pass
+        timed: bool = len(self.steps) > 1 and profiling.enabled()
+        for i in range(start, len(self.steps)):
+            assert content is not None
+            if timed:
+                step_start: float = time.perf_counter()
+                content = self.steps[i].transform(composite_id, content)
+                profiling.add("steps", "%i:%s" % (i, self.steps[i].__class__.__name__), time.perf_counter() - step_start)
+            else:
+                content = self.steps[i].transform(composite_id, content)
+            encoded = None
+            if i < len(keys):
+                assert cache is not None
+                encoded = StepCache.DROPPED if content is None else StepCache.CODEC.encode(content)
+                cache.put(keys[i], encoded)
+            if content is None:
+                return None
+        if encoded is not None and target_codec is StepCache.CODEC:
+            return encoded
+        return target_codec.encode(content)
+
+    def process_composite(self, origin: CompositeStore, writer: StoreWriter, composite_id: str,
+                          cache: Optional[StepCache] = None) -> Optional[ManifestEntry]:
+        output: Optional[bytes] = self._apply(composite_id, origin.read(composite_id), cache, origin.codec, writer.codec)
+        if output is None:
+            return None
+        return writer.write(composite_id, output)
+
+    def _apply_batch(self, composite_ids: List[str], contents: List[Dict]) -> List[Optional[Dict]]:
+        """Apply all steps, one after the other, to the contents of several composites. Composites dropped by a step
+        are not passed on to the next one."""
+        results: List[Optional[Dict]] = list(contents)
+        timed: bool = len(self.steps) > 1 and profiling.enabled()
+        for i, step in enumerate(self.steps):
+            pending: List[int] = [j for j, content in enumerate(results) if content is not None]
+            if len(pending) == 0:
+                break
+            step_start: float = time.perf_counter()
+            transformed: List[Optional[Dict]] = step.transform_batch([composite_ids[j] for j in pending],
+                                                                     [cast(Dict, results[j]) for j in pending])
+            if timed:
+                profiling.add("steps", "%i:%s" % (i, step.__class__.__name__), time.perf_counter() - step_start)
+            for j, content in zip(pending, transformed):
+                results[j] = content
+        return results
+
+    def process_batch(self, origin: CompositeStore, writer: StoreWriter, composite_ids: List[str]) \
+            -> List[ManifestEntry]:
+        contents: List[Dict] = [origin.codec.decode(origin.read(composite_id)) for composite_id in composite_ids]
+        written: List[ManifestEntry] = []
+        for composite_id, content in zip(composite_ids, self._apply_batch(composite_ids, contents)):
+            if content is not None:
+                written.append(writer.write(composite_id, writer.codec.encode(content)))
+        return written
+
+    @property
+    def batched(self) -> bool:
+        """Whether composites are passed through the steps in batches (see PerCompositeStep.transform_batch) rather
+        than one at a time. Batches bypass the step cache, so this is only done when there is no cache."""
+        return self.context.cache_dir is None and any(step.batched for step in self.steps)
+
+    def process_composites(self, chunk: List[str], origin_dir: str, target_dir: str) -> List[ManifestEntry]:
+        start: float = time.time()
+        cache: Optional[StepCache] = StepCache(self.context.cache_dir) if self.context.cache_dir else None
+        origin: CompositeStore = open_store(origin_dir)
+        written: List[ManifestEntry] = []
+        with open_store(target_dir).writer() as writer:
+            if self.batched:
+                for i in range(0, len(chunk), BATCH_SIZE):
+                    batch: List[str] = chunk[i:i + BATCH_SIZE]
+                    try:
+                        written.extend(self.process_batch(origin, writer, batch))
+                    except Exception:
+                        logging.error("Error processing composites %s to %s during %s step." % (batch[0], batch[-1],
+                                                                                               self))
+                        traceback.print_exc()
+                        raise
+            else:
+                for composite_id in chunk:
+                    try:
+                        entry: Optional[ManifestEntry] = self.process_composite(origin, writer, composite_id, cache)
+                        if entry is not None:
+                            written.append(entry)
+                    except Exception:
+                        logging.error("Error processing composite %s during %s step." % (composite_id, self))
+                        traceback.print_exc()
+                        raise
+        elapsed: float = time.time() - start
+        logging.info("Completed batch of {:,} composites ({}) in {:0.2f} seconds.".format(len(chunk), self, elapsed))
+        return written
+
+    def __call__(self, origin_dir: str, target_dir: str) -> None:
+        origin: CompositeStore = open_store(origin_dir)
+        composite_ids: WeightedItems[str] = origin.weighted_composite_ids()
+        quarantine: Optional[StepQuarantine] = self.context.quarantine_for(str(self), origin)
+        logging.info("Spawning parallel processes to perform %s on all composites." % self)
+        if self.context.cache_dir is not None and any(step.batched for step in self.steps):
+            logging.info("Passing composites through %s one at a time, since batches bypass the step cache." % self)
+        with recording_manifest(target_dir) as manifest:
+            for written in self.context.run_in_process_pool(self.process_composites, composite_ids, origin_dir,
+                                                            target_dir, quarantine=quarantine):
+                manifest.extend(written)
+
+def fuse(context: "Context", steps: List[Step]) -> List[Step]:
+    """Plan the execution of a task by replacing each run of two or more consecutive per-composite steps with a single
+    FusedStep. Steps that need to see every composite before producing output (Scan, Aggregate, Consume, Merge) are
+    kept as-is, and act as barriers between runs."""
+    planned: List[Step] = []
+    run: List[PerCompositeStep] = []
+
+    def flush() -> None:
+        if len(run) == 1:
+            planned.append(run[0])  # type: ignore
+        elif len(run) > 1:
+            planned.append(FusedStep(context, list(run)))
+        run.clear()
+
+    for step in steps:
+        if isinstance(step, PerCompositeStep):
+            run.append(step)
+            continue
+        flush()
+        planned.append(step)
+    flush()
+    return planned
@@ -1,70 +1,105 @@
-import json
 import os
-from typing import Any, Set, Tuple, Dict, Optional
+from typing import Any, Tuple, Dict, Optional, List, Union, Iterator
 
-from polytropos.util.paths import find_all_composites, relpath_for
+from polytropos.util.chunking import WeightedItems
+from polytropos.util.manifest import ManifestEntry, iter_manifest, recording_manifest
+from polytropos.util.store import CompositeStore, StoreWriter, open_store
 
 from polytropos.actions.merge.util import merge_dicts
 from polytropos.actions.step import Step
 from polytropos.ontology.context import Context
 from polytropos.ontology.schema import Schema
-import shutil
 
-def _do_copy_all(eins: Set[str], source_dir: str, target_dir: str) -> None:
-    for ein in eins:
-        relpath: str = relpath_for(ein)
-        source: str = "{}/{}/{}.json".format(source_dir, relpath, ein)
-        target: str = "{}/{}/{}.json".format(target_dir, relpath, ein)
-        os.makedirs(os.path.dirname(target), exist_ok=True)
-        shutil.copyfile(source, target)
+# Name by which precedence refers to the input of the step
+PRIMARY = "primary"
+
+def _merge_one(composite_id: str, sources: List[CompositeStore], writer: StoreWriter) -> ManifestEntry:
+    """Merge a composite found in several sources, which are given in order of precedence."""
+    merged_content: Dict = sources[0].load(composite_id)
+    for source in sources[1:]:
+        merged_content = merge_dicts(merged_content, source.load(composite_id))
+    return writer.dump(composite_id, merged_content)
+
+# A composite to merge: its ID, a bit mask of the sources (in order of precedence) in which it is found, and, if it is
+# found in only one, its entry in that source's manifest (if there is one)
+MergeItem = Tuple[str, int, Optional[ManifestEntry]]
+
+def merge_composites(items: List[MergeItem], source_dirs: List[str], target_dir: str) -> List[ManifestEntry]:
+    """Merge each composite found in several sources, and pass through each composite found in only one."""
+    sources: List[CompositeStore] = [open_store(source_dir) for source_dir in source_dirs]
+    written: List[ManifestEntry] = []
+    with open_store(target_dir).writer() as writer:
+        for composite_id, mask, entry in items:
+            found: List[CompositeStore] = [source for index, source in enumerate(sources) if mask & (1 << index)]
+            if len(found) == 1:
+                written.append(writer.copy(found[0], composite_id, entry))
+            else:
+                written.append(_merge_one(composite_id, found, writer))
+    return written
 
+class Merge(Step):
+    """Combines the composites of the step's input (the primary source) with those of one or more secondary sources,
+    each a directory of the entities input directory. A composite found in only one source is passed through as it is;
+    one found in several is merged, giving precedence to the sources in the order given by precedence (by default,
+    the primary source and then the secondary ones as listed). Where sources disagree about a value, the one that comes
+    first wins, except that dictionaries are merged key by key (see merge_dicts).
 
-def _merge_one(ein: str, primary_dir: str, secondary_dir: str, target_dir: str) -> None:
-    relpath: str = relpath_for(ein)
-    primary_fn: str = os.path.join(primary_dir, relpath, "{}.json".format(ein))
-    secondary_fn: str = os.path.join(secondary_dir, relpath, "{}.json".format(ein))
-
-    with open(primary_fn) as p_fh, open(secondary_fn) as s_fh:
-        primary_content: Dict = json.load(p_fh)
-        secondary_content: Dict = json.load(s_fh)
-
-    merged_content: Dict = merge_dicts(primary_content, secondary_content)
-
-    target_fn: str = os.path.join(target_dir, relpath, "{}.json".format(ein))
-    os.makedirs(os.path.dirname(target_fn), exist_ok=True)
-    with open(target_fn, "w") as t_fh:
-        json.dump(merged_content, t_fh, indent=2)
+    Composites are merged in the context's process pool. Composites passed through from a directory store are shared
+    with it as reflinks or hard links, where possible (see DirectoryWriter.copy)."""
 
-class Merge(Step):
-    def __init__(self, context: Context, schema: Schema, secondary: str):
+    def __init__(self, context: Context, schema: Schema, secondary: Union[str, List[str]],
+                 precedence: Optional[List[str]] = None):
         self.context = context
         self.schema = schema
-        self.secondary_dir = os.path.join(context.entities_input_dir, secondary)
+        self.secondary: List[str] = [secondary] if isinstance(secondary, str) else list(secondary)
+        if len(self.secondary) == 0:
+            raise ValueError("Merge requires at least one secondary source")
+        if PRIMARY in self.secondary:
+            raise ValueError('"%s" refers to the input of the step, and cannot name a secondary source' % PRIMARY)
+        if len(set(self.secondary)) < len(self.secondary):
+            raise ValueError("Each secondary source can only be merged once")
+        self.precedence: List[str] = list(precedence) if precedence is not None else [PRIMARY] + self.secondary
+        if sorted(self.precedence) != sorted([PRIMARY] + self.secondary):
+            raise ValueError('Precedence must list "%s" and each secondary source exactly once' % PRIMARY)
+        self.secondary_dirs: Dict[str, str] = {name: os.path.join(context.entities_input_dir, name)
+                                               for name in self.secondary}
 
     # noinspection PyMethodOverriding
     @classmethod
-    def build(cls, *, context: Context, schema: Schema, secondary: str) -> Any:  # type: ignore
-        return cls(context, schema, secondary)
-
-    def _get_ein_sets(self, origin_dir: str) -> Tuple[Set[str], Set[str], Set[str]]:
-        primary_eins: Set[str] = {ein for ein in find_all_composites(origin_dir)}
-        secondary_eins: Set[str] = {ein for ein in find_all_composites(self.secondary_dir)}
-
-        primary_only = primary_eins - secondary_eins
-        secondary_only = secondary_eins - primary_eins
-        common = primary_eins.intersection(secondary_eins)
-
-        return primary_only, common, secondary_only
-
-    def _copy_directly(self, p_only: Set[str], q_only: Set[str], primary_dir: str, target_dir: str) -> None:
-        _do_copy_all(p_only, primary_dir, target_dir)
-        _do_copy_all(q_only, self.secondary_dir, target_dir)
-
-    def _merge_common(self, eins: Set[str], primary_dir: str, target_dir: str) -> None:
-        for ein in eins:
-            _merge_one(ein, primary_dir, self.secondary_dir, target_dir)
+    def build(cls, *, context: Context, schema: Schema, secondary: Union[str, List[str]],  # type: ignore
+              precedence: Optional[List[str]] = None) -> Any:
+        return cls(context, schema, secondary, precedence)
+
+    def _source_dirs(self, origin_dir: str) -> List[str]:
+        """The directories of the sources, in order of precedence."""
+        return [origin_dir if name == PRIMARY else self.secondary_dirs[name] for name in self.precedence]
+
+    def _crawl(self, source_dirs: List[str]) -> Iterator[Tuple[MergeItem, int]]:
+        """Yields (merge item, total size) for every composite. Manifest entries are taken from the source manifests,
+        so that composites passed through need not be read again to record them in the target's manifest."""
+        found: Dict[str, List[Any]] = {}
+        for index, source_dir in enumerate(source_dirs):
+            listed: Dict[str, ManifestEntry] = {entry.composite_id: entry for entry in iter_manifest(source_dir) or []}
+            for composite_id, size in open_store(source_dir).composite_sizes():
+                record: Optional[List[Any]] = found.get(composite_id)
+                if record is None:
+                    entry: Optional[ManifestEntry] = listed.get(composite_id)
+                    # A manifest that disagrees with the file it lists is not to be trusted
+                    if entry is not None and entry.size != size:
+                        entry = None
+                    found[composite_id] = [1 << index, size, entry]
+                else:
+                    record[0] |= 1 << index
+                    record[1] += size
+                    # Merged, rather than passed through
+                    record[2] = None
+            del listed
+        for composite_id, (mask, size, entry) in found.items():
+            yield (composite_id, mask, entry), size
 
     def __call__(self, origin_dir: str, target_dir: str) -> None:
-        primary_only, common, secondary_only = self._get_ein_sets(origin_dir)
-        self._copy_directly(primary_only, secondary_only, origin_dir, target_dir)
-        self._merge_common(common, origin_dir, target_dir)
\ No newline at end of file
+        source_dirs: List[str] = self._source_dirs(origin_dir)
+        items: WeightedItems[MergeItem] = WeightedItems(self._crawl(source_dirs))
+        with recording_manifest(target_dir) as manifest:
+            for written in self.context.run_in_process_pool(merge_composites, items, source_dirs, target_dir):
+                manifest.extend(written)
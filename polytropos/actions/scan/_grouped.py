@@ -0,0 +1,69 @@
+"""Support for scans that compare each composite only with those sharing its value of some immutable variable, such as
+Rank and Quantile with group_by. The observations are counted by group in the workers; the groups are then
+hash-partitioned, and the partitions analyzed independently and in parallel."""
+
+import os
+from collections import Counter, defaultdict
+from typing import Dict, Any, List, Tuple, Iterable, DefaultDict, TYPE_CHECKING
+
+import numpy as np
+
+if TYPE_CHECKING:
+    from polytropos.ontology.context import Context
+
+# Distinct values in ascending order, the number of observations less than each, and the total number of observations
+OffsetTable = Tuple[np.ndarray, np.ndarray, int]
+
+def count_by_group(extracts: List[Tuple[str, Any]]) -> Dict[Any, Counter]:
+    """Count the occurrences of each value in each group, given extracts of (group, value). Extracts with no group or no
+    value are left out."""
+    observations: DefaultDict[Any, Counter] = defaultdict(Counter)
+    for composite_id, (group, obs) in extracts:  # types: str, Tuple[Any, Any]
+        if group is None or obs is None:
+            continue
+        observations[group][obs] += 1
+    return dict(observations)
+
+def merge_by_group(partials: Iterable[Dict[Any, Counter]]) -> Dict[Any, Counter]:
+    observations: DefaultDict[Any, Counter] = defaultdict(Counter)
+    for partial in partials:
+        for group, counts in partial.items():
+            observations[group].update(counts)
+    return dict(observations)
+
+def offset_table(observations: Counter) -> OffsetTable:
+    values: np.ndarray = np.asarray(list(observations.keys()))
+    counts: np.ndarray = np.asarray(list(observations.values()), dtype=np.int64)
+    order: np.ndarray = np.argsort(values, kind="stable")
+    values = values[order]
+    below: np.ndarray = np.concatenate(([0], np.cumsum(counts[order])[:-1]))
+    return values, below, int(counts.sum())
+
+def offset_tables(partitions: List[Dict[Any, Counter]]) -> Dict[Any, OffsetTable]:
+    tables: Dict[Any, OffsetTable] = {}
+    for partition in partitions:
+        for group, observations in partition.items():
+            tables[group] = offset_table(observations)
+    return tables
+
+def partition(observations: Dict[Any, Counter], n_partitions: int) -> List[Dict[Any, Counter]]:
+    """Split the groups into (at most) n_partitions, by the hash of each group."""
+    partitions: List[Dict[Any, Counter]] = [{} for _ in range(n_partitions)]
+    for group, counts in observations.items():
+        partitions[hash(group) % n_partitions][group] = counts
+    return [p for p in partitions if len(p) > 0]
+
+def analyze_by_group(context: "Context", observations: Dict[Any, Counter]) -> Dict[Any, OffsetTable]:
+    """Compute the offset table of every group, with each partition of the groups in a worker process."""
+    tables: Dict[Any, OffsetTable] = {}
+    partitions: List[Dict[Any, Counter]] = partition(observations, os.cpu_count() or 1)
+    for partial in context.run_in_process_pool(offset_tables, partitions, chunk_size=1):
+        tables.update(partial)
+    return tables
+
+def offset_of(table: OffsetTable, value: Any) -> int:
+    """The number of observations less than value, which must be among those observed."""
+    values, below, _ = table
+    index: int = int(np.searchsorted(values, value))
+    assert index < len(values) and values[index] == value, "Value {} did not get recorded in offset table".format(value)
+    return int(below[index])
@@ -1,16 +1,19 @@
 import itertools
 import logging
-import os
-import json
+import shutil
+import tempfile
 from abc import abstractmethod
 from dataclasses import dataclass
-from typing import Dict, Any, Iterable, Tuple, TYPE_CHECKING, Type, List
+from typing import Dict, Any, Iterable, Tuple, TYPE_CHECKING, Type, List, Optional, Set
 
 from polytropos.ontology.composite import Composite
 
 from polytropos.actions.step import Step
+from polytropos.util.chunking import WeightedItems
 from polytropos.util.loader import load
-from polytropos.util.paths import find_all_composites, relpath_for
+from polytropos.util.manifest import ManifestEntry, recording_manifest
+from polytropos.util.quarantine import StepQuarantine
+from polytropos.util.store import CompositeStore, PickleCodec, open_store, create_store
 
 if TYPE_CHECKING:
     from polytropos.ontology.context import Context
@@ -25,7 +28,14 @@ class Scan(Step):
     """Scan iterates through all of the composites in the task pipeline twice: once to gather global information, and
     then a second time to make alterations to the composites on the basis of the globally gathered information. In
     between, an arbitrary analysis may be performed on the basis of the global information. Example use cases include
-    assigning ranks, or computing a property relative to peers sharing some other property."""
+    assigning ranks, or computing a property relative to peers sharing some other property.
+
+    The input is only read and parsed once. The first pass keeps the parsed composites in memory, if their total size
+    is within the context's scan_memory_budget, or else spills them to the temp directory as pickles; the second pass
+    alters them from there. Keeping composites in memory is not free: they are pickled back from the workers to the
+    parent process, and then altered in a thread pool of the parent, where alter is bound by the GIL. It pays off when
+    reading the input is slow relative to alter; when alter is expensive, the spilled path, which alters in the process
+    pool, may be faster."""
 
     # noinspection PyMethodOverriding
     @classmethod
@@ -39,10 +49,22 @@ class Scan(Step):
         """Gather the information to be used in the analysis."""
         pass
 
+    def combine(self, extracts: List[Tuple[str, Any]]) -> Any:
+        """Reduce the extracts from one chunk of composites to a partial result, in the worker process that extracted
+        them, so that less is sent back to the parent. By default, the extracts are passed on as they are.
+        :param extracts: Tuple of (composite id, whatever is returned by extract)"""
+        return extracts
+
+    def merge(self, partials: Iterable[Any]) -> Any:
+        """Merge the partial results from every chunk (see combine) into what is passed to analyze. By default, the
+        extracts from every chunk, in turn."""
+        return itertools.chain.from_iterable(partials)
+
     @abstractmethod
-    def analyze(self, extracts: Iterable[Tuple[str, Any]]) -> None:
+    def analyze(self, extracts: Any) -> None:
         """Collect, process, and store the global information provided from each composite during the scan() step.
-        :param extracts: Tuple of (composite id, whatever is returned by extract)"""
+        :param extracts: Whatever is returned by merge; by default, tuples of (composite id, whatever is returned by
+        extract)"""
         pass
 
     @abstractmethod
@@ -51,34 +73,119 @@ class Scan(Step):
         the alteration."""
         pass
 
-    def process_composites(self, composite_ids: List[str], origin_dir: str) -> List[Tuple[str, Any]]:
-        result: List[Tuple[str, Any]] = []
+    def extract_and_keep(self, composite_ids: List[str], origin_dir: str) -> Tuple[Any, List[Tuple[str, Dict]]]:
+        """Returns the combined extracts from a chunk of composites, along with the content of each composite, for the
+        second pass to alter."""
+        origin: CompositeStore = open_store(origin_dir)
+        extracts: List[Tuple[str, Any]] = []
+        contents: List[Tuple[str, Dict]] = []
         for composite_id in composite_ids:
-            relpath: str = relpath_for(composite_id)
-            with open(os.path.join(origin_dir, relpath, "%s.json" % composite_id)) as origin_file:
-                content: Dict = json.load(origin_file)
-                composite: Composite = Composite(self.schema, content, composite_id=composite_id)
-                result.append((composite_id, self.extract(composite)))
-        return result
+            content: Dict = origin.load(composite_id)
+            composite: Composite = Composite(self.schema, content, composite_id=composite_id)
+            extracts.append((composite_id, self.extract(composite)))
+            contents.append((composite_id, content))
+        return self.combine(extracts), contents
 
-    def alter_and_write_composites(self, composite_ids: List[str], origin_dir: str, target_base_dir: str) -> None:
-        for composite_id in composite_ids:
-            relpath: str = relpath_for(composite_id)
-            with open(os.path.join(origin_dir, relpath, "%s.json" % composite_id)) as origin_file:
-                content: Dict = json.load(origin_file)
+    def extract_and_spill(self, composite_ids: List[str], origin_dir: str, spill_dir: str) -> Any:
+        """Returns the combined extracts from a chunk of composites, having written each composite to the spill store,
+        for the second pass to alter."""
+        origin: CompositeStore = open_store(origin_dir)
+        extracts: List[Tuple[str, Any]] = []
+        with open_store(spill_dir).writer() as writer:
+            for composite_id in composite_ids:
+                content: Dict = origin.load(composite_id)
                 composite: Composite = Composite(self.schema, content, composite_id=composite_id)
+                extracts.append((composite_id, self.extract(composite)))
+                writer.dump(composite_id, content)
+        return self.combine(extracts)
+
+    def alter_and_write_kept(self, composite_ids: List[str], target_base_dir: str) -> List[ManifestEntry]:
+        """Alter and write composites kept in memory by the first pass. Runs in threads of the process that kept them."""
+        written: List[ManifestEntry] = []
+        with open_store(target_base_dir).writer() as writer:
+            for composite_id in composite_ids:
+                composite: Composite = Composite(self.schema, self._kept[composite_id], composite_id=composite_id)
+                self.alter(composite_id, composite)
+                written.append(writer.dump(composite_id, composite.content))
+        return written
+
+    def alter_and_write_composites(self, composite_ids: List[str], origin_dir: str, target_base_dir: str) -> List[ManifestEntry]:
+        origin: CompositeStore = open_store(origin_dir)
+        written: List[ManifestEntry] = []
+        with open_store(target_base_dir).writer() as writer:
+            for composite_id in composite_ids:
+                composite: Composite = Composite(self.schema, origin.load(composite_id), composite_id=composite_id)
                 self.alter(composite_id, composite)
-            target_dir: str = os.path.join(target_base_dir, relpath)
-            os.makedirs(target_dir, exist_ok=True)
-            with open(os.path.join(target_dir, "%s.json" % composite_id), 'w') as target_file:
-                json.dump(composite.content, target_file, indent=2)
+                written.append(writer.dump(composite_id, composite.content))
+        return written
+
+    def _fits_in_memory(self, origin: CompositeStore) -> bool:
+        budget: Optional[int] = self.context.scan_memory_budget
+        if budget is None:
+            return False
+        total: int = 0
+        for _, size in origin.composite_sizes():
+            total += size
+            if total > budget:
+                return False
+        return True
+
+    def _in_memory(self, origin: CompositeStore, origin_dir: str, target_dir: str,
+                   quarantine: Optional[StepQuarantine]) -> None:
+        logging.info("Spawning parallel processes to extract data from each composite for global application. "
+                     "Composites are kept in memory.")
+        kept: Dict[str, Dict] = {}
+        partials: List[Any] = []
+        for partial, contents in self.context.run_in_process_pool(self.extract_and_keep,
+                                                                  origin.weighted_composite_ids(), origin_dir,
+                                                                  quarantine=quarantine):
+            partials.append(partial)
+            kept.update(contents)
+        self.analyze(self.merge(partials))
+        del partials
+        # Only now attached to the scan, which is sent to worker processes along with the first pass
+        self._kept: Dict[str, Dict] = kept
+
+        logging.info("Applying global information to each composite.")
+        # Composites that were left out of the analysis are not kept, so they are left out of the output as well
+        composite_ids: List[str] = [composite_id for composite_id in origin.composite_ids() if composite_id in kept]
+        try:
+            with recording_manifest(target_dir) as manifest:
+                for written in self.context.run_in_thread_pool(self.alter_and_write_kept, composite_ids, target_dir,
+                                                               chunk_size=self.context.process_pool_chunk_size,
+                                                               quarantine=quarantine):
+                    manifest.extend(written)
+        finally:
+            self._kept = {}
+
+    def _spilled(self, origin: CompositeStore, origin_dir: str, target_dir: str,
+                 quarantine: Optional[StepQuarantine]) -> None:
+        spill_dir: str = tempfile.mkdtemp(prefix="scan_spill_", dir=self.context.temp_dir or None)
+        try:
+            create_store(spill_dir, self.context.store_backend, PickleCodec.name)
+            logging.info("Spawning parallel processes to extract data from each composite for global application.")
+            self.analyze(
+                self.merge(self.context.run_in_process_pool(self.extract_and_spill, origin.weighted_composite_ids(),
+                                                            origin_dir, spill_dir, quarantine=quarantine))
+            )
+            logging.info("Spawning parallel processes to apply global information to each composite.")
+            composite_ids: WeightedItems[str] = origin.weighted_composite_ids()
+            if quarantine is not None and len(quarantine.composite_ids) > 0:
+                # Composites that were left out of the analysis are left out of the output as well
+                excluded: Set[str] = set(quarantine.composite_ids)
+                composite_ids = WeightedItems((composite_id, size) for composite_id, size in origin.composite_sizes()
+                                              if composite_id not in excluded)
+            with recording_manifest(target_dir) as manifest:
+                for written in self.context.run_in_process_pool(self.alter_and_write_composites, composite_ids,
+                                                                spill_dir, target_dir, quarantine=quarantine):
+                    manifest.extend(written)
+        finally:
+            shutil.rmtree(spill_dir, ignore_errors=True)
 
     def __call__(self, origin_dir: str, target_dir: str) -> None:
-        logging.info("Spawning parallel processes to extract data from each composite for global application.")
-        composite_ids: List[str] = list(find_all_composites(origin_dir))
-        self.analyze(
-            itertools.chain.from_iterable(self.context.run_in_process_pool(self.process_composites, composite_ids, origin_dir))
-        )
-        logging.info("Spawning parallel processes to apply global information to each composite.")
-        for _ in self.context.run_in_process_pool(self.alter_and_write_composites, composite_ids, origin_dir, target_dir):
-            pass
+        origin: CompositeStore = open_store(origin_dir)
+        quarantine: Optional[StepQuarantine] = self.context.quarantine_for(self.__class__.__name__, origin)
+        if self._fits_in_memory(origin):
+            self._in_memory(origin, origin_dir, target_dir, quarantine)
+        else:
+            self._spilled(origin, origin_dir, target_dir, quarantine)
@@ -1,10 +1,15 @@
+import zlib
 from dataclasses import dataclass, field
 from typing import Iterable, Tuple, Any, Optional, Dict, Iterator, List
 from collections import Counter
 
+import numpy as np
+
 from polytropos.actions.scan import Scan
+from polytropos.actions.scan._grouped import OffsetTable, count_by_group, merge_by_group, analyze_by_group, offset_of
 from polytropos.ontology.composite import Composite
-from polytropos.ontology.variable import VariableId
+from polytropos.ontology.variable import VariableId, Variable
+from polytropos.util.kll import KLLSketch, k_for_error
 
 def val2qtile(observations: Counter) -> Dict[int, float]:
     distinct_values: List[int] = sorted(observations.keys())
@@ -20,43 +25,148 @@ def val2qtile(observations: Counter) -> Dict[int, float]:
 @dataclass
 class Quantile(Scan):
     """Extracts an numeric value from each composite, assigning a quantile score to each unique value. For each
-    observation with a non-null source value, store the associated quantile in the target variable."""
+    observation with a non-null source value, store the associated quantile in the target variable.
+
+    If group_by is specified, each quantile is instead relative to the composites with the same value of that
+    (immutable) variable. Composites without a value for group_by get no quantile."""
 
     source: VariableId
     target: VariableId
+    group_by: Optional[VariableId] = None
     value_to_quantile: Dict[int, float] = field(default_factory=dict, init=False)
+    group_quantiles: Dict[Any, OffsetTable] = field(default_factory=dict, init=False)
 
     def __post_init__(self) -> None:
-        source_var = self.schema.get(self.source)
-        target_var = self.schema.get(self.target)
+        source_var: Optional[Variable] = self.schema.get(self.source)
+        target_var: Optional[Variable] = self.schema.get(self.target)
 
+        if source_var is None:
+            raise ValueError('Source variable "%s" does not exist.' % self.source)
+        if target_var is None:
+            raise ValueError('Target variable "%s" does not exist.' % self.target)
         if source_var.temporal or target_var.temporal:
             raise ValueError("Quantile scan compares entities and thus only works on immutable variables.")
+        if self.group_by is not None:
+            group_var: Optional[Variable] = self.schema.get(self.group_by)
+            if group_var is None:
+                raise ValueError('Grouping variable "%s" does not exist.' % self.group_by)
+            if group_var.temporal:
+                raise ValueError("Quantile scan can only group by an immutable variable.")
 
         assert source_var.data_type in {"Integer", "Currency"}, "Quantile currently only implemented for integers"
         assert target_var.data_type == "Decimal", "Quantile target must be a Decimal"
 
-    def extract(self, composite: Composite) -> Optional[int]:
-        return composite.get_immutable(self.source, treat_missing_as_null=True)
+    def extract(self, composite: Composite) -> Any:
+        value: Optional[int] = composite.get_immutable(self.source, treat_missing_as_null=True)
+        if self.group_by is None:
+            return value
+        return composite.get_immutable(self.group_by, treat_missing_as_null=True), value
 
-    def analyze(self, extracts: Iterable[Tuple[str, Any]]) -> None:
+    def combine(self, extracts: List[Tuple[str, Any]]) -> Any:
+        if self.group_by is not None:
+            return count_by_group(extracts)
         observations: Counter = Counter()
         for composite_id, obs in extracts:  # types: str, Optional[int]
             if obs is None:
                 continue
             int_obs: int = int(obs)
             observations[int_obs] += 1
+        return observations
 
+    def merge(self, partials: Iterable[Any]) -> Any:
+        if self.group_by is not None:
+            return merge_by_group(partials)
+        observations: Counter = Counter()
+        for partial in partials:
+            observations.update(partial)
+        return observations
+
+    def analyze(self, observations: Any) -> None:
         if len(observations) == 0:
             return
 
+        if self.group_by is not None:
+            self.group_quantiles = analyze_by_group(self.context, observations)
+            return
         self.value_to_quantile = val2qtile(observations)
 
     def alter(self, composite_id: str, composite: Composite) -> None:
         value: Optional[int] = composite.get_immutable(self.source, treat_missing_as_null=True)
         if value is None:
             return
+        if self.group_by is not None:
+            self._alter_in_group(composite, self.group_by, value)
+            return
         assert value in self.value_to_quantile, "Value {} did not get recorded in value-to-quantile map".format(value)
         quantile: float = self.value_to_quantile[value]
         composite.put_immutable(self.target, quantile)
 
+    def _alter_in_group(self, composite: Composite, group_by: VariableId, value: int) -> None:
+        group: Any = composite.get_immutable(group_by, treat_missing_as_null=True)
+        if group is None:
+            return
+        table: OffsetTable = self.group_quantiles[group]
+        composite.put_immutable(self.target, offset_of(table, value) / table[2])
+
+@dataclass
+class ApproximateQuantile(Scan):
+    """As Quantile, but estimates the quantile of each value from a KLL sketch of the values rather than counting every
+    distinct value, so that memory is bounded however many composites there are. Each quantile is within error of the
+    one Quantile would assign (with about 99% confidence). Also accepts Decimal sources."""
+
+    source: VariableId
+    target: VariableId
+    error: float = 0.01
+    n_obs: int = field(default=0, init=False)
+    sorted_values: np.ndarray = field(default_factory=lambda: np.empty(0), init=False)
+    ranks: np.ndarray = field(default_factory=lambda: np.zeros(1, dtype=np.int64), init=False)
+
+    def __post_init__(self) -> None:
+        source_var: Optional[Variable] = self.schema.get(self.source)
+        target_var: Optional[Variable] = self.schema.get(self.target)
+
+        if source_var is None:
+            raise ValueError('Source variable "%s" does not exist.' % self.source)
+        if target_var is None:
+            raise ValueError('Target variable "%s" does not exist.' % self.target)
+        if source_var.temporal or target_var.temporal:
+            raise ValueError("Quantile scan compares entities and thus only works on immutable variables.")
+
+        assert source_var.data_type in {"Integer", "Currency", "Decimal"}, "Quantile requires a numeric argument"
+        assert target_var.data_type == "Decimal", "Quantile target must be a Decimal"
+
+        self.k: int = k_for_error(self.error)
+
+    def extract(self, composite: Composite) -> Optional[float]:
+        return composite.get_immutable(self.source, treat_missing_as_null=True)
+
+    def combine(self, extracts: List[Tuple[str, Any]]) -> KLLSketch:
+        # Each chunk's sketch is seeded differently, but reproducibly, so that the quantiles assigned do not vary from
+        # one run to the next
+        seed: int = zlib.crc32(extracts[0][0].encode("utf-8")) if len(extracts) > 0 else 0
+        sketch: KLLSketch = KLLSketch(self.k, seed=seed)
+        for composite_id, obs in extracts:  # types: str, Optional[float]
+            if obs is None:
+                continue
+            sketch.update(float(obs))
+        return sketch
+
+    def merge(self, partials: Iterable[KLLSketch]) -> KLLSketch:
+        sketch: KLLSketch = KLLSketch(self.k, seed=0)
+        for partial in partials:
+            sketch.merge(partial)
+        return sketch
+
+    def analyze(self, sketch: KLLSketch) -> None:
+        if sketch.n == 0:
+            return
+
+        self.n_obs = sketch.n
+        self.sorted_values, self.ranks = sketch.rank_table()
+
+    def alter(self, composite_id: str, composite: Composite) -> None:
+        value: Optional[float] = composite.get_immutable(self.source, treat_missing_as_null=True)
+        if value is None:
+            return
+        rank: int = int(self.ranks[np.searchsorted(self.sorted_values, float(value), side="left")])
+        composite.put_immutable(self.target, rank / self.n_obs)
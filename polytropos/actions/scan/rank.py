@@ -7,7 +7,8 @@ from polytropos.ontology.composite import Composite
 from polytropos.ontology.schema import Schema
 from polytropos.ontology.context import Context
 from polytropos.actions.scan import Scan
-from polytropos.ontology.variable import VariableId
+from polytropos.actions.scan._grouped import OffsetTable, count_by_group, merge_by_group, analyze_by_group, offset_of
+from polytropos.ontology.variable import VariableId, Variable
 
 def value_to_rank(observations: Counter) -> Dict[Any, int]:
     rank: Dict = {}
@@ -21,36 +22,70 @@ def value_to_rank(observations: Counter) -> Dict[Any, int]:
 class Rank(Scan):
     """Similar to Quantile, Rank provides an ordering of non-temporal, integer values across the set of composites. This
     particular ranking puts the highest value at 1, and resolves ties by assigning the lowest possible value. For
-    example, given the values [45, 7, 7, 0], the ranking would be 45->1, 7->3, 0->4."""
-    def __init__(self, context: Context, schema: Schema, source: VariableId, target: VariableId):
+    example, given the values [45, 7, 7, 0], the ranking would be 45->1, 7->3, 0->4.
+
+    If group_by is specified, each composite is instead ranked among those with the same value of that (immutable)
+    variable. Composites without a value for group_by are left unranked."""
+    def __init__(self, context: Context, schema: Schema, source: VariableId, target: VariableId,
+                 group_by: Optional[VariableId] = None):
         super(Rank, self).__init__(context, schema)
         self.source: VariableId = source
         self.target: VariableId = target
+        self.group_by: Optional[VariableId] = group_by
 
-        source_var = self.schema.get(self.source)
-        target_var = self.schema.get(self.target)
+        source_var: Optional[Variable] = self.schema.get(self.source)
+        target_var: Optional[Variable] = self.schema.get(self.target)
 
+        if source_var is None:
+            raise ValueError('Source variable "%s" does not exist.' % self.source)
+        if target_var is None:
+            raise ValueError('Target variable "%s" does not exist.' % self.target)
         if source_var.temporal or target_var.temporal:
             raise ValueError("Rank scan compares entities and thus only works on immutable variables.")
+        if group_by is not None:
+            group_var: Optional[Variable] = self.schema.get(group_by)
+            if group_var is None:
+                raise ValueError('Grouping variable "%s" does not exist.' % group_by)
+            if group_var.temporal:
+                raise ValueError("Rank scan can only group by an immutable variable.")
 
         assert source_var.data_type in {"Integer", "Currency", "Decimal"}, "Rank requires a numeric argument"
         assert target_var.data_type == "Integer", "Rank target must be an Integer"
 
         self.ranks: Dict[Any, int] = {}
+        self.group_ranks: Dict[Any, OffsetTable] = {}
 
     def extract(self, composite: Composite) -> Any:
-        return composite.get_immutable(self.source, treat_missing_as_null=True)
+        value: Any = composite.get_immutable(self.source, treat_missing_as_null=True)
+        if self.group_by is None:
+            return value
+        return composite.get_immutable(self.group_by, treat_missing_as_null=True), value
 
-    def analyze(self, extracts: Iterable[Tuple[str, Any]]) -> None:
+    def combine(self, extracts: List[Tuple[str, Any]]) -> Any:
+        if self.group_by is not None:
+            return count_by_group(extracts)
         observations: Counter = Counter()
         for composite_id, obs in extracts:  # types: str, Optional[int]
             if obs is None:
                 continue
             observations[obs] += 1
+        return observations
+
+    def merge(self, partials: Iterable[Any]) -> Any:
+        if self.group_by is not None:
+            return merge_by_group(partials)
+        observations: Counter = Counter()
+        for partial in partials:
+            observations.update(partial)
+        return observations
 
+    def analyze(self, observations: Any) -> None:
         if len(observations) == 0:
             return
 
+        if self.group_by is not None:
+            self.group_ranks = analyze_by_group(self.context, observations)
+            return
         self.ranks = value_to_rank(observations)
 
     def alter(self, composite_id: str, composite: Composite) -> None:
@@ -58,6 +93,17 @@ class Rank(Scan):
             value: Any = composite.get_immutable(self.source)
         except MissingDataError:
             return
+        if self.group_by is not None:
+            self._alter_in_group(composite, self.group_by, value)
+            return
         assert value in self.ranks, "Value {} did not get recorded in value-to-rank map".format(value)
         rank: int = self.ranks[value]
-        composite.put_immutable(self.target, rank)
\ No newline at end of file
+        composite.put_immutable(self.target, rank)
+
+    def _alter_in_group(self, composite: Composite, group_by: VariableId, value: Any) -> None:
+        group: Any = composite.get_immutable(group_by, treat_missing_as_null=True)
+        if group is None:
+            return
+        table: OffsetTable = self.group_ranks[group]
+        # The number of observations in the group that are at least the value
+        composite.put_immutable(self.target, table[2] - offset_of(table, value))
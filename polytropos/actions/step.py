@@ -1,11 +1,14 @@
 from abc import abstractmethod
-from typing import TYPE_CHECKING, Any
+from typing import TYPE_CHECKING, Any, Dict, List, Optional, FrozenSet
 
 if TYPE_CHECKING:
     from polytropos.ontology.context import Context
     from polytropos.ontology.schema import Schema
 
 class Step:
+    # Hash of the step's configuration (class, arguments, schemas, lookups and code), assigned by the task that loads
+    # the step. Used to key cached per-composite outputs; None disables caching for the step.
+    fingerprint: Optional[str] = None
 
     @classmethod
     @abstractmethod
@@ -18,3 +21,33 @@ class Step:
     def __call__(self, origin_dir: str, target_dir: str) -> None:
         """Call takes the origin folder and the target folder"""
         pass
+
+class PerCompositeStep:
+    """Mixin for steps that transform each composite without reference to any other composite. Consecutive steps of
+    this kind can be fused by the task planner into a single pass over the data (see FusedStep)."""
+
+    @abstractmethod
+    def transform(self, composite_id: str, content: Dict) -> Optional[Dict]:
+        """Apply this step to the content of a single composite, in memory. Returns the resulting content, or None if
+        the composite should not be passed on to the next step."""
+        pass
+
+    @property
+    def reads(self) -> Optional[FrozenSet[str]]:
+        """IDs of the variables that transform may read, or None if it may read any variable. Together with writes,
+        tells the task planner which per-composite steps are independent of one another."""
+        return None
+
+    @property
+    def writes(self) -> Optional[FrozenSet[str]]:
+        """IDs of the variables that transform may create, alter or delete, or None if it may write any variable."""
+        return None
+
+    @property
+    def batched(self) -> bool:
+        """True if transform_batch does better than applying transform to each composite in turn."""
+        return False
+
+    def transform_batch(self, composite_ids: List[str], contents: List[Dict]) -> List[Optional[Dict]]:
+        """Apply this step to the content of several composites, in memory, returning the results in the same order."""
+        return [self.transform(composite_id, content) for composite_id, content in zip(composite_ids, contents)]
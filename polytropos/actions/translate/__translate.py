@@ -1,21 +1,18 @@
 import logging
 import time
 from dataclasses import dataclass
-import os
-import json
-from typing import Optional, List, Callable, Dict, Any
-from functools import partial
-import traceback
+from typing import Optional, Dict, Any
 
-from polytropos.actions.step import Step
+from polytropos.actions.fused import FusedStep
+from polytropos.actions.step import Step, PerCompositeStep
 from polytropos.actions.translate.__document import DocumentValueProvider
 from polytropos.ontology.schema import Schema
 from polytropos.actions.translate import Translator
-from polytropos.util.paths import find_all_composites, relpath_for
 from polytropos.ontology.context import Context
+from polytropos.util import profiling
 
 @dataclass
-class Translate(Step):
+class Translate(Step, PerCompositeStep):
     context: Context
     target_schema: Schema
     translate_immutable: Translator
@@ -40,45 +37,30 @@ class Translate(Step):
         return cls(context, target_schema_instance, translate_immutable, translate_temporal)
 
     def do_translate(self, content: Dict, composite_id: str) -> Dict:
+        # When profiling, the time spent on each target track is recorded for the task profile
+        timed: bool = profiling.enabled()
         translated = {}
         for key, value in content.items():
             if key.isdigit():
-                translated[key] = self.translate_temporal(composite_id, key, value)
+                track, translator = "temporal", self.translate_temporal
             elif key == 'immutable':
-                translated[key] = self.translate_immutable(composite_id, key, value)
+                track, translator = "immutable", self.translate_immutable
             else:
-                pass
+                continue
+            if not timed:
+                translated[key] = translator(composite_id, key, value)
+                continue
+            start: float = time.perf_counter()
+            translated[key] = translator(composite_id, key, value)
+            profiling.add("tracks", track, time.perf_counter() - start)
         return translated
 
-    def process_composite(self, origin_dir: str, target_base_dir: str, composite_id: str) -> None:
+    def transform(self, composite_id: str, content: Dict) -> Optional[Dict]:
         logging.debug('Translating composite "%s".' % composite_id)
-        relpath: str = relpath_for(composite_id)
-        try:
-            with open(os.path.join(origin_dir, relpath, "%s.json" % composite_id)) as origin_file:
-                content = json.load(origin_file)
-                translated: Dict = self.do_translate(content, composite_id)
-
-            target_dir: str = os.path.join(target_base_dir, relpath)
-            os.makedirs(target_dir, exist_ok=True)
-            with open(os.path.join(target_dir, "%s.json" % composite_id), 'w') as target_file:
-                json.dump(translated, target_file, indent=2)
-        except Exception as e:
-            logging.error("Error translating composite %s." % composite_id)
-            traceback.print_exc()
-            raise e
-
-    def process_composites(self, origin_dir: str, target_dir: str, chunk: List[str]) -> None:
-        start: float = time.time()
-        for composite_id in chunk:
-            self.process_composite(origin_dir, target_dir, composite_id)
-        elapsed: float = time.time() - start
-        logging.info("Completed batch of {:,} translations in {:0.2f} seconds.".format(len(chunk), elapsed))
+        return self.do_translate(content, composite_id)
 
     def __call__(self, origin_dir: str, target_dir: str) -> None:
-        composites: List[str] = list(find_all_composites(origin_dir))
-        action: Callable = partial(self.process_composites, origin_dir, target_dir)
-        for _ in self.context.run_in_process_pool(action, composites):
-            pass
+        FusedStep(self.context, [self])(origin_dir, target_dir)
 
     @staticmethod
     def create_document_value_provider(doc: Dict[str, Any]) -> DocumentValueProvider:
@@ -1,5 +1,7 @@
 import os
-from typing import TextIO, Optional, cast
+import sys
+import tempfile
+from typing import TextIO, Optional, Tuple, cast
 import click
 import logging
 
@@ -9,13 +11,17 @@ from polytropos.actions.translate.trace import Trace
 from polytropos.ontology.schema import Schema
 
 from polytropos.actions.consume.coverage import CoverageFile
-from polytropos.ontology.context import Context
+from polytropos.ontology.context import Context, DEFAULT_TARGET_CHUNK_SECONDS, ERROR_POLICIES, ABORT
 from polytropos.ontology.task import Task
 from polytropos.ontology.variable import VariableId
+from polytropos.tools.bench.corpus import CorpusSpec, CorpusGenerator
+from polytropos.tools.bench.suite import BENCHMARKS, run_suite, write_results, read_results, compare
 from polytropos.tools.schema import treeview
 from polytropos.tools.schema.catalog import variable_catalog
 from polytropos.tools.schema.linkage import ExportLinkages
 from polytropos.tools.schema.repair_sort import repair_sort_order
+from polytropos.util.manifest import build_manifest
+from polytropos.util.store import CODECS, STORE_BACKENDS
 from polytropos.actions import register_all
 
 logging.basicConfig(format='%(asctime)s : %(levelname)s : %(message)s', level=logging.INFO)
@@ -37,12 +43,65 @@ def cli() -> None:
 @click.option('--output_path', type=click.Path(exists=False))
 @click.option('--temp_path', type=click.Path(exists=False))
 @click.option('--no_cleanup', is_flag=True)
-@click.option('--chunk_size', type=click.INT)
-def task(data_path: str, config_path: str, task_name: str, input_path: Optional[str], output_path: Optional[str], temp_path: Optional[str], no_cleanup: bool, chunk_size: Optional[int]) -> None:
+@click.option('--chunk_size', type=click.INT, help="Fixed number of composites per chunk of parallel work. By default, "
+                                                   "chunks are balanced by composite size and adapt to take about "
+                                                   "--chunk_seconds each.")
+@click.option('--chunk_seconds', type=click.FLOAT, default=DEFAULT_TARGET_CHUNK_SECONDS)
+@click.option('--no_fusion', is_flag=True, help="Run every step separately, instead of fusing consecutive per-composite "
+                                                "steps into a single pass.")
+@click.option('--cache_path', type=click.Path(exists=False), help="Directory in which to cache the output of each "
+                                                                   "per-composite step, so that re-runs only recompute "
+                                                                   "what changed. Defaults to a cache in the temp "
+                                                                   "directory when --no_cleanup is set.")
+@click.option('--cache_max_mb', type=click.INT, help="Evict least recently used cache entries beyond this size.")
+@click.option('--store', type=click.Choice(sorted(STORE_BACKENDS.keys())), default="directory",
+              help="Storage layout for intermediate outputs.")
+@click.option('--codec', type=click.Choice(sorted(CODECS.keys())), default="compact-json",
+              help="Serialization of intermediate outputs. The task's output is always indented JSON.")
+@click.option('--on_error', type=click.Choice(ERROR_POLICIES), default=ABORT,
+              help="What to do when a composite raises an error: abort the task, or retry the chunk that contains it, "
+                   "set aside the composites that fail on their own, and complete the task without them.")
+@click.option('--retries', type=click.INT, default=1, help="Times to retry a failed chunk before isolating the "
+                                                           "composites that fail, when --on_error=quarantine.")
+@click.option('--quarantine_path', type=click.Path(exists=False), help="Where to report quarantined composites. "
+                                                                        "Defaults to _quarantine in the output "
+                                                                        "directory.")
+@click.option('--profile', is_flag=True, help="Write a JSON performance profile of each step beside the task's "
+                                              "output.")
+@click.option('--scan_memory_mb', type=click.INT, help="Keep the composites read by a Scan in memory between its two "
+                                                       "passes if their total size is within this many MB. Otherwise "
+                                                       "they are spilled to the temp directory.")
+@click.option('--aggregate_memory_mb', type=click.INT, help="Split the extracts of a grouped Aggregate into enough "
+                                                            "partitions that those being grouped at once fit within "
+                                                            "this many MB.")
+def task(data_path: str, config_path: str, task_name: str, input_path: Optional[str], output_path: Optional[str], temp_path: Optional[str], no_cleanup: bool, chunk_size: Optional[int], chunk_seconds: float, no_fusion: bool,
+         cache_path: Optional[str], cache_max_mb: Optional[int], store: str, codec: str, on_error: str, retries: int,
+         quarantine_path: Optional[str], profile: bool, scan_memory_mb: Optional[int],
+         aggregate_memory_mb: Optional[int]) -> None:
     """Perform a Polytropos task."""
-    with Context.build(config_path, data_path, input_dir=input_path, output_dir=output_path, temp_dir=temp_path, no_cleanup=no_cleanup, process_pool_chunk_size=chunk_size) as context:
+    cache_max_bytes: Optional[int] = cache_max_mb * 1024 * 1024 if cache_max_mb is not None else None
+    scan_memory_budget: Optional[int] = scan_memory_mb * 1024 * 1024 if scan_memory_mb is not None else None
+    aggregate_memory_budget: Optional[int] = (aggregate_memory_mb * 1024 * 1024 if aggregate_memory_mb is not None
+                                              else None)
+    with Context.build(config_path, data_path, input_dir=input_path, output_dir=output_path, temp_dir=temp_path, no_cleanup=no_cleanup, process_pool_chunk_size=chunk_size,
+                       fuse_steps=not no_fusion, cache_dir=cache_path, cache_max_bytes=cache_max_bytes, store_backend=store, intermediate_codec=codec, target_chunk_seconds=chunk_seconds,
+                       error_policy=on_error, chunk_retries=retries, quarantine_dir=quarantine_path, profile=profile,
+                       scan_memory_budget=scan_memory_budget,
+                       aggregate_memory_budget=aggregate_memory_budget) as context:
         task = Task.build(context, task_name)
         task.run()
+        if context.quarantine is not None:
+            click.echo(context.quarantine.summary(), err=True)
+
+
+@cli.command()
+@click.argument('data_path', type=click.Path(exists=True))
+@click.option('--no_checksums', is_flag=True, help="Record only composite sizes, without reading every composite.")
+def manifest(data_path: str, no_checksums: bool) -> None:
+    """Crawl a directory of composites and write its manifest, so that later tasks reading from it need not crawl it
+    again. Task steps write manifests for their own outputs; this is for data produced by other means. Rebuild the
+    manifest whenever composites are added to or removed from the directory by hand."""
+    build_manifest(data_path, checksums=not no_checksums)
 
 
 @cli.group()
@@ -173,5 +232,83 @@ def source_coverage(schemas_dir: str, source_schema_name: str, target_schema_nam
         SourceCoverage.standalone(context, translate_dir, trace_dir, source_schema_name, target_schema_name, output_filename)
 
 
+def _corpus_options(func):  # type: ignore
+    func = click.option('--composites', type=click.INT, default=1000, help="Number of composites to generate.")(func)
+    func = click.option('--periods', type=click.INT, default=5, help="Number of periods in each composite.")(func)
+    func = click.option('--list_length', type=click.INT, default=5, help="Maximum number of elements in each List "
+                                                                           "or KeyedList.")(func)
+    func = click.option('--missing', type=click.FLOAT, default=0.1, help="Share of primitive values to leave out.")(func)
+    func = click.option('--seed', type=click.INT, default=0)(func)
+    func = click.option('--store', type=click.Choice(sorted(STORE_BACKENDS.keys())), default="directory")(func)
+    func = click.option('--codec', type=click.Choice(sorted(CODECS.keys())), default="json")(func)
+    return func
+
+
+@cli.group()
+def bench() -> None:
+    """Synthetic corpora and benchmarks of every kind of step."""
+    pass
+
+
+@bench.command(name="corpus")
+@click.argument('schema_basepath', type=click.Path(exists=True))
+@click.argument('schema_name', type=str)
+@click.argument('output_dir', type=click.Path(exists=False))
+@_corpus_options
+def bench_corpus(schema_basepath: str, schema_name: str, output_dir: str, composites: int, periods: int,
+                 list_length: int, missing: float, seed: int, store: str, codec: str) -> None:
+    """Generate a synthetic corpus of composites that fill in every variable of a schema."""
+    schema: Optional[Schema] = Schema.load(schema_name, schema_basepath)
+    assert schema is not None
+    spec: CorpusSpec = CorpusSpec(composites, periods, list_length, missing, seed)
+    CorpusGenerator(schema, spec).write(output_dir, store, codec)
+
+
+@bench.command(name="run")
+@click.argument('schema_basepath', type=click.Path(exists=True))
+@click.argument('schema_name', type=str)
+@click.argument('output_file', type=click.Path(exists=False))
+@_corpus_options
+@click.option('--repeat', type=click.INT, default=3, help="Times to run each benchmark; the best time is reported.")
+@click.option('--only', type=str, multiple=True, help="Run only this benchmark, or those starting with this prefix "
+                                                      "(e.g. Evolve). May be given more than once. Known benchmarks: "
+                                                      "%s." % ", ".join(BENCHMARKS.keys()))
+@click.option('--chunk_size', type=click.INT)
+@click.option('--work_path', type=click.Path(exists=False), help="Where to put the corpus and step outputs. Defaults "
+                                                                  "to a temporary directory that is removed "
+                                                                  "afterwards.")
+def bench_run(schema_basepath: str, schema_name: str, output_file: str, composites: int, periods: int,
+              list_length: int, missing: float, seed: int, store: str, codec: str, repeat: int, only: Tuple[str, ...],
+              chunk_size: Optional[int], work_path: Optional[str]) -> None:
+    """Time every kind of step over a synthetic corpus for a schema, and write the results as JSON."""
+    spec: CorpusSpec = CorpusSpec(composites, periods, list_length, missing, seed)
+    with tempfile.TemporaryDirectory() as temp_path:
+        results = run_suite(schema_basepath, schema_name, work_path or temp_path, spec, repeat=repeat, only=only,
+                            chunk_size=chunk_size, backend=store, codec=codec)
+    write_results(results, output_file)
+    for name, result in results["benchmarks"].items():
+        click.echo("{:<32}{:>10.3f}s{:>12,.0f}/s".format(name, result["best_seconds"],
+                                                        result["composites_per_second"] or 0))
+
+
+@bench.command(name="compare")
+@click.argument('baseline_file', type=click.Path(exists=True))
+@click.argument('current_file', type=click.Path(exists=True))
+@click.option('--tolerance', type=click.FLOAT, default=0.1, help="Slowdown, as a share of the baseline time, beyond "
+                                                                 "which a benchmark counts as a regression.")
+def bench_compare(baseline_file: str, current_file: str, tolerance: float) -> None:
+    """Compare two sets of benchmark results. Exits with an error if any benchmark regressed."""
+    regressed: bool = False
+    for comparison in compare(read_results(baseline_file), read_results(current_file)):
+        flag: str = ""
+        if comparison.ratio > 1 + tolerance:
+            flag = "  REGRESSION"
+            regressed = True
+        click.echo("{:<32}{:>10.3f}s{:>10.3f}s{:>8.2f}x{}".format(comparison.name, comparison.baseline_seconds,
+                                                                  comparison.current_seconds, comparison.ratio, flag))
+    if regressed:
+        sys.exit(1)
+
+
 if __name__ == "__main__":
     cli()
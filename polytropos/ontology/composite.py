@@ -2,7 +2,7 @@ import copy
 from dataclasses import dataclass, field
 from typing import Dict, Iterator, Optional, Any, Tuple, List
 
-from polytropos.util.nesteddicts import MissingDataError
+from polytropos.util.nesteddicts import MissingDataError, MISSING_VALUE, PathAccessor
 
 from polytropos.util import nesteddicts
 
@@ -30,49 +30,38 @@ class Composite:
     # TODO Check that this isn't trying to grab a list descendant
     def get_immutable(self, var_id: VariableId, treat_missing_as_null: bool = False) -> Optional[Any]:
         """Get an immutable variable from this composite."""
-        var = self.as_var(var_id, track_type=TrackType.IMMUTABLE)
-
-        path = ["immutable"] + list(var.absolute_path)
-        try:
-            return nesteddicts.get(self.content, path)
-        except MissingDataError as e:
+        value: Any = self.schema.accessor(var_id, TrackType.IMMUTABLE).get(self.content, "immutable")
+        if value is MISSING_VALUE:
             if treat_missing_as_null:
                 return None
-            raise e
+            raise MissingDataError
+        return value
 
     # TODO Check that this isn't trying to grab a list descendant
     def get_all_observations(self, var_id: VariableId) -> Iterator[Tuple[str, Any]]:
         """Iterate over all observations of a temporal variable from this composite."""
-        var = self.as_var(var_id, track_type=TrackType.TEMPORAL)
-        var_path: List = list(var.absolute_path)
+        accessor: PathAccessor = self.schema.accessor(var_id, TrackType.TEMPORAL)
         for period in self.periods:
-            try:
-                yield period, nesteddicts.get(self.content, [period] + var_path)
-            except MissingDataError:
-                continue
+            value: Any = accessor.get(self.content, period)
+            if value is not MISSING_VALUE:
+                yield period, value
 
     # TODO Check that this isn't trying to grab a list descendant
     def get_observation(self, var_id: VariableId, period: str, treat_missing_as_null: bool = False) -> Optional[Any]:
         """Get the value of a temporal variable for a particular observation period."""
-        var = self.as_var(var_id, track_type=TrackType.TEMPORAL)
-        var_path: List = list(var.absolute_path)
-        try:
-            return nesteddicts.get(self.content, [period] + var_path)
-        except MissingDataError as e:
+        value: Any = self.schema.accessor(var_id, TrackType.TEMPORAL).get(self.content, period)
+        if value is MISSING_VALUE:
             if treat_missing_as_null:
                 return None
-            raise e
+            raise MissingDataError
+        return value
 
     def put_immutable(self, var_id: VariableId, value: Optional[Any]) -> None:
-        var = self.as_var(var_id, track_type=TrackType.IMMUTABLE)
-        path: List = ["immutable"] + list(var.absolute_path)
-        nesteddicts.put(self.content, path, value)
+        self.schema.accessor(var_id, TrackType.IMMUTABLE).put(self.content, value, "immutable")
 
     def put_observation(self, var_id: VariableId, period: str, value: Optional[Any]) -> None:
         """Assign (or overwrite) the value of a temporal variable into a particular time period's observation."""
-        var = self.as_var(var_id, track_type=TrackType.TEMPORAL)
-        path: List = [period] + list(var.absolute_path)
-        nesteddicts.put(self.content, path, value)
+        self.schema.accessor(var_id, TrackType.TEMPORAL).put(self.content, value, period)
 
     def pop_observation(self, var_id: VariableId, period: str, treat_missing_as_null: bool = False) -> Optional[Any]:
         value: Optional[Any] = self.get_observation(var_id, period, treat_missing_as_null=treat_missing_as_null)
@@ -80,14 +69,10 @@ class Composite:
         return value
 
     def del_observation(self, var_id: VariableId, period: str) -> None:
-        var = self.as_var(var_id, track_type=TrackType.TEMPORAL)
-        path: List = [period] + list(var.absolute_path)
-        nesteddicts.delete(self.content, path)
+        self.schema.accessor(var_id, TrackType.TEMPORAL).delete(self.content, period)
 
     def del_immutable(self, var_id: VariableId) -> None:
-        var = self.as_var(var_id, track_type=TrackType.IMMUTABLE)
-        path: List = ["immutable"] + list(var.absolute_path)
-        nesteddicts.delete(self.content, path)
+        self.schema.accessor(var_id, TrackType.IMMUTABLE).delete(self.content, "immutable")
 
     def encode_list(self, mappings: Dict[str, VariableId], content: List[Dict]) -> Iterator[Dict]:
         """Create a schema-compliant version of a list of dicts based on data structured in some other format.
@@ -1,14 +1,26 @@
 import logging
 import os
 import shutil
-from dataclasses import dataclass
-from typing import Optional, Any, Type, List, Iterable, TypeVar, Callable
+from concurrent.futures.process import ProcessPoolExecutor
+from dataclasses import dataclass, field
+from typing import Optional, Any, Type, Iterable, TypeVar, Callable, Dict
 
-from polytropos.util.futures import run_in_process_pool, run_in_thread_pool, run_in_loop, Func
+from polytropos.util.futures import run_in_process_pool, run_in_thread_pool, run_in_loop, run_in_persistent_pool, Func, \
+    FailurePolicy
+from polytropos.util.profiling import StepProfile, TaskProfile
+from polytropos.util.quarantine import QuarantineReport, StepQuarantine
+from polytropos.util.store import CompositeStore
 
 T = TypeVar('T')  # element type
 R = TypeVar('R', covariant=True)  # result type
 
+DEFAULT_TARGET_CHUNK_SECONDS = 2.0
+
+# Error policies: stop the task at the first composite that raises, or set such composites aside and carry on
+ABORT = "abort"
+QUARANTINE = "quarantine"
+ERROR_POLICIES = (ABORT, QUARANTINE)
+
 @dataclass
 class Context:
     """Context"""
@@ -23,11 +35,44 @@ class Context:
     process_pool_chunk_size: int
     legacy_mode: bool
     steppable_mode: bool
+    fuse_steps: bool = True
+    cache_dir: Optional[str] = None
+    cache_max_bytes: Optional[int] = None
+    store_backend: str = "directory"
+    intermediate_codec: str = "compact-json"
+    # If set, process pool chunks start at process_pool_chunk_size items and adapt to take about this many seconds each
+    target_chunk_seconds: Optional[float] = None
+    error_policy: str = ABORT
+    # Under the quarantine policy, number of times a failed chunk is retried before it is bisected
+    chunk_retries: int = 1
+    # Where quarantined composites are reported; defaults to _quarantine in the output directory
+    quarantine_dir: Optional[str] = None
+    # Whether tasks run in this context write a performance profile (see TaskProfile)
+    profile: bool = False
+    # Total size (serialized) of the composites that a Scan may keep in memory between its two passes. Larger inputs,
+    # or any input if this is None, are spilled to the temp directory instead (see Scan).
+    scan_memory_budget: Optional[int] = None
+    # Total size of the extracts that a GroupedAggregate holds in memory at once, across all workers, when grouping them.
+    # If None, the extracts are split into one partition per worker (see GroupedAggregate).
+    aggregate_memory_budget: Optional[int] = None
+    # Composites set aside under the quarantine policy; started on first use
+    quarantine: Optional[QuarantineReport] = field(default=None, init=False, repr=False, compare=False)
+    # Profile of the task being run, if profiling
+    profiler: Optional[TaskProfile] = field(default=None, init=False, repr=False, compare=False)
+    # Worker pool shared by every step run in this context; started on first use
+    process_pool: Optional[ProcessPoolExecutor] = field(default=None, init=False, repr=False, compare=False)
 
     @classmethod
     def build(cls, conf_dir: str, data_dir: str, input_dir: Optional[str] = None, output_dir: Optional[str] = None, schemas_dir: Optional[str] = None,
               temp_dir: Optional[str] = None, no_cleanup: bool = False,
-              process_pool_chunk_size: Optional[int] = None, steppable_mode: bool = False, clean_output_directory: bool = True) -> "Context":
+              process_pool_chunk_size: Optional[int] = None, steppable_mode: bool = False, clean_output_directory: bool = True,
+              fuse_steps: bool = True, cache_dir: Optional[str] = None, cache_max_bytes: Optional[int] = None,
+              store_backend: str = "directory", intermediate_codec: str = "compact-json",
+              target_chunk_seconds: Optional[float] = DEFAULT_TARGET_CHUNK_SECONDS, error_policy: str = ABORT,
+              chunk_retries: int = 1, quarantine_dir: Optional[str] = None, profile: bool = False,
+              scan_memory_budget: Optional[int] = None, aggregate_memory_budget: Optional[int] = None) -> "Context":
+        if error_policy not in ERROR_POLICIES:
+            raise ValueError('Unrecognized error policy "%s"' % error_policy)
 
         entities_input_dir = input_dir or os.path.join(data_dir, 'entities')
         entities_output_dir = output_dir or entities_input_dir
@@ -49,6 +94,10 @@ class Context:
 
         os.makedirs(temp_dir, exist_ok=True)
 
+        # When intermediate outputs are kept anyway, keep a step cache alongside them so that re-runs can reuse them
+        if cache_dir is None and no_cleanup:
+            cache_dir = os.path.join(temp_dir, '_cache')
+
         return cls(conf_dir=conf_dir,
                    schemas_dir=schemas_dir or os.path.join(conf_dir, 'schemas'),
                    lookups_dir=os.path.join(data_dir, 'lookups'),
@@ -59,26 +108,87 @@ class Context:
                    no_cleanup=no_cleanup,
                    process_pool_chunk_size=process_pool_chunk_size if process_pool_chunk_size is not None else 1000,
                    legacy_mode=input_dir is None,
-                   steppable_mode=steppable_mode)
+                   steppable_mode=steppable_mode,
+                   fuse_steps=fuse_steps,
+                   cache_dir=cache_dir,
+                   cache_max_bytes=cache_max_bytes,
+                   store_backend=store_backend,
+                   intermediate_codec=intermediate_codec,
+                   # A chunk size given explicitly is taken literally
+                   target_chunk_seconds=target_chunk_seconds if process_pool_chunk_size is None else None,
+                   error_policy=error_policy,
+                   chunk_retries=chunk_retries,
+                   quarantine_dir=quarantine_dir,
+                   profile=profile,
+                   scan_memory_budget=scan_memory_budget,
+                   aggregate_memory_budget=aggregate_memory_budget)
 
     def __enter__(self) -> Any:
         return self
 
     def __exit__(self, exc_type: Type, exc_val: Any, exc_tb: Any) -> None:
+        self.shutdown_pool()
+        if self.quarantine is not None:
+            self.quarantine.close()
         if not self.no_cleanup:
             shutil.rmtree(self.temp_dir, ignore_errors=True)
 
-    def run_in_process_pool(self, func: Callable[..., R], items: List[T], *args: Any, chunk_size: Optional[int] = None, workers_count: Optional[int] = None) -> Iterable[R]:  # func: Func[T,R] doesn't work currently (MyPy issue)
+    def quarantine_for(self, step_name: str, origin: CompositeStore) -> Optional[StepQuarantine]:
+        """Failure handler for a step reading from origin, or None if failures are to abort the task. Pass it to
+        run_in_process_pool or run_in_thread_pool along with functions that take chunks of composite IDs."""
+        if self.error_policy != QUARANTINE:
+            return None
+        if self.quarantine is None:
+            self.quarantine = QuarantineReport(self.quarantine_dir or os.path.join(self.output_dir, "_quarantine"))
+        return StepQuarantine(self.quarantine, step_name, origin)
+
+    def _failure_policy(self, quarantine: Optional[StepQuarantine]) -> Optional[FailurePolicy]:
+        return FailurePolicy(quarantine, self.chunk_retries) if quarantine is not None else None
+
+    def _step_profile(self) -> Optional[StepProfile]:
+        return self.profiler.current if self.profiler is not None else None
+
+    def run_in_process_pool(self, func: Callable[..., R], items: Iterable[T], *args: Any, chunk_size: Optional[int] = None, workers_count: Optional[int] = None,
+                            quarantine: Optional[StepQuarantine] = None) -> Iterable[R]:  # func: Func[T,R] doesn't work currently (MyPy issue)
+        failure_policy: Optional[FailurePolicy] = self._failure_policy(quarantine)
+        profile: Optional[StepProfile] = self._step_profile()
         if self.steppable_mode:
-            return run_in_loop(func, items, *args, chunk_size=chunk_size)
+            return run_in_loop(func, items, *args, chunk_size=chunk_size, failure_policy=failure_policy, profile=profile)
 
         if chunk_size is None:
             chunk_size = self.process_pool_chunk_size
 
-        return run_in_process_pool(func, items, *args, chunk_size=chunk_size, workers_count=workers_count)
-
-    def run_in_thread_pool(self, func: Callable[..., R], items: List[T], *args: Any, chunk_size: Optional[int] = None, workers_count: Optional[int] = None) -> Iterable[R]:  # func: Func[T,R] doesn't work currently (MyPy issue)
+        # A request for a specific number of workers gets a pool of its own
+        if workers_count is not None:
+            return run_in_process_pool(func, items, *args, chunk_size=chunk_size, workers_count=workers_count,
+                                       failure_policy=failure_policy, profile=profile)
+
+        pool_size: int = os.cpu_count() or 1
+        if self.process_pool is None:
+            self.process_pool = ProcessPoolExecutor(max_workers=pool_size)
+        return run_in_persistent_pool(self.process_pool, func, items, *args, chunk_size=chunk_size,
+                                      workers_count=pool_size, broadcast_dir=self.temp_dir,
+                                      target_seconds=self.target_chunk_seconds, failure_policy=failure_policy,
+                                      profile=profile)
+
+    def shutdown_pool(self) -> None:
+        if self.process_pool is not None:
+            self.process_pool.shutdown(wait=True)
+            self.process_pool = None
+
+    def __getstate__(self) -> Dict:
+        # Steps are sent to workers along with their context, but the pool and the task profile stay with the parent
+        state: Dict = self.__dict__.copy()
+        state["process_pool"] = None
+        state["profiler"] = None
+        return state
+
+    def run_in_thread_pool(self, func: Callable[..., R], items: Iterable[T], *args: Any, chunk_size: Optional[int] = None, workers_count: Optional[int] = None,
+                           quarantine: Optional[StepQuarantine] = None) -> Iterable[R]:  # func: Func[T,R] doesn't work currently (MyPy issue)
+        failure_policy: Optional[FailurePolicy] = self._failure_policy(quarantine)
+        profile: Optional[StepProfile] = self._step_profile()
         if self.steppable_mode:
-            return run_in_loop(func, items, *args, chunk_size=chunk_size)
+            return run_in_loop(func, items, *args, chunk_size=chunk_size, failure_policy=failure_policy, profile=profile)
 
-        return run_in_thread_pool(func, items, *args, chunk_size=chunk_size, workers_count=workers_count)
+        return run_in_thread_pool(func, items, *args, chunk_size=chunk_size, workers_count=workers_count,
+                                  failure_policy=failure_policy, profile=profile)
@@ -1,3 +1,4 @@
+import hashlib
 import logging
 import os
 import json
@@ -11,6 +12,8 @@ from functools import partial
 from polytropos.ontology.track import Track
 
 from polytropos.ontology.variable import Variable, VariableId
+from polytropos.util.nesteddicts import PathAccessor
+from polytropos.util.schemacache import SchemaCache
 
 
 SCHEMAS_DIR = 'fixtures/conf/schemas/'
@@ -30,6 +33,19 @@ class DuplicatePathError(ValueError):
         return template % (self.var1.var_id, self.var2.var_id, self.var1.absolute_path)
 
 
+def _external_objects(source_schema: Optional["Schema"]) -> Dict[str, Any]:
+    """The objects of a source schema that a schema translated from it can refer to, by name, for SchemaCache."""
+    if source_schema is None:
+        return {}
+    ret: Dict[str, Any] = {
+        "source": source_schema,
+        "source_temporal": source_schema.temporal,
+        "source_immutable": source_schema.immutable
+    }
+    for variable in source_schema:
+        ret["source_variable:%s" % variable.var_id] = variable
+    return ret
+
 @dataclass(eq=False)
 class Schema:
     """A schema identifies all of the temporal and immutable properties that a particular entity can have."""
@@ -37,9 +53,11 @@ class Schema:
     immutable: Track
     name: str = "UNSPECIFIED"
     source: Optional["Schema"] = None
+    digest: Optional[str] = None
 
     _var_id_cache: Dict = field(init=False, default_factory=dict)
     _var_path_cache: Dict = field(init=False, default_factory=dict)
+    _accessor_cache: Dict = field(init=False, default_factory=lambda: {track_type: {} for track_type in TrackType})
 
     def __post_init__(self) -> None:
         if self.temporal.source and self.immutable.source:
@@ -56,6 +74,14 @@ class Schema:
             )
         self._preload_var_path_cache()
 
+    def __getstate__(self) -> Dict:
+        # Memoized lookups by variable ID are keyed by cachetools keys, which carry a hash that is only valid in the
+        # process that computed it, so they are not pickled
+        state: Dict = self.__dict__.copy()
+        state["_var_id_cache"] = {}
+        state["_accessor_cache"] = {track_type: {} for track_type in TrackType}
+        return state
+
     def _preload_var_path_cache(self) -> None:
         logging.info("Preloading absolute path cache.")
         for track in [self.temporal, self.immutable]:  # type: Track
@@ -116,16 +142,55 @@ class Schema:
         logging.debug('Temporal path for schema "%s": %s' % (schema_name, temporal_path))
         logging.debug('Immutable path for schema "%s": %s' % (schema_name, temporal_path))
 
-        with open(temporal_path, 'r') as temporal, open(immutable_path, 'r') as immutable:
-            return cls(
-                temporal=Track.build(
-                    specs=json.load(temporal), source=source_temporal, name='%s_temporal' % schema_name
-                ),
-                immutable=Track.build(
-                    specs=json.load(immutable), source=source_immutable, name='%s_immutable' % schema_name
-                ),
-                name=schema_name
-            )
+        with open(temporal_path, 'rb') as temporal, open(immutable_path, 'rb') as immutable:
+            temporal_bytes: bytes = temporal.read()
+            immutable_bytes: bytes = immutable.read()
+
+        digest = hashlib.sha1()
+        digest.update(temporal_bytes)
+        digest.update(immutable_bytes)
+        if source_schema:
+            digest.update(source_schema.fingerprint().encode("utf-8"))
+
+        # Building and validating a large schema is slow, so schemas are compiled once for each definition and kept in
+        # a cache. The source schema is not part of the compiled schema; the one supplied is put back in its place.
+        cache: Optional[SchemaCache] = SchemaCache.default()
+        cache_key: str = SchemaCache.key_for(schema_name, digest.hexdigest())
+        external: Dict[str, Any] = _external_objects(source_schema)
+        if cache is not None:
+            cached: Optional[Any] = cache.get(cache_key, external)
+            if isinstance(cached, Schema):
+                logging.info('Loaded compiled schema "%s" from cache.' % schema_name)
+                if source_temporal is not None and source_immutable is not None:
+                    source_temporal.target = cached.temporal
+                    source_immutable.target = cached.immutable
+                return cached
+
+        schema: "Schema" = cls(
+            temporal=Track.build(
+                specs=json.loads(temporal_bytes), source=source_temporal, name='%s_temporal' % schema_name
+            ),
+            immutable=Track.build(
+                specs=json.loads(immutable_bytes), source=source_immutable, name='%s_immutable' % schema_name
+            ),
+            name=schema_name,
+            digest=digest.hexdigest()
+        )
+        if cache is not None:
+            cache.put(cache_key, schema, external)
+        return schema
+
+    def fingerprint(self) -> str:
+        """A hash identifying the definition of this schema (and of its source schema, if any). For schemas loaded
+        from disk, this is a hash of the schema files; otherwise, it is computed from the variable definitions."""
+        if self.digest is None:
+            digest = hashlib.sha1()
+            digest.update(json.dumps(self.temporal.dump(), sort_keys=True).encode("utf-8"))
+            digest.update(json.dumps(self.immutable.dump(), sort_keys=True).encode("utf-8"))
+            if self.source is not None:
+                digest.update(self.source.fingerprint().encode("utf-8"))
+            self.digest = digest.hexdigest()
+        return self.digest
 
     @cachedmethod(lambda self: self._var_id_cache, key=partial(hashkey, 'root'))
     def get(self, var_id: VariableId, track_type: TrackType=TrackType.ANY) -> Optional[Variable]:
@@ -147,6 +212,19 @@ class Schema:
 
         return immutable_match
 
+    def accessor(self, var_id: VariableId, track_type: TrackType=TrackType.ANY) -> PathAccessor:
+        """The accessor for a variable's absolute path. Unlike get, this memoizes by plain dictionary lookup, as it is
+        called for every value read from or written to a composite."""
+        accessors: Dict[VariableId, PathAccessor] = self._accessor_cache[track_type]
+        accessor: Optional[PathAccessor] = accessors.get(var_id)
+        if accessor is None:
+            var: Optional[Variable] = self.get(var_id, track_type=track_type)
+            if var is None:
+                raise ValueError('Unrecognized variable ID "%s"' % var_id)
+            accessor = var.accessor
+            accessors[var_id] = accessor
+        return accessor
+
     def _lookup(self, frozen_abs_path: Tuple[str, ...]) -> Optional[Variable]:
         if frozen_abs_path in self._var_path_cache:
             return self._var_path_cache[frozen_abs_path]
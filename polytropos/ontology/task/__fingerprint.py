@@ -0,0 +1,63 @@
+import hashlib
+import inspect
+import json
+from typing import Any, Iterable, List, Optional, Set, Type
+
+from polytropos.actions.evolve.__lookup import _resolve_filename
+from polytropos.actions.step import Step
+from polytropos.ontology.schema import Schema
+from polytropos.util.codedigest import package_digest
+
+def _file_digest(path: str) -> str:
+    digest = hashlib.sha1()
+    with open(path, "rb") as fh:
+        for block in iter(lambda: fh.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+def _code_digest(classes: Iterable[Type]) -> str:
+    """Hash of the source files that define the supplied classes, and of polytropos itself, so that editing a Step or
+    Change, or upgrading polytropos, invalidates its cached outputs."""
+    digest = hashlib.sha1(package_digest("polytropos").encode("utf-8"))
+    paths: Set[str] = set()
+    for cls in classes:
+        try:
+            path: Optional[str] = inspect.getsourcefile(cls)
+        except TypeError:
+            path = None
+        if path is not None:
+            paths.add(path)
+    for path in sorted(paths):
+        digest.update(_file_digest(path).encode("utf-8"))
+    return digest.hexdigest()
+
+def _component_classes(step: Step) -> List[Type]:
+    """The classes whose code determines the behavior of the step: the step itself, plus the Changes of an Evolve and
+    the Filters of a SequentialFilter."""
+    classes: List[Type] = [type(step)]
+    classes.extend(type(change) for change in getattr(step, "changes", []))
+    f_iter: Any = getattr(step, "f_iter", None)
+    if f_iter is not None:
+        classes.extend(type(the_filter) for the_filter in f_iter.filters)
+    return classes
+
+def step_fingerprint(step: Step, class_name: str, args: Any, schema: Schema, lookups_dir: str) -> str:
+    """Hash everything that determines what a step does to a composite: its class and code, its arguments from the task
+    YAML, the schemas it reads and writes, and the contents of any lookup files it loads."""
+    digest = hashlib.sha1()
+    digest.update(class_name.encode("utf-8"))
+    digest.update(json.dumps(args, sort_keys=True, default=str).encode("utf-8"))
+    digest.update(schema.fingerprint().encode("utf-8"))
+
+    target_schema: Optional[Schema] = getattr(step, "target_schema", None)
+    if target_schema is not None:
+        digest.update(target_schema.fingerprint().encode("utf-8"))
+
+    lookup_names: List[str] = []
+    if isinstance(args, dict) and args.get("lookups"):
+        lookup_names = args["lookups"]
+    for lookup_name in lookup_names:
+        digest.update(_file_digest(_resolve_filename(lookup_name, lookups_dir)).encode("utf-8"))
+
+    digest.update(_code_digest(_component_classes(step)).encode("utf-8"))
+    return digest.hexdigest()
@@ -1,3 +1,4 @@
+import copy
 import logging
 import os
 import shutil
@@ -6,23 +7,28 @@ from typing import Optional, Any, List, Dict
 import yaml
 from tempfile import mkdtemp
 from polytropos.actions.consume import Consume
+from polytropos.actions.fused import FusedStep, fuse
 from polytropos.actions.filter.logical_operators._logical_operator import LogicalOperator
 from polytropos.actions.step import Step
 from polytropos.ontology.schema import Schema
 from polytropos.ontology.context import Context
+from polytropos.ontology.task.__fingerprint import step_fingerprint
+from polytropos.util.profiling import TaskProfile
+from polytropos.util.stepcache import StepCache
+from polytropos.util.store import create_store
 
 # Import all action types so that they can be registered as subclasses
 from polytropos.actions.evolve.__evolve import Evolve
 from polytropos.actions.scan import Scan
 from polytropos.actions.filter import Filter
-from polytropos.actions.aggregate import Aggregate
+from polytropos.actions.aggregate import GenericAggregate
 from polytropos.actions.translate import Translate
 from polytropos.actions.filter.sequential_filter import SequentialFilter  # This is a subclass of Step, not of Filter
 from polytropos.actions.filter.nested_filter import NestedFilter  # This is a subclass of Step, not of Filter
 
-# Step class name deserialization
+# Step class name deserialization. Aggregations of every kind (see GenericAggregate) are specified as Aggregate.
 STEP_TYPES = {
-    cls.__name__: cls
+    "Aggregate" if cls is GenericAggregate else cls.__name__: cls
     for cls in Step.__subclasses__()
 }
 
@@ -30,9 +36,11 @@ class Task:
     def __init__(
         self, context: Context,
         origin_data: Any, origin_schema: Schema,
-        target_data: Optional[Any] = None, target_schema: Optional[Schema] = None
+        target_data: Optional[Any] = None, target_schema: Optional[Schema] = None,
+        name: Optional[str] = None
     ):
         self.context = context
+        self.name = name
         self.origin_data = origin_data
         self.origin_schema = origin_schema
         self.target_data = target_data
@@ -57,7 +65,8 @@ class Task:
             origin_data=spec['starting_with']['data'],
             origin_schema=origin_schema,
             target_data=resulting_in.get('data'),
-            target_schema=Schema.load(resulting_in.get('schema'), context.schemas_dir)
+            target_schema=Schema.load(resulting_in.get('schema'), context.schemas_dir),
+            name=name
         )
         task.load_steps(spec['steps'])
         # If the last step is a Consume step we don't need target data
@@ -77,6 +86,9 @@ class Task:
                 if class_name == "Filter" and LogicalOperator.is_logical_operator(args["name"]):
                     raise ValueError("LogicalOperator filter can be used in NestedFilter only")
 
+                # Some steps consume their arguments as they are built, so keep a pristine copy for the fingerprint
+                fingerprint_args: Any = copy.deepcopy(args)
+
                 # Sequential filters have a list of arguments
                 if class_name == "SequentialFilter":
                     step_instance: Step = SequentialFilter.build(self.context, current_schema, *args)  # type: ignore
@@ -84,11 +96,13 @@ class Task:
                 else:
                     step_instance: Step = self.append_normal_step(class_name, current_schema, args)  # type: ignore
 
+                step_instance.fingerprint = step_fingerprint(step_instance, class_name, fingerprint_args, current_schema,
+                                                             self.context.lookups_dir)
                 self.steps.append(step_instance)
 
                 # Aggregation changes schema
                 if class_name in ('Aggregate', 'Translate'):
-                    assert isinstance(step_instance, Aggregate) or isinstance(step_instance, Translate)
+                    assert isinstance(step_instance, GenericAggregate) or isinstance(step_instance, Translate)
                     # noinspection PyUnresolvedReferences
                     current_schema = step_instance.target_schema
 
@@ -118,17 +132,30 @@ class Task:
         # can delete the current_path folder because it's not used anymore
         current_path: str = origin_path
         next_path: Optional[str] = None
-        for i, step in enumerate(self.steps):
-            logging.info("Beginning a %s step (%d)." % (step.__class__.__name__, i))
+        # Consecutive per-composite steps are fused into a single pass over the data, so that each composite is read
+        # and written once per run rather than once per step
+        stages: List[Step] = fuse(self.context, self.steps) if self.context.fuse_steps else self.steps
+        profile: Optional[TaskProfile] = TaskProfile(self.name) if self.context.profile else None
+        self.context.profiler = profile
+        for i, step in enumerate(stages):
+            step_name: str = str(step) if isinstance(step, FusedStep) else step.__class__.__name__
+            logging.info("Beginning a %s step (%d)." % (step_name, i))
 
-            is_last_step = i == len(self.steps) - 1
+            is_last_step = i == len(stages) - 1
             if is_last_step and task_output_path is not None:
                 next_path = task_output_path
             else:
+                # Intermediate outputs are only ever read by later steps, so they use whichever backend and codec the
+                # context calls for; the task's own output is always a directory of indented JSON
                 next_path = mkdtemp(dir=self.context.temp_dir, prefix=str(i).zfill(3) + '-')
+                create_store(next_path, self.context.store_backend, self.context.intermediate_codec)
 
             logging.debug("Output for this step will be recorded in %s." % next_path)
-            step(current_path, next_path)
+            if profile is not None:
+                with profile.step("%i:%s" % (i, step_name)):
+                    step(current_path, next_path)
+            else:
+                step(current_path, next_path)
 
             if i > 0 and not self.context.no_cleanup:
                 shutil.rmtree(current_path, ignore_errors=True)
@@ -137,3 +164,21 @@ class Task:
         assert next_path is not None
         if task_output_path is None and not self.context.no_cleanup:
             shutil.rmtree(next_path, ignore_errors=True)
+
+        if self.context.cache_dir is not None and self.context.cache_max_bytes is not None:
+            StepCache(self.context.cache_dir).evict(self.context.cache_max_bytes)
+
+        if profile is not None:
+            profile.write(self.profile_path(task_output_path))
+            self.context.profiler = None
+
+        if self.context.quarantine is not None and self.context.quarantine.total > 0:
+            logging.warning("Task completed with errors. %s" % self.context.quarantine.summary())
+
+    def profile_path(self, task_output_path: Optional[str]) -> str:
+        """The profile is written beside the task's output, rather than inside it, where it would be mistaken for a
+        composite. Tasks that end in a Consume step write it to the output directory, alongside their exports."""
+        filename: str = "%s.profile.json" % (self.name or "task")
+        if task_output_path is None:
+            return os.path.join(self.context.output_dir, filename)
+        return os.path.join(os.path.dirname(os.path.abspath(task_output_path)), filename)
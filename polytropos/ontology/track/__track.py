@@ -8,9 +8,6 @@ from polytropos.ontology.variable import (
     Variable, VariableId
 )
 import polytropos.ontology.variable
-from cachetools import cachedmethod
-from cachetools.keys import hashkey
-from functools import partial
 
 if TYPE_CHECKING:
     from polytropos.ontology.schema import Schema
@@ -41,7 +38,13 @@ class Track(MutableMapping):
         self.source = source
         self.target = None
         self.schema: Optional["Schema"] = None
-        self._cache: Dict[str, Any] = {}
+        # Indices of the children of each variable (with the roots under None), and of the children of each variable by
+        # name, so that walking the tree and validating a variable against its siblings do not require scanning the
+        # whole track. Children are kept in the order they were added. Maintained by __setitem__ and __delitem__.
+        self._children: Dict[Optional[VariableId], Dict[VariableId, None]] = {}
+        self._children_by_name: Dict[Tuple[Optional[VariableId], str], Dict[VariableId, None]] = {}
+        # Variables added once the track is built are linked (see Variable.link) as they are added
+        self._built: bool = False
         if source:
             source.target = self
 
@@ -54,11 +57,13 @@ class Track(MutableMapping):
 
             logging.debug('Building variable "%s".' % variable_id)
             variable: "Variable" = self.build_variable(variable_data, variable_id)
-            self._variables[VariableId(variable_id)] = variable
+            self[VariableId(variable_id)] = variable
             n += 1
             if n % 100 == 0:
                 logging.info("Built %i variables." % n)
         logging.info('Finished building all %i variables for track "%s".' % (n, name))
+        self._link_all()
+        self._built = True
 
         logging.info('Performing post-load validation on variables for track "%s".' % name)
         n = 0
@@ -100,9 +105,15 @@ class Track(MutableMapping):
         return self._variables[key]
 
     def __setitem__(self, key: "VariableId", value: Variable) -> None:
+        if key in self._variables:
+            self._unindex(key, self._variables[key])
         self._variables[key] = value
+        self._index(key, value)
+        if self._built:
+            self._link_subtree(key)
 
     def __delitem__(self, key: "VariableId") -> None:
+        self._unindex(key, self._variables[key])
         del self._variables[key]
 
     def __len__(self) -> int:
@@ -120,6 +131,73 @@ class Track(MutableMapping):
             return False
         return True
 
+    ###########################################
+    # Tree index
+
+    def _index(self, var_id: VariableId, variable: Variable) -> None:
+        self._children.setdefault(variable.parent, {})[var_id] = None
+        self._children_by_name.setdefault((variable.parent, variable.name), {})[var_id] = None
+
+    def _unindex(self, var_id: VariableId, variable: Variable) -> None:
+        for index, key in [(self._children, variable.parent), (self._children_by_name, (variable.parent, variable.name))]:
+            ids: Dict[VariableId, None] = index[key]  # type: ignore
+            del ids[var_id]
+            if len(ids) == 0:
+                del index[key]  # type: ignore
+
+    def _parent_of(self, variable: Variable) -> Optional[Variable]:
+        # A parent that does not exist is reported by validation, so until then the variable is treated as a root
+        if variable.parent is None:
+            return None
+        return self._variables.get(variable.parent)
+
+    def _link_all(self) -> None:
+        """Link every variable, each after its parent, so that the attributes derived from the tree are computed once
+        per variable."""
+        for var_id in self._variables:
+            lineage: ListType[Variable] = []
+            variable: Optional[Variable] = self._variables[var_id]
+            while variable is not None and not variable.linked:
+                if variable in lineage:
+                    raise ValueError('Variable "%s" is its own ancestor.' % variable.var_id)
+                lineage.append(variable)
+                variable = self._parent_of(variable)
+            for variable in reversed(lineage):
+                variable.link(self._parent_of(variable))
+
+    def _link_subtree(self, var_id: VariableId) -> None:
+        """Link a variable set after the track was built, and relink its descendants, whose derived attributes depend
+        on it."""
+        variable: Variable = self._variables[var_id]
+        variable.link(self._parent_of(variable))
+        pending: ListType[VariableId] = [var_id]
+        seen: Set[VariableId] = {var_id}
+        while len(pending) > 0:
+            parent_id: VariableId = pending.pop()
+            parent: Variable = self._variables[parent_id]
+            for child_id in self._children.get(parent_id, ()):
+                if child_id in seen:
+                    raise ValueError('Variable "%s" is its own ancestor.' % child_id)
+                seen.add(child_id)
+                self._variables[child_id].link(parent)
+                pending.append(child_id)
+
+    def child_ids(self, parent: Optional[VariableId]) -> ListType[VariableId]:
+        """IDs of the variables whose parent is the one given, or of the roots if parent is None."""
+        return list(self._children.get(parent, ()))
+
+    def children_of(self, parent: Optional[VariableId]) -> ListType[Variable]:
+        """Variables whose parent is the one given, or the roots if parent is None."""
+        return [self._variables[var_id] for var_id in self._children.get(parent, ())]
+
+    def n_children(self, parent: Optional[VariableId]) -> int:
+        return len(self._children.get(parent, ()))
+
+    def children_named(self, parent: Optional[VariableId], name: str) -> ListType[VariableId]:
+        """IDs of the children of a variable (or of the roots, if parent is None) that have the given name. In a valid
+        track, there is at most one."""
+        return list(self._children_by_name.get((parent, name), ()))
+
     ###########################################
 
     @classmethod
@@ -134,14 +212,10 @@ class Track(MutableMapping):
         :param name: The name of the stage/aspect."""
         return cls(specs, source, name)
 
-    @property  # type: ignore # Decorated property not supported
-    @cachedmethod(lambda self: self._cache, key=partial(hashkey, 'root'))
+    @property
     def roots(self) -> ListType["Variable"]:
         """All the roots of this track's variable tree."""
-        return list(filter(
-            lambda variable: variable.parent is None,
-            self._variables.values()
-        ))
+        return self.children_of(None)
 
     def new_var_id(self) -> VariableId:
         """If no ID is supplied, use <stage name>_<temporal|invarant>_<n+1>,
@@ -149,7 +223,7 @@ class Track(MutableMapping):
         # Missing the temporal/immutable part for now
         return VariableId('{}_{}'.format(self.name, len(self._variables) + 1))
 
-    def descendants_that(self, data_type: str=None, container: int=0, inside_list: int=0) \
+    def descendants_that(self, data_type: Optional[str] = None, container: int=0, inside_list: int=0) \
             -> Iterator[VariableId]:
         """Provides a list of variable IDs in this track that meet certain criteria.
         :param data_type: The type of descendant to be found.
@@ -157,19 +231,25 @@ class Track(MutableMapping):
         :param inside_list: If -1, include only elements outside lists; if 1, only inside lists.
         """
         for variable_id, variable in self._variables.items():
-            if data_type is None or variable.data_type == data_type:
-                if container:
-                    if container == -1 and not isinstance(variable, Primitive):
-                        continue
-                    if container == 1 and not isinstance(variable, Container):
-                        continue
-                if inside_list:
-                    if inside_list == -1 and variable.descends_from_list:
-                        continue
-                    if inside_list == 1 and not variable.descends_from_list:
-                        continue
+            if self.meets_criteria(variable, data_type, container, inside_list):
                 yield variable_id
 
+    @staticmethod
+    def meets_criteria(variable: Variable, data_type: Optional[str] = None, container: int = 0,
+                       inside_list: int = 0) -> bool:
+        """Whether a variable meets the criteria of descendants_that."""
+        if data_type is not None and variable.data_type != data_type:
+            return False
+        if container == -1 and not isinstance(variable, Primitive):
+            return False
+        if container == 1 and not isinstance(variable, Container):
+            return False
+        if inside_list == -1 and variable.descends_from_list:
+            return False
+        if inside_list == 1 and not variable.descends_from_list:
+            return False
+        return True
+
     def dump(self) -> Dict:
         """A Dict representation of this track."""
         representation = {}
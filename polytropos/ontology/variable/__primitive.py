@@ -9,6 +9,12 @@ from urllib.parse import quote
 from polytropos.ontology.variable import Variable
 
 class Primitive(Variable):
+    __slots__ = ()
+
+    # Values of exactly this type, other than the empty string, are returned unchanged by cast, so they need not be
+    # cast again. None if there is no such type.
+    cast_type: Optional[type] = None
+
     @classmethod
     @abstractmethod
     def cast(cls, value: Optional[Any]) -> Optional[Any]:
@@ -28,6 +34,9 @@ class Primitive(Variable):
         return str(value)
 
 class Integer(Primitive):
+    __slots__ = ()
+    cast_type = int
+
     @classmethod
     def cast(cls, value: Optional[Any]) -> Optional[int]:
         if value is None or value == "":
@@ -42,6 +51,9 @@ class Integer(Primitive):
         return "{:,}".format(value)
 
 class Text(Primitive):
+    __slots__ = ()
+    cast_type = str
+
     @classmethod
     def cast(cls, value: Optional[Any]) -> Optional[str]:
         if value is None or value == "":
@@ -77,6 +89,9 @@ class Text(Primitive):
         return quote(s_clean)
 
 class Decimal(Primitive):
+    __slots__ = ()
+    cast_type = float
+
     @classmethod
     def cast(cls, value: Optional[Any]) -> Optional[float]:
         if value is None or value == "":
@@ -91,6 +106,8 @@ class Decimal(Primitive):
         return "{:,.02f}".format(value)
 
 class Ratio(Decimal):
+    __slots__ = ()
+
     @classmethod
     def display_format(cls, value: Optional[float]) -> str:
         if value is None:
@@ -99,6 +116,8 @@ class Ratio(Decimal):
         return "{:,.0f}%".format(value*100)
 
 class Unary(Primitive):
+    __slots__ = ()
+
     @classmethod
     def cast(cls, value: Optional[Any]) -> Optional[bool]:
         if value is None or value == "":
@@ -118,6 +137,9 @@ class Unary(Primitive):
         return "True"
 
 class Binary(Primitive):
+    __slots__ = ()
+    cast_type = bool
+
     @classmethod
     def cast(cls, value: Optional[Any]) -> Optional[bool]:
         if value is None or value == "":
@@ -144,6 +166,9 @@ class Binary(Primitive):
             raise ValueError("Unrecognized binary value {:}".format(value))
 
 class Currency(Primitive):
+    __slots__ = ()
+    cast_type = int
+
     @classmethod
     def cast(cls, value: Optional[Any]) -> Optional[float]:
         if value is None or value == "":
@@ -168,6 +193,9 @@ class Currency(Primitive):
         return "${:,}".format(value)
 
 class Phone(Primitive):
+    __slots__ = ()
+    cast_type = str
+
     @classmethod
     def cast(cls, value: Optional[Any]) -> Optional[str]:
         if value is None or value == "":
@@ -186,6 +214,9 @@ class Phone(Primitive):
         return clean
 
 class Email(Primitive):
+    __slots__ = ()
+    cast_type = str
+
     @classmethod
     def cast(cls, value: Optional[Any]) -> Optional[str]:
         if value is None or value == "":
@@ -220,6 +251,9 @@ def _has_common_tld(url: str) -> bool:
     return False
 
 class URL(Primitive):
+    __slots__ = ()
+    cast_type = str
+
     link_template: str = '<a href="{:}" target="_blank" rel="ugc">{:}</a>'
     @classmethod
     def cast(cls, value: Optional[Any]) -> Optional[str]:
@@ -264,6 +298,8 @@ class URL(Primitive):
         return ", ".join(links_list)
 
 class Date(Primitive):
+    __slots__ = ()
+
     @classmethod
     def cast(cls, value: Optional[Any]) -> Optional[str]:
         if value is None or value in {"", "000000"}:
@@ -284,6 +320,9 @@ class Date(Primitive):
         raise ValueError
 
 class EIN(Primitive):
+    __slots__ = ()
+    cast_type = str
+
 
     @classmethod
     def cast(cls, value: Optional[Any]) -> Optional[str]:
@@ -1,18 +1,19 @@
 import logging
 import json
 import warnings
-from collections import defaultdict, deque
-from typing import List as ListType, Dict, Iterator, TYPE_CHECKING, Optional, Set, Any, NewType, Iterable, Deque, cast
-from functools import partial
-from cachetools import cachedmethod
-from cachetools.keys import hashkey
-from polytropos.util.nesteddicts import path_to_str
+from collections import defaultdict
+from typing import List as ListType, Dict, Iterator, TYPE_CHECKING, Optional, Set, Any, NewType, Iterable, Tuple, cast
+from polytropos.util.nesteddicts import path_to_str, PathAccessor
 
 if TYPE_CHECKING:
+    from polytropos.ontology.schema import Schema
     from polytropos.ontology.track import Track
 
 VariableId = NewType("VariableId", str)
 
+# Variables refuse attribute assignment, so their own methods assign through object
+_set = object.__setattr__
+
 class Validator:
     @staticmethod
     def validate_sources(variable: "Variable", sources: ListType[VariableId], init: bool = False) -> None:
@@ -48,18 +49,13 @@ class Validator:
     def validate_name(variable: "Variable", name: str) -> None:
         if '/' in name or '.' in name:
             raise ValueError("bad name")
-        sibling_names = set(
-            variable.track[sibling].name
-            for sibling in variable.siblings
+        conflicting_siblings: ListType[VariableId] = [
+            sibling
+            for sibling in variable.track.children_named(variable.parent, name)
             if sibling != variable.var_id
-        )
-        if name in sibling_names:
-            conflicting_sibling = None
-            for sibling in variable.siblings:
-                if variable.track[sibling].name == name:
-                    conflicting_sibling = sibling
-                    break
-            assert conflicting_sibling is not None
+        ]
+        if len(conflicting_siblings) > 0:
+            conflicting_sibling = conflicting_siblings[0]
             raise ValueError('Variable "%s" has a name conflict with sibling "%s".' % (variable.var_id,
                                                                                        conflicting_sibling))
 
@@ -68,8 +64,7 @@ class Validator:
         # TODO Add a validation that every sort order value is unique among siblings
         if sort_order < 0:
             raise ValueError('Variable "%s" has a sort order less than zero.')
-        # This line is very slow. Consider adding a cache for variable.siblings.
-        max_sort_order = len(list(variable.siblings)) + (1 if adding else 0)
+        max_sort_order = variable.track.n_children(variable.parent) + (1 if adding else 0)
         if sort_order >= max_sort_order:
             raise ValueError('Variable "%s" has a sort order of %i, which exceeds the total number of variables at its '
                              'level in the hierarchy (%i)' % (variable.var_id, variable.sort_order, max_sort_order))
@@ -95,47 +90,96 @@ class Validator:
         if variable.track.source is not None:
             cls.validate_sources(variable, variable.sources, init)
 
-        # TODO This line is extremely slow. I suspect that putting a cache on 'Variable.children' would solve it
         cls.validate_sort_order(variable, variable.sort_order, adding)
 
 
 class Variable:
+    """A node of a track's variable tree. Variables are immutable once built: their attributes are set by the
+    constructor, and the attributes that derive from their position in the tree (paths, list ancestry) are computed once,
+    by the track, when it is built. Variables are numerous and accessed constantly, so they are slotted."""
+
+    __slots__ = ("track", "var_id", "name", "sort_order", "metadata", "sources", "parent", "_absolute_path",
+                 "_relative_path", "_descends_from_list", "_nearest_list", "_ancestor_ids", "_accessor",
+                 "_relative_accessor")
+
+    # Declared for type checkers; the values are assigned (through object) by __init__ and link()
+    track: "Track"
+    var_id: VariableId
+    name: str
+    sort_order: int
+    metadata: Dict[str, Any]
+    sources: ListType[VariableId]
+    parent: Optional[VariableId]
+    _absolute_path: Optional[Tuple[str, ...]]
+    _relative_path: Optional[Tuple[str, ...]]
+    _descends_from_list: bool
+    _nearest_list: Optional[VariableId]
+    _ancestor_ids: Tuple[VariableId, ...]
+    _accessor: Optional[PathAccessor]
+    _relative_accessor: Optional[PathAccessor]
+
     def __init__(self, track: "Track", var_id: VariableId, name: str, sort_order: int,
                  metadata: Optional[Dict[str, Any]] = None,
                  sources: Optional[ListType[VariableId]] = None, parent: Optional[VariableId] = None):
 
-        self.initialized = False
-
-        self.data_type = self.__class__.__name__
-
         # The track to which this variable belongs
-        self.track: "Track" = track
-
-        # Used for single dispatch type situations, as well as for schema reports.
-        self.data_type = self.__class__.__name__
+        _set(self, "track", track)
 
         # The variable id of the variable in the corresponding track.
         # WARNING! The variable ID _MUST_ be unique within the schema, or terrible things will happen!
-        self.var_id: VariableId = var_id
+        _set(self, "var_id", var_id)
 
         # The name of the node, as used in paths. Not to be confused with its ID, which is path-immutable.
-        self.name: str = name
+        _set(self, "name", name)
 
         # The order that this variable appears in instance hierarchies.
-        self.sort_order: int = sort_order
+        _set(self, "sort_order", sort_order)
 
         # Metadata: any information about the variable that the operator chooses to include.
-        self.metadata: Dict[str, Any] = metadata if metadata is not None else {}
+        _set(self, "metadata", metadata if metadata is not None else {})
 
         # The variable IDs (not names!) from the preceding stage from which to derive values for this variable, if any.
-        self.sources: ListType[VariableId] = sources if sources is not None else []
+        _set(self, "sources", sources if sources is not None else [])
 
         # The container variable above this variable in the hierarchy, if any.
-        self.parent: Optional[VariableId] = parent
-
-        self._cache: Dict = {}
+        _set(self, "parent", parent)
+
+        # Derived from the variable's position in the tree; see link()
+        _set(self, "_absolute_path", None)
+        _set(self, "_relative_path", None)
+        _set(self, "_descends_from_list", False)
+        _set(self, "_nearest_list", None)
+        _set(self, "_ancestor_ids", ())
+        _set(self, "_accessor", None)
+        _set(self, "_relative_accessor", None)
+
+    def link(self, parent: Optional["Variable"]) -> None:
+        """Compute the attributes that derive from this variable's position in the tree. Called by the track once the
+        variable's parent (if any) has been linked."""
+        absolute_path: Tuple[str, ...] = (self.name,)
+        relative_path: Tuple[str, ...] = (self.name,)
+        descends_from_list: bool = False
+        nearest_list: Optional[VariableId] = None
+        ancestor_ids: Tuple[VariableId, ...] = ()
+        if parent is not None:
+            parent_is_list: bool = isinstance(parent, GenericList)
+            absolute_path = parent.absolute_path + absolute_path
+            if not parent_is_list:
+                relative_path = parent.relative_path + relative_path
+            descends_from_list = parent_is_list or parent.descends_from_list
+            nearest_list = parent.var_id if parent_is_list else parent._nearest_list
+            ancestor_ids = (parent.var_id,) + parent._ancestor_ids
+        _set(self, "_absolute_path", absolute_path)
+        _set(self, "_relative_path", relative_path)
+        _set(self, "_descends_from_list", descends_from_list)
+        _set(self, "_nearest_list", nearest_list)
+        _set(self, "_ancestor_ids", ancestor_ids)
+        _set(self, "_accessor", PathAccessor(absolute_path))
+        _set(self, "_relative_accessor", PathAccessor(relative_path))
 
-        self.initialized = True
+    @property
+    def linked(self) -> bool:
+        return self._absolute_path is not None
 
     def __hash__(self) -> int:
         return hash(self.var_id) if self.var_id is not None else 0
@@ -144,10 +188,22 @@ class Variable:
         return isinstance(other, self.__class__) and other.var_id == self.var_id
 
     def __setattr__(self, attribute: str, value: Any) -> None:
-        if attribute != "initialized" and self.initialized:
-            raise AttributeError("Variables are immutable at runtime and must be edited offline.")
+        raise AttributeError("Variables are immutable at runtime and must be edited offline.")
+
+    def __delattr__(self, attribute: str) -> None:
+        raise AttributeError("Variables are immutable at runtime and must be edited offline.")
+
+    def __getstate__(self) -> Dict:
+        return {attribute: getattr(self, attribute) for attribute in Variable.__slots__}
+
+    def __setstate__(self, state: Dict) -> None:
+        for attribute, value in state.items():
+            _set(self, attribute, value)
 
-        self.__dict__[attribute] = value
+    @property
+    def data_type(self) -> str:
+        """Used for single dispatch type situations, as well as for schema reports."""
+        return self.__class__.__name__
 
     def validate_attribute_value(self, attribute: str, value: Any) -> Any:
         if attribute == 'var_id':
@@ -183,62 +239,67 @@ class Variable:
 
     @property
     def temporal(self) -> bool:
-        return self.track.schema is not None and self.track.schema.is_temporal(self.var_id)
+        schema: Optional["Schema"] = self.track.schema
+        return schema is not None and self.track is schema.temporal
 
-    @property  # type: ignore # Decorated property not supported
-    @cachedmethod(lambda self: self._cache, key=partial(hashkey, 'siblings'))
+    @property
     def siblings(self) -> Iterable[VariableId]:
-        if self.parent is None:
-            return list(map(lambda root: root.var_id, self.track.roots))
-        return list(map(
-            lambda child: child.var_id,
-            self.track[self.parent].children
-        ))
-
-    @property  # type: ignore
-    @cachedmethod(lambda self: self._cache, key=partial(hashkey, 'descends_from_list'))
+        """IDs of the variables that share this variable's parent (or that are roots, if this is one), including this
+        variable itself."""
+        return self.track.child_ids(self.parent)
+
+    def _link_on_demand(self) -> None:
+        """Variables are linked by their track when it is built. One used before then (e.g., built outside of a track)
+        is linked on first use, after its parent."""
+        parent: Optional[Variable] = None
+        if self.parent is not None and self.track is not None and self.parent in self.track:
+            parent = self.track[self.parent]
+        self.link(parent)
+
+    @property
     def descends_from_list(self) -> bool:
         """True iff this or any upstream variable is a list or keyed list."""
-        if not self.parent:
-            return False
-        parent = self.track[self.parent]
-        return isinstance(parent, GenericList) or parent.descends_from_list
+        if self._absolute_path is None:
+            self._link_on_demand()
+        return self._descends_from_list
 
-    @property  # type: ignore
-    @cachedmethod(lambda self: self._cache, key=partial(hashkey, 'nearest_list'))
+    @property
     def nearest_list(self) -> VariableId:
-        if not self.descends_from_list:
+        if self._absolute_path is None:
+            self._link_on_demand()
+        if self._nearest_list is None:
             raise AttributeError
-        parent_id: VariableId = cast(VariableId, self.parent)
-        parent = self.track[parent_id]
-        if isinstance(parent, GenericList):
-            return parent_id
-        else:
-            return parent.nearest_list
-
-    @property  # type: ignore # Decorated property not supported
-    @cachedmethod(lambda self: self._cache, key=partial(hashkey, 'relative_path'))
-    def relative_path(self) -> ListType[str]:
+        return self._nearest_list
+
+    @property
+    def relative_path(self) -> Tuple[str, ...]:
         """The path from this node to the nearest list or or root."""
-        if not self.parent:
-            return [self.name]
-        parent: "Variable" = self.track[self.parent]
-        if isinstance(parent, GenericList):
-            return [self.name]
-        parent_path: ListType = parent.relative_path
-        return parent_path + [self.name]
-
-    @property  # type: ignore # Decorated property not supported
-    @cachedmethod(lambda self: self._cache, key=partial(hashkey, 'absolute_path'))
-    def absolute_path(self) -> ListType[str]:
+        if self._relative_path is None:
+            self._link_on_demand()
+        return cast(Tuple[str, ...], self._relative_path)
+
+    @property
+    def absolute_path(self) -> Tuple[str, ...]:
         """The path from this node to the root."""
-        if not self.parent:
-            return [self.name]
-        parent_path: ListType = self.track[self.parent].absolute_path
-        return parent_path + [self.name]
+        if self._absolute_path is None:
+            self._link_on_demand()
+        return cast(Tuple[str, ...], self._absolute_path)
+
+    @property
+    def accessor(self) -> PathAccessor:
+        """Accessor for this variable's absolute path, relative to the root of a period (or of the immutable track)."""
+        if self._accessor is None:
+            self._link_on_demand()
+        return cast(PathAccessor, self._accessor)
 
-    @property  # type: ignore # Decorated property not supported
-    @cachedmethod(lambda self: self._cache, key=partial(hashkey, 'tree'))
+    @property
+    def relative_accessor(self) -> PathAccessor:
+        """Accessor for this variable's relative path, i.e., relative to an element of its nearest list."""
+        if self._relative_accessor is None:
+            self._link_on_demand()
+        return cast(PathAccessor, self._relative_accessor)
+
+    @property
     def tree(self) -> Dict:
         """A tree representing the descendants of this node. (For UI)"""
         children = [
@@ -268,9 +329,8 @@ class Variable:
             'data_type': self.data_type,
             'sort_order': self.sort_order
         }
-        for field_name, field_value in vars(self).items():
-            if field_name in {'name', 'sort_order', 'track', 'initialized', 'var_id', '_cache'}:
-                continue
+        for field_name in ('metadata', 'sources', 'parent'):
+            field_value: Any = getattr(self, field_name)
             if field_value:
                 representation[field_name] = field_value
         return representation
@@ -279,7 +339,6 @@ class Variable:
         """A JSON-compatible representation of this variable. (For serialization.)"""
         return json.dumps(self.dump(), indent=4)
 
-    @cachedmethod(lambda self: self._cache, key=partial(hashkey, 'check_ancestor'))
     def is_ancestor_of(self, child_id: VariableId, stop_at_list: bool = False) -> bool:
         variable = self.track[child_id]
         if variable.parent is None:
@@ -289,58 +348,56 @@ class Variable:
                 isinstance(self.track[variable.parent], GenericList)
         ):
             return False
-        if variable.parent == self.var_id:
-            return True
-        return self.is_ancestor_of(variable.parent)
+        if variable._absolute_path is None:
+            variable._link_on_demand()
+        return self.var_id in variable._ancestor_ids
 
-    @cachedmethod(lambda self: self._cache, key=partial(hashkey, 'first_list_ancestor'))
     def get_first_list_ancestor(self) -> Optional["Variable"]:
-        parent_id = self.parent
-        if parent_id is None:
+        if self._absolute_path is None:
+            self._link_on_demand()
+        if self._nearest_list is None:
             return None
-        parent = self.track[parent_id]
-        if isinstance(parent, GenericList):
-            return parent
-        return parent.get_first_list_ancestor()
+        return self.track[self._nearest_list]
 
-    @cachedmethod(lambda self: self._cache, key=partial(hashkey, 'descendants_that'))
-    def descendants_that(self, data_type: str=None, container: int=0, inside_list: int=0) \
+    def descendants_that(self, data_type: Optional[str] = None, container: int=0, inside_list: int=0) \
             -> Iterable[VariableId]:
         """Provides a list of variable IDs descending from this variable that meet certain criteria.
         :param data_type: The type of descendant to be found.
         :param container: If -1, include only primitives; if 1, only containers.
         :param inside_list: If -1, include only elements outside lists; if 1, only inside lists.
         """
-        ret: Deque[VariableId] = deque()
-        for variable_id in self.track.descendants_that(
-            data_type, container, inside_list
-        ):
-            if self.is_ancestor_of(variable_id, stop_at_list=True):
-                ret.append(variable_id)
-        return list(ret)
+        ret: ListType[VariableId] = []
+        pending: ListType[Variable] = list(reversed(self.track.children_of(self.var_id)))
+        while len(pending) > 0:
+            variable: Variable = pending.pop()
+            # As with is_ancestor_of(stop_at_list=True), the immediate children of lists are left out
+            parent: Variable = self.track[cast(VariableId, variable.parent)]
+            if not isinstance(parent, GenericList) and self.track.meets_criteria(variable, data_type, container,
+                                                                                 inside_list):
+                ret.append(variable.var_id)
+            pending.extend(reversed(self.track.children_of(variable.var_id)))
+        return ret
 
-    @property   # type: ignore # Decorated property not supported
-    @cachedmethod(lambda self: self._cache, key=partial(hashkey, 'targets'))
+    @property
     def children(self) -> Iterable["Variable"]:
-        # TODO Consider caching the list of children for each variable in Track.
-        return list(filter(
-            lambda variable: variable.parent == self.var_id,
-            self.track.values()
-        ))
+        return self.track.children_of(self.var_id)
 
-    @cachedmethod(lambda self: self._cache, key=partial(hashkey, 'ancestors'))
     def ancestors(self, parent_id_to_stop: Optional[VariableId]) -> Iterable["Variable"]:
         """Returns an iterator of ancestors (self, self.parent, self.parent.parent, etc).
         The first item - the current variable.
         If the parent_id_to_stop parameter is None all ancestors are returned.
         Otherwise the last item is the ancestor with parent identifier equal to parent_id_to_stop."""
-        ret: Deque[Variable] = deque()
-        current = self
-        ret.append(current)
-        while current.parent is not None and current.parent != parent_id_to_stop:
-            current = self.track[current.parent]
-            ret.append(current)
-        return list(ret)
+        ret: ListType[Variable] = [self]
+        if self.parent == parent_id_to_stop:
+            return ret
+        if self._absolute_path is None:
+            self._link_on_demand()
+        for ancestor_id in self._ancestor_ids:
+            ancestor: Variable = self.track[ancestor_id]
+            ret.append(ancestor)
+            if ancestor.parent == parent_id_to_stop:
+                break
+        return ret
 
     @property
     def transient(self) -> bool:
@@ -360,22 +417,22 @@ class Variable:
 
 
 class Container(Variable):
-    pass
+    __slots__ = ()
 
 class MultipleText(Variable):
-    pass
+    __slots__ = ()
 
 class Folder(Container):
-    pass
+    __slots__ = ()
 
 class GenericList(Container):
-    pass
+    __slots__ = ()
 
 class List(GenericList):
-    pass
+    __slots__ = ()
 
 class KeyedList(GenericList):
-    pass
+    __slots__ = ()
 
 def _incompatible_type(source_var: Variable, variable: Variable) -> bool:
     if variable.__class__ == List:
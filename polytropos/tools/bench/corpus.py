@@ -0,0 +1,117 @@
+import logging
+import random
+from dataclasses import dataclass
+from typing import Dict, Any, Callable, Optional, List as ListType
+
+from polytropos.ontology.schema import Schema
+from polytropos.ontology.track import Track
+from polytropos.ontology.variable import Variable, Folder, List, KeyedList, MultipleText
+from polytropos.tools.bench.schema import I_GROUP, OUTPUT_FLAG
+from polytropos.util.manifest import recording_manifest
+from polytropos.util.store import CompositeStore, DirectoryStore, JSON, create_store
+
+WORDS: ListType[str] = ["alpha", "bravo", "charlie", "delta", "echo", "foxtrot", "golf", "hotel", "india", "juliet",
+                        "kilo", "lima", "mike", "november", "oscar", "papa", "quebec", "romeo", "sierra", "tango"]
+
+# The benchmark aggregation emits one composite per group, so the groups are kept few
+GROUPS: ListType[str] = WORDS[:8]
+
+def _random_date(rng: random.Random) -> str:
+    return "%04d-%02d-%02d" % (rng.randint(1990, 2020), rng.randint(1, 12), rng.randint(1, 28))
+
+# Random value for each primitive data type, of the type that the data type casts to
+VALUES: Dict[str, Callable[[random.Random], Any]] = {
+    "Integer": lambda rng: rng.randint(0, 10000),
+    "Currency": lambda rng: rng.randint(-1000, 10000000),
+    "Decimal": lambda rng: round(rng.uniform(0, 10000), 2),
+    "Ratio": lambda rng: round(rng.random(), 4),
+    "Unary": lambda rng: True,
+    "Binary": lambda rng: rng.random() < 0.5,
+    "Text": lambda rng: rng.choice(WORDS),
+    "Phone": lambda rng: "%010d" % rng.randint(2000000000, 9999999999),
+    "Email": lambda rng: "%s@%s.org" % (rng.choice(WORDS), rng.choice(WORDS)),
+    "URL": lambda rng: "https://www.%s.org" % rng.choice(WORDS),
+    "Date": _random_date,
+    "EIN": lambda rng: "%02d-%07d" % (rng.randint(10, 99), rng.randint(0, 9999999))
+}
+
+@dataclass
+class CorpusSpec:
+    """Shape of a synthetic corpus. Each composite has the given number of annual periods, lists have up to list_length
+    elements, and each primitive value is left out with probability missing. Composite i is generated from seed + i, so
+    a corpus is reproducible, and its first composites do not depend on how many there are."""
+    composites: int = 1000
+    periods: int = 5
+    list_length: int = 5
+    missing: float = 0.1
+    seed: int = 0
+    first_period: int = 2000
+
+    def __post_init__(self) -> None:
+        if not 0.0 <= self.missing <= 1.0:
+            raise ValueError("The share of missing values must be between 0 and 1.")
+
+    @property
+    def period_names(self) -> ListType[str]:
+        return [str(self.first_period + i) for i in range(self.periods)]
+
+def composite_id_for(i: int) -> str:
+    return "{:09}".format(i)
+
+class CorpusGenerator:
+    """Produces composites that fill in every variable of a schema with random values of the right data type. Variables
+    that benchmarks write to are left empty."""
+
+    def __init__(self, schema: Schema, spec: CorpusSpec):
+        self.schema = schema
+        self.spec = spec
+
+    def _fill(self, rng: random.Random, variables: ListType[Variable]) -> Dict:
+        ret: Dict = {}
+        for variable in variables:
+            if variable.metadata.get(OUTPUT_FLAG, False):
+                continue
+            value: Optional[Any] = self._value(rng, variable)
+            if value is not None:
+                ret[variable.name] = value
+        return ret
+
+    def _value(self, rng: random.Random, variable: Variable) -> Optional[Any]:
+        children: ListType[Variable] = list(variable.children)
+        if isinstance(variable, Folder):
+            return self._fill(rng, children) or None
+        if isinstance(variable, List):
+            return [self._fill(rng, children) for _ in range(rng.randint(0, self.spec.list_length))] or None
+        if isinstance(variable, KeyedList):
+            n: int = rng.randint(0, self.spec.list_length)
+            return {"key_%i" % i: self._fill(rng, children) for i in range(n)} or None
+        if rng.random() < self.spec.missing:
+            return None
+        if variable.var_id == I_GROUP:
+            return rng.choice(GROUPS)
+        if isinstance(variable, MultipleText):
+            return rng.sample(WORDS, rng.randint(1, 3))
+        return VALUES[variable.data_type](rng)
+
+    def _track(self, rng: random.Random, track: Track) -> Dict:
+        return self._fill(rng, sorted(track.roots, key=lambda root: root.sort_order))
+
+    def content(self, i: int) -> Dict:
+        """Content of the i-th composite of the corpus."""
+        rng: random.Random = random.Random(self.spec.seed + i)
+        ret: Dict = {"immutable": self._track(rng, self.schema.immutable)}
+        for period in self.spec.period_names:
+            ret[period] = self._track(rng, self.schema.temporal)
+        return ret
+
+    def write(self, output_dir: str, backend: str = DirectoryStore.backend, codec: str = JSON.name) -> int:
+        """Write the corpus to a new store, with its manifest, and return its total size in bytes."""
+        logging.info("Generating {:,} synthetic composites in {}.".format(self.spec.composites, output_dir))
+        store: CompositeStore = create_store(output_dir, backend, codec)
+        n_bytes: int = 0
+        with recording_manifest(output_dir) as manifest, store.writer() as writer:
+            for i in range(self.spec.composites):
+                entry = writer.dump(composite_id_for(i), self.content(i))
+                manifest.append(entry)
+                n_bytes += entry.size
+        return n_bytes
@@ -0,0 +1,134 @@
+import copy
+import json
+import os
+from typing import Dict, Tuple
+
+from polytropos.ontology.variable import VariableId
+
+# Every benchmark variable lives under a root folder of its track, with an ID starting with BENCH_PREFIX, so that it
+# cannot collide with the variables of the schema being benchmarked. (Absolute paths must be unique across tracks.)
+T_FOLDER_NAME = "polytropos_bench_temporal"
+I_FOLDER_NAME = "polytropos_bench_immutable"
+BENCH_PREFIX = "bench_"
+
+# Variables that benchmarked steps write to, and that the corpus generator therefore leaves empty
+OUTPUT_FLAG = "bench_output"
+
+# Temporal variables used by the benchmarks. The List and its children feed the cross-sectional statistics.
+T_FOLDER = VariableId("bench_t_folder")
+T_VALUE = VariableId("bench_t_value")
+T_ITEMS = VariableId("bench_t_items")
+T_ITEM_NAME = VariableId("bench_t_item_name")
+T_ITEM_AMOUNT = VariableId("bench_t_item_amount")
+T_SUM = VariableId("bench_t_sum")
+T_MEAN = VariableId("bench_t_mean")
+T_COUNT = VariableId("bench_t_count")
+T_MIN = VariableId("bench_t_min")
+T_MAX = VariableId("bench_t_max")
+T_ARGMAX = VariableId("bench_t_argmax")
+
+# Immutable variables used by the benchmarks
+I_FOLDER = VariableId("bench_i_folder")
+I_VALUE = VariableId("bench_i_value")
+I_GROUP = VariableId("bench_i_group")
+I_BEST = VariableId("bench_i_best")
+I_RANK = VariableId("bench_i_rank")
+I_QUANTILE = VariableId("bench_i_quantile")
+
+# Variables of the schema emitted by the benchmark aggregation, one composite per value of I_GROUP
+AGG_N = VariableId("agg_n")
+AGG_TOTAL = VariableId("agg_total")
+
+SOURCE_SCHEMA = "source"
+TARGET_SCHEMA = "target"
+AGGREGATE_SCHEMA = "aggregate"
+
+TARGET_PREFIX = "target_"
+
+def _var(name: str, data_type: str, sort_order: int, parent: str, output: bool = False) -> Dict:
+    spec: Dict = {"name": name, "data_type": data_type, "sort_order": sort_order, "parent": parent}
+    if output:
+        spec["metadata"] = {OUTPUT_FLAG: True}
+    return spec
+
+def _n_roots(spec: Dict) -> int:
+    return sum(1 for var_spec in spec.values() if var_spec.get("parent") is None)
+
+def _check_free(spec: Dict, folder_name: str) -> None:
+    for var_id, var_spec in spec.items():
+        if var_id.startswith(BENCH_PREFIX) or (var_spec.get("parent") is None and var_spec["name"] == folder_name):
+            raise ValueError('Schema already defines benchmark variable "%s"' % var_id)
+
+def augment_temporal(spec: Dict) -> Dict:
+    """Returns a copy of a temporal track specification, with the variables used by the benchmarks added under a root
+    folder of their own."""
+    _check_free(spec, T_FOLDER_NAME)
+    ret: Dict = copy.deepcopy(spec)
+    ret[T_FOLDER] = {"name": T_FOLDER_NAME, "data_type": "Folder", "sort_order": _n_roots(spec)}
+    ret[T_VALUE] = _var("value", "Decimal", 0, T_FOLDER)
+    ret[T_ITEMS] = _var("items", "List", 1, T_FOLDER)
+    ret[T_ITEM_NAME] = _var("name", "Text", 0, T_ITEMS)
+    ret[T_ITEM_AMOUNT] = _var("amount", "Decimal", 1, T_ITEMS)
+    ret[T_SUM] = _var("sum", "Decimal", 2, T_FOLDER, output=True)
+    ret[T_MEAN] = _var("mean", "Decimal", 3, T_FOLDER, output=True)
+    ret[T_COUNT] = _var("count", "Integer", 4, T_FOLDER, output=True)
+    ret[T_MIN] = _var("min", "Decimal", 5, T_FOLDER, output=True)
+    ret[T_MAX] = _var("max", "Decimal", 6, T_FOLDER, output=True)
+    ret[T_ARGMAX] = _var("argmax", "Text", 7, T_FOLDER, output=True)
+    return ret
+
+def augment_immutable(spec: Dict) -> Dict:
+    """Returns a copy of an immutable track specification, with the variables used by the benchmarks added under a root
+    folder of their own."""
+    _check_free(spec, I_FOLDER_NAME)
+    ret: Dict = copy.deepcopy(spec)
+    ret[I_FOLDER] = {"name": I_FOLDER_NAME, "data_type": "Folder", "sort_order": _n_roots(spec)}
+    ret[I_VALUE] = _var("value", "Integer", 0, I_FOLDER)
+    ret[I_GROUP] = _var("group", "Text", 1, I_FOLDER)
+    ret[I_BEST] = _var("best", "Decimal", 2, I_FOLDER, output=True)
+    ret[I_RANK] = _var("rank", "Integer", 3, I_FOLDER, output=True)
+    ret[I_QUANTILE] = _var("quantile", "Decimal", 4, I_FOLDER, output=True)
+    return ret
+
+def mirror(spec: Dict) -> Dict:
+    """Specification of a track with the same structure as the one supplied, in which every variable other than a
+    folder is sourced from its counterpart. Translating into the mirror exercises every variable of the original."""
+    ret: Dict = {}
+    for var_id, var_spec in spec.items():
+        target: Dict = {"name": var_spec["name"], "data_type": var_spec["data_type"],
+                        "sort_order": var_spec["sort_order"]}
+        if var_spec.get("parent") is not None:
+            target["parent"] = TARGET_PREFIX + var_spec["parent"]
+        if var_spec["data_type"] != "Folder":
+            target["sources"] = [var_id]
+        ret[TARGET_PREFIX + var_id] = target
+    return ret
+
+def aggregate_specs() -> Tuple[Dict, Dict]:
+    """Temporal and immutable specifications of the schema emitted by the benchmark aggregation."""
+    immutable: Dict = {
+        AGG_N: {"name": "n", "data_type": "Integer", "sort_order": 0},
+        AGG_TOTAL: {"name": "total", "data_type": "Integer", "sort_order": 1}
+    }
+    return {}, immutable
+
+def _read_spec(path: str) -> Dict:
+    with open(path) as fh:
+        return json.load(fh)
+
+def _write_schema(path: str, temporal: Dict, immutable: Dict) -> None:
+    os.makedirs(path, exist_ok=True)
+    with open(os.path.join(path, "temporal.json"), "w") as fh:
+        json.dump(temporal, fh, indent=2)
+    with open(os.path.join(path, "immutable.json"), "w") as fh:
+        json.dump(immutable, fh, indent=2)
+
+def write_bench_schemas(schemas_dir: str, schema_name: str, bench_schemas_dir: str) -> None:
+    """Write the schemas used by the benchmarks into bench_schemas_dir: the schema being benchmarked, augmented with the
+    benchmark variables (SOURCE_SCHEMA); a mirror of it to translate into (TARGET_SCHEMA); and the schema emitted by the
+    benchmark aggregation (AGGREGATE_SCHEMA)."""
+    temporal: Dict = augment_temporal(_read_spec(os.path.join(schemas_dir, schema_name, "temporal.json")))
+    immutable: Dict = augment_immutable(_read_spec(os.path.join(schemas_dir, schema_name, "immutable.json")))
+    _write_schema(os.path.join(bench_schemas_dir, SOURCE_SCHEMA), temporal, immutable)
+    _write_schema(os.path.join(bench_schemas_dir, TARGET_SCHEMA), mirror(temporal), mirror(immutable))
+    _write_schema(os.path.join(bench_schemas_dir, AGGREGATE_SCHEMA), *aggregate_specs())
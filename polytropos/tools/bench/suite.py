@@ -0,0 +1,320 @@
+import json
+import logging
+import os
+import platform
+import shutil
+import statistics
+import time
+from collections import OrderedDict, Counter
+from dataclasses import dataclass, asdict, field
+from typing import Dict, Callable, List, Optional, Iterable, Tuple, Any, Iterator, NamedTuple
+
+from polytropos.actions.aggregate import Aggregate, GroupedAggregate
+from polytropos.actions.changes.available import BestAvailable
+from polytropos.actions.changes.cast import Cast
+from polytropos.actions.changes.sort import Sort
+from polytropos.actions.changes.stat.cross_sectional.minmax import CrossSectionalMinimum, CrossSectionalMaximum
+from polytropos.actions.changes.stat.cross_sectional.reduce import CrossSectionalSum, CrossSectionalCount, \
+    CrossSectionalMean
+from polytropos.actions.consume.coverage import CoverageFile
+from polytropos.actions.consume.sourcecoverage import SourceCoverage
+from polytropos.actions.consume.tocsv import ExportToCSV
+from polytropos.actions.evolve import Change
+from polytropos.actions.evolve.__evolve import Evolve
+from polytropos.actions.filter.univariate.comparison import AtLeast
+from polytropos.actions.scan.quantile import Quantile, ApproximateQuantile
+from polytropos.actions.scan.rank import Rank
+from polytropos.actions.translate import Translate
+from polytropos.actions.translate.trace import Trace
+from polytropos.ontology.composite import Composite
+from polytropos.ontology.context import Context
+from polytropos.ontology.schema import Schema
+from polytropos.tools.bench.corpus import CorpusSpec, CorpusGenerator
+from polytropos.tools.bench.schema import write_bench_schemas, SOURCE_SCHEMA, TARGET_SCHEMA, AGGREGATE_SCHEMA, \
+    T_VALUE, T_ITEMS, T_ITEM_NAME, T_ITEM_AMOUNT, T_SUM, T_MEAN, T_COUNT, T_MIN, T_MAX, T_ARGMAX, I_VALUE, I_GROUP, \
+    I_BEST, I_RANK, I_QUANTILE, AGG_N, AGG_TOTAL
+from polytropos.util.store import DirectoryStore, JSON, create_store
+
+RESULT_FORMAT = 1
+
+@dataclass
+class BenchEnvironment:
+    """Everything a benchmark needs to build its step: the augmented schema, the corpus it runs on, and a context whose
+    output directory receives whatever the step writes."""
+    context: Context
+    schema: Schema
+    corpus_dir: str
+    backend: str = DirectoryStore.backend
+    codec: str = JSON.name
+    # Outputs of steps that other benchmarks consume (e.g. SourceCoverage reads those of Translate and Trace)
+    prerequisites: Dict[str, str] = field(default_factory=dict)
+
+    def output_dir(self, name: str) -> str:
+        """An empty store to receive the output of a benchmark."""
+        path: str = os.path.join(self.context.output_dir, "steps", name.replace("/", "_"))
+        shutil.rmtree(path, ignore_errors=True)
+        create_store(path, self.backend, self.codec)
+        return path
+
+    def prerequisite(self, name: str, build: Callable[[], Callable[[str, str], None]]) -> str:
+        """Output of running a step over the corpus, computed the first time it is requested."""
+        if name not in self.prerequisites:
+            path: str = self.output_dir("_" + name)
+            build()(self.corpus_dir, path)
+            self.prerequisites[name] = path
+        return self.prerequisites[name]
+
+# A benchmark builds its step, which is not timed, and returns a function that runs the step over the corpus once
+Benchmark = Callable[[BenchEnvironment], Callable[[], None]]
+
+BENCHMARKS: Dict[str, Benchmark] = OrderedDict()
+
+def benchmark(name: str) -> Callable[[Benchmark], Benchmark]:
+    def _register(func: Benchmark) -> Benchmark:
+        BENCHMARKS[name] = func
+        return func
+    return _register
+
+def _evolve(name: str, make_change: Callable[[Schema], Change]) -> None:
+    def _benchmark(env: BenchEnvironment) -> Callable[[], None]:
+        step: Evolve = Evolve(env.context, [make_change(env.schema)], env.schema)
+        output_dir: str = env.output_dir(name)
+        return lambda: step(env.corpus_dir, output_dir)
+    benchmark(name)(_benchmark)
+
+_evolve("Evolve/Cast", lambda schema: Cast(schema, {}))
+_evolve("Evolve/Sort", lambda schema: Sort(schema, {}))
+_evolve("Evolve/BestAvailable", lambda schema: BestAvailable(schema, {}, temporal_source=T_VALUE, target=I_BEST))
+_evolve("Evolve/CrossSectionalSum", lambda schema: CrossSectionalSum(schema, {}, subjects=T_ITEMS, value_target=T_SUM,
+                                                                     argument=T_ITEM_AMOUNT))
+_evolve("Evolve/CrossSectionalCount", lambda schema: CrossSectionalCount(schema, {}, subjects=T_ITEMS,
+                                                                         value_target=T_COUNT, argument=T_ITEM_AMOUNT))
+_evolve("Evolve/CrossSectionalMean", lambda schema: CrossSectionalMean(schema, {}, subjects=T_ITEMS,
+                                                                       value_target=T_MEAN, argument=T_ITEM_AMOUNT))
+_evolve("Evolve/CrossSectionalMinimum", lambda schema: CrossSectionalMinimum(schema, {}, subjects=T_ITEMS,
+                                                                             value_target=T_MIN,
+                                                                             argument=T_ITEM_AMOUNT))
+_evolve("Evolve/CrossSectionalMaximum", lambda schema: CrossSectionalMaximum(schema, {}, subjects=T_ITEMS,
+                                                                             value_target=T_MAX,
+                                                                             argument=T_ITEM_AMOUNT,
+                                                                             identifier=T_ITEM_NAME,
+                                                                             identifier_target=T_ARGMAX))
+
+@benchmark("Filter/AtLeast")
+def _filter(env: BenchEnvironment) -> Callable[[], None]:
+    step: AtLeast = AtLeast(env.context, env.schema, T_VALUE, "5000")
+    output_dir: str = env.output_dir("Filter/AtLeast")
+    return lambda: step(env.corpus_dir, output_dir)
+
+@benchmark("Scan/Rank")
+def _rank(env: BenchEnvironment) -> Callable[[], None]:
+    step: Rank = Rank(env.context, env.schema, I_VALUE, I_RANK)
+    output_dir: str = env.output_dir("Scan/Rank")
+    return lambda: step(env.corpus_dir, output_dir)
+
+@benchmark("Scan/Quantile")
+def _quantile(env: BenchEnvironment) -> Callable[[], None]:
+    step: Quantile = Quantile(env.context, env.schema, I_VALUE, I_QUANTILE)
+    output_dir: str = env.output_dir("Scan/Quantile")
+    return lambda: step(env.corpus_dir, output_dir)
+
+@benchmark("Scan/ApproximateQuantile")
+def _approximate_quantile(env: BenchEnvironment) -> Callable[[], None]:
+    step: ApproximateQuantile = ApproximateQuantile(env.context, env.schema, I_VALUE, I_QUANTILE)
+    output_dir: str = env.output_dir("Scan/ApproximateQuantile")
+    return lambda: step(env.corpus_dir, output_dir)
+
+@dataclass
+class GroupTotals(Aggregate):
+    """Emits one composite for each group of the benchmark corpus, with the number of composites in the group and the
+    total of their values."""
+
+    def extract(self, composite: Composite) -> Tuple[Optional[str], Optional[int]]:
+        return (composite.get_immutable(I_GROUP, treat_missing_as_null=True),
+                composite.get_immutable(I_VALUE, treat_missing_as_null=True))
+
+    def analyze(self, extracts: Iterable[Tuple[str, Any]]) -> None:
+        self.counts: Counter = Counter()
+        self.totals: Counter = Counter()
+        for composite_id, (group, value) in extracts:
+            if group is None:
+                continue
+            self.counts[group] += 1
+            self.totals[group] += value or 0
+
+    def emit(self) -> Iterator[Tuple[str, Composite]]:
+        for group in sorted(self.counts):
+            composite: Composite = Composite(self.target_schema, {"immutable": {}})
+            composite.put_immutable(AGG_N, self.counts[group])
+            composite.put_immutable(AGG_TOTAL, self.totals[group])
+            yield "group_%s" % group, composite
+
+@benchmark("Aggregate/GroupTotals")
+def _aggregate(env: BenchEnvironment) -> Callable[[], None]:
+    target_schema: Optional[Schema] = Schema.load(AGGREGATE_SCHEMA, env.context.schemas_dir)
+    assert target_schema is not None
+    step: GroupTotals = GroupTotals(env.context, env.schema, target_schema, I_GROUP)
+    output_dir: str = env.output_dir("Aggregate/GroupTotals")
+    return lambda: step(env.corpus_dir, output_dir)
+
+@dataclass
+class GroupedTotals(GroupedAggregate):
+    """As GroupTotals, shuffling the extracts by group through the temp directory."""
+
+    def extract(self, composite: Composite) -> Optional[int]:
+        return composite.get_immutable(I_VALUE, treat_missing_as_null=True)
+
+    def emit_group(self, group: Any, extracts: List[Tuple[str, Any]]) -> Iterator[Tuple[str, Composite]]:
+        composite: Composite = Composite(self.target_schema, {"immutable": {}})
+        composite.put_immutable(AGG_N, len(extracts))
+        composite.put_immutable(AGG_TOTAL, sum(value or 0 for _, value in extracts))
+        yield "group_%s" % group, composite
+
+@benchmark("Aggregate/GroupedTotals")
+def _grouped_aggregate(env: BenchEnvironment) -> Callable[[], None]:
+    target_schema: Optional[Schema] = Schema.load(AGGREGATE_SCHEMA, env.context.schemas_dir)
+    assert target_schema is not None
+    step: GroupedTotals = GroupedTotals(env.context, env.schema, target_schema, I_GROUP)
+    output_dir: str = env.output_dir("Aggregate/GroupedTotals")
+    return lambda: step(env.corpus_dir, output_dir)
+
+@benchmark("Translate")
+def _translate(env: BenchEnvironment) -> Callable[[], None]:
+    step: Translate = Translate.build(env.context, env.schema, TARGET_SCHEMA)
+    output_dir: str = env.output_dir("Translate")
+    return lambda: step(env.corpus_dir, output_dir)
+
+@benchmark("Trace")
+def _trace(env: BenchEnvironment) -> Callable[[], None]:
+    step: Translate = Trace.build(env.context, env.schema, TARGET_SCHEMA)
+    output_dir: str = env.output_dir("Trace")
+    return lambda: step(env.corpus_dir, output_dir)
+
+@benchmark("Consume/ExportToCSV")
+def _export_to_csv(env: BenchEnvironment) -> Callable[[], None]:
+    columns: List = [
+        {"immutable_block": [I_VALUE, I_GROUP]},
+        {"temporal_block": [T_VALUE, {T_ITEMS: {"type": "List", "children": [T_ITEM_NAME, T_ITEM_AMOUNT]}}]}
+    ]
+    step: ExportToCSV = ExportToCSV(env.context, env.schema, "bench_export.csv", columns)
+    return lambda: step(env.corpus_dir, None)
+
+@benchmark("Consume/CoverageFile")
+def _coverage_file(env: BenchEnvironment) -> Callable[[], None]:
+    file_prefix: str = os.path.join(env.context.output_dir, "bench_coverage")
+    step: CoverageFile = CoverageFile(env.context, env.schema, file_prefix, None, I_GROUP, False)
+    return lambda: step(env.corpus_dir, None)
+
+@benchmark("Consume/SourceCoverage")
+def _source_coverage(env: BenchEnvironment) -> Callable[[], None]:
+    translate_dir: str = env.prerequisite("Translate",
+                                          lambda: Translate.build(env.context, env.schema, TARGET_SCHEMA))
+    trace_dir: str = env.prerequisite("Trace", lambda: Trace.build(env.context, env.schema, TARGET_SCHEMA))
+    target_schema: Optional[Schema] = Schema.load(TARGET_SCHEMA, env.context.schemas_dir, source_schema=env.schema)
+    assert target_schema is not None
+    step: SourceCoverage = SourceCoverage(env.context, target_schema, translate_dir, trace_dir,
+                                          "bench_source_coverage.csv")
+    return lambda: step("dummy", None)
+
+def select(only: Optional[Iterable[str]]) -> List[str]:
+    """Names of the benchmarks to run: all of them, or those named (or whose names start with one of the prefixes
+    given, e.g. "Evolve")."""
+    if not only:
+        return list(BENCHMARKS.keys())
+    prefixes: List[str] = list(only)
+    selected: List[str] = [name for name in BENCHMARKS
+                           if any(name == prefix or name.startswith(prefix + "/") for prefix in prefixes)]
+    if len(selected) == 0:
+        raise ValueError("No benchmarks match %s. Known benchmarks: %s." % (prefixes, list(BENCHMARKS.keys())))
+    return selected
+
+def _version() -> Optional[str]:
+    try:
+        import pkg_resources
+        return pkg_resources.get_distribution("polytropos").version
+    except Exception:
+        return None
+
+def _time(env: BenchEnvironment, name: str, repeat: int) -> Dict[str, Any]:
+    runs: List[float] = []
+    for _ in range(repeat):
+        run: Callable[[], None] = BENCHMARKS[name](env)
+        start: float = time.perf_counter()
+        run()
+        runs.append(time.perf_counter() - start)
+    return {
+        "runs": runs,
+        "best_seconds": min(runs),
+        "median_seconds": statistics.median(runs)
+    }
+
+def run_suite(schemas_dir: str, schema_name: str, workdir: str, spec: CorpusSpec, repeat: int = 3,
+              only: Optional[Iterable[str]] = None, chunk_size: Optional[int] = None,
+              backend: str = DirectoryStore.backend, codec: str = JSON.name) -> Dict[str, Any]:
+    """Generate a synthetic corpus for a schema in workdir, and time each selected benchmark over it. Returns the
+    results, which are JSON serializable, in the form read by compare."""
+    names: List[str] = select(only)
+    bench_schemas_dir: str = os.path.join(workdir, "schemas")
+    write_bench_schemas(schemas_dir, schema_name, bench_schemas_dir)
+    schema: Optional[Schema] = Schema.load(SOURCE_SCHEMA, bench_schemas_dir)
+    assert schema is not None
+
+    corpus_dir: str = os.path.join(workdir, "corpus")
+    shutil.rmtree(corpus_dir, ignore_errors=True)
+    corpus_bytes: int = CorpusGenerator(schema, spec).write(corpus_dir, backend, codec)
+
+    results: Dict[str, Any] = OrderedDict()
+    with Context.build("", "", input_dir=corpus_dir, output_dir=os.path.join(workdir, "output"),
+                       schemas_dir=bench_schemas_dir, process_pool_chunk_size=chunk_size, store_backend=backend,
+                       intermediate_codec=codec) as context:
+        env: BenchEnvironment = BenchEnvironment(context, schema, corpus_dir, backend, codec)
+        for name in names:
+            logging.info('Running benchmark "%s".' % name)
+            result: Dict[str, Any] = _time(env, name, repeat)
+            result["composites_per_second"] = spec.composites / result["best_seconds"] \
+                if result["best_seconds"] > 0 else None
+            results[name] = result
+
+    return {
+        "format": RESULT_FORMAT,
+        "polytropos_version": _version(),
+        "python_version": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "schema": schema_name,
+        "corpus": dict(asdict(spec), bytes=corpus_bytes, backend=backend, codec=codec),
+        "repeat": repeat,
+        "benchmarks": results
+    }
+
+def write_results(results: Dict[str, Any], path: str) -> None:
+    with open(path, "w") as fh:
+        json.dump(results, fh, indent=2)
+    logging.info("Wrote benchmark results to %s." % path)
+
+def read_results(path: str) -> Dict[str, Any]:
+    with open(path) as fh:
+        return json.load(fh)
+
+class Comparison(NamedTuple):
+    name: str
+    baseline_seconds: float
+    current_seconds: float
+
+    @property
+    def ratio(self) -> float:
+        """Current time as a multiple of the baseline; above 1 is slower."""
+        return self.current_seconds / self.baseline_seconds if self.baseline_seconds > 0 else float("inf")
+
+def compare(baseline: Dict[str, Any], current: Dict[str, Any]) -> List[Comparison]:
+    """Compare the best times of the benchmarks present in both results. Results are only comparable if they were run on
+    the same corpus, which is reported as a warning otherwise."""
+    if baseline["corpus"] != current["corpus"]:
+        logging.warning("Benchmark results were produced from different corpora; timings may not be comparable.")
+    ret: List[Comparison] = []
+    for name, result in current["benchmarks"].items():
+        if name not in baseline["benchmarks"]:
+            continue
+        ret.append(Comparison(name, baseline["benchmarks"][name]["best_seconds"], result["best_seconds"]))
+    return ret
@@ -1,6 +1,4 @@
-import json
 import logging
-import os
 from typing import Dict, Set, Optional, Iterator, List
 
 from polytropos.ontology.composite import Composite
@@ -9,19 +7,16 @@ from polytropos.ontology.schema import Schema
 from polytropos.tools.qc.compare import FixtureComparator
 
 from polytropos.tools.qc.outcome import Outcome, ValueMatch, ValueMismatch, MissingValue, InvalidPath
-from polytropos.util.paths import find_all_composites, relpath_for
+from polytropos.util.store import CompositeStore, open_store
 
-def _get_composite(basepath: str, composite_id: str, schema: Schema) -> Optional[Composite]:
-    relpath: str = relpath_for(composite_id)
-    filename: str = os.path.join(basepath, relpath, "%s.json" % composite_id)
-    if not os.path.exists(filename):
+def _get_composite(store: CompositeStore, composite_id: str, schema: Schema) -> Optional[Composite]:
+    if composite_id not in store:
         return None
-    with open(filename) as fh:
-        try:
-            content: Dict = json.load(fh)
-        except Exception as e:
-            logging.error("Error reading composite %s" % filename)
-            raise e
+    try:
+        content: Dict = store.load(composite_id)
+    except Exception as e:
+        logging.error("Error reading composite %s in %s" % (composite_id, store.basepath))
+        raise e
     return Composite(schema, content, composite_id=composite_id)
 
 class FixtureOutcomes:
@@ -29,13 +24,15 @@ class FixtureOutcomes:
         unsorted_outcomes: Dict[str, Outcome] = {}
         self.no_actual: Set[str] = set()
 
-        for composite_id in find_all_composites(fixture_path):
-            actual: Optional[Composite] = _get_composite(actual_path, composite_id, schema)
+        fixtures: CompositeStore = open_store(fixture_path)
+        actuals: CompositeStore = open_store(actual_path)
+        for composite_id in fixtures.composite_ids():
+            actual: Optional[Composite] = _get_composite(actuals, composite_id, schema)
             if actual is None:
                 self.no_actual.add(composite_id)
                 logging.warning("No actual value observed for fixture %s." % composite_id)
                 continue
-            fixture: Optional[Composite] = _get_composite(fixture_path, composite_id, schema)
+            fixture: Optional[Composite] = _get_composite(fixtures, composite_id, schema)
             assert fixture is not None
             comparator: FixtureComparator = FixtureComparator(schema, composite_id, fixture, actual)
             outcome: Outcome = comparator.outcome
@@ -0,0 +1,106 @@
+from abc import ABC, abstractmethod
+from itertools import islice
+from typing import Generic, Iterable, Iterator, List, Optional, Tuple, TypeVar
+
+T = TypeVar('T')  # element type
+
+# Number of items read ahead and sorted by weight when building chunks
+DEFAULT_WINDOW = 50000
+
+# Weight of the observations made so far, relative to a new one, in the running estimate of throughput
+SMOOTHING = 0.8
+
+class WeightedItems(Generic[T]):
+    """Items to be processed in parallel, paired with an estimate of the work each represents (for composites, their
+    size in bytes). Iterating over it yields the bare items, so it can be passed wherever an iterable of items is
+    expected; schedulers that know about weights use the pairs to balance their chunks."""
+
+    def __init__(self, pairs: Iterable[Tuple[T, int]]):
+        self.pairs = pairs
+
+    def __iter__(self) -> Iterator[T]:
+        return (item for item, _ in self.pairs)
+
+class Chunker(ABC, Generic[T]):
+    """Splits items into chunks for submission to a pool, and is told how long each chunk took."""
+
+    @abstractmethod
+    def chunks(self) -> Iterator[Tuple[List[T], int]]:
+        """Yields tuples of (chunk, total weight of the chunk)."""
+        pass
+
+    def observe(self, weight: int, seconds: float) -> None:
+        pass
+
+class FixedChunker(Chunker[T]):
+    """Chunks of a fixed number of items, in the order given."""
+
+    def __init__(self, items: Iterable[T], chunk_size: int):
+        self.items = items
+        self.chunk_size = chunk_size
+
+    def chunks(self) -> Iterator[Tuple[List[T], int]]:
+        iterator: Iterator[T] = iter(self.items)
+        while True:
+            chunk: List[T] = list(islice(iterator, self.chunk_size))
+            if len(chunk) == 0:
+                return
+            yield chunk, len(chunk)
+
+class BalancedChunker(Chunker[T]):
+    """Chunks of roughly equal total weight, heaviest items first.
+
+    Items are read a window at a time and sorted by descending weight, so that the most expensive items are scheduled
+    early rather than left to straggle at the end of the step; memory use is bounded by the window. The weight budget of
+    each chunk starts at initial_size times the mean weight of the first window. If target_seconds is given, the
+    budget then adapts to the throughput observed so far, so that each chunk takes about target_seconds to process."""
+
+    def __init__(self, pairs: Iterable[Tuple[T, int]], initial_size: int, target_seconds: Optional[float] = None,
+                 window: int = DEFAULT_WINDOW):
+        self.pairs = pairs
+        self.initial_size = initial_size
+        self.target_seconds = target_seconds
+        self.window = window
+        self.budget: Optional[float] = None
+        self.weight_per_second: Optional[float] = None
+
+    def observe(self, weight: int, seconds: float) -> None:
+        if self.target_seconds is None or seconds <= 0:
+            return
+        observed: float = weight / seconds
+        if self.weight_per_second is None:
+            self.weight_per_second = observed
+        else:
+            self.weight_per_second = SMOOTHING * self.weight_per_second + (1 - SMOOTHING) * observed
+        self.budget = self.weight_per_second * self.target_seconds
+
+    def chunks(self) -> Iterator[Tuple[List[T], int]]:
+        iterator: Iterator[Tuple[T, int]] = iter(self.pairs)
+        while True:
+            window: List[Tuple[T, int]] = list(islice(iterator, self.window))
+            if len(window) == 0:
+                return
+            window.sort(key=lambda pair: pair[1], reverse=True)
+            if self.budget is None:
+                mean: float = sum(weight for _, weight in window) / len(window)
+                self.budget = max(mean, 1.0) * self.initial_size
+
+            chunk: List[T] = []
+            chunk_weight: int = 0
+            for item, weight in window:
+                chunk.append(item)
+                chunk_weight += max(weight, 1)
+                if chunk_weight >= self.budget:
+                    yield chunk, chunk_weight
+                    chunk, chunk_weight = [], 0
+            if len(chunk) > 0:
+                yield chunk, chunk_weight
+
+def chunker_for(items: Iterable[T], chunk_size: int, target_seconds: Optional[float] = None) -> Chunker[T]:
+    """Choose how to split items: balanced by weight if the items are weighted or chunk sizes are to adapt to observed
+    throughput, and in plain fixed-size chunks otherwise."""
+    if isinstance(items, WeightedItems):
+        return BalancedChunker(items.pairs, chunk_size, target_seconds)
+    if target_seconds is not None:
+        return BalancedChunker(((item, 1) for item in items), chunk_size, target_seconds)
+    return FixedChunker(items, chunk_size)
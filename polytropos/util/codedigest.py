@@ -0,0 +1,24 @@
+import functools
+import hashlib
+import importlib
+import os
+from typing import List, Optional
+
+@functools.lru_cache(maxsize=None)
+def package_digest(package_name: str) -> str:
+    """Hash of the source files of an installed package (e.g., "polytropos.ontology"), including its subpackages, so
+    that anything cached by one version of the code is not used by another. Computed once per process."""
+    init_path: Optional[str] = importlib.import_module(package_name).__file__
+    if init_path is None:
+        raise ValueError('Cannot locate the source of package "%s"' % package_name)
+    package_dir: str = os.path.dirname(os.path.abspath(init_path))
+    paths: List[str] = []
+    for dir_path, dir_names, file_names in os.walk(package_dir):
+        dir_names[:] = [name for name in dir_names if name != "__pycache__"]
+        paths.extend(os.path.join(dir_path, name) for name in file_names if name.endswith(".py"))
+    digest = hashlib.sha1()
+    for path in sorted(paths):
+        digest.update(os.path.relpath(path, package_dir).encode("utf-8") + b"\0")
+        with open(path, "rb") as fh:
+            digest.update(hashlib.sha1(fh.read()).digest())
+    return digest.hexdigest()
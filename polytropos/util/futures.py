@@ -1,14 +1,31 @@
 import math
 import os
-from concurrent.futures import as_completed, Executor, ThreadPoolExecutor, Future
+import pickle
+import tempfile
+import time
+import uuid
+from collections import OrderedDict, deque
+from concurrent.futures import wait, Executor, ThreadPoolExecutor, Future, FIRST_COMPLETED, BrokenExecutor
 from concurrent.futures.process import ProcessPoolExecutor
-from typing import Optional, List, Any, Iterable, Dict, TypeVar
+from typing import Optional, List, Any, Iterable, Iterator, Dict, TypeVar, Tuple, Sized, Generic, Callable, Deque
 from typing_extensions import Protocol
 
 from tqdm import tqdm
 
+from polytropos.util import profiling
+from polytropos.util.chunking import Chunker, chunker_for
+
 MAX_PROCESS_POOL_CHUNK_SIZE = 10000
 
+# Chunk size used when the number of items is not known in advance
+DEFAULT_STREAMING_CHUNK_SIZE = 1000
+
+# Number of chunks submitted per worker before waiting for any of them to complete
+CHUNKS_IN_FLIGHT_PER_WORKER = 2
+
+# Number of broadcast functions that each worker of a persistent pool keeps installed
+MAX_INSTALLED_BROADCASTS = 2
+
 T = TypeVar('T')  # element type
 R = TypeVar('R', covariant=True)  # result type
 
@@ -17,77 +34,234 @@ class Func(Protocol[T, R]):
     def __call__(self, __chunk: List[T], *args: Any) -> R: ...
 
 
-def run_in_process_pool(func: Func[T, R], items: List[T], *args: Any, chunk_size: Optional[int] = None, workers_count: Optional[int] = None) -> Iterable[R]:
+class FailurePolicy(Generic[T]):
+    """How a pool handles a chunk that raises. The chunk is first resubmitted up to retries times, in case the failure
+    was transient; if it still fails, it is split in half and each half is resubmitted, until the items that fail on
+    their own have been isolated. Each of those is passed to quarantine along with its exception, and the rest of the
+    items complete normally. Without a policy, the first failure is raised once the chunks in flight have completed."""
+
+    def __init__(self, quarantine: Callable[[T, BaseException], None], retries: int = 1):
+        self.quarantine = quarantine
+        self.retries = retries
+
+    def split(self, chunk: List[T], attempt: int, error: BaseException) -> List[Tuple[List[T], int]]:
+        """Returns the (chunk, attempt) pairs to resubmit after a failed attempt at a chunk, quarantining the chunk if it
+        consists of a single item that has exhausted its retries."""
+        if attempt < self.retries:
+            return [(chunk, attempt + 1)]
+        if len(chunk) == 1:
+            self.quarantine(chunk[0], error)
+            return []
+        # Halves of a chunk that has failed repeatedly are not retried again: the failure is likely deterministic
+        middle: int = len(chunk) // 2
+        return [(chunk[:middle], attempt), (chunk[middle:], attempt)]
+
+# Functions installed in this worker process by broadcast, by token
+_installed: "OrderedDict[str, Tuple[Func, Tuple]]" = OrderedDict()
+
+class _BroadcastCall:
+    """Stands in for a function and its trailing arguments when submitting chunks to a persistent pool. The function and
+    arguments are pickled to a file once, and each worker unpickles them the first time it sees the token, so that only
+    the token and the chunk itself are sent with each submission."""
+
+    def __init__(self, token: str, path: str):
+        self.token = token
+        self.path = path
+
+    def __call__(self, chunk: List[T]) -> Any:
+        installed: Optional[Tuple[Func, Tuple]] = _installed.get(self.token)
+        if installed is None:
+            with open(self.path, "rb") as fh:
+                installed = pickle.load(fh)
+            assert installed is not None
+            _installed[self.token] = installed
+            while len(_installed) > MAX_INSTALLED_BROADCASTS:
+                _installed.popitem(last=False)
+        func, args = installed
+        return func(chunk, *args)
+
+class _Timed:
+    """Wraps a function to report how long each call took in the worker, for adaptive chunk sizing, along with the
+    worker's performance counters for the call if the step is being profiled."""
+
+    def __init__(self, func: Func, collect: bool = False):
+        self.func = func
+        self.collect = collect
+
+    def __call__(self, chunk: List[T], *args: Any) -> Tuple[float, Optional[profiling.Collector], Any]:
+        start: float = time.time()
+        if not self.collect:
+            result: Any = self.func(chunk, *args)
+            return time.time() - start, None, result
+        with profiling.collecting() as collector:
+            result = self.func(chunk, *args)
+        return time.time() - start, collector, result
+
+def run_in_persistent_pool(executor: Executor, func: Func[T, R], items: Iterable[T], *args: Any, chunk_size: int,
+                           workers_count: int, broadcast_dir: Optional[str] = None,
+                           target_seconds: Optional[float] = None,
+                           failure_policy: Optional[FailurePolicy[T]] = None,
+                           profile: Optional[profiling.StepProfile] = None) -> Iterable[R]:
+    """Like run_in_process_pool, but using an existing, long-lived pool of workers_count workers, which is left running
+    afterwards. The function and arguments are broadcast to the workers through a file in broadcast_dir rather than
+    pickled with every chunk. See chunker_for regarding chunk_size and target_seconds, FailurePolicy regarding
+    failure_policy, and _run_in_pool regarding profile."""
+    fd, path = tempfile.mkstemp(dir=broadcast_dir or None, prefix="broadcast-", suffix=".pickle")
+    try:
+        with os.fdopen(fd, "wb") as fh:
+            pickle.dump((func, args), fh, protocol=pickle.HIGHEST_PROTOCOL)
+        call: _BroadcastCall = _BroadcastCall(uuid.uuid4().hex, path)
+        yield from _run_in_pool(executor, call, items, chunk_size=chunk_size,
+                                max_in_flight=CHUNKS_IN_FLIGHT_PER_WORKER * workers_count, shutdown=False,
+                                target_seconds=target_seconds, failure_policy=failure_policy, profile=profile)
+    finally:
+        os.remove(path)
+
+def _default_chunk_size(items: Iterable[T], workers_count: int) -> int:
+    if not isinstance(items, Sized):
+        return DEFAULT_STREAMING_CHUNK_SIZE
+    chunk_size: int = math.ceil(len(items) / workers_count)
+    return max(1, min(chunk_size, MAX_PROCESS_POOL_CHUNK_SIZE))
+
+
+def run_in_process_pool(func: Func[T, R], items: Iterable[T], *args: Any, chunk_size: Optional[int] = None, workers_count: Optional[int] = None,
+                        failure_policy: Optional[FailurePolicy[T]] = None,
+                        profile: Optional[profiling.StepProfile] = None) -> Iterable[R]:
     if workers_count is not None and workers_count <= 0:
         raise ValueError("workers_count must be greater than 0")
 
-    if len(items) == 0:
-        return
-
     if workers_count is None:
         workers_count = os.cpu_count() or 1
 
     if chunk_size is None:
-        chunk_size = math.ceil(len(items) / workers_count)
-        if chunk_size > MAX_PROCESS_POOL_CHUNK_SIZE:
-            chunk_size = MAX_PROCESS_POOL_CHUNK_SIZE
+        chunk_size = _default_chunk_size(items, workers_count)
 
     executor = ProcessPoolExecutor(max_workers=workers_count)
-    yield from _run_in_pool(executor, func, items, *args, chunk_size=chunk_size)
+    yield from _run_in_pool(executor, func, items, *args, chunk_size=chunk_size,
+                            max_in_flight=CHUNKS_IN_FLIGHT_PER_WORKER * workers_count, failure_policy=failure_policy,
+                            profile=profile)
 
 
-def run_in_thread_pool(func: Func[T, R], items: List[T], *args: Any, chunk_size: Optional[int] = None, workers_count: Optional[int] = None) -> Iterable[R]:
+def run_in_thread_pool(func: Func[T, R], items: Iterable[T], *args: Any, chunk_size: Optional[int] = None, workers_count: Optional[int] = None,
+                       failure_policy: Optional[FailurePolicy[T]] = None,
+                       profile: Optional[profiling.StepProfile] = None) -> Iterable[R]:
     if workers_count is not None and workers_count <= 0:
         raise ValueError("workers_count must be greater than 0")
 
-    if len(items) == 0:
-        return
-
     executor = ThreadPoolExecutor(max_workers=workers_count)
-    yield from _run_in_pool(executor, func, items, *args, chunk_size=chunk_size)
+    # noinspection PyProtectedMember
+    max_in_flight: int = CHUNKS_IN_FLIGHT_PER_WORKER * executor._max_workers  # type: ignore
+    yield from _run_in_pool(executor, func, items, *args, chunk_size=chunk_size, max_in_flight=max_in_flight,
+                            failure_policy=failure_policy, profile=profile)
+
 
+def _run_in_pool(executor: Executor, func: Func[T, R], items: Iterable[T], *args: Any, chunk_size: Optional[int] = None,
+                 max_in_flight: int = 1, shutdown: bool = True, target_seconds: Optional[float] = None,
+                 failure_policy: Optional[FailurePolicy[T]] = None,
+                 profile: Optional[profiling.StepProfile] = None) -> Iterable[R]:
+    """Submit chunks of items to the executor, keeping no more than max_in_flight chunks pending at once, and yield the
+    results as they complete. Items are drawn from the iterable only as chunks are submitted, so memory use does not
+    depend on the number of items. If a chunk fails and there is a failure policy, the chunk is retried and bisected as
+    the policy dictates; otherwise, no further chunks are submitted, and the first exception is raised after the chunks
+    already in flight have completed. A broken pool is never retried.
 
-def _run_in_pool(executor: Executor, func: Func[T, R], items: List[T], *args: Any, chunk_size: Optional[int] = None) -> Iterable[R]:
+    Chunks are formed by chunker_for: weighted items are balanced by weight, heaviest first, and if target_seconds is
+    given, chunk sizes adapt to the time that the workers report for the chunks completed so far.
+
+    If a step profile is given, the workers collect performance counters for each chunk, which are merged into it."""
     if chunk_size is None:
         chunk_size = 1
 
-    chunks: Iterable[List[T]] = _split_to_chunks(items, chunk_size)
+    chunker: Chunker[T] = chunker_for(items, chunk_size, target_seconds)
+    chunks: Iterator[Tuple[List[T], int]] = chunker.chunks()
+    timed: _Timed = _Timed(func, collect=profile is not None)
+    completed: int = 0
+    total: Optional[int] = len(items) if isinstance(items, Sized) else None
 
     exceptions: List[BaseException] = []
-    with executor:
-        futures: Dict[Future, int] = {}
-        for chunk in chunks:
-            future = executor.submit(func, chunk, *args)
-            futures[future] = len(chunk)
-        with tqdm(total=len(items)) as pbar:
-            for future in as_completed(set(futures.keys())):
-                pbar.update(futures[future])
-                del futures[future]
-                e = future.exception()
-                if e is not None:
-                    exceptions.append(e)
-                else:
-                    yield future.result()
+    # Future -> (chunk, weight, attempt). Chunks are kept until they complete, in case they have to be resubmitted.
+    futures: Dict[Future, Tuple[List[T], int, int]] = {}
+    # Parts of failed chunks awaiting resubmission, which take precedence over new chunks: (chunk, attempt)
+    resubmissions: Deque[Tuple[List[T], int]] = deque()
+
+    def submit_more() -> None:
+        while len(exceptions) == 0 and len(futures) < max_in_flight:
+            if len(resubmissions) > 0:
+                chunk, attempt = resubmissions.popleft()
+                # Weights only inform the adaptive chunk size, which ignores resubmissions
+                weight: int = 0
+            else:
+                next_chunk: Optional[Tuple[List[T], int]] = next(chunks, None)
+                if next_chunk is None:
+                    return
+                chunk, weight = next_chunk
+                attempt = 0
+            futures[executor.submit(timed, chunk, *args)] = (chunk, weight, attempt)
+
+    try:
+        with tqdm(total=total) as pbar:
+            submit_more()
+            while len(futures) > 0:
+                done, _ = wait(list(futures.keys()), return_when=FIRST_COMPLETED)
+                for future in done:
+                    chunk, weight, attempt = futures.pop(future)
+                    e = future.exception()
+                    if e is None:
+                        pbar.update(len(chunk))
+                        completed += len(chunk)
+                        elapsed, collector, result = future.result()
+                        if weight > 0:
+                            chunker.observe(weight, elapsed)
+                        if profile is not None and collector is not None:
+                            profile.absorb(collector)
+                        yield result
+                    elif failure_policy is None or isinstance(e, BrokenExecutor):
+                        pbar.update(len(chunk))
+                        exceptions.append(e)
+                    else:
+                        resubmitted: List[Tuple[List[T], int]] = failure_policy.split(chunk, attempt, e)
+                        if len(resubmitted) == 0:
+                            pbar.update(len(chunk))
+                        resubmissions.extend(resubmitted)
+                submit_more()
+    finally:
+        if shutdown:
+            executor.shutdown(wait=True)
+        else:
+            # The pool outlives this call, so make sure that none of its chunks are still pending or running
+            for future in futures:
+                future.cancel()
+            wait(list(futures.keys()))
+        if profile is not None:
+            profile.passes.append(completed)
     if len(exceptions) > 0:
         raise exceptions[0]
 
 
-def run_in_loop(func: Func[T, R], items: List[T], *args: Any, chunk_size: Optional[int] = None) -> Iterable[R]:
-    if len(items) == 0:
-        return
-
+def run_in_loop(func: Func[T, R], items: Iterable[T], *args: Any, chunk_size: Optional[int] = None,
+                failure_policy: Optional[FailurePolicy[T]] = None,
+                profile: Optional[profiling.StepProfile] = None) -> Iterable[R]:
+    """Process the chunks one at a time in the current thread. Performance counters, if any are being collected, go
+    straight to the current thread's collector; the step profile only receives the number of items completed."""
     if chunk_size is None:
         chunk_size = 1
 
-    chunks: Iterable[List[T]] = _split_to_chunks(items, chunk_size)
-    with tqdm(total=len(items)) as pbar:
-        for chunk in chunks:
-            result = func(chunk, *args)
+    total: Optional[int] = len(items) if isinstance(items, Sized) else None
+    completed: int = 0
+    with tqdm(total=total) as pbar:
+        for chunk, _ in chunker_for(items, chunk_size).chunks():
+            pending: Deque[Tuple[List[T], int]] = deque([(chunk, 0)])
+            while len(pending) > 0:
+                part, attempt = pending.popleft()
+                try:
+                    result = func(part, *args)
+                except Exception as e:
+                    if failure_policy is None:
+                        raise
+                    pending.extendleft(reversed(failure_policy.split(part, attempt, e)))
+                    continue
+                completed += len(part)
+                yield result
             pbar.update(len(chunk))
-            yield result
-
-
-# https://stackoverflow.com/questions/312443/how-do-you-split-a-list-into-evenly-sized-chunks
-def _split_to_chunks(items: List[T], chunk_size: int) -> Iterable[List[T]]:
-    for i in range(0, len(items), chunk_size):
-        yield items[i:i + chunk_size]
+    if profile is not None:
+        profile.passes.append(completed)
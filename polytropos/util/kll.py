@@ -0,0 +1,112 @@
+"""KLL sketches (Karnin, Lang and Liberty, "Optimal Quantile Approximation in Streams", 2016): a summary of a stream of
+numbers, from which the rank of any value can be estimated to within a fixed fraction of the stream's length. The
+sketch keeps a bounded number of items however long the stream is, and sketches of different streams can be merged."""
+
+import math
+import random
+from typing import List, Iterable, Tuple, Optional
+
+import numpy as np
+
+# Ratio between the capacities of successive compactors
+_C = 2 / 3
+
+# Smallest capacity of any compactor
+_MIN_CAPACITY = 2
+
+def k_for_error(error: float) -> int:
+    """The accuracy parameter k for which the estimated rank of a value is within error * n of its true rank, with
+    about 99% confidence. (After the empirical bound of the DataSketches implementation of KLL.)"""
+    if not 0 < error < 1:
+        raise ValueError("Error bound must be between 0 and 1")
+    return max(8, math.ceil((2.296 / error) ** (1 / 0.9723)))
+
+class KLLSketch:
+    """Items are kept in a hierarchy of compactors, those at level h each standing for 2^h items of the stream. When a
+    compactor is full, its items are sorted and every other one (starting at random) is promoted to the next level.
+
+    Sketches that are to be merged should be given different seeds, lest their random choices be correlated. By default,
+    each sketch is seeded from the operating system's source of randomness."""
+
+    def __init__(self, k: int, seed: Optional[int] = None):
+        self.k = k
+        self.n: int = 0
+        self.levels: List[List[float]] = [[]]
+        self._size: int = 0
+        self._random: random.Random = random.Random(seed)
+        # Number of items retained beyond which the sketch is compressed, which grows with the number of levels
+        self._limit: int = self._max_size()
+
+    def _capacity(self, level: int) -> int:
+        depth: int = len(self.levels) - level - 1
+        return max(_MIN_CAPACITY, int(math.ceil(self.k * (_C ** depth))))
+
+    def _max_size(self) -> int:
+        return sum(self._capacity(level) for level in range(len(self.levels)))
+
+    def update(self, value: float) -> None:
+        self.levels[0].append(value)
+        self.n += 1
+        self._size += 1
+        if self._size >= self._limit:
+            self._compress()
+
+    def extend(self, values: Iterable[float]) -> None:
+        for value in values:
+            self.update(value)
+
+    def _compact(self, level: int) -> None:
+        if level + 1 == len(self.levels):
+            self.levels.append([])
+            self._limit = self._max_size()
+        items: List[float] = sorted(self.levels[level])
+        # An odd item out stays where it is
+        kept: List[float] = [items.pop()] if len(items) % 2 == 1 else []
+        promoted: List[float] = items[self._random.randint(0, 1)::2]
+        self.levels[level] = kept
+        self.levels[level + 1].extend(promoted)
+        self._size -= len(items) - len(promoted)
+
+    def _compress(self) -> None:
+        self._limit = self._max_size()
+        while self._size >= self._limit:
+            for level in range(len(self.levels)):
+                if len(self.levels[level]) >= self._capacity(level):
+                    self._compact(level)
+                    break
+            else:
+                return
+
+    def merge(self, other: "KLLSketch") -> None:
+        """Fold another sketch (of the same k) into this one."""
+        while len(self.levels) < len(other.levels):
+            self.levels.append([])
+        for level, items in enumerate(other.levels):
+            self.levels[level].extend(items)
+        self.n += other.n
+        self._size += sum(len(items) for items in other.levels)
+        self._compress()
+
+    def __len__(self) -> int:
+        """The number of items retained (not the number of items seen; see n)."""
+        return self._size
+
+    def rank_table(self) -> Tuple[np.ndarray, np.ndarray]:
+        """The distinct values retained, in ascending order, and for each the estimated number of items seen that are
+        less than it. The table has one more rank than values, the last being n, so that the estimated rank of any
+        value x is ranks[searchsorted(values, x)]."""
+        values: List[float] = []
+        weights: List[int] = []
+        for level, items in enumerate(self.levels):
+            values.extend(items)
+            weights.extend([1 << level] * len(items))
+        if len(values) == 0:
+            return np.empty(0), np.zeros(1, dtype=np.int64)
+        value_array: np.ndarray = np.asarray(values, dtype=float)
+        weight_array: np.ndarray = np.asarray(weights, dtype=np.int64)
+        order: np.ndarray = np.argsort(value_array, kind="stable")
+        value_array = value_array[order]
+        weight_array = weight_array[order]
+        distinct, first = np.unique(value_array, return_index=True)
+        ranks: np.ndarray = np.concatenate(([0], np.cumsum(weight_array)))[np.append(first, len(value_array))]
+        return distinct, ranks
@@ -0,0 +1,186 @@
+"""Lookup tables compiled into an on-disk hash table, which each process maps into memory and reads on demand. A
+MappedLookup pickles as the path of its file, so steps that carry large lookups are cheap to send to worker processes,
+and the operating system shares the pages of the file among them."""
+
+import hashlib
+import logging
+import mmap
+import os
+import pickle
+import struct
+import tempfile
+from typing import Optional, Any, Dict, Iterator, Tuple, Mapping
+
+# Bump whenever the layout of compiled lookups changes, so that files compiled by older code are ignored
+LOOKUP_FORMAT = 1
+
+# Directory in which to keep compiled lookups. If set to an empty string, lookups are loaded into memory instead.
+LOOKUP_CACHE_ENV = "POLYTROPOS_LOOKUP_CACHE"
+
+_MAGIC = b"PTLK"
+
+# Magic, format, number of records, number of slots (a power of two)
+_HEADER = struct.Struct("<4sIQQ")
+
+# Hash of the key, and 1 + the offset of the record (0 if the slot is empty)
+_SLOT = struct.Struct("<QQ")
+
+# Lengths of the key and of the value that follow
+_RECORD = struct.Struct("<II")
+
+def default_cache_dir() -> Optional[str]:
+    """The directory named by POLYTROPOS_LOOKUP_CACHE, or polytropos/lookups in the user's cache directory if it is not
+    set. Returns None if compiling lookups is disabled."""
+    configured: Optional[str] = os.environ.get(LOOKUP_CACHE_ENV)
+    if configured is not None:
+        return configured or None
+    cache_home: str = os.environ.get("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"), ".cache")
+    return os.path.join(cache_home, "polytropos", "lookups")
+
+def _hash(key: bytes) -> int:
+    # Python's own string hash differs from one process to the next, so it cannot be stored
+    return int.from_bytes(hashlib.blake2b(key, digest_size=8).digest(), "little")
+
+def compilable(content: Any) -> bool:
+    """True if the content can be compiled, i.e., it is a dictionary keyed by strings."""
+    return isinstance(content, dict) and all(isinstance(key, str) for key in content.keys())
+
+def write_lookup(path: str, content: Dict[str, Any]) -> None:
+    """Compile a lookup into the file at path, replacing it atomically."""
+    n_slots: int = 1
+    while n_slots < 2 * len(content):
+        n_slots *= 2
+    records_start: int = _HEADER.size + n_slots * _SLOT.size
+    slots: bytearray = bytearray(n_slots * _SLOT.size)
+    mask: int = n_slots - 1
+
+    directory: str = os.path.dirname(path) or "."
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as fh:
+            fh.seek(records_start)
+            offset: int = records_start
+            for key, value in content.items():
+                key_bytes: bytes = key.encode("utf-8")
+                value_bytes: bytes = pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+                key_hash: int = _hash(key_bytes)
+                slot: int = key_hash & mask
+                while _SLOT.unpack_from(slots, slot * _SLOT.size)[1] != 0:
+                    slot = (slot + 1) & mask
+                _SLOT.pack_into(slots, slot * _SLOT.size, key_hash, offset + 1)
+                fh.write(_RECORD.pack(len(key_bytes), len(value_bytes)))
+                fh.write(key_bytes)
+                fh.write(value_bytes)
+                offset += _RECORD.size + len(key_bytes) + len(value_bytes)
+            fh.seek(0)
+            fh.write(_HEADER.pack(_MAGIC, LOOKUP_FORMAT, len(content), n_slots))
+            fh.write(slots)
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+        raise
+
+class MappedLookup(Mapping[str, Any]):
+    """Read-only view of a compiled lookup. Values are unpickled from the file each time they are retrieved, so changes
+    made to a retrieved value are not seen by later retrievals. Keys are iterated in the order of the original lookup.
+    The file is mapped the first time it is read from in each process."""
+
+    def __init__(self, path: str):
+        self.path: str = path
+        self._map: Optional[mmap.mmap] = None
+        self._n_records: int = 0
+        self._mask: int = 0
+
+    def _mapped(self) -> mmap.mmap:
+        if self._map is None:
+            with open(self.path, "rb") as fh:
+                mapped: mmap.mmap = mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ)
+            magic, lookup_format, n_records, n_slots = _HEADER.unpack_from(mapped, 0)
+            if magic != _MAGIC or lookup_format != LOOKUP_FORMAT:
+                mapped.close()
+                raise ValueError("%s is not a compiled lookup of format %i" % (self.path, LOOKUP_FORMAT))
+            self._n_records = n_records
+            self._mask = n_slots - 1
+            self._map = mapped
+        return self._map
+
+    def _record(self, mapped: mmap.mmap, offset: int) -> Tuple[bytes, int, int]:
+        """The key of the record at offset, and the position and length of its value."""
+        key_length, value_length = _RECORD.unpack_from(mapped, offset)
+        key_start: int = offset + _RECORD.size
+        return mapped[key_start:key_start + key_length], key_start + key_length, value_length
+
+    def _find(self, key: Any) -> Optional[Tuple[int, int]]:
+        """The position and length of the value for a key, or None if the key is not present."""
+        if not isinstance(key, str):
+            return None
+        mapped: mmap.mmap = self._mapped()
+        key_bytes: bytes = key.encode("utf-8")
+        key_hash: int = _hash(key_bytes)
+        slot: int = key_hash & self._mask
+        while True:
+            slot_hash, position = _SLOT.unpack_from(mapped, _HEADER.size + slot * _SLOT.size)
+            if position == 0:
+                return None
+            if slot_hash == key_hash:
+                record_key, value_start, value_length = self._record(mapped, position - 1)
+                if record_key == key_bytes:
+                    return value_start, value_length
+            slot = (slot + 1) & self._mask
+
+    def __getitem__(self, key: str) -> Any:
+        found: Optional[Tuple[int, int]] = self._find(key)
+        if found is None:
+            raise KeyError(key)
+        value_start, value_length = found
+        return pickle.loads(self._mapped()[value_start:value_start + value_length])
+
+    def __contains__(self, key: object) -> bool:
+        return self._find(key) is not None
+
+    def __iter__(self) -> Iterator[str]:
+        mapped: mmap.mmap = self._mapped()
+        offset: int = _HEADER.size + (self._mask + 1) * _SLOT.size
+        for _ in range(self._n_records):
+            key, value_start, value_length = self._record(mapped, offset)
+            yield key.decode("utf-8")
+            offset = value_start + value_length
+
+    def __len__(self) -> int:
+        self._mapped()
+        return self._n_records
+
+    def __getstate__(self) -> Dict:
+        # Each process maps the file for itself
+        return {"path": self.path}
+
+    def __setstate__(self, state: Dict) -> None:
+        self.__init__(state["path"])  # type: ignore
+
+    def __repr__(self) -> str:
+        return "MappedLookup(%r)" % self.path
+
+def compiled_path(cache_dir: str, filename: str) -> str:
+    """Where the compiled form of a lookup file is kept: under a digest of its content, so that it is compiled again
+    whenever the file changes."""
+    digest = hashlib.sha1(("%i\0%s\0" % (LOOKUP_FORMAT, os.path.splitext(filename)[1])).encode("utf-8"))
+    with open(filename, "rb") as fh:
+        for block in iter(lambda: fh.read(1 << 20), b""):
+            digest.update(block)
+    return os.path.join(cache_dir, "%s.lookup" % digest.hexdigest())
+
+def open_compiled(path: str) -> Optional[MappedLookup]:
+    """The compiled lookup at path, or None if there is none that can be read."""
+    if not os.path.exists(path):
+        return None
+    lookup: MappedLookup = MappedLookup(path)
+    try:
+        len(lookup)
+    except (OSError, ValueError, struct.error) as e:
+        logging.warning("Ignoring unreadable compiled lookup %s: %s" % (path, repr(e)))
+        return None
+    return lookup
@@ -0,0 +1,160 @@
+import hashlib
+import heapq
+import logging
+import os
+import tempfile
+from contextlib import contextmanager
+from typing import Iterable, Iterator, List, NamedTuple, Optional, Union
+
+MANIFEST_FILENAME = "_manifest.tsv"
+MANIFEST_HEADER = "# polytropos composite manifest v1"
+
+# Placeholder for the checksum of a composite whose content was not read when the manifest was built
+UNKNOWN_CHECKSUM = "-"
+
+class ManifestEntry(NamedTuple):
+    composite_id: str
+    size: int
+    checksum: str
+
+def entry_for(composite_id: str, data: Union[bytes, memoryview]) -> ManifestEntry:
+    """Manifest entry for a composite, given its serialized content."""
+    return ManifestEntry(composite_id, len(data), hashlib.sha1(data).hexdigest())
+
+def _format(entry: ManifestEntry) -> str:
+    return "%s\t%d\t%s\n" % entry
+
+def _parse(line: str) -> ManifestEntry:
+    composite_id, size, checksum = line.rstrip("\n").split("\t")
+    return ManifestEntry(composite_id, int(size), checksum)
+
+def _write_sorted(basepath: str, ordered: Iterable[ManifestEntry]) -> None:
+    os.makedirs(basepath, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=basepath, prefix=MANIFEST_FILENAME, suffix=".tmp")
+    n: int = 0
+    with os.fdopen(fd, "w") as fh:
+        fh.write(MANIFEST_HEADER + "\n")
+        for entry in ordered:
+            fh.write(_format(entry))
+            n += 1
+    os.replace(tmp_path, os.path.join(basepath, MANIFEST_FILENAME))
+    logging.info("Wrote manifest of {:,} composites to {}.".format(n, basepath))
+
+def write_manifest(basepath: str, entries: Iterable[ManifestEntry]) -> None:
+    """Record the composites in a directory as a sorted, tab-separated list of composite id, size in bytes, and SHA-1
+    checksum. The manifest is written atomically, so readers never see a partial list."""
+    _write_sorted(basepath, sorted(entries))
+
+def iter_manifest(basepath: str) -> Optional[Iterator[ManifestEntry]]:
+    """Returns a lazy iterator over the entries of the manifest in a directory, in composite id order, or None if there
+    is no manifest. The manifest is read as the iterator is consumed, so that memory use does not depend on its size."""
+    try:
+        fh = open(os.path.join(basepath, MANIFEST_FILENAME))
+    except FileNotFoundError:
+        return None
+    header: str = fh.readline().rstrip("\n")
+    if header != MANIFEST_HEADER:
+        fh.close()
+        logging.warning("Ignoring manifest with unrecognized header in %s." % basepath)
+        return None
+
+    def entries() -> Iterator[ManifestEntry]:
+        with fh:
+            for line in fh:
+                yield _parse(line)
+    return entries()
+
+def read_manifest(basepath: str) -> Optional[List[ManifestEntry]]:
+    """Returns the entries of the manifest in a directory, in composite id order, or None if there is no manifest."""
+    entries: Optional[Iterator[ManifestEntry]] = iter_manifest(basepath)
+    return None if entries is None else list(entries)
+
+def discard_manifest(basepath: str) -> None:
+    try:
+        os.remove(os.path.join(basepath, MANIFEST_FILENAME))
+    except FileNotFoundError:
+        pass
+
+class ManifestRecorder:
+    """Accumulates manifest entries in any order and writes them out sorted. Entries are held in memory up to
+    spill_entries at a time; beyond that, sorted runs are spilled beside the manifest and merged at the end, so that
+    recording the manifest of an arbitrarily large directory takes bounded memory."""
+
+    def __init__(self, basepath: str, spill_entries: int = 1000000):
+        self.basepath = basepath
+        self.spill_entries = spill_entries
+        self.buffer: List[ManifestEntry] = []
+        self.runs: List[str] = []
+
+    def append(self, entry: ManifestEntry) -> None:
+        self.buffer.append(entry)
+        if len(self.buffer) >= self.spill_entries:
+            self._spill()
+
+    def extend(self, entries: Iterable[ManifestEntry]) -> None:
+        for entry in entries:
+            self.append(entry)
+
+    def _spill(self) -> None:
+        os.makedirs(self.basepath, exist_ok=True)
+        fd, path = tempfile.mkstemp(dir=self.basepath, prefix=MANIFEST_FILENAME, suffix=".run")
+        with os.fdopen(fd, "w") as fh:
+            for entry in sorted(self.buffer):
+                fh.write(_format(entry))
+        self.runs.append(path)
+        self.buffer = []
+
+    def _read_run(self, path: str) -> Iterator[ManifestEntry]:
+        with open(path) as fh:
+            for line in fh:
+                yield _parse(line)
+
+    def finish(self) -> None:
+        if len(self.runs) == 0:
+            write_manifest(self.basepath, self.buffer)
+        else:
+            self._spill()
+            _write_sorted(self.basepath, heapq.merge(*[self._read_run(path) for path in self.runs]))
+        self.discard()
+
+    def discard(self) -> None:
+        for path in self.runs:
+            os.remove(path)
+        self.runs = []
+        self.buffer = []
+
+@contextmanager
+def recording_manifest(basepath: str) -> Iterator[ManifestRecorder]:
+    """Collects the entries for the composites written to a directory, and writes them as its manifest if (and only if)
+    the block completes. Any existing manifest is discarded on entry, so that an interrupted step never leaves behind a
+    manifest that disagrees with the directory."""
+    discard_manifest(basepath)
+    recorder: ManifestRecorder = ManifestRecorder(basepath)
+    try:
+        yield recorder
+    except BaseException:
+        recorder.discard()
+        raise
+    recorder.finish()
+
+def crawl_manifest_entries(basepath: str, checksums: bool) -> Iterator[ManifestEntry]:
+    """Crawl a directory of composites for their manifest entries. Checksums are only computed if requested, as they
+    require reading every composite."""
+    for obj in os.scandir(path=basepath):  # type: os.DirEntry
+        if obj.is_dir():
+            yield from crawl_manifest_entries(obj.path, checksums)
+        elif obj.is_file() and obj.name.endswith(".json"):
+            composite_id: str = obj.name[:-5]
+            if checksums:
+                with open(obj.path, "rb") as fh:
+                    yield entry_for(composite_id, fh.read())
+            else:
+                yield ManifestEntry(composite_id, obj.stat().st_size, UNKNOWN_CHECKSUM)
+
+def build_manifest(basepath: str, checksums: bool = True) -> List[ManifestEntry]:
+    """Rebuild the manifest for a directory by crawling it. Computing checksums requires reading every composite; if
+    checksums is False, only sizes are recorded."""
+    logging.info("Crawling %s to build a manifest." % basepath)
+    entries: List[ManifestEntry] = list(crawl_manifest_entries(basepath, checksums))
+    write_manifest(basepath, entries)
+    return entries
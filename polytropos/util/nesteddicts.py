@@ -1,4 +1,4 @@
-from typing import Optional, Any, Iterable, Dict, Sequence, Iterator
+from typing import Optional, Any, Iterable, Dict, Sequence, Iterator, Tuple
 
 NO_DEFAULT = Ellipsis
 
@@ -9,19 +9,13 @@ class IncompleteNestingError(ValueError):
     pass
 
 def _do_get(target: Any, nodes: Sequence) -> Optional[Any]:
-    if len(nodes) == 0:
-        return target
-
-    if not isinstance(target, dict):
-        raise IncompleteNestingError
-
-    key: str = nodes[0]
-    if key not in target:
-        raise MissingDataError
-
-    cur: Any = target.get(key)
-
-    return _do_get(cur, nodes[1:])
+    for key in nodes:
+        if not isinstance(target, dict):
+            raise IncompleteNestingError
+        if key not in target:
+            raise MissingDataError
+        target = target[key]
+    return target
 
 def get(target: Dict, spec: Sequence, default: Any=NO_DEFAULT, accept_none: bool=True) -> Any:
     """Given a nested dict, traverse the specified path and return the value."""
@@ -58,17 +52,9 @@ def _get_or_init(target: Dict, key: str) -> Dict:
 def _do_put(target: Dict, spec_arr: Sequence, value: Any) -> None:
     assert len(spec_arr) > 0
 
-    if len(spec_arr) == 1:
-        key = spec_arr[0]
-        target[key] = value
-        return
-
-    key = spec_arr[0]
-
-    _get_or_init(target, key)
-
-    _do_put(target[key], spec_arr[1:], value)
-
+    for i in range(len(spec_arr) - 1):
+        target = _get_or_init(target, spec_arr[i])
+    target[spec_arr[-1]] = value
 
 def put(target: Dict, spec: Sequence, value: Any) -> None:
     """Given a nested dict, traverse the specified path and assign the value."""
@@ -99,4 +85,61 @@ def str_to_path(path_str: str) -> Iterator[str]:
 class MissingValue:
     pass
 
-MISSING_VALUE: MissingValue = MissingValue()
\ No newline at end of file
+MISSING_VALUE: MissingValue = MissingValue()
+
+class PathAccessor:
+    """A path into nested dicts, compiled once so that it can be followed many times. Unlike get and put, an accessor
+    neither copies its path nor raises on a missing value: get returns the default (MISSING_VALUE unless otherwise
+    specified) instead. An intermediate node that is not a dict still raises IncompleteNestingError.
+
+    Every method accepts an optional root key, which is looked up in the target before following the path. This allows
+    one accessor per variable to serve every period of a composite (with the period as the root)."""
+
+    __slots__ = ("path", "_parents", "_leaf")
+
+    def __init__(self, path: Iterable[str]):
+        self.path: Tuple[str, ...] = tuple(path)
+        assert len(self.path) > 0
+        self._parents: Tuple[str, ...] = self.path[:-1]
+        self._leaf: str = self.path[-1]
+
+    def get(self, target: Any, root: Optional[str] = None, default: Any = MISSING_VALUE) -> Any:
+        if root is not None:
+            if not isinstance(target, dict):
+                raise IncompleteNestingError
+            target = target.get(root, MISSING_VALUE)
+            if target is MISSING_VALUE:
+                return default
+        for key in self.path:
+            if not isinstance(target, dict):
+                raise IncompleteNestingError
+            target = target.get(key, MISSING_VALUE)
+            if target is MISSING_VALUE:
+                return default
+        return target
+
+    def put(self, target: Dict, value: Any, root: Optional[str] = None) -> None:
+        if root is not None:
+            target = _get_or_init(target, root)
+        for key in self._parents:
+            target = _get_or_init(target, key)
+        target[self._leaf] = value
+
+    def delete(self, target: Dict, root: Optional[str] = None) -> None:
+        """Deletes the final node of the path, if it exists."""
+        if root is not None:
+            target = target.get(root, MISSING_VALUE)
+        for key in self._parents:
+            if target is MISSING_VALUE:
+                return
+            if not isinstance(target, dict):
+                raise IncompleteNestingError
+            target = target.get(key, MISSING_VALUE)
+        if target is MISSING_VALUE:
+            return
+        if not isinstance(target, dict):
+            raise IncompleteNestingError
+        target.pop(self._leaf, None)
+
+    def __repr__(self) -> str:
+        return "PathAccessor(%s)" % path_to_str(self.path)
\ No newline at end of file
@@ -1,9 +1,11 @@
 import functools
 import logging
 import os
-from typing import Iterator, Iterable
+from typing import Iterator, Iterable, Optional, Tuple
 import textwrap
 
+from polytropos.util.manifest import ManifestEntry, crawl_manifest_entries, iter_manifest
+
 def _use_scandir(basepath: str, outer: bool = False) -> Iterator[str]:
     if outer is True:
         logging.info("Crawling %s for composites." % basepath)
@@ -26,8 +28,24 @@ def _use_scandir(basepath: str, outer: bool = False) -> Iterator[str]:
         logging.info("Crawl complete. Found {:,} EINs in {}.".format(i, basepath))
 
 def find_all_composites(basepath: str) -> Iterator[str]:
+    """Yields the ID of every composite in a directory. If the directory has a manifest (see polytropos.util.manifest),
+    the IDs are read from it; otherwise, the directory is crawled."""
+    entries: Optional[Iterator[ManifestEntry]] = iter_manifest(basepath)
+    if entries is not None:
+        logging.info("Reading composites from manifest in %s." % basepath)
+        yield from (entry.composite_id for entry in entries)
+        return
     yield from _use_scandir(basepath, outer=True)
 
+def find_all_composite_sizes(basepath: str) -> Iterator[Tuple[str, int]]:
+    """Yields (composite ID, size in bytes) for every composite in a directory, from its manifest if it has one, and
+    otherwise by crawling it."""
+    entries: Optional[Iterator[ManifestEntry]] = iter_manifest(basepath)
+    if entries is None:
+        logging.info("Crawling %s for composites and their sizes." % basepath)
+        entries = crawl_manifest_entries(basepath, checksums=False)
+    yield from ((entry.composite_id, entry.size) for entry in entries)
+
 @functools.lru_cache(maxsize=4194304)
 def relpath_for(composite_id: str) -> str:
     chunks: Iterable[str] = textwrap.wrap(composite_id, 3)[:-1]
@@ -0,0 +1,168 @@
+import json
+import logging
+import sys
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Optional, Any, DefaultDict
+
+try:
+    import resource
+except ImportError:  # Not available on Windows
+    resource = None  # type: ignore
+
+# Counters are kept per thread, so that the workers of a thread pool do not share them
+_local = threading.local()
+
+def peak_rss_bytes() -> Optional[int]:
+    """High-water mark of the resident set size of this process since it started, or None if unavailable."""
+    if resource is None:
+        return None
+    peak: int = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Reported in bytes on macOS, and in kilobytes elsewhere
+    return peak if sys.platform == "darwin" else peak * 1024
+
+class Collector:
+    """Performance counters accumulated while profiling: CPU time, bytes read and written through composite stores,
+    peak memory, and named sections of times or counts reported by steps (e.g. time per Change class). Workers collect
+    into a collector of their own for each chunk, which is returned with the chunk's result and merged by the parent."""
+
+    def __init__(self) -> None:
+        self.cpu_seconds: float = 0.0
+        self.bytes_read: int = 0
+        self.bytes_written: int = 0
+        self.peak_rss_bytes: Optional[int] = None
+        self.sections: DefaultDict[str, DefaultDict[str, float]] = defaultdict(lambda: defaultdict(float))
+
+    def __getstate__(self) -> Dict:
+        state: Dict = self.__dict__.copy()
+        state["sections"] = {section: dict(values) for section, values in self.sections.items()}
+        return state
+
+    def __setstate__(self, state: Dict) -> None:
+        sections: Dict[str, Dict[str, float]] = state.pop("sections")
+        self.__dict__.update(state)
+        self.sections = defaultdict(lambda: defaultdict(float))
+        for section, values in sections.items():
+            self.sections[section].update(values)
+
+    def merge(self, other: "Collector") -> None:
+        self.cpu_seconds += other.cpu_seconds
+        self.bytes_read += other.bytes_read
+        self.bytes_written += other.bytes_written
+        if other.peak_rss_bytes is not None:
+            self.peak_rss_bytes = max(self.peak_rss_bytes or 0, other.peak_rss_bytes)
+        for section, values in other.sections.items():
+            for key, amount in values.items():
+                self.sections[section][key] += amount
+
+def _current() -> Optional[Collector]:
+    return getattr(_local, "collector", None)
+
+def enabled() -> bool:
+    """Whether the current thread is collecting. Steps check this before doing any timing of their own."""
+    return _current() is not None
+
+def count_read(n_bytes: int) -> None:
+    collector: Optional[Collector] = _current()
+    if collector is not None:
+        collector.bytes_read += n_bytes
+
+def count_written(n_bytes: int) -> None:
+    collector: Optional[Collector] = _current()
+    if collector is not None:
+        collector.bytes_written += n_bytes
+
+def add(section: str, key: str, amount: float) -> None:
+    """Add to a named time or count in a section of the profile, such as the time spent in a Change class."""
+    collector: Optional[Collector] = _current()
+    if collector is not None:
+        collector.sections[section][key] += amount
+
+@contextmanager
+def collecting() -> Iterator[Collector]:
+    """Collect counters for the code run in this thread within the block. CPU time is that of the current thread only,
+    so that work done by other threads is not counted twice."""
+    previous: Optional[Collector] = _current()
+    collector: Collector = Collector()
+    _local.collector = collector
+    start: float = time.thread_time()
+    try:
+        yield collector
+    finally:
+        collector.cpu_seconds += time.thread_time() - start
+        collector.peak_rss_bytes = peak_rss_bytes()
+        _local.collector = previous
+
+class StepProfile:
+    """Profile of one step (or fused run of steps) of a task. Counters from the parent process and from every chunk run
+    by workers are merged into a single collector."""
+
+    def __init__(self, name: str):
+        self.name = name
+        self.wall_seconds: float = 0.0
+        self.collector: Collector = Collector()
+        # Number of composites completed by each parallel pass of the step
+        self.passes: List[int] = []
+
+    def absorb(self, collector: Collector) -> None:
+        self.collector.merge(collector)
+
+    @property
+    def composites(self) -> int:
+        """Composites processed by the step; a step that passes over its input more than once (e.g. Scan) counts each
+        composite once."""
+        return max(self.passes) if len(self.passes) > 0 else 0
+
+    def as_dict(self) -> Dict[str, Any]:
+        ret: Dict[str, Any] = {
+            "step": self.name,
+            "wall_seconds": self.wall_seconds,
+            "cpu_seconds": self.collector.cpu_seconds,
+            "composites": self.composites,
+            "composites_per_second": self.composites / self.wall_seconds if self.wall_seconds > 0 else None,
+            "bytes_read": self.collector.bytes_read,
+            "bytes_written": self.collector.bytes_written,
+            "peak_rss_bytes": self.collector.peak_rss_bytes
+        }
+        for section, values in sorted(self.collector.sections.items()):
+            ret[section] = dict(sorted(values.items()))
+        return ret
+
+class TaskProfile:
+    """Machine-readable performance profile of a task, with one entry per step. Peak RSS is the high-water mark of
+    any process that took part in the step, which for long-lived workers includes earlier steps."""
+
+    def __init__(self, task_name: Optional[str] = None):
+        self.task_name = task_name
+        self.steps: List[StepProfile] = []
+        self.current: Optional[StepProfile] = None
+
+    @contextmanager
+    def step(self, name: str) -> Iterator[StepProfile]:
+        profile: StepProfile = StepProfile(name)
+        self.steps.append(profile)
+        self.current = profile
+        start: float = time.time()
+        collector: Optional[Collector] = None
+        try:
+            with collecting() as collector:
+                yield profile
+        finally:
+            profile.wall_seconds = time.time() - start
+            if collector is not None:
+                profile.absorb(collector)
+            self.current = None
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            "task": self.task_name,
+            "wall_seconds": sum(step.wall_seconds for step in self.steps),
+            "steps": [step.as_dict() for step in self.steps]
+        }
+
+    def write(self, path: str) -> None:
+        with open(path, "w") as fh:
+            json.dump(self.as_dict(), fh, indent=2)
+        logging.info("Wrote task profile to %s." % path)
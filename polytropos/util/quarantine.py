@@ -0,0 +1,92 @@
+import json
+import logging
+import os
+import traceback
+from collections import Counter
+from typing import Dict, Optional, TextIO, Set
+
+from polytropos.util.store import Buffer, CompositeStore
+
+REPORT_FILENAME = "report.jsonl"
+INPUTS_DIRNAME = "inputs"
+
+class QuarantineReport:
+    """Records the composites that a step could not process, so that the rest of the task can complete without them.
+    Each quarantined composite gets a line in report.jsonl, giving the step, the composite ID, the location of its input
+    and the traceback of its failure, and a copy of its input is saved under inputs/, since intermediate inputs are
+    removed when the task completes. The report is started afresh the first time a composite is quarantined."""
+
+    def __init__(self, basepath: str):
+        self.basepath = basepath
+        self.counts: Counter = Counter()
+        self._fh: Optional[TextIO] = None
+
+    def __getstate__(self) -> Dict:
+        state: Dict = self.__dict__.copy()
+        state["_fh"] = None
+        return state
+
+    @property
+    def total(self) -> int:
+        return sum(self.counts.values())
+
+    def _report(self) -> TextIO:
+        if self._fh is None:
+            os.makedirs(os.path.join(self.basepath, INPUTS_DIRNAME), exist_ok=True)
+            self._fh = open(os.path.join(self.basepath, REPORT_FILENAME), "w")
+        return self._fh
+
+    def _save_input(self, origin: CompositeStore, composite_id: str) -> Optional[str]:
+        try:
+            data: Buffer = origin.read(composite_id)
+        except Exception:
+            return None
+        path: str = os.path.join(self.basepath, INPUTS_DIRNAME, "%s.%s" % (composite_id, origin.codec.name))
+        with open(path, "wb") as fh:
+            fh.write(data)
+        return path
+
+    def record(self, step_name: str, origin: CompositeStore, composite_id: str, error: BaseException) -> None:
+        logging.error("Quarantined composite %s after it failed during %s step: %s" % (composite_id, step_name,
+                                                                                      repr(error)))
+        fh: TextIO = self._report()
+        entry: Dict = {
+            "step": step_name,
+            "composite_id": composite_id,
+            "input_path": origin.location_of(composite_id),
+            "input_codec": origin.codec.name,
+            "saved_input": self._save_input(origin, composite_id),
+            "error": repr(error),
+            # Exceptions raised in worker processes carry the worker's traceback as their cause
+            "traceback": "".join(traceback.format_exception(type(error), error, error.__traceback__))
+        }
+        fh.write(json.dumps(entry) + "\n")
+        fh.flush()
+        self.counts[step_name] += 1
+
+    def close(self) -> None:
+        if self._fh is not None:
+            self._fh.close()
+            self._fh = None
+
+    def summary(self) -> str:
+        if self.total == 0:
+            return "No composites were quarantined."
+        steps: str = ", ".join("{:,} in {}".format(count, step_name) for step_name, count in self.counts.items())
+        return "{:,} composites were quarantined ({}). See {}.".format(self.total, steps,
+                                                                      os.path.join(self.basepath, REPORT_FILENAME))
+
+class StepQuarantine:
+    """Failure handler for the composites of a single step, for use with FailurePolicy. Remembers which composites it
+    has quarantined, so that steps which pass over their input more than once (e.g. Scan) can leave them out of later
+    passes."""
+
+    def __init__(self, report: QuarantineReport, step_name: str, origin: CompositeStore):
+        self.report = report
+        self.step_name = step_name
+        self.origin = origin
+        self.composite_ids: Set[str] = set()
+
+    def __call__(self, composite_id: str, error: BaseException) -> None:
+        self.composite_ids.add(composite_id)
+        self.report.record(self.step_name, self.origin, composite_id, error)
@@ -0,0 +1,100 @@
+import gc
+import hashlib
+import logging
+import os
+import pickle
+import tempfile
+from typing import Optional, Dict, Any, BinaryIO
+
+from polytropos.util.codedigest import package_digest
+
+# Directory in which to keep compiled schemas. If set to an empty string, schemas are always compiled from JSON.
+SCHEMA_CACHE_ENV = "POLYTROPOS_SCHEMA_CACHE"
+
+def default_cache_dir() -> Optional[str]:
+    """The directory named by POLYTROPOS_SCHEMA_CACHE, or polytropos/schemas in the user's cache directory if it is not
+    set. Returns None if caching is disabled."""
+    configured: Optional[str] = os.environ.get(SCHEMA_CACHE_ENV)
+    if configured is not None:
+        return configured or None
+    cache_home: str = os.environ.get("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"), ".cache")
+    return os.path.join(cache_home, "polytropos", "schemas")
+
+class _Pickler(pickle.Pickler):
+    def __init__(self, fh: BinaryIO, external: Dict[str, Any]):
+        super(_Pickler, self).__init__(fh, protocol=pickle.HIGHEST_PROTOCOL)
+        self.external_ids: Dict[int, str] = {id(obj): name for name, obj in external.items()}
+
+    def persistent_id(self, obj: Any) -> Optional[str]:
+        return self.external_ids.get(id(obj))
+
+class _Unpickler(pickle.Unpickler):
+    def __init__(self, fh: BinaryIO, external: Dict[str, Any]):
+        super(_Unpickler, self).__init__(fh)
+        self.external = external
+
+    def persistent_load(self, pid: Any) -> Any:
+        if pid not in self.external:
+            raise pickle.UnpicklingError("Compiled schema refers to unknown object %s" % pid)
+        return self.external[pid]
+
+class SchemaCache:
+    """Compiled (i.e., built and validated) schemas, pickled under a key that identifies their definition. Objects that
+    a compiled schema refers to but does not own, such as its source schema, are supplied by the caller as named
+    externals: they are stored by name only, and the caller's objects are put back in their place when the schema is
+    loaded. An entry that cannot be read is treated as missing, so the cache can always be deleted or ignored."""
+
+    def __init__(self, cache_dir: str):
+        self.cache_dir = cache_dir
+
+    @classmethod
+    def default(cls) -> Optional["SchemaCache"]:
+        cache_dir: Optional[str] = default_cache_dir()
+        return cls(cache_dir) if cache_dir is not None else None
+
+    @staticmethod
+    def key_for(*parts: str) -> str:
+        # Schemas compiled by any other version of the ontology code are ignored
+        digest = hashlib.sha1(package_digest("polytropos.ontology").encode("utf-8"))
+        for part in parts:
+            digest.update(b"\0" + part.encode("utf-8"))
+        return digest.hexdigest()
+
+    def _path_for(self, key: str) -> str:
+        return os.path.join(self.cache_dir, "%s.pickle" % key)
+
+    def get(self, key: str, external: Dict[str, Any]) -> Optional[Any]:
+        try:
+            fh = open(self._path_for(key), "rb")
+        except FileNotFoundError:
+            return None
+        # The collector would otherwise run many times over the thousands of objects being created, none of them garbage
+        gc_was_enabled: bool = gc.isenabled()
+        gc.disable()
+        try:
+            with fh:
+                return _Unpickler(fh, external).load()
+        except Exception as e:
+            logging.warning("Ignoring unreadable compiled schema %s: %s" % (self._path_for(key), repr(e)))
+            return None
+        finally:
+            if gc_was_enabled:
+                gc.enable()
+
+    def put(self, key: str, compiled: Any, external: Dict[str, Any]) -> None:
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=self.cache_dir, suffix=".tmp")
+        except OSError as e:
+            logging.warning("Could not cache compiled schema in %s: %s" % (self.cache_dir, repr(e)))
+            return
+        try:
+            with os.fdopen(fd, "wb") as fh:
+                _Pickler(fh, external).dump(compiled)
+            os.replace(tmp_path, self._path_for(key))
+        except Exception as e:
+            logging.warning("Could not cache compiled schema in %s: %s" % (self.cache_dir, repr(e)))
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
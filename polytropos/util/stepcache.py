@@ -0,0 +1,85 @@
+import hashlib
+import logging
+import os
+import tempfile
+from typing import Optional, List, Tuple
+
+from polytropos.util.store import Buffer, CODECS, Codec
+
+def chain_key(previous: str, fingerprint: str) -> str:
+    """Key for the output of a step, given the key of its input and the fingerprint of the step's configuration. Keys
+    for a chain of steps are built by folding this function over the steps, starting from a digest of the original
+    input; a change to any step therefore invalidates that step and everything downstream of it, but nothing upstream."""
+    return hashlib.sha1((previous + ":" + fingerprint).encode("utf-8")).hexdigest()
+
+def content_digest(data: Buffer) -> str:
+    return hashlib.sha1(data).hexdigest()
+
+class StepCache:
+    """A content-addressed store of the per-composite outputs of task steps. Each entry holds the serialized output of
+    one step for one composite, under a key derived from the composite's ID and input and the configuration of every
+    step that led to it (see chain_key). Entries are compact JSON, whatever the codecs of the steps' inputs and outputs;
+    an entry of null records that the composite was dropped (e.g. by a Filter)."""
+
+    CODEC: Codec = CODECS["compact-json"]
+    DROPPED: bytes = b"null"
+
+    def __init__(self, cache_dir: str):
+        self.cache_dir = cache_dir
+
+    def _path_for(self, key: str) -> str:
+        return os.path.join(self.cache_dir, key[:2], key[2:4], "%s.json" % key)
+
+    def get(self, key: str) -> Optional[bytes]:
+        """Returns the cached output for the key, or None if there is no entry. Marks the entry as recently used."""
+        path: str = self._path_for(key)
+        try:
+            with open(path, "rb") as fh:
+                data: bytes = fh.read()
+        except FileNotFoundError:
+            return None
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        return data
+
+    def put(self, key: str, data: bytes) -> None:
+        path: str = self._path_for(key)
+        directory: str = os.path.dirname(path)
+        os.makedirs(directory, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+        with os.fdopen(fd, "wb") as fh:
+            fh.write(data)
+        os.replace(tmp_path, path)
+
+    def evict(self, max_bytes: int) -> None:
+        """Delete the least recently used entries until the cache occupies no more than max_bytes."""
+        entries: List[Tuple[float, int, str]] = []
+        total: int = 0
+        for dirpath, _, filenames in os.walk(self.cache_dir):
+            for filename in filenames:
+                path: str = os.path.join(dirpath, filename)
+                try:
+                    stat: os.stat_result = os.stat(path)
+                except FileNotFoundError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, path))
+                total += stat.st_size
+
+        if total <= max_bytes:
+            logging.info("Step cache occupies {:,} bytes; no eviction necessary.".format(total))
+            return
+
+        entries.sort()
+        n_evicted: int = 0
+        for _, size, path in entries:
+            if total <= max_bytes:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            total -= size
+            n_evicted += 1
+        logging.info("Evicted {:,} entries from step cache; {:,} bytes remain.".format(n_evicted, total))
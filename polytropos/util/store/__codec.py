@@ -0,0 +1,65 @@
+import json
+import pickle
+from abc import abstractmethod
+from typing import Dict, Union
+
+# Serialized content, as read from a store: bytes, or a view of memory that the store maps rather than copies
+Buffer = Union[bytes, memoryview]
+
+# Protocol 5 (out-of-band buffers, faster framing) where available; it was introduced in Python 3.8
+PICKLE_PROTOCOL: int = min(5, pickle.HIGHEST_PROTOCOL)
+
+class Codec:
+    """Serialization of composite content within a store."""
+
+    name: str
+
+    @abstractmethod
+    def encode(self, content: Dict) -> bytes:
+        pass
+
+    @abstractmethod
+    def decode(self, data: Buffer) -> Dict:
+        pass
+
+def _json_loads(data: Buffer) -> Dict:
+    # json only parses bytes or text; decoding a view as text is the one copy that parsing bytes makes anyway
+    return json.loads(data if isinstance(data, bytes) else str(data, "utf-8"))
+
+class PrettyJSONCodec(Codec):
+    """Indented JSON. This is the format of all task outputs, and of any data that predates configurable codecs."""
+
+    name = "json"
+
+    def encode(self, content: Dict) -> bytes:
+        return json.dumps(content, indent=2).encode("utf-8")
+
+    def decode(self, data: Buffer) -> Dict:
+        return _json_loads(data)
+
+class CompactJSONCodec(Codec):
+    """JSON without insignificant whitespace: about half the size of indented JSON, and still readable by any tool."""
+
+    name = "compact-json"
+
+    def encode(self, content: Dict) -> bytes:
+        return json.dumps(content, separators=(",", ":")).encode("utf-8")
+
+    def decode(self, data: Buffer) -> Dict:
+        return _json_loads(data)
+
+class PickleCodec(Codec):
+    """Python pickles. Fastest to encode and decode, but only readable by Polytropos, so only suitable for data that
+    does not leave the task."""
+
+    name = "pickle"
+
+    def encode(self, content: Dict) -> bytes:
+        return pickle.dumps(content, protocol=PICKLE_PROTOCOL)
+
+    def decode(self, data: Buffer) -> Dict:
+        return pickle.loads(data)
+
+JSON = PrettyJSONCodec()
+
+CODECS: Dict[str, Codec] = {codec.name: codec for codec in [JSON, CompactJSONCodec(), PickleCodec()]}
@@ -0,0 +1,52 @@
+import os
+from typing import Dict, Type
+
+from polytropos.util.store.__codec import CODECS, JSON
+from polytropos.util.store.__directory import DirectoryStore
+from polytropos.util.store.__packed import PackedStore
+from polytropos.util.store.__store import CompositeStore, STORE_DESCRIPTOR
+
+STORE_BACKENDS: Dict[str, Type[CompositeStore]] = {
+    DirectoryStore.backend: DirectoryStore,
+    PackedStore.backend: PackedStore
+}
+
+def read_descriptor(basepath: str) -> Dict[str, str]:
+    """Returns the settings in a store descriptor, which consists of "key = value" lines. A directory without a
+    descriptor is a directory store of indented JSON."""
+    settings: Dict[str, str] = {"backend": DirectoryStore.backend, "codec": JSON.name}
+    try:
+        fh = open(os.path.join(basepath, STORE_DESCRIPTOR))
+    except FileNotFoundError:
+        return settings
+    with fh:
+        for line in fh:
+            line = line.strip()
+            if line == "" or line.startswith("#"):
+                continue
+            key, value = line.split("=", 1)
+            settings[key.strip()] = value.strip()
+    return settings
+
+def _validate(backend: str, codec: str) -> None:
+    if backend not in STORE_BACKENDS:
+        raise ValueError('Unrecognized store backend "%s"' % backend)
+    if codec not in CODECS:
+        raise ValueError('Unrecognized codec "%s"' % codec)
+
+def open_store(basepath: str) -> CompositeStore:
+    """Open the composites in a directory, using the backend and codec recorded in its descriptor."""
+    settings: Dict[str, str] = read_descriptor(basepath)
+    _validate(settings["backend"], settings["codec"])
+    return STORE_BACKENDS[settings["backend"]](basepath, CODECS[settings["codec"]])
+
+def create_store(basepath: str, backend: str = DirectoryStore.backend, codec: str = JSON.name) -> CompositeStore:
+    """Prepare an empty directory to receive composites using the given backend and codec. Steps that write to the
+    directory will then pick both up through open_store."""
+    _validate(backend, codec)
+    os.makedirs(basepath, exist_ok=True)
+    if backend != DirectoryStore.backend or codec != JSON.name:
+        with open(os.path.join(basepath, STORE_DESCRIPTOR), "w") as fh:
+            fh.write("backend = %s\n" % backend)
+            fh.write("codec = %s\n" % codec)
+    return STORE_BACKENDS[backend](basepath, CODECS[codec])
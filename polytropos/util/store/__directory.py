@@ -0,0 +1,128 @@
+import os
+import sys
+from typing import Iterator, List, Tuple, Dict, Callable, Optional
+
+from polytropos.util import profiling
+from polytropos.util.manifest import ManifestEntry, entry_for
+from polytropos.util.paths import find_all_composites, find_all_composite_sizes, relpath_for
+from polytropos.util.store.__codec import Buffer, Codec
+from polytropos.util.store.__store import CompositeStore, StoreWriter
+
+# ioctl that clones a file as a copy-on-write reflink (on Linux file systems that support it, such as Btrfs and XFS)
+_FICLONE = 0x40049409 if sys.platform.startswith("linux") else None
+
+def _clone(origin: str, target: str) -> None:
+    if _FICLONE is None:
+        raise OSError("Reflinks are not supported on %s" % sys.platform)
+    import fcntl
+    with open(origin, "rb") as src:
+        try:
+            with open(target, "wb") as dst:
+                fcntl.ioctl(dst.fileno(), _FICLONE, src.fileno())
+        except OSError:
+            os.remove(target)
+            raise
+
+def _hard_link(origin: str, target: str) -> None:
+    os.link(origin, target)
+
+class DirectoryWriter(StoreWriter):
+    def __init__(self, basepath: str, codec: Codec):
+        super(DirectoryWriter, self).__init__(codec)
+        self.basepath = basepath
+        self.written: List[str] = []
+        # For each store copied from, the ways of sharing its files that have not failed yet
+        self._sharing: Dict[str, List[Callable[[str, str], None]]] = {}
+
+    def _target_path(self, composite_id: str, replace: bool = False) -> str:
+        """Where to write a composite, removing any file already there that is to be replaced rather than
+        overwritten in place: always if replace is set, and otherwise if the file is shared with another store."""
+        target_dir: str = os.path.join(self.basepath, relpath_for(composite_id))
+        os.makedirs(target_dir, exist_ok=True)
+        path: str = os.path.join(target_dir, "%s.json" % composite_id)
+        try:
+            if replace or os.stat(path).st_nlink > 1:
+                os.remove(path)
+        except FileNotFoundError:
+            pass
+        return path
+
+    def write(self, composite_id: str, data: Buffer) -> ManifestEntry:
+        path: str = self._target_path(composite_id)
+        with open(path, "wb") as fh:
+            fh.write(data)
+        self.written.append(path)
+        profiling.count_written(len(data))
+        return entry_for(composite_id, data)
+
+    def copy(self, source: CompositeStore, composite_id: str, entry: Optional[ManifestEntry] = None) -> ManifestEntry:
+        """Composites from another directory store with the same codec share its file, without copying it: as a
+        reflink where the file system supports them, or else as a hard link if the two stores are on the same file
+        system. Otherwise, they are copied. A shared file is only read if its manifest entry is not supplied."""
+        if not isinstance(source, DirectoryStore) or source.codec is not self.codec:
+            return super(DirectoryWriter, self).copy(source, composite_id, entry)
+        origin: str = source.location_of(composite_id)
+        if not os.path.exists(origin):
+            raise KeyError(composite_id)
+        methods: List[Callable[[str, str], None]] = self._sharing.setdefault(source.basepath, [_clone, _hard_link])
+        while len(methods) > 0:
+            path: str = self._target_path(composite_id, replace=True)
+            try:
+                methods[0](origin, path)
+            except OSError:
+                # Not supported here, or across file systems, and so not for any other file of this store either
+                methods.pop(0)
+                continue
+            self.written.append(path)
+            if entry is not None:
+                return entry
+            with open(path, "rb") as fh:
+                data: bytes = fh.read()
+            profiling.count_read(len(data))
+            return entry_for(composite_id, data)
+        return super(DirectoryWriter, self).copy(source, composite_id, entry)
+
+    def close(self) -> None:
+        self.written = []
+
+    def abort(self) -> None:
+        for path in self.written:
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+        self.written = []
+
+class DirectoryStore(CompositeStore):
+    """One file per composite, in a directory tree sharded by composite ID (see relpath_for). This is the layout of all
+    data that predates pluggable stores. Files keep the .json extension whatever the codec, so that the layout (and the
+    crawl that falls back on it) is the same for every codec."""
+
+    backend = "directory"
+
+    def _path_for(self, composite_id: str) -> str:
+        return os.path.join(self.basepath, relpath_for(composite_id), "%s.json" % composite_id)
+
+    def composite_ids(self) -> Iterator[str]:
+        return find_all_composites(self.basepath)
+
+    def composite_sizes(self) -> Iterator[Tuple[str, int]]:
+        return find_all_composite_sizes(self.basepath)
+
+    def read(self, composite_id: str) -> bytes:
+        try:
+            with open(self._path_for(composite_id), "rb") as fh:
+                data: bytes = fh.read()
+        except FileNotFoundError:
+            raise KeyError(composite_id)
+        profiling.count_read(len(data))
+        return data
+
+    def __contains__(self, composite_id: object) -> bool:
+        return isinstance(composite_id, str) and os.path.exists(self._path_for(composite_id))
+
+    def location_of(self, composite_id: str) -> str:
+        return self._path_for(composite_id)
+
+    def writer(self) -> DirectoryWriter:
+        return DirectoryWriter(self.basepath, self.codec)
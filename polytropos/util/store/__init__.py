@@ -0,0 +1,5 @@
+from polytropos.util.store.__codec import Buffer, Codec, CODECS, JSON, PickleCodec
+from polytropos.util.store.__store import CompositeStore, StoreWriter, STORE_DESCRIPTOR
+from polytropos.util.store.__directory import DirectoryStore
+from polytropos.util.store.__packed import PackedStore
+from polytropos.util.store.__descriptor import STORE_BACKENDS, open_store, create_store, read_descriptor
@@ -0,0 +1,214 @@
+import logging
+import mmap
+import os
+import struct
+import uuid
+from collections import OrderedDict
+from typing import Dict, Iterator, List, Optional, Tuple, FrozenSet, BinaryIO
+
+from polytropos.util import profiling
+from polytropos.util.manifest import ManifestEntry, entry_for, iter_manifest
+from polytropos.util.store.__codec import Buffer, Codec, JSON
+from polytropos.util.store.__store import CompositeStore, StoreWriter
+
+SEGMENT_MAGIC = b"PTSEG001"
+SEGMENT_SUFFIX = ".seg"
+INDEX_SUFFIX = ".idx"
+
+# Length of the composite ID, followed by length of the content
+_RECORD_HEADER = struct.Struct("<HQ")
+
+# Segments are rolled over once they reach this size
+DEFAULT_SEGMENT_BYTES = 1 << 30
+
+# Location of a composite: segment file name, offset of the content within the segment, length of the content
+Location = Tuple[str, int, int]
+
+class PackedWriter(StoreWriter):
+    """Appends length-prefixed records to a segment file of its own. When the writer is closed (or a segment fills up),
+    an offset index for the segment is written beside it. A segment whose index is missing, e.g. because its writer was
+    interrupted, is re-indexed by scanning its records."""
+
+    def __init__(self, basepath: str, codec: Codec, segment_bytes: int):
+        super(PackedWriter, self).__init__(codec)
+        self.basepath = basepath
+        self.segment_bytes = segment_bytes
+        self.segment_name: Optional[str] = None
+        self.segment: Optional[BinaryIO] = None
+        self.offset: int = 0
+        self.locations: List[Tuple[str, int, int]] = []
+        # Every segment opened by this writer, so that they can all be discarded if the writer is aborted
+        self.written_segments: List[str] = []
+
+    def _open_segment(self) -> BinaryIO:
+        self.segment_name = uuid.uuid4().hex + SEGMENT_SUFFIX
+        self.written_segments.append(self.segment_name)
+        self.segment = open(os.path.join(self.basepath, self.segment_name), "wb")
+        self.segment.write(SEGMENT_MAGIC)
+        self.offset = len(SEGMENT_MAGIC)
+        self.locations = []
+        return self.segment
+
+    def _close_segment(self) -> None:
+        if self.segment is None:
+            return
+        self.segment.close()
+        assert self.segment_name is not None
+        index_path: str = os.path.join(self.basepath, self.segment_name[:-len(SEGMENT_SUFFIX)] + INDEX_SUFFIX)
+        with open(index_path + ".tmp", "w") as fh:
+            for composite_id, offset, length in self.locations:
+                fh.write("%s\t%d\t%d\n" % (composite_id, offset, length))
+        os.replace(index_path + ".tmp", index_path)
+        self.segment = None
+
+    def write(self, composite_id: str, data: Buffer) -> ManifestEntry:
+        segment: Optional[BinaryIO] = self.segment
+        if segment is None or self.offset >= self.segment_bytes:
+            self._close_segment()
+            segment = self._open_segment()
+        encoded_id: bytes = composite_id.encode("utf-8")
+        segment.write(_RECORD_HEADER.pack(len(encoded_id), len(data)))
+        segment.write(encoded_id)
+        segment.write(data)
+        data_offset: int = self.offset + _RECORD_HEADER.size + len(encoded_id)
+        self.locations.append((composite_id, data_offset, len(data)))
+        self.offset = data_offset + len(data)
+        profiling.count_written(len(data))
+        return entry_for(composite_id, data)
+
+    def close(self) -> None:
+        self._close_segment()
+        self.written_segments = []
+
+    def abort(self) -> None:
+        if self.segment is not None:
+            self.segment.close()
+            self.segment = None
+        for segment_name in self.written_segments:
+            for path in (segment_name, segment_name[:-len(SEGMENT_SUFFIX)] + INDEX_SUFFIX):
+                try:
+                    os.remove(os.path.join(self.basepath, path))
+                except FileNotFoundError:
+                    pass
+        self.written_segments = []
+
+def _read_index(index_path: str, segment_name: str) -> Iterator[Tuple[str, Location]]:
+    with open(index_path) as fh:
+        for line in fh:
+            composite_id, offset, length = line.rstrip("\n").split("\t")
+            yield composite_id, (segment_name, int(offset), int(length))
+
+def _scan_segment(segment: mmap.mmap, segment_name: str) -> Iterator[Tuple[str, Location]]:
+    logging.warning("Segment %s has no index; scanning its records." % segment_name)
+    offset: int = len(SEGMENT_MAGIC)
+    size: int = len(segment)
+    while offset + _RECORD_HEADER.size <= size:
+        id_length, length = _RECORD_HEADER.unpack_from(segment, offset)
+        data_offset: int = offset + _RECORD_HEADER.size + id_length
+        if data_offset + length > size:
+            logging.warning("Ignoring truncated record at end of segment %s." % segment_name)
+            break
+        composite_id: str = segment[offset + _RECORD_HEADER.size:data_offset].decode("utf-8")
+        yield composite_id, (segment_name, data_offset, length)
+        offset = data_offset + length
+
+class _PackedIndex:
+    """Offset index and memory maps for every segment of a packed store, as of the moment it was loaded."""
+
+    def __init__(self, basepath: str, segment_names: List[str]):
+        self.segments: Dict[str, mmap.mmap] = {}
+        self.locations: Dict[str, Location] = {}
+        for segment_name in segment_names:
+            with open(os.path.join(basepath, segment_name), "rb") as fh:
+                segment: mmap.mmap = mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ)
+            if segment[:len(SEGMENT_MAGIC)] != SEGMENT_MAGIC:
+                segment.close()
+                raise ValueError("%s is not a composite segment" % os.path.join(basepath, segment_name))
+            self.segments[segment_name] = segment
+            index_path: str = os.path.join(basepath, segment_name[:-len(SEGMENT_SUFFIX)] + INDEX_SUFFIX)
+            if os.path.exists(index_path):
+                self.locations.update(_read_index(index_path, segment_name))
+            else:
+                self.locations.update(_scan_segment(segment, segment_name))
+
+# Loading the index of a large store is expensive, so each process keeps the indices it has loaded most recently. An
+# index is reused only as long as the store's segments are unchanged.
+_MAX_CACHED_INDICES = 4
+_index_cache: "OrderedDict[str, Tuple[FrozenSet[Tuple[str, int]], _PackedIndex]]" = OrderedDict()
+
+def _segment_snapshot(basepath: str) -> FrozenSet[Tuple[str, int]]:
+    return frozenset(
+        (entry.name, entry.stat().st_size)
+        for entry in os.scandir(basepath)
+        if entry.is_file() and entry.name.endswith(SEGMENT_SUFFIX) and entry.stat().st_size > len(SEGMENT_MAGIC)
+    )
+
+def _load_index(basepath: str) -> _PackedIndex:
+    snapshot: FrozenSet[Tuple[str, int]] = _segment_snapshot(basepath)
+    cached: Optional[Tuple[FrozenSet[Tuple[str, int]], _PackedIndex]] = _index_cache.get(basepath)
+    if cached is not None and cached[0] == snapshot:
+        _index_cache.move_to_end(basepath)
+        return cached[1]
+    index = _PackedIndex(basepath, sorted(name for name, _ in snapshot))
+    _index_cache[basepath] = (snapshot, index)
+    _index_cache.move_to_end(basepath)
+    # Evicted indices are not closed explicitly, as stores may still hold them; their maps are released once unreferenced
+    while len(_index_cache) > _MAX_CACHED_INDICES:
+        _index_cache.popitem(last=False)
+    return index
+
+class PackedStore(CompositeStore):
+    """Composites packed into large append-only segment files, addressed through an offset index. Segments are read
+    through memory maps, so looking up a composite costs no system calls once its segment has been mapped, and the
+    store occupies a handful of inodes rather than one per composite."""
+
+    backend = "packed"
+
+    def __init__(self, basepath: str, codec: Codec = JSON, segment_bytes: int = DEFAULT_SEGMENT_BYTES):
+        super(PackedStore, self).__init__(basepath, codec)
+        self.segment_bytes = segment_bytes
+        self._loaded: Optional[_PackedIndex] = None
+
+    def __getstate__(self) -> Dict:
+        # Memory maps cannot be pickled; the receiving process loads (or reuses) its own copy of the index
+        state: Dict = self.__dict__.copy()
+        state["_loaded"] = None
+        return state
+
+    def _index(self) -> _PackedIndex:
+        if self._loaded is None:
+            self._loaded = _load_index(self.basepath)
+        return self._loaded
+
+    def composite_ids(self) -> Iterator[str]:
+        entries: Optional[Iterator[ManifestEntry]] = iter_manifest(self.basepath)
+        if entries is not None:
+            return (entry.composite_id for entry in entries)
+        return iter(sorted(self._index().locations.keys()))
+
+    def composite_sizes(self) -> Iterator[Tuple[str, int]]:
+        entries: Optional[Iterator[ManifestEntry]] = iter_manifest(self.basepath)
+        if entries is not None:
+            return ((entry.composite_id, entry.size) for entry in entries)
+        locations: Dict[str, Location] = self._index().locations
+        return ((composite_id, locations[composite_id][2]) for composite_id in sorted(locations.keys()))
+
+    def read(self, composite_id: str) -> Buffer:
+        """Returns a view of the composite in its segment's memory map, rather than a copy."""
+        index: _PackedIndex = self._index()
+        segment_name, offset, length = index.locations[composite_id]
+        profiling.count_read(length)
+        return memoryview(index.segments[segment_name])[offset:offset + length]
+
+    def __contains__(self, composite_id: object) -> bool:
+        return composite_id in self._index().locations
+
+    def location_of(self, composite_id: str) -> str:
+        location: Optional[Location] = self._index().locations.get(composite_id)
+        if location is None:
+            return self.basepath
+        segment_name, offset, _ = location
+        return "%s@%d" % (os.path.join(self.basepath, segment_name), offset)
+
+    def writer(self) -> PackedWriter:
+        return PackedWriter(self.basepath, self.codec, self.segment_bytes)
@@ -0,0 +1,95 @@
+from abc import abstractmethod
+from typing import Dict, Iterator, Any, Type, Tuple, Optional
+
+from polytropos.util.chunking import WeightedItems
+from polytropos.util.manifest import ManifestEntry
+from polytropos.util.store.__codec import Buffer, Codec, JSON
+
+# Describes how the composites in a directory are stored. Directories without one use the sharded JSON file layout.
+STORE_DESCRIPTOR = "_store.conf"
+
+class StoreWriter:
+    """Writes composites to a store. Each worker process writes through its own writer; the composites it writes may not
+    be visible to readers until the writer is closed."""
+
+    def __init__(self, codec: Codec):
+        self.codec = codec
+
+    @abstractmethod
+    def write(self, composite_id: str, data: Buffer) -> ManifestEntry:
+        """Store the serialized content of a composite, and return its manifest entry."""
+        pass
+
+    def dump(self, composite_id: str, content: Dict) -> ManifestEntry:
+        return self.write(composite_id, self.codec.encode(content))
+
+    def copy(self, source: "CompositeStore", composite_id: str, entry: Optional[ManifestEntry] = None) -> ManifestEntry:
+        """Store a composite as it is in another store. By default it is read and written again, and only decoded and
+        encoded again if the two stores use different codecs.
+
+        :param entry: The composite's entry in the manifest of the other store, if known, which writers that copy the
+        composite without reading it return rather than reading it to compute its own"""
+        if source.codec is self.codec:
+            return self.write(composite_id, source.read(composite_id))
+        return self.dump(composite_id, source.load(composite_id))
+
+    def close(self) -> None:
+        pass
+
+    def abort(self) -> None:
+        """Discard the composites written so far, so that a chunk that fails part way through (and may be retried) does
+        not leave some of its composites behind."""
+        self.close()
+
+    def __enter__(self) -> "StoreWriter":
+        return self
+
+    def __exit__(self, exc_type: Type, exc_val: Any, exc_tb: Any) -> None:
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+
+class CompositeStore:
+    """A collection of composites, addressed by composite ID, in some on-disk layout. Steps read their input and write
+    their output through a store rather than through the file system, so that the layout can be chosen per task (see
+    open_store)."""
+
+    backend: str
+
+    def __init__(self, basepath: str, codec: Codec = JSON):
+        self.basepath = basepath
+        self.codec = codec
+
+    @abstractmethod
+    def composite_ids(self) -> Iterator[str]:
+        pass
+
+    @abstractmethod
+    def composite_sizes(self) -> Iterator[Tuple[str, int]]:
+        """Yields (composite ID, size in bytes) for every composite, for scheduling work in proportion to size."""
+        pass
+
+    def weighted_composite_ids(self) -> WeightedItems[str]:
+        return WeightedItems(self.composite_sizes())
+
+    @abstractmethod
+    def read(self, composite_id: str) -> Buffer:
+        """Returns the serialized content of a composite, which stores that map it into memory may return as a view
+        rather than a copy. Raises KeyError if there is no such composite."""
+        pass
+
+    @abstractmethod
+    def __contains__(self, composite_id: object) -> bool:
+        pass
+
+    def location_of(self, composite_id: str) -> str:
+        """Where to find a composite on disk, for the benefit of a human reader."""
+        return self.basepath
+
+    @abstractmethod
+    def writer(self) -> StoreWriter:
+        pass
+
+    def load(self, composite_id: str) -> Dict:
+        return self.codec.decode(self.read(composite_id))
@@ -1,7 +1,27 @@
 import os
+from typing import Iterator
 
 import pytest
 
+from polytropos.util.lookuptable import LOOKUP_CACHE_ENV
+from polytropos.util.schemacache import SCHEMA_CACHE_ENV
+
 @pytest.fixture
 def basepath() -> str:
     return os.path.dirname(os.path.abspath(__file__))
+
+@pytest.fixture(scope="session", autouse=True)
+def schema_cache_dir(tmp_path_factory) -> Iterator[str]:
+    """Keep compiled schemas out of the user's cache directory."""
+    path: str = str(tmp_path_factory.mktemp("schema_cache"))
+    with pytest.MonkeyPatch.context() as monkeypatch:
+        monkeypatch.setenv(SCHEMA_CACHE_ENV, path)
+        yield path
+
+@pytest.fixture(scope="session", autouse=True)
+def lookup_cache_dir(tmp_path_factory) -> Iterator[str]:
+    """Keep compiled lookups out of the user's cache directory."""
+    path: str = str(tmp_path_factory.mktemp("lookup_cache"))
+    with pytest.MonkeyPatch.context() as monkeypatch:
+        monkeypatch.setenv(LOOKUP_CACHE_ENV, path)
+        yield path
@@ -15,11 +15,13 @@ from polytropos.util.paths import find_all_composites, relpath_for
 @pytest.fixture
 def run_task(basepath) -> Callable:
     # noinspection DuplicatedCode
-    def _run_task(scenario, task_name, expected_location, output_dir: Optional[str] = None):
+    def _run_task(scenario, task_name, expected_location, output_dir: Optional[str] = None, store_backend: str = "directory",
+                  intermediate_codec: str = "compact-json", profile: bool = False) -> Task:
         polytropos.actions.register_all()
         conf = os.path.join(basepath, '../examples', scenario, 'conf')
         data = os.path.join(basepath, '../examples', scenario, 'data')
-        with Context.build(conf, data, output_dir=output_dir) as context:
+        with Context.build(conf, data, output_dir=output_dir, store_backend=store_backend,
+                           intermediate_codec=intermediate_codec, profile=profile) as context:
             task = Task.build(context, task_name)
             task.run()
         actual_path = os.path.join(
@@ -43,4 +45,5 @@ def run_task(basepath) -> Callable:
                     assert compare(actual_data, expected_data), (
                             'Diff: ' + '\n'.join(line for line in diff)
                     )
+        return task
     return _run_task
@@ -1,4 +1,7 @@
+import json
 import logging
+import os
+from typing import Dict, List
 
 # noinspection PyUnresolvedReferences
 def test(run_task):
@@ -8,3 +11,36 @@ def test(run_task):
     import examples.s_3_mm_aggregate_mm_scan.conf.scans.rank
     import examples.s_3_mm_aggregate_mm_scan.conf.aggregations.economy
     run_task('s_3_mm_aggregate_mm_scan', 'economy', 'city/expected')
+
+# noinspection PyUnresolvedReferences
+def test_packed_intermediates(run_task):
+    import examples.s_3_mm_aggregate_mm_scan.conf.changes.city
+    import examples.s_3_mm_aggregate_mm_scan.conf.changes.company
+    import examples.s_3_mm_aggregate_mm_scan.conf.scans.rank
+    import examples.s_3_mm_aggregate_mm_scan.conf.aggregations.economy
+    run_task('s_3_mm_aggregate_mm_scan', 'economy', 'city/expected', store_backend="packed",
+             intermediate_codec="pickle")
+
+# noinspection PyUnresolvedReferences
+def test_profile(run_task):
+    import examples.s_3_mm_aggregate_mm_scan.conf.changes.city
+    import examples.s_3_mm_aggregate_mm_scan.conf.changes.company
+    import examples.s_3_mm_aggregate_mm_scan.conf.scans.rank
+    import examples.s_3_mm_aggregate_mm_scan.conf.aggregations.economy
+    task = run_task('s_3_mm_aggregate_mm_scan', 'economy', 'city/expected', profile=True)
+    path: str = task.profile_path(os.path.join(task.context.entities_output_dir, task.target_data))
+    try:
+        with open(path) as fh:
+            profile: Dict = json.load(fh)
+    finally:
+        os.remove(path)
+    assert profile["task"] == "economy"
+    steps: List[Dict] = profile["steps"]
+    assert [step["step"] for step in steps] == ["0:Evolve", "1:EconomicOverview", "2:Evolve", "3:AssignProductivityRank"]
+    for step in steps:
+        assert step["composites"] > 0
+        assert step["bytes_read"] > 0
+        assert step["bytes_written"] > 0
+        assert step["wall_seconds"] >= 0
+    assert set(steps[0]["changes"].keys()) == {"AssignCityState"}
+    assert set(steps[2]["changes"].keys()) == {"CalculateMeanProductivity"}
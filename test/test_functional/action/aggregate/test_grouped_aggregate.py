@@ -0,0 +1,94 @@
+import os
+from collections import defaultdict
+from dataclasses import dataclass
+from typing import Dict, List, Tuple, Any, Iterator, Optional
+
+import pytest
+
+from polytropos.actions.aggregate import GroupedAggregate
+from polytropos.actions.aggregate._grouped import partition_of
+from polytropos.ontology.composite import Composite
+from polytropos.ontology.context import Context
+from polytropos.ontology.schema import Schema
+from polytropos.ontology.track import Track
+from polytropos.util.manifest import read_manifest
+from polytropos.util.store import open_store
+
+@dataclass
+class Members(GroupedAggregate):
+    """Emits one composite per organization, listing the filings that name it and the total of their amounts."""
+
+    def extract(self, composite: Composite) -> Optional[int]:
+        return composite.get_immutable("f_amount", treat_missing_as_null=True)
+
+    def emit_group(self, group: Any, extracts: List[Tuple[str, Any]]) -> Iterator[Tuple[str, Composite]]:
+        composite: Composite = Composite(self.target_schema, {"immutable": {}})
+        composite.put_immutable("o_filings", [{"filing": composite_id} for composite_id, _ in extracts])
+        composite.put_immutable("o_total", sum(amount or 0 for _, amount in extracts))
+        yield "org_%s" % group, composite
+
+@pytest.fixture(scope="module")
+def origin_schema() -> Schema:
+    spec: Dict = {
+        "f_org": {"name": "org", "data_type": "Text", "sort_order": 0},
+        "f_amount": {"name": "amount", "data_type": "Integer", "sort_order": 1}
+    }
+    return Schema(Track.build({}, None, "temporal"), Track.build(spec, None, "immutable"))
+
+@pytest.fixture(scope="module")
+def target_schema() -> Schema:
+    spec: Dict = {
+        "o_filings": {"name": "filings", "data_type": "List", "sort_order": 0},
+        "o_filing": {"name": "filing", "data_type": "Text", "sort_order": 0, "parent": "o_filings"},
+        "o_total": {"name": "total", "data_type": "Integer", "sort_order": 1}
+    }
+    return Schema(Track.build({}, None, "temporal"), Track.build(spec, None, "immutable"))
+
+@pytest.fixture()
+def origin_dir(tmpdir) -> str:
+    path: str = os.path.join(str(tmpdir), "origin")
+    with open_store(path).writer() as writer:
+        for i in range(300):
+            immutable: Dict = {"amount": i}
+            if i % 11 != 0:
+                immutable["org"] = "%i" % (i * 7 % 23)
+            writer.dump("filing_%04i" % i, {"immutable": immutable})
+    return path
+
+def _expected() -> Dict[str, Dict]:
+    groups: Dict[str, List[int]] = defaultdict(list)
+    for i in range(300):
+        if i % 11 != 0:
+            groups["org_%i" % (i * 7 % 23)].append(i)
+    return {org: {"immutable": {"filings": [{"filing": "filing_%04i" % i} for i in filings], "total": sum(filings)}}
+            for org, filings in groups.items()}
+
+# With no budget, one partition; with a budget of a few hundred bytes, a partition for every few organizations
+@pytest.mark.parametrize("budget", [None, 1000, 100])
+def test_grouped_aggregate(tmpdir, origin_schema, target_schema, origin_dir, budget):
+    target_dir: str = os.path.join(str(tmpdir), "target")
+    temp_dir: str = os.path.join(str(tmpdir), "tmp")
+    os.makedirs(temp_dir)
+    with Context("", "", "", "", "", "", temp_dir, False, 7, False, True, aggregate_memory_budget=budget) as context:
+        aggregate: Members = Members(context, origin_schema, target_schema, "f_org")
+        aggregate(origin_dir, target_dir)
+        # The shuffle is cleaned up
+        assert os.listdir(temp_dir) == []
+    target = open_store(target_dir)
+    actual: Dict[str, Dict] = {composite_id: target.load(composite_id) for composite_id in target.composite_ids()}
+    assert actual == _expected()
+    assert sorted(entry.composite_id for entry in read_manifest(target_dir)) == sorted(actual.keys())
+
+def test_partitions_count(origin_schema, target_schema):
+    with Context("", "", "", "", "", "", "", False, 1, False, True, aggregate_memory_budget=1000) as context:
+        aggregate: Members = Members(context, origin_schema, target_schema, "f_org")
+        assert aggregate.partitions_count(0) == 1
+        assert aggregate.partitions_count(1000) == 1
+        assert aggregate.partitions_count(10001) == 11
+        context.aggregate_memory_budget = None
+        assert aggregate.partitions_count(10001) == 1
+
+def test_partition_of_equal_numbers():
+    for n_partitions in [2, 7, 23]:
+        assert partition_of(1, n_partitions) == partition_of(1.0, n_partitions) == partition_of(True, n_partitions)
+        assert partition_of(0, n_partitions) == partition_of(-0.0, n_partitions) == partition_of(False, n_partitions)
@@ -0,0 +1,84 @@
+import copy
+import random
+from typing import Dict, List, Callable
+
+import pytest
+
+from polytropos.actions.changes.stat.cross_sectional.minmax import CrossSectionalMaximum, CrossSectionalMinimum
+from polytropos.actions.changes.stat.cross_sectional.reduce import CrossSectionalSum, CrossSectionalCount, \
+    CrossSectionalMean
+from polytropos.actions.changes.stat.longitudinal.minmax import LongitudinalMaximum, LongitudinalMinimum
+from polytropos.actions.changes.stat.longitudinal.reduce import LongitudinalMean
+from polytropos.actions.evolve import Change
+from polytropos.ontology.composite import Composite
+from polytropos.ontology.schema import Schema
+from polytropos.ontology.track import Track
+
+@pytest.fixture(scope="module")
+def schema() -> Schema:
+    temporal_spec: Dict = {
+        "t_list": {"name": "the_list", "data_type": "List", "sort_order": 0},
+        "t_name": {"name": "name", "data_type": "Text", "sort_order": 0, "parent": "t_list"},
+        "t_amount": {"name": "amount", "data_type": "Decimal", "sort_order": 1, "parent": "t_list"},
+        "t_value": {"name": "value", "data_type": "Integer", "sort_order": 1},
+        "t_word": {"name": "word", "data_type": "Text", "sort_order": 2},
+        "t_result": {"name": "result", "data_type": "Decimal", "sort_order": 3},
+        "t_result_id": {"name": "result_id", "data_type": "Text", "sort_order": 4}
+    }
+    immutable_spec: Dict = {
+        "i_result": {"name": "best", "data_type": "Decimal", "sort_order": 0},
+        "i_text_result": {"name": "best_text", "data_type": "Text", "sort_order": 1},
+        "i_result_period": {"name": "best_period", "data_type": "Text", "sort_order": 2}
+    }
+    return Schema(Track.build(temporal_spec, None, "temporal"), Track.build(immutable_spec, None, "immutable"))
+
+def _period(rng: random.Random) -> Dict:
+    ret: Dict = {}
+    if rng.random() < 0.8:
+        ret["the_list"] = [{"name": "item_%i" % i, "amount": rng.choice([None, rng.randint(-5, 5) / 2])}
+                           for i in range(rng.randint(0, 4))]
+    if rng.random() < 0.8:
+        ret["value"] = rng.choice([None, rng.randint(-3, 3)])
+    if rng.random() < 0.8:
+        ret["word"] = rng.choice(["alpha", "bravo", "charlie"])
+    return ret
+
+@pytest.fixture()
+def contents() -> List[Dict]:
+    rng: random.Random = random.Random(0)
+    return [{str(2000 + j): _period(rng) for j in range(rng.randint(0, 4))} for _ in range(50)]
+
+CHANGES: Dict[str, Callable[[Schema], Change]] = {
+    "CrossSectionalSum": lambda schema: CrossSectionalSum(schema, {}, "t_list", "t_result", argument="t_amount"),
+    "CrossSectionalCount": lambda schema: CrossSectionalCount(schema, {}, "t_list", "t_result", argument="t_amount"),
+    "CrossSectionalMean": lambda schema: CrossSectionalMean(schema, {}, "t_list", "t_result", argument="t_amount"),
+    "CrossSectionalMinimum": lambda schema: CrossSectionalMinimum(schema, {}, "t_list", "t_result",
+                                                                  argument="t_amount", identifier="t_name",
+                                                                  identifier_target="t_result_id"),
+    "CrossSectionalMaximum": lambda schema: CrossSectionalMaximum(schema, {}, "t_list", "t_result",
+                                                                  argument="t_amount", identifier="t_name",
+                                                                  identifier_target="t_result_id"),
+    "LongitudinalMean": lambda schema: LongitudinalMean(schema, {}, subject="t_value", target="i_result"),
+    "LongitudinalMinimum": lambda schema: LongitudinalMinimum(schema, {}, subject="t_value", target="i_result",
+                                                              period_id_target="i_result_period"),
+    "LongitudinalMaximum": lambda schema: LongitudinalMaximum(schema, {}, subject="t_value", target="i_result",
+                                                              period_id_target="i_result_period"),
+    # Not numeric, so computed one composite at a time
+    "LongitudinalMaximum (Text)": lambda schema: LongitudinalMaximum(schema, {}, subject="t_word",
+                                                                     target="i_text_result")
+}
+
+@pytest.mark.parametrize("name", CHANGES.keys())
+def test_batch_matches_per_composite(schema, contents, name):
+    change: Change = CHANGES[name](schema)
+    assert change.batched
+
+    one_at_a_time: List[Composite] = [Composite(schema, copy.deepcopy(content)) for content in contents]
+    for composite in one_at_a_time:
+        change(composite)
+
+    batched: List[Composite] = [Composite(schema, copy.deepcopy(content)) for content in contents]
+    change.batch(batched)
+
+    assert [composite.content for composite in batched] == [composite.content for composite in one_at_a_time]
+    assert [composite.content for composite in batched] != contents
@@ -0,0 +1,100 @@
+import random
+from collections import Counter
+from typing import Dict, List, Tuple, Any
+
+import pytest
+
+from polytropos.actions.scan.quantile import Quantile, val2qtile
+from polytropos.actions.scan.rank import Rank, value_to_rank
+from polytropos.ontology.composite import Composite
+from polytropos.ontology.context import Context
+from polytropos.ontology.schema import Schema
+from polytropos.ontology.track import Track
+
+@pytest.fixture(scope="module")
+def schema() -> Schema:
+    spec: Dict = {
+        "the_source": {"name": "source", "data_type": "Currency", "sort_order": 0},
+        "the_group": {"name": "group", "data_type": "Text", "sort_order": 1},
+        "the_rank": {"name": "rank", "data_type": "Integer", "sort_order": 2},
+        "the_quantile": {"name": "quantile", "data_type": "Decimal", "sort_order": 3},
+        "t_group": {"name": "period_group", "data_type": "Text", "sort_order": 0}
+    }
+    temporal: Track = Track.build({"t_group": spec.pop("t_group")}, None, "temporal")
+    return Schema(temporal, Track.build(spec, None, "immutable"))
+
+@pytest.fixture(scope="module")
+def contents() -> List[Dict]:
+    rng: random.Random = random.Random(0)
+    ret: List[Dict] = []
+    for i in range(3000):
+        immutable: Dict = {}
+        if i % 40 != 0:
+            immutable["group"] = "group_%i" % rng.randint(0, 30)
+        if i % 25 != 0:
+            immutable["source"] = rng.randint(0, 200)
+        ret.append({"immutable": immutable})
+    return ret
+
+def _run(scan: Any, schema: Schema, contents: List[Dict], chunk_size: int) -> List[Dict]:
+    """Apply the scan's passes to in-memory composites, one chunk at a time as the workers would."""
+    composites: List[Tuple[str, Composite]] = [("%09i" % i, Composite(schema, {"immutable": dict(c["immutable"])}))
+                                               for i, c in enumerate(contents)]
+    partials: List[Any] = []
+    for start in range(0, len(composites), chunk_size):
+        chunk: List[Tuple[str, Composite]] = composites[start:start + chunk_size]
+        partials.append(scan.combine([(composite_id, scan.extract(composite)) for composite_id, composite in chunk]))
+    scan.analyze(scan.merge(partials))
+    for composite_id, composite in composites:
+        scan.alter(composite_id, composite)
+    return [composite.content["immutable"] for _, composite in composites]
+
+def _by_group(contents: List[Dict]) -> Dict[str, Counter]:
+    observations: Dict[str, Counter] = {}
+    for content in contents:
+        immutable: Dict = content["immutable"]
+        if "group" in immutable and "source" in immutable:
+            observations.setdefault(immutable["group"], Counter())[immutable["source"]] += 1
+    return observations
+
+def test_rank_within_group(schema, contents):
+    with Context("", "", "", "", "", "", "", False, 1, False, True) as context:
+        actual: List[Dict] = _run(Rank(context, schema, "the_source", "the_rank", group_by="the_group"), schema,
+                                  contents, 200)
+    expected: Dict[str, Dict[Any, int]] = {group: value_to_rank(observations)
+                                           for group, observations in _by_group(contents).items()}
+    for content, result in zip(contents, actual):
+        immutable: Dict = content["immutable"]
+        if "group" in immutable and "source" in immutable:
+            assert result["rank"] == expected[immutable["group"]][immutable["source"]]
+            assert type(result["rank"]) is int
+        else:
+            assert "rank" not in result
+
+def test_quantile_within_group(schema, contents):
+    with Context("", "", "", "", "", "", "", False, 1, False, True) as context:
+        actual: List[Dict] = _run(Quantile(context, schema, "the_source", "the_quantile", group_by="the_group"), schema,
+                                  contents, 200)
+    expected: Dict[str, Dict[int, float]] = {group: val2qtile(observations)
+                                             for group, observations in _by_group(contents).items()}
+    for content, result in zip(contents, actual):
+        immutable: Dict = content["immutable"]
+        if "group" in immutable and "source" in immutable:
+            assert result["quantile"] == expected[immutable["group"]][immutable["source"]]
+        else:
+            assert "quantile" not in result
+
+def test_single_group_matches_ungrouped(schema, contents):
+    single: List[Dict] = [{"immutable": dict(c["immutable"], group="all")} for c in contents]
+    with Context("", "", "", "", "", "", "", False, 1, False, True) as context:
+        grouped: List[Dict] = _run(Rank(context, schema, "the_source", "the_rank", group_by="the_group"), schema,
+                                   single, 500)
+        ungrouped: List[Dict] = _run(Rank(context, schema, "the_source", "the_rank"), schema, single, 500)
+    assert grouped == ungrouped
+
+def test_temporal_group_rejected(schema):
+    with Context("", "", "", "", "", "", "", False, 1, False, True) as context:
+        with pytest.raises(ValueError):
+            Rank(context, schema, "the_source", "the_rank", group_by="t_group")
+        with pytest.raises(ValueError):
+            Quantile(context, schema, "the_source", "the_quantile", group_by="t_group")
@@ -0,0 +1,60 @@
+import random
+from typing import Dict, List, Tuple, Any
+
+import pytest
+
+from polytropos.actions.scan.quantile import Quantile, ApproximateQuantile
+from polytropos.ontology.composite import Composite
+from polytropos.ontology.context import Context
+from polytropos.ontology.schema import Schema
+from polytropos.ontology.track import Track
+
+@pytest.fixture(scope="module")
+def schema() -> Schema:
+    spec: Dict = {
+        "the_source": {"name": "source", "data_type": "Currency", "sort_order": 0},
+        "the_target": {"name": "quantile", "data_type": "Decimal", "sort_order": 1}
+    }
+    return Schema(Track.build({}, None, "temporal"), Track.build(spec, None, "immutable"))
+
+@pytest.fixture(scope="module")
+def contents() -> List[Dict]:
+    rng: random.Random = random.Random(0)
+    ret: List[Dict] = []
+    for i in range(20000):
+        if i % 50 == 0:
+            ret.append({"immutable": {}})
+        elif i % 7 == 0:
+            # Some repeated values among the near-unique ones
+            ret.append({"immutable": {"source": 1000 * rng.randint(0, 20)}})
+        else:
+            ret.append({"immutable": {"source": int(rng.lognormvariate(12, 2))}})
+    return ret
+
+def _run(scan: Any, schema: Schema, contents: List[Dict], chunk_size: int) -> List[Any]:
+    """Apply the scan's passes to in-memory composites, one chunk at a time as the workers would."""
+    composites: List[Tuple[str, Composite]] = [("%09i" % i, Composite(schema, dict(content)))
+                                               for i, content in enumerate(contents)]
+    partials: List[Any] = []
+    for start in range(0, len(composites), chunk_size):
+        chunk: List[Tuple[str, Composite]] = composites[start:start + chunk_size]
+        partials.append(scan.combine([(composite_id, scan.extract(composite)) for composite_id, composite in chunk]))
+    scan.analyze(scan.merge(partials))
+    for composite_id, composite in composites:
+        scan.alter(composite_id, composite)
+    return [composite.content.get("immutable", {}).get("quantile") for _, composite in composites]
+
+@pytest.mark.parametrize("error", [0.05, 0.01])
+def test_within_error_of_exact(schema, contents, error):
+    with Context("", "", "", "", "", "", "", False, 1, False, True) as context:
+        exact: List[Any] = _run(Quantile(context, schema, "the_source", "the_target"), schema, contents, 1000)
+        approximate: List[Any] = _run(ApproximateQuantile(context, schema, "the_source", "the_target", error=error),
+                                      schema, contents, 1000)
+    assert [value is None for value in approximate] == [value is None for value in exact]
+    assert max(abs(a - e) for a, e in zip(approximate, exact) if e is not None) <= error
+
+def test_no_values(schema):
+    with Context("", "", "", "", "", "", "", False, 1, False, True) as context:
+        actual: List[Any] = _run(ApproximateQuantile(context, schema, "the_source", "the_target"), schema,
+                                 [{"immutable": {}}, {}], 1)
+    assert actual == [None, None]
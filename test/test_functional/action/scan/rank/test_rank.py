@@ -57,11 +57,13 @@ def setup_teardown(schema):
     yield input_dir, actual_dir
     shutil.rmtree(working_path)
 
+# Composites are spilled to disk between passes, or kept in memory
+@pytest.mark.parametrize("scan_memory_budget", [None, 1024 * 1024])
 @pytest.mark.parametrize("source_type", ["integer", "currency", "decimal"])
-def test_rank(setup_teardown, schema, source_type) -> None:
+def test_rank(setup_teardown, schema, source_type, scan_memory_budget) -> None:
     source: VariableId = cast(VariableId, "{}_source".format(source_type))
     input_dir, actual_dir = setup_teardown
-    with Context("", "", "", "", "", "", "", False, 1, False, True) as context:
+    with Context("", "", "", "", "", "", "", False, 1, False, True, scan_memory_budget=scan_memory_budget) as context:
         rank: Rank = Rank(context, schema, source, target)
         rank(input_dir, actual_dir)
     for index in range(1, 6):
@@ -72,4 +74,13 @@ def test_rank(setup_teardown, schema, source_type) -> None:
         with open(e_path) as e_fh, open(a_path) as a_fh:
             expected: Dict = json.load(e_fh)
             actual: Dict = json.load(a_fh)
-        assert actual == expected
\ No newline at end of file
+        assert actual == expected
+
+
+def test_combine_merge(schema) -> None:
+    with Context("", "", "", "", "", "", "", False, 1, False, True) as context:
+        rank: Rank = Rank(context, schema, cast(VariableId, "integer_source"), target)
+    extracts = [("a", 3), ("b", None), ("c", 7), ("d", 3), ("e", 0)]
+    partials = [rank.combine(extracts[:2]), rank.combine(extracts[2:4]), rank.combine(extracts[4:]), rank.combine([])]
+    rank.analyze(rank.merge(partials))
+    assert rank.ranks == {7: 1, 3: 3, 0: 4}
@@ -0,0 +1,236 @@
+import json
+import logging
+import os
+import shutil
+import tempfile
+from typing import Dict, Optional, List
+
+import pytest
+
+from polytropos.actions.fused import FusedStep, fuse
+from polytropos.actions.step import Step, PerCompositeStep
+from polytropos.ontology.context import Context
+from polytropos.util.manifest import read_manifest
+from polytropos.util.paths import relpath_for, find_all_composites
+from polytropos.util.stepcache import StepCache
+from polytropos.util.store import CODECS
+
+class _Increment(Step, PerCompositeStep):
+    def __init__(self, context: Context):
+        self.context = context
+
+    def transform(self, composite_id: str, content: Dict) -> Optional[Dict]:
+        content["immutable"]["n"] += 1
+        return content
+
+class _DropOdd(Step, PerCompositeStep):
+    def __init__(self, context: Context):
+        self.context = context
+
+    def transform(self, composite_id: str, content: Dict) -> Optional[Dict]:
+        if content["immutable"]["n"] % 2 == 1:
+            return None
+        return content
+
+class _Barrier(Step):
+    def __call__(self, origin_dir: str, target_dir: str) -> None:
+        pass
+
+@pytest.fixture()
+def context() -> Context:
+    return Context("", "", "", "", "", "", "", False, 1, False, True)
+
+def test_fuse_groups_consecutive_steps(context):
+    a, b, c, d = _Increment(context), _DropOdd(context), _Barrier(), _Increment(context)
+    planned: List[Step] = fuse(context, [a, b, c, d])
+    assert len(planned) == 3
+    assert isinstance(planned[0], FusedStep)
+    assert planned[0].steps == [a, b]
+    assert planned[1] is c
+    assert planned[2] is d
+
+def test_fuse_leaves_barriers_alone(context):
+    a, b = _Barrier(), _Barrier()
+    assert fuse(context, [a, b]) == [a, b]
+
+def test_fused_step_single_pass(context):
+    working_path: str = tempfile.mkdtemp()
+    origin_dir: str = os.path.join(working_path, "origin")
+    target_dir: str = os.path.join(working_path, "target")
+    try:
+        for n in range(4):
+            composite_id: str = "{:09}".format(n)
+            os.makedirs(os.path.join(origin_dir, relpath_for(composite_id)), exist_ok=True)
+            with open(os.path.join(origin_dir, relpath_for(composite_id), "%s.json" % composite_id), "w") as fh:
+                json.dump({"immutable": {"n": n}}, fh)
+
+        fused = FusedStep(context, [_Increment(context), _DropOdd(context), _Increment(context)])
+        fused(origin_dir, target_dir)
+
+        assert sorted(find_all_composites(target_dir)) == ["000000001", "000000003"]
+        assert [entry.composite_id for entry in read_manifest(target_dir)] == ["000000001", "000000003"]
+        with open(os.path.join(target_dir, relpath_for("000000001"), "000000001.json")) as fh:
+            assert json.load(fh) == {"immutable": {"n": 3}}
+    finally:
+        shutil.rmtree(working_path)
+
+class _BatchedIncrement(_Increment):
+    def __init__(self, context: Context):
+        super(_BatchedIncrement, self).__init__(context)
+        self.batch_sizes: List[int] = []
+
+    @property
+    def batched(self) -> bool:
+        return True
+
+    def transform_batch(self, composite_ids: List[str], contents: List[Dict]) -> List[Optional[Dict]]:
+        self.batch_sizes.append(len(contents))
+        return super(_BatchedIncrement, self).transform_batch(composite_ids, contents)
+
+def test_fused_step_batches(context):
+    working_path: str = tempfile.mkdtemp()
+    origin_dir: str = os.path.join(working_path, "origin")
+    target_dir: str = os.path.join(working_path, "target")
+    try:
+        for n in range(4):
+            composite_id: str = "{:09}".format(n)
+            os.makedirs(os.path.join(origin_dir, relpath_for(composite_id)), exist_ok=True)
+            with open(os.path.join(origin_dir, relpath_for(composite_id), "%s.json" % composite_id), "w") as fh:
+                json.dump({"immutable": {"n": n}}, fh)
+
+        first, second = _BatchedIncrement(context), _BatchedIncrement(context)
+        fused = FusedStep(context, [first, _DropOdd(context), second])
+        assert fused.batched
+        fused(origin_dir, target_dir)
+
+        # Composites dropped by the filter are not passed on to the second increment
+        assert sum(first.batch_sizes) == 4
+        assert sum(second.batch_sizes) == 2
+        assert sorted(find_all_composites(target_dir)) == ["000000001", "000000003"]
+        with open(os.path.join(target_dir, relpath_for("000000003"), "000000003.json")) as fh:
+            assert json.load(fh) == {"immutable": {"n": 5}}
+    finally:
+        shutil.rmtree(working_path)
+
+def test_fused_step_not_batched_with_cache(caplog):
+    working_path: str = tempfile.mkdtemp()
+    origin_dir: str = os.path.join(working_path, "origin")
+    target_dir: str = os.path.join(working_path, "target")
+    context: Context = Context("", "", "", "", "", "", "", False, 1, False, True,
+                               cache_dir=os.path.join(working_path, "cache"))
+    try:
+        os.makedirs(os.path.join(origin_dir, relpath_for("000000000")))
+        with open(os.path.join(origin_dir, relpath_for("000000000"), "000000000.json"), "w") as fh:
+            json.dump({"immutable": {"n": 0}}, fh)
+
+        step = _BatchedIncrement(context)
+        fused = FusedStep(context, [step])
+        assert not fused.batched
+        with caplog.at_level(logging.INFO):
+            fused(origin_dir, target_dir)
+        assert step.batch_sizes == []
+        assert "one at a time" in caplog.text
+    finally:
+        shutil.rmtree(working_path)
+
+class _Counting(Step, PerCompositeStep):
+    def __init__(self, context: Context, fingerprint: str):
+        self.context = context
+        self.fingerprint = fingerprint
+        self.calls = 0
+
+    def transform(self, composite_id: str, content: Dict) -> Optional[Dict]:
+        self.calls += 1
+        content["immutable"]["n"] += 1
+        return content
+
+def test_fused_step_resumes_from_cache(context):
+    working_path: str = tempfile.mkdtemp()
+    cache = StepCache(os.path.join(working_path, "cache"))
+    raw: bytes = json.dumps({"immutable": {"n": 0}}).encode("utf-8")
+    try:
+        first, second = _Counting(context, "a"), _Counting(context, "b")
+        assert json.loads(FusedStep(context, [first, second])._apply("000000000", raw, cache)) == {"immutable": {"n": 2}}
+        assert (first.calls, second.calls) == (1, 1)
+
+        # Identical configuration: nothing is recomputed
+        FusedStep(context, [first, second])._apply("000000000", raw, cache)
+        assert (first.calls, second.calls) == (1, 1)
+
+        # Reconfigured second step: only the second step is recomputed
+        changed = _Counting(context, "c")
+        assert json.loads(FusedStep(context, [first, changed])._apply("000000000", raw, cache)) == {"immutable": {"n": 2}}
+        assert (first.calls, changed.calls) == (1, 1)
+    finally:
+        shutil.rmtree(working_path)
+
+class _RecordId(Step, PerCompositeStep):
+    def __init__(self, context: Context):
+        self.context = context
+        self.fingerprint = "record_id"
+
+    def transform(self, composite_id: str, content: Dict) -> Optional[Dict]:
+        content["immutable"]["id"] = composite_id
+        return content
+
+def test_fused_step_cache_distinguishes_composites(context):
+    working_path: str = tempfile.mkdtemp()
+    cache = StepCache(os.path.join(working_path, "cache"))
+    raw: bytes = json.dumps({"immutable": {}}).encode("utf-8")
+    try:
+        step = _RecordId(context)
+        for composite_id in ["000000001", "000000002", "000000001"]:
+            output: Optional[bytes] = FusedStep(context, [step])._apply(composite_id, raw, cache)
+            assert output is not None
+            assert json.loads(output) == {"immutable": {"id": composite_id}}
+    finally:
+        shutil.rmtree(working_path)
+
+def test_fused_step_transcodes(context):
+    raw: bytes = CODECS["pickle"].encode({"immutable": {"n": 0}})
+    output = FusedStep(context, [_Increment(context)])._apply("000000000", raw, None, CODECS["pickle"],
+                                                              CODECS["compact-json"])
+    assert output == b'{"immutable":{"n":1}}'
+
+class _FailOnThree(Step, PerCompositeStep):
+    def __init__(self, context: Context):
+        self.context = context
+
+    def transform(self, composite_id: str, content: Dict) -> Optional[Dict]:
+        if content["immutable"]["n"] == 3:
+            raise ValueError("three")
+        return content
+
+@pytest.mark.parametrize("steppable", [True, False])
+def test_fused_step_quarantine(steppable):
+    working_path: str = tempfile.mkdtemp()
+    origin_dir: str = os.path.join(working_path, "origin")
+    target_dir: str = os.path.join(working_path, "target")
+    quarantine_dir: str = os.path.join(working_path, "quarantine")
+    context = Context("", "", "", "", "", "", working_path, False, 2, False, steppable, error_policy="quarantine",
+                      quarantine_dir=quarantine_dir)
+    try:
+        for n in range(6):
+            composite_id: str = "{:09}".format(n)
+            os.makedirs(os.path.join(origin_dir, relpath_for(composite_id)), exist_ok=True)
+            with open(os.path.join(origin_dir, relpath_for(composite_id), "%s.json" % composite_id), "w") as fh:
+                json.dump({"immutable": {"n": n}}, fh)
+
+        FusedStep(context, [_Increment(context), _FailOnThree(context)])(origin_dir, target_dir)
+
+        expected: List[str] = ["000000000", "000000001", "000000003", "000000004", "000000005"]
+        assert sorted(find_all_composites(target_dir)) == expected
+        assert [entry.composite_id for entry in read_manifest(target_dir)] == expected
+        assert context.quarantine.total == 1
+        context.quarantine.close()
+        with open(os.path.join(quarantine_dir, "report.jsonl")) as fh:
+            entries: List[Dict] = [json.loads(line) for line in fh]
+        assert len(entries) == 1
+        assert entries[0]["composite_id"] == "000000002"
+        assert entries[0]["input_path"] == os.path.join(origin_dir, relpath_for("000000002"), "000000002.json")
+        assert "three" in entries[0]["traceback"]
+        with open(entries[0]["saved_input"]) as fh:
+            assert json.load(fh) == {"immutable": {"n": 2}}
+    finally:
+        context.shutdown_pool()
+        shutil.rmtree(working_path)
@@ -0,0 +1,116 @@
+import os
+from typing import Dict
+
+import pytest
+
+from polytropos.actions.merge import Merge
+from polytropos.ontology.context import Context
+from polytropos.util.manifest import read_manifest, write_manifest, ManifestEntry
+from polytropos.util.store import open_store, create_store, PackedStore
+
+SOURCES: Dict[str, Dict[str, Dict]] = {
+    "p": {
+        "only_p": {"immutable": {"a": 1}},
+        "in_all": {"immutable": {"a": 1, "nested": {"x": "p"}}, "2010": {"b": 1}},
+        "p_and_r": {"immutable": {"a": 1}}
+    },
+    "q": {
+        "only_q": {"immutable": {"a": 2}},
+        "in_all": {"immutable": {"a": 2, "nested": {"x": "q", "y": "q"}}, "2011": {"b": 2}},
+    },
+    "r": {
+        "in_all": {"immutable": {"a": 3, "nested": {"y": "r", "z": "r"}, "c": 3}},
+        "p_and_r": {"immutable": {"a": 3, "c": 3}}
+    }
+}
+
+@pytest.fixture()
+def entities_dir(tmpdir) -> str:
+    path: str = os.path.join(str(tmpdir), "entities")
+    for name, composites in SOURCES.items():
+        with open_store(os.path.join(path, name)).writer() as writer:
+            for composite_id, content in composites.items():
+                writer.dump(composite_id, content)
+    return path
+
+def _run(entities_dir: str, target_dir: str, **kwargs) -> Dict[str, Dict]:
+    with Context("", "", "", entities_dir, "", "", "", False, 2, False, True) as context:
+        merge: Merge = Merge.build(context=context, schema=None, **kwargs)
+        merge(os.path.join(entities_dir, "p"), target_dir)
+    target = open_store(target_dir)
+    actual: Dict[str, Dict] = {composite_id: target.load(composite_id) for composite_id in target.composite_ids()}
+    assert sorted(entry.composite_id for entry in read_manifest(target_dir)) == sorted(actual.keys())
+    return actual
+
+def test_two_sources(tmpdir, entities_dir):
+    actual: Dict[str, Dict] = _run(entities_dir, os.path.join(str(tmpdir), "target"), secondary="q")
+    assert actual == {
+        "only_p": {"immutable": {"a": 1}},
+        "only_q": {"immutable": {"a": 2}},
+        "in_all": {"immutable": {"a": 1, "nested": {"x": "p", "y": "q"}}, "2010": {"b": 1}, "2011": {"b": 2}},
+        "p_and_r": {"immutable": {"a": 1}}
+    }
+
+def test_several_sources_in_order(tmpdir, entities_dir):
+    actual: Dict[str, Dict] = _run(entities_dir, os.path.join(str(tmpdir), "target"), secondary=["q", "r"])
+    assert actual["in_all"] == {"immutable": {"a": 1, "nested": {"x": "p", "y": "q", "z": "r"}, "c": 3},
+                             "2010": {"b": 1}, "2011": {"b": 2}}
+    assert actual["p_and_r"] == {"immutable": {"a": 1, "c": 3}}
+
+def test_precedence(tmpdir, entities_dir):
+    actual: Dict[str, Dict] = _run(entities_dir, os.path.join(str(tmpdir), "target"), secondary=["q", "r"],
+                                   precedence=["r", "primary", "q"])
+    assert actual["in_all"] == {"immutable": {"a": 3, "nested": {"x": "p", "y": "r", "z": "r"}, "c": 3},
+                             "2010": {"b": 1}, "2011": {"b": 2}}
+    assert actual["p_and_r"] == {"immutable": {"a": 3, "c": 3}}
+
+@pytest.mark.parametrize("secondary, precedence", [
+    ([], None),
+    (["q", "q"], None),
+    (["primary"], None),
+    (["q"], ["q"]),
+    (["q"], ["primary", "q", "r"])
+])
+def test_invalid(entities_dir, secondary, precedence):
+    with Context("", "", "", entities_dir, "", "", "", False, 2, False, True) as context:
+        with pytest.raises(ValueError):
+            Merge(context, None, secondary, precedence)
+
+def test_passthrough_shares_files(tmpdir, entities_dir):
+    target_dir: str = os.path.join(str(tmpdir), "target")
+    _run(entities_dir, target_dir, secondary="q")
+    origin = open_store(os.path.join(entities_dir, "q"))
+    target = open_store(target_dir)
+    origin_path: str = origin.location_of("only_q")
+    target_path: str = target.location_of("only_q")
+    # Either a hard link (the same file), or a reflink or copy with the same content
+    with open(origin_path, "rb") as origin_fh, open(target_path, "rb") as target_fh:
+        assert origin_fh.read() == target_fh.read()
+    shared: bool = os.path.samefile(origin_path, target_path)
+
+    # Writing over a shared composite leaves the original as it was
+    with target.writer() as writer:
+        writer.dump("only_q", {"immutable": {"a": 5}})
+    assert target.load("only_q") == {"immutable": {"a": 5}}
+    assert origin.load("only_q") == {"immutable": {"a": 2}}
+    if shared:
+        assert os.stat(origin_path).st_nlink == 1
+
+def test_passthrough_takes_source_manifest(tmpdir, entities_dir):
+    source_dir: str = os.path.join(entities_dir, "q")
+    size: int = os.path.getsize(open_store(source_dir).location_of("only_q"))
+    source_entry: ManifestEntry = ManifestEntry("only_q", size, "recorded")
+    write_manifest(source_dir, [source_entry])
+    target_dir: str = os.path.join(str(tmpdir), "target")
+    _run(entities_dir, target_dir, secondary="q")
+    entries: Dict[str, ManifestEntry] = {entry.composite_id: entry for entry in read_manifest(target_dir)}
+    # The shared file is not read again
+    assert entries["only_q"] == source_entry
+    # Composites not in a manifest are read to record them
+    assert entries["only_p"].checksum != "recorded"
+
+def test_packed_target(tmpdir, entities_dir):
+    target_dir: str = os.path.join(str(tmpdir), "target")
+    create_store(target_dir, PackedStore.backend)
+    expected: Dict[str, Dict] = _run(entities_dir, os.path.join(str(tmpdir), "directory_target"), secondary="q")
+    assert _run(entities_dir, target_dir, secondary="q") == expected
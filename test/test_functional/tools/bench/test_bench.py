@@ -0,0 +1,57 @@
+import os
+import tempfile
+from typing import Dict
+
+import pytest
+
+from polytropos.ontology.schema import Schema
+from polytropos.tools.bench.corpus import CorpusSpec, CorpusGenerator
+from polytropos.tools.bench.schema import write_bench_schemas, SOURCE_SCHEMA
+from polytropos.tools.bench.suite import BENCHMARKS, run_suite, compare, select
+
+@pytest.fixture
+def schemas_dir(basepath: str) -> str:
+    return os.path.join(basepath, "..", "examples", "s_7_csv", "conf", "schemas")
+
+@pytest.fixture
+def bench_schema(schemas_dir: str) -> Schema:
+    with tempfile.TemporaryDirectory() as temp_dir:
+        write_bench_schemas(schemas_dir, "composite", temp_dir)
+        return Schema.load(SOURCE_SCHEMA, temp_dir)
+
+def test_corpus_is_reproducible(bench_schema: Schema):
+    spec: CorpusSpec = CorpusSpec(composites=3, periods=2, list_length=3, missing=0.2, seed=7)
+    first: CorpusGenerator = CorpusGenerator(bench_schema, spec)
+    second: CorpusGenerator = CorpusGenerator(bench_schema, spec)
+    for i in range(3):
+        assert first.content(i) == second.content(i)
+    assert set(first.content(0).keys()) == {"immutable", "2000", "2001"}
+
+def test_corpus_leaves_outputs_empty(bench_schema: Schema):
+    spec: CorpusSpec = CorpusSpec(composites=1, periods=1, list_length=3, missing=0.0)
+    content: Dict = CorpusGenerator(bench_schema, spec).content(0)
+    assert set(content["immutable"]["polytropos_bench_immutable"].keys()) == {"value", "group"}
+    temporal: Dict = content["2000"]["polytropos_bench_temporal"]
+    assert temporal["value"] is not None
+    assert set(temporal.keys()) <= {"value", "items"}
+    assert len(temporal.get("items", [])) <= 3
+
+def test_select():
+    assert select(None) == list(BENCHMARKS.keys())
+    assert select(["Scan"]) == ["Scan/Rank", "Scan/Quantile", "Scan/ApproximateQuantile"]
+    assert select(["Translate"]) == ["Translate"]
+    with pytest.raises(ValueError):
+        select(["Nonexistent"])
+
+def test_run_suite(schemas_dir: str):
+    spec: CorpusSpec = CorpusSpec(composites=10, periods=2, list_length=2)
+    with tempfile.TemporaryDirectory() as workdir:
+        results: Dict = run_suite(schemas_dir, "composite", workdir, spec, repeat=2)
+    assert list(results["benchmarks"].keys()) == list(BENCHMARKS.keys())
+    for result in results["benchmarks"].values():
+        assert len(result["runs"]) == 2
+        assert result["best_seconds"] == min(result["runs"])
+    assert results["corpus"]["composites"] == 10
+    comparisons = compare(results, results)
+    assert len(comparisons) == len(BENCHMARKS)
+    assert all(comparison.ratio == 1.0 for comparison in comparisons)
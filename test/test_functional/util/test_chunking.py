@@ -0,0 +1,46 @@
+from typing import List, Tuple
+
+from polytropos.util.chunking import BalancedChunker, FixedChunker, WeightedItems, chunker_for
+
+def test_weighted_items_iterate_bare():
+    assert list(WeightedItems([("a", 1), ("b", 2)])) == ["a", "b"]
+
+def test_fixed_chunker():
+    chunks: List[Tuple[List[int], int]] = list(FixedChunker(range(5), 2).chunks())
+    assert chunks == [([0, 1], 2), ([2, 3], 2), ([4], 1)]
+
+def test_balanced_heaviest_first():
+    pairs = [("small_%i" % i, 1) for i in range(8)] + [("large", 8)]
+    chunks = list(BalancedChunker(pairs, 4).chunks())
+    # Mean weight is 16/9; budget is four composites' worth of it
+    assert chunks[0] == (["large"], 8)
+    assert sum(len(chunk) for chunk, _ in chunks) == 9
+    assert all(weight <= 8 for _, weight in chunks)
+
+def test_balanced_window_bounds_sorting():
+    pairs = [("a", 1), ("b", 2), ("c", 3), ("d", 4)]
+    chunks = list(BalancedChunker(pairs, 1, window=2).chunks())
+    assert [chunk for chunk, _ in chunks] == [["b"], ["a"], ["d"], ["c"]]
+
+def test_balanced_adapts_to_throughput():
+    chunker = BalancedChunker([(str(i), 1) for i in range(100)], 10, target_seconds=1.0)
+    chunks = chunker.chunks()
+    first, _ = next(chunks)
+    assert len(first) == 10
+    # Ten items per half second: a one-second chunk holds twenty
+    chunker.observe(10, 0.5)
+    second, _ = next(chunks)
+    assert len(second) == 20
+
+def test_observe_ignored_without_target():
+    chunker = BalancedChunker([(str(i), 1) for i in range(30)], 10)
+    chunks = chunker.chunks()
+    next(chunks)
+    chunker.observe(10, 0.01)
+    second, _ = next(chunks)
+    assert len(second) == 10
+
+def test_chunker_for():
+    assert isinstance(chunker_for(range(3), 2), FixedChunker)
+    assert isinstance(chunker_for(range(3), 2, target_seconds=1.0), BalancedChunker)
+    assert isinstance(chunker_for(WeightedItems([("a", 1)]), 2), BalancedChunker)
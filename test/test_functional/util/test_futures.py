@@ -0,0 +1,114 @@
+import os
+import pickle
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import List
+
+import pytest
+
+from polytropos.ontology.context import Context
+from polytropos.util.futures import _run_in_pool, run_in_loop, FailurePolicy, _Timed
+
+def _double(chunk: List[int], offset: int) -> List[int]:
+    return [2 * item + offset for item in chunk]
+
+def test_persistent_pool_reused(tmpdir):
+    context = Context("", "", "", "", "", "", str(tmpdir), False, 2, False, False)
+    try:
+        first: List[int] = sorted(sum(context.run_in_process_pool(_double, list(range(10)), 1), []))
+        pool = context.process_pool
+        second: List[int] = sorted(sum(context.run_in_process_pool(_double, list(range(10)), 0), []))
+        assert first == [2 * i + 1 for i in range(10)]
+        assert second == [2 * i for i in range(10)]
+        assert pool is not None and context.process_pool is pool
+        # Broadcast files are removed once the step is done with them
+        assert os.listdir(str(tmpdir)) == []
+    finally:
+        context.shutdown_pool()
+    assert context.process_pool is None
+
+def test_context_pickles_without_pool(tmpdir):
+    context = Context("", "", "", "", "", "", str(tmpdir), False, 2, False, False)
+    try:
+        list(context.run_in_process_pool(_double, [1], 0))
+        restored: Context = pickle.loads(pickle.dumps(context))
+        assert restored.process_pool is None
+        assert restored.temp_dir == context.temp_dir
+    finally:
+        context.shutdown_pool()
+
+def _identity(chunk: List[int]) -> List[int]:
+    return chunk
+
+def test_streaming_bounded_in_flight():
+    pulled: List[int] = []
+
+    def items():
+        for i in range(100):
+            pulled.append(i)
+            yield i
+
+    results = _run_in_pool(ThreadPoolExecutor(max_workers=2), _identity, items(), chunk_size=5, max_in_flight=3)
+    first: List[int] = next(iter(results))
+    assert len(first) == 5
+    # Only the chunks in flight have been drawn from the iterator
+    assert len(pulled) <= 4 * 5
+    remaining: List[int] = sum(results, [])
+    assert sorted(first + remaining) == list(range(100))
+
+def _fail_on_first(chunk: List[int]) -> List[int]:
+    if 0 in chunk:
+        raise ValueError
+    return chunk
+
+def test_streaming_stops_submitting_after_failure():
+    pulled: List[int] = []
+
+    def items():
+        for i in range(100):
+            pulled.append(i)
+            yield i
+
+    with pytest.raises(ValueError):
+        list(_run_in_pool(ThreadPoolExecutor(max_workers=1), _fail_on_first, items(), chunk_size=10, max_in_flight=1))
+    assert len(pulled) < 100
+
+def _fail_on_seven(chunk: List[int]) -> List[int]:
+    if 7 in chunk:
+        raise ValueError("seven")
+    return chunk
+
+@pytest.mark.parametrize("retries", [0, 2])
+def test_failure_policy_isolates_failing_item(retries):
+    quarantined: List[int] = []
+    attempts: List[int] = []
+
+    def fail_on_seven(chunk: List[int]) -> List[int]:
+        attempts.append(len(chunk))
+        return _fail_on_seven(chunk)
+
+    policy: FailurePolicy[int] = FailurePolicy(lambda item, e: quarantined.append(item), retries=retries)
+    results = _run_in_pool(ThreadPoolExecutor(max_workers=2), fail_on_seven, range(20), chunk_size=10,
+                           max_in_flight=2, failure_policy=policy)
+    assert sorted(sum(results, [])) == [i for i in range(20) if i != 7]
+    assert quarantined == [7]
+    # The failing chunk of ten is tried 1 + retries times, then halved until seven is on its own
+    assert attempts.count(10) == 2 + retries
+
+def test_failure_policy_in_loop():
+    quarantined: List[int] = []
+    policy: FailurePolicy[int] = FailurePolicy(lambda item, e: quarantined.append(item), retries=0)
+    results = list(run_in_loop(_fail_on_seven, range(10), chunk_size=4, failure_policy=policy))
+    assert sorted(sum(results, [])) == [i for i in range(10) if i != 7]
+    assert quarantined == [7]
+
+def _sleep(chunk: List[float]) -> List[float]:
+    time.sleep(sum(chunk))
+    return chunk
+
+@pytest.mark.parametrize("collect", [False, True])
+def test_timed_reports_time_of_call(collect: bool) -> None:
+    seconds, collector, result = _Timed(_sleep, collect=collect)([0.1, 0.05])
+    assert seconds >= 0.15
+    assert (collector is not None) == collect
+    assert result == [0.1, 0.05]
@@ -0,0 +1,61 @@
+import random
+from typing import List
+
+import numpy as np
+import pytest
+
+from polytropos.util.kll import KLLSketch, k_for_error
+
+@pytest.fixture(scope="module")
+def values() -> List[float]:
+    rng: random.Random = random.Random(0)
+    return [rng.lognormvariate(10, 2) for _ in range(100000)]
+
+def _max_rank_error(sketch: KLLSketch, values: List[float]) -> float:
+    sorted_values, ranks = sketch.rank_table()
+    probes: np.ndarray = np.asarray(values[:5000])
+    exact: np.ndarray = np.searchsorted(np.sort(values), probes, side="left")
+    estimated: np.ndarray = ranks[np.searchsorted(sorted_values, probes, side="left")]
+    return float(np.max(np.abs(exact - estimated))) / len(values)
+
+def test_exact_while_small():
+    sketch: KLLSketch = KLLSketch(k_for_error(0.01))
+    sketch.extend([3.0, 1.0, 2.0, 2.0])
+    sorted_values, ranks = sketch.rank_table()
+    assert sorted_values.tolist() == [1.0, 2.0, 3.0]
+    assert ranks.tolist() == [0, 1, 3, 4]
+
+def test_empty():
+    sorted_values, ranks = KLLSketch(100).rank_table()
+    assert len(sorted_values) == 0
+    assert ranks.tolist() == [0]
+
+@pytest.mark.parametrize("error", [0.05, 0.01])
+def test_bounded_and_accurate(values, error):
+    sketch: KLLSketch = KLLSketch(k_for_error(error), seed=0)
+    sketch.extend(values)
+    assert sketch.n == len(values)
+    assert len(sketch) <= 4 * sketch.k
+    assert sketch.rank_table()[1][-1] == len(values)
+    assert _max_rank_error(sketch, values) <= error
+
+def test_merged(values):
+    k: int = k_for_error(0.01)
+    merged: KLLSketch = KLLSketch(k, seed=0)
+    for start in range(0, len(values), 7000):
+        partial: KLLSketch = KLLSketch(k, seed=start + 1)
+        partial.extend(values[start:start + 7000])
+        merged.merge(partial)
+    assert merged.n == len(values)
+    assert len(merged) <= 4 * k
+    assert _max_rank_error(merged, values) <= 0.01
+
+def test_seeded_sketches_differ():
+    first, second = KLLSketch(8, seed=1), KLLSketch(8, seed=2)
+    first.extend(float(i) for i in range(1000))
+    second.extend(float(i) for i in range(1000))
+    assert first.levels != second.levels
+
+def test_invalid_error():
+    with pytest.raises(ValueError):
+        k_for_error(0)
@@ -0,0 +1,84 @@
+import os
+import pickle
+from typing import Dict
+
+import pytest
+
+from polytropos.actions.evolve.__lookup import load_lookups
+from polytropos.util.lookuptable import MappedLookup, write_lookup, compiled_path, open_compiled, LOOKUP_CACHE_ENV
+
+CONTENT: Dict = {
+    "john": {"color": "blue"},
+    "mary": {"color": "orange", "tags": ["a", "b"]},
+    "": {"empty": True},
+    "naïve": None
+}
+
+@pytest.fixture()
+def compiled(tmpdir) -> MappedLookup:
+    path: str = os.path.join(str(tmpdir), "test.lookup")
+    write_lookup(path, CONTENT)
+    return MappedLookup(path)
+
+def test_read(compiled):
+    assert len(compiled) == 4
+    assert list(compiled) == list(CONTENT)
+    for key, value in CONTENT.items():
+        assert key in compiled
+        assert compiled[key] == value
+    assert compiled == CONTENT
+
+def test_missing(compiled):
+    assert "nobody" not in compiled
+    assert 3 not in compiled
+    assert compiled.get("nobody") is None
+    with pytest.raises(KeyError):
+        compiled["nobody"]
+
+def test_many_keys(tmpdir):
+    content: Dict = {"key_%i" % i: {"value": str(i)} for i in range(5000)}
+    path: str = os.path.join(str(tmpdir), "many.lookup")
+    write_lookup(path, content)
+    assert MappedLookup(path) == content
+
+def test_empty(tmpdir):
+    path: str = os.path.join(str(tmpdir), "empty.lookup")
+    write_lookup(path, {})
+    assert len(MappedLookup(path)) == 0
+    assert "x" not in MappedLookup(path)
+
+def test_pickles_as_path(compiled):
+    compiled["john"]
+    pickled: bytes = pickle.dumps(compiled)
+    assert len(pickled) < 200
+    assert pickle.loads(pickled) == CONTENT
+
+def test_unreadable_ignored(tmpdir):
+    path: str = os.path.join(str(tmpdir), "bad.lookup")
+    with open(path, "wb") as fh:
+        fh.write(b"not a lookup at all, and long enough to have a header")
+    assert open_compiled(path) is None
+
+def test_recompiled_when_source_changes(tmpdir, monkeypatch):
+    cache_dir: str = os.path.join(str(tmpdir), "cache")
+    monkeypatch.setenv(LOOKUP_CACHE_ENV, cache_dir)
+    filename: str = os.path.join(str(tmpdir), "colors.csv")
+    with open(filename, "w") as fh:
+        fh.write("name,color\njohn,blue\n")
+    first = load_lookups(["colors"], str(tmpdir))["colors"]
+    assert isinstance(first, MappedLookup)
+    assert first == {"john": {"color": "blue"}}
+    assert load_lookups(["colors"], str(tmpdir))["colors"].path == first.path
+
+    with open(filename, "w") as fh:
+        fh.write("name,color\njohn,green\n")
+    second = load_lookups(["colors"], str(tmpdir))["colors"]
+    assert second.path != first.path
+    assert second == {"john": {"color": "green"}}
+    assert compiled_path(cache_dir, filename) == second.path
+
+def test_not_compiled_when_disabled(tmpdir, monkeypatch):
+    monkeypatch.setenv(LOOKUP_CACHE_ENV, "")
+    with open(os.path.join(str(tmpdir), "colors.json"), "w") as fh:
+        fh.write('{"john": {"color": "blue"}}')
+    assert type(load_lookups(["colors"], str(tmpdir))["colors"]) is dict
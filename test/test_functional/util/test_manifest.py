@@ -0,0 +1,55 @@
+import os
+import shutil
+from typing import List
+
+import pytest
+
+from polytropos.util.manifest import ManifestEntry, ManifestRecorder, MANIFEST_FILENAME, UNKNOWN_CHECKSUM, build_manifest, entry_for, \
+    read_manifest, recording_manifest, write_manifest
+from polytropos.util.paths import find_all_composites
+
+@pytest.fixture()
+def fixture_copy(basepath, tmpdir) -> str:
+    path: str = os.path.join(str(tmpdir), "composites")
+    shutil.copytree(os.path.join(basepath, "test_functional", "util", "path_fixtures"), path)
+    return path
+
+def test_write_read_sorted(tmpdir):
+    entries: List[ManifestEntry] = [entry_for("b", b"{}"), entry_for("a", b"[]")]
+    write_manifest(str(tmpdir), entries)
+    assert read_manifest(str(tmpdir)) == sorted(entries)
+
+def test_read_missing(tmpdir):
+    assert read_manifest(str(tmpdir)) is None
+
+def test_find_all_composites_prefers_manifest(fixture_copy):
+    write_manifest(fixture_copy, [entry_for("02164", b"{}")])
+    assert list(find_all_composites(fixture_copy)) == ["02164"]
+
+def test_build_manifest(fixture_copy):
+    build_manifest(fixture_copy)
+    entries = read_manifest(fixture_copy)
+    assert entries is not None
+    assert [entry.composite_id for entry in entries] == ["02164", "380476abcxyz", "person_3"]
+    assert all(entry.checksum != UNKNOWN_CHECKSUM for entry in entries)
+
+def test_build_manifest_without_checksums(fixture_copy):
+    entries: List[ManifestEntry] = build_manifest(fixture_copy, checksums=False)
+    assert all(entry.checksum == UNKNOWN_CHECKSUM for entry in entries)
+
+def test_recording_manifest_discarded_on_failure(tmpdir):
+    write_manifest(str(tmpdir), [entry_for("stale", b"{}")])
+    with pytest.raises(RuntimeError):
+        with recording_manifest(str(tmpdir)) as manifest:
+            manifest.append(entry_for("new", b"{}"))
+            raise RuntimeError
+    assert not os.path.exists(os.path.join(str(tmpdir), MANIFEST_FILENAME))
+
+def test_recorder_spills_sorted_runs(tmpdir):
+    recorder = ManifestRecorder(str(tmpdir), spill_entries=3)
+    recorder.extend(entry_for("{:09}".format(i), b"{}") for i in reversed(range(10)))
+    assert len(recorder.runs) == 3
+    recorder.finish()
+    entries = read_manifest(str(tmpdir))
+    assert [entry.composite_id for entry in entries] == ["{:09}".format(i) for i in range(10)]
+    assert os.listdir(str(tmpdir)) == [MANIFEST_FILENAME]
@@ -184,3 +184,35 @@ def test_getpop_no_default_raises():
     spec: List[str] = ["a", "b", "c"]
     with raises(nesteddicts.MissingDataError):
         nesteddicts.pop(target, spec)
+
+def test_accessor_get():
+    target: Dict = {"a": {"b": {"c": "value"}}}
+    accessor = nesteddicts.PathAccessor(["b", "c"])
+    assert accessor.get(target, "a") == "value"
+    assert accessor.get(target["a"]) == "value"
+
+def test_accessor_get_missing_returns_default():
+    target: Dict = {"a": {"b": {}}}
+    accessor = nesteddicts.PathAccessor(["b", "c"])
+    assert accessor.get(target, "a") is nesteddicts.MISSING_VALUE
+    assert accessor.get(target, "x", default="value") == "value"
+
+def test_accessor_get_incomplete_nesting_raises():
+    target: Dict = {"a": {"b": "not a dict"}}
+    accessor = nesteddicts.PathAccessor(["b", "c"])
+    with raises(nesteddicts.IncompleteNestingError):
+        accessor.get(target, "a")
+
+def test_accessor_put_creates_parents():
+    target: Dict = {}
+    nesteddicts.PathAccessor(["b", "c"]).put(target, "value", "a")
+    assert target == {"a": {"b": {"c": "value"}}}
+
+@mark.parametrize("target, expected", [
+    ({"a": {"b": {"c": "value", "d": "other"}}}, {"a": {"b": {"d": "other"}}}),
+    ({"a": {"b": {}}}, {"a": {"b": {}}}),
+    ({}, {})
+])
+def test_accessor_delete(target: Dict, expected: Dict):
+    nesteddicts.PathAccessor(["b", "c"]).delete(target, "a")
+    assert target == expected
@@ -0,0 +1,33 @@
+import os
+import time
+
+from polytropos.util.stepcache import StepCache, chain_key, content_digest
+
+def test_put_get(tmpdir):
+    cache = StepCache(str(tmpdir))
+    key: str = chain_key(content_digest(b"{}"), "abc")
+    assert cache.get(key) is None
+    cache.put(key, b'{"a": 1}')
+    assert cache.get(key) == b'{"a": 1}'
+
+def test_dropped(tmpdir):
+    cache = StepCache(str(tmpdir))
+    cache.put("0123456789", StepCache.DROPPED)
+    assert cache.get("0123456789") == StepCache.DROPPED
+
+def test_chain_key_depends_on_every_link():
+    root: str = content_digest(b"{}")
+    assert chain_key(chain_key(root, "a"), "b") != chain_key(chain_key(root, "a"), "c")
+    assert chain_key(chain_key(root, "a"), "b") != chain_key(chain_key(root, "x"), "b")
+
+def test_evict_least_recently_used(tmpdir):
+    cache = StepCache(str(tmpdir))
+    now: float = time.time()
+    for i, key in enumerate(["aaaa01", "bbbb02", "cccc03"]):
+        cache.put(key, b"x" * 100)
+        os.utime(cache._path_for(key), (now - 100 + i, now - 100 + i))
+    cache.get("aaaa01")
+    cache.evict(200)
+    assert cache.get("aaaa01") is not None
+    assert cache.get("bbbb02") is None
+    assert cache.get("cccc03") is not None
@@ -0,0 +1,95 @@
+import os
+import pickle
+from typing import List
+
+import pytest
+
+from polytropos.util.manifest import ManifestEntry, entry_for, write_manifest
+from polytropos.util.store import CODECS, CompositeStore, DirectoryStore, PackedStore, create_store, open_store, STORE_DESCRIPTOR
+from polytropos.util.store.__packed import INDEX_SUFFIX
+
+@pytest.fixture(params=[(backend, codec) for backend in ["directory", "packed"] for codec in sorted(CODECS.keys())])
+def store(request, tmpdir) -> CompositeStore:
+    backend, codec = request.param
+    return create_store(os.path.join(str(tmpdir), "store"), backend, codec)
+
+def test_open_store_uses_descriptor(store):
+    reopened: CompositeStore = open_store(store.basepath)
+    assert type(reopened) is type(store)
+    assert reopened.codec is store.codec
+
+def test_open_store_without_descriptor(tmpdir):
+    assert isinstance(open_store(str(tmpdir)), DirectoryStore)
+
+def test_write_read(store):
+    with store.writer() as writer:
+        entry: ManifestEntry = writer.dump("000000001", {"immutable": {"n": 1}})
+        writer.write("000000002", store.codec.encode({}))
+    assert entry.composite_id == "000000001"
+    assert store.load("000000001") == {"immutable": {"n": 1}}
+    assert store.load("000000002") == {}
+    assert "000000001" in store
+    assert "000000003" not in store
+    with pytest.raises(KeyError):
+        store.read("000000003")
+    assert sorted(store.composite_ids()) == ["000000001", "000000002"]
+
+def test_failed_writer_discards_its_composites(store):
+    with store.writer() as writer:
+        writer.dump("000000001", {})
+    with pytest.raises(ValueError):
+        with store.writer() as writer:
+            writer.dump("000000002", {})
+            raise ValueError
+    assert sorted(store.composite_ids()) == ["000000001"]
+
+def test_composite_ids_from_manifest(store):
+    with store.writer() as writer:
+        entries: List[ManifestEntry] = [writer.write(composite_id, b"{}") for composite_id in ["000000002", "000000001"]]
+    write_manifest(store.basepath, entries)
+    assert list(store.composite_ids()) == ["000000001", "000000002"]
+
+def test_packed_rolls_over_segments(tmpdir):
+    store = PackedStore(str(tmpdir), segment_bytes=16)
+    with store.writer() as writer:
+        for i in range(5):
+            writer.write(str(i), b"x" * 20)
+    segments = [name for name in os.listdir(str(tmpdir)) if name.endswith(".seg")]
+    assert len(segments) == 5
+    assert [store.read(str(i)) for i in range(5)] == [b"x" * 20] * 5
+
+def test_packed_rebuilds_missing_index(tmpdir):
+    writer = PackedStore(str(tmpdir)).writer()
+    writer.write("a", b"[1]")
+    writer.write("b", b"[2]")
+    writer.close()
+    for name in os.listdir(str(tmpdir)):
+        if name.endswith(INDEX_SUFFIX):
+            os.remove(os.path.join(str(tmpdir), name))
+    store = PackedStore(str(tmpdir))
+    assert store.read("a") == b"[1]"
+    assert store.read("b") == b"[2]"
+
+def test_packed_pickles_without_maps(tmpdir):
+    store = PackedStore(str(tmpdir))
+    with store.writer() as writer:
+        writer.write("a", b"[1]")
+    assert store.read("a") == b"[1]"
+    assert pickle.loads(pickle.dumps(store)).read("a") == b"[1]"
+
+@pytest.mark.parametrize("codec", list(CODECS.keys()))
+def test_packed_reads_without_copying(tmpdir, codec):
+    store = PackedStore(str(tmpdir), CODECS[codec])
+    with store.writer() as writer:
+        writer.dump("a", {"immutable": {"n": 1}})
+    data = store.read("a")
+    assert isinstance(data, memoryview)
+    assert store.codec.decode(data) == {"immutable": {"n": 1}}
+
+def test_writer_returns_manifest_entries(store):
+    with store.writer() as writer:
+        assert writer.write("000000001", b"[1]") == entry_for("000000001", b"[1]")
+
+def test_no_descriptor_for_legacy_layout(tmpdir):
+    create_store(str(tmpdir), "directory", "json")
+    assert not os.path.exists(os.path.join(str(tmpdir), STORE_DESCRIPTOR))
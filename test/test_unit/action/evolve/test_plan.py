@@ -0,0 +1,105 @@
+import copy
+from typing import Dict, List
+
+import pytest
+
+from polytropos.actions.changes.delete import Delete
+from polytropos.actions.changes.display import DisplayFormat
+from polytropos.actions.changes.stat.longitudinal.minmax import LongitudinalMaximum
+from polytropos.actions.changes.stat.longitudinal.reduce import LongitudinalMean
+from polytropos.actions.changes.universal import UniversalChangeChain
+from polytropos.actions.evolve import Change
+from polytropos.actions.evolve.__evolve import Evolve
+from polytropos.actions.evolve.__plan import plan, dependency_graph, Presence
+from polytropos.ontology.composite import Composite
+from polytropos.ontology.schema import Schema
+from polytropos.ontology.track import Track
+
+@pytest.fixture(scope="module")
+def schema() -> Schema:
+    temporal_spec: Dict = {
+        "t_list": {"name": "the_list", "data_type": "List", "sort_order": 0},
+        "t_phone": {"name": "phone", "data_type": "Phone", "sort_order": 0, "parent": "t_list"},
+        "t_phone_text": {"name": "phone_text", "data_type": "Text", "sort_order": 1, "parent": "t_list"},
+        "t_ein": {"name": "ein", "data_type": "EIN", "sort_order": 2, "parent": "t_list"},
+        "t_ein_text": {"name": "ein_text", "data_type": "Text", "sort_order": 3, "parent": "t_list"},
+        "t_value": {"name": "value", "data_type": "Integer", "sort_order": 1}
+    }
+    immutable_spec: Dict = {
+        "i_max": {"name": "max", "data_type": "Integer", "sort_order": 0},
+        "i_mean": {"name": "mean", "data_type": "Decimal", "sort_order": 1}
+    }
+    return Schema(Track.build(temporal_spec, None, "temporal"), Track.build(immutable_spec, None, "immutable"))
+
+@pytest.fixture()
+def changes(schema) -> List[Change]:
+    return [
+        DisplayFormat(schema, {}, "t_phone", "t_phone_text", list_base="t_list"),
+        DisplayFormat(schema, {}, "t_ein", "t_ein_text", list_base="t_list"),
+        LongitudinalMaximum(schema, {}, subject="t_value", target="i_max"),
+        LongitudinalMean(schema, {}, subject="t_value", target="i_mean"),
+        Delete(schema, {}, ["t_list"])
+    ]
+
+def test_adjacent_changes_over_same_list_merged(schema, changes):
+    planned: List = plan(schema, changes)
+    assert len(planned) == 4
+    chained, _ = planned[0]
+    assert isinstance(chained, UniversalChangeChain)
+    assert chained.chain == changes[:2]
+    assert chained.reads == {"t_phone", "t_ein"}
+    assert chained.writes == {"t_phone_text", "t_ein_text"}
+    assert [change for change, _ in planned[1:]] == changes[2:]
+
+def test_presence_only_where_input_required(schema, changes):
+    presences: List = [presence for _, presence in plan(schema, changes)]
+    assert presences[0] is not None
+    assert presences[1] is not None
+    # The mean is written (as None) even when there is nothing to average
+    assert presences[2] is None
+    assert presences[3] is not None
+
+@pytest.mark.parametrize("content, expected", [
+    ({}, False),
+    ({"2010": {}, "immutable": {"max": 3}}, False),
+    ({"2010": {}, "2011": {"the_list": []}}, True),
+    ({"2010": {"the_list": None}}, True),
+    ({"2010": {"value": 3}}, False)
+])
+def test_presence(schema, content, expected):
+    presence: Presence = Presence(schema, ["t_phone", "t_list"])
+    assert presence(Composite(schema, content)) is expected
+
+def test_presence_unknown_variable(schema):
+    with pytest.raises(ValueError):
+        Presence(schema, ["t_phone", "not_a_variable"])
+
+def test_dependency_graph(schema, changes):
+    assert dependency_graph(schema, changes) == {0: [], 1: [], 2: [], 3: [], 4: [0, 1]}
+
+def test_undeclared_change_depends_on_everything(schema, changes):
+    class Undeclared(Change):
+        def __call__(self, composite: Composite) -> None:
+            pass
+
+    graph: Dict[int, List[int]] = dependency_graph(schema, [changes[2], Undeclared(schema, {}), changes[3]])
+    assert graph == {0: [], 1: [0], 2: [1]}
+
+@pytest.mark.parametrize("content", [
+    {},
+    {"2010": {"value": 3}, "2011": {"value": 5}},
+    {"2010": {"the_list": [{"phone": "2125551234", "ein": "123456789"}, {"ein": "987654321"}]}},
+    {"2010": {"the_list": [{"phone": "2125551234"}], "value": 2}, "immutable": {"max": 7}}
+])
+@pytest.mark.parametrize("batch", [False, True])
+def test_evolve_matches_changes_in_turn(schema, changes, content, batch):
+    expected: Composite = Composite(schema, copy.deepcopy(content))
+    for change in changes[:4]:
+        change(expected)
+
+    evolve: Evolve = Evolve(None, changes[:4], schema)
+    if batch:
+        actual: Dict = evolve.transform_batch(["composite_0"], [copy.deepcopy(content)])[0]
+    else:
+        actual = evolve.transform("composite_0", copy.deepcopy(content))
+    assert actual == expected.content
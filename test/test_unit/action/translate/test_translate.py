@@ -0,0 +1,27 @@
+from typing import Dict, Any
+
+import pytest
+
+from polytropos.actions.translate.__translate import Translate
+from polytropos.util import profiling
+
+def _translator(label: str):
+    def translate(composite_id: str, key: str, value: Dict) -> Dict[str, Any]:
+        return {"translated": label, "from": value}
+    return translate
+
+@pytest.fixture()
+def translate() -> Translate:
+    return Translate(None, None, _translator("immutable"), _translator("temporal"))
+
+@pytest.mark.parametrize("profiled", [False, True])
+def test_do_translate(translate, profiled):
+    content: Dict = {"immutable": {"a": 1}, "2010": {"b": 2}, "other": {"c": 3}}
+    expected: Dict = {"immutable": {"translated": "immutable", "from": {"a": 1}},
+                      "2010": {"translated": "temporal", "from": {"b": 2}}}
+    if not profiled:
+        assert translate.do_translate(content, "the_composite") == expected
+        return
+    with profiling.collecting() as collector:
+        assert translate.do_translate(content, "the_composite") == expected
+    assert set(collector.sections["tracks"].keys()) == {"immutable", "temporal"}
@@ -1,10 +1,14 @@
 import copy
+import json
+import os
 from typing import Dict
 
 import pytest
 
 from polytropos.ontology.schema import Schema, TrackType, DuplicatePathError
 from polytropos.ontology.track import Track
+from polytropos.util import schemacache
+from polytropos.util.schemacache import SCHEMA_CACHE_ENV
 
 @pytest.fixture()
 def temporal_track() -> Track:
@@ -118,3 +122,67 @@ def test_is_temporal(var_id, expected, schema):
 def test_is_temporal_unknown_raises(schema):
     with pytest.raises(ValueError):
         schema.is_temporal("not a real variable")
+
+@pytest.fixture()
+def schemas_dir(tmp_path) -> str:
+    for name, prefix in [("source", ""), ("target", "target_")]:
+        os.makedirs(os.path.join(str(tmp_path), name))
+        for track, var_id in [("temporal", "the_temporal_var"), ("immutable", "the_immutable_var")]:
+            spec: Dict = {prefix + var_id: {"name": var_id, "data_type": "Text", "sort_order": 0}}
+            if prefix:
+                spec[prefix + var_id]["sources"] = [var_id]
+            with open(os.path.join(str(tmp_path), name, "%s.json" % track), "w") as fh:
+                json.dump(spec, fh)
+    return str(tmp_path)
+
+@pytest.fixture()
+def schema_cache(tmp_path, monkeypatch) -> str:
+    path: str = os.path.join(str(tmp_path), "cache")
+    monkeypatch.setenv(SCHEMA_CACHE_ENV, path)
+    return path
+
+def test_load_uses_compiled_schema(schemas_dir, schema_cache, monkeypatch):
+    source: Schema = Schema.load("source", schemas_dir)
+    target: Schema = Schema.load("target", schemas_dir, source_schema=source)
+    assert len(os.listdir(schema_cache)) == 2
+
+    def fail(*args, **kwargs):
+        raise AssertionError("Schema should have been loaded from the cache")
+    monkeypatch.setattr(Track, "build", fail)
+
+    cached_source: Schema = Schema.load("source", schemas_dir)
+    assert cached_source == source
+    cached_target: Schema = Schema.load("target", schemas_dir, source_schema=cached_source)
+    assert cached_target == target
+    # The compiled target refers to the source schema supplied, rather than to a copy
+    assert cached_target.source is cached_source
+    assert cached_target.temporal.source is cached_source.temporal
+    assert cached_source.temporal.target is cached_target.temporal
+    assert cached_target.get("target_the_temporal_var").sources == ["the_temporal_var"]
+
+def test_compiled_schema_follows_definition(schemas_dir, schema_cache):
+    Schema.load("source", schemas_dir)
+    spec: Dict = {"other_var": {"name": "other", "data_type": "Integer", "sort_order": 0}}
+    with open(os.path.join(schemas_dir, "source", "temporal.json"), "w") as fh:
+        json.dump(spec, fh)
+    schema: Schema = Schema.load("source", schemas_dir)
+    assert schema.get("other_var").data_type == "Integer"
+    assert schema.get("the_temporal_var") is None
+
+def test_unreadable_compiled_schema_is_rebuilt(schemas_dir, schema_cache):
+    expected: Schema = Schema.load("source", schemas_dir)
+    for filename in os.listdir(schema_cache):
+        with open(os.path.join(schema_cache, filename), "wb") as fh:
+            fh.write(b"garbage")
+    assert Schema.load("source", schemas_dir) == expected
+
+def test_compiled_schema_follows_ontology_code(schemas_dir, schema_cache, monkeypatch):
+    Schema.load("source", schemas_dir)
+    monkeypatch.setattr(schemacache, "package_digest", lambda package_name: "other version")
+    Schema.load("source", schemas_dir)
+    assert len(os.listdir(schema_cache)) == 2
+
+def test_schema_cache_disabled(schemas_dir, schema_cache, monkeypatch):
+    monkeypatch.setenv(SCHEMA_CACHE_ENV, "")
+    Schema.load("source", schemas_dir)
+    assert not os.path.exists(schema_cache)
@@ -105,3 +105,66 @@ def test_variable_spec_two_errors():
         "var1: bad name",
         'var2: Variable "var2" lists "unknown" as its parent, but variable doesn\'t exist.',
     ]
+
+
+@pytest.fixture
+def tree_spec() -> Dict:
+    return {
+        "folder": {"name": "folder", "data_type": "Folder", "sort_order": 0},
+        "in_folder_1": {"name": "first", "data_type": "Text", "sort_order": 0, "parent": "folder"},
+        "in_folder_2": {"name": "second", "data_type": "Integer", "sort_order": 1, "parent": "folder"},
+        "a_list": {"name": "a_list", "data_type": "List", "sort_order": 1},
+        "in_list": {"name": "first", "data_type": "Text", "sort_order": 0, "parent": "a_list"}
+    }
+
+
+def test_children_index(tree_spec):
+    track = Track.build(tree_spec, None, "")
+    assert [root.var_id for root in track.roots] == ["folder", "a_list"]
+    assert [child.var_id for child in track["folder"].children] == ["in_folder_1", "in_folder_2"]
+    assert track["in_folder_2"].siblings == ["in_folder_1", "in_folder_2"]
+    assert track.n_children("a_list") == 1
+    assert track.children_named("folder", "first") == ["in_folder_1"]
+    assert track.children_of("in_list") == []
+
+
+def test_children_index_follows_changes(tree_spec):
+    track = Track.build(tree_spec, None, "")
+    del track[VariableId("in_folder_1")]
+    assert [child.var_id for child in track["folder"].children] == ["in_folder_2"]
+    assert track.children_named("folder", "first") == []
+    track[VariableId("in_folder_1")] = track["in_list"]
+    assert track.child_ids("a_list") == ["in_list", "in_folder_1"]
+    assert track.child_ids("folder") == ["in_folder_2"]
+
+
+def test_replaced_variable_relinks_descendants(tree_spec):
+    track = Track.build(tree_spec, None, "")
+    assert track["in_folder_2"].absolute_path == ("folder", "second")
+    track[VariableId("folder")] = track.build_variable({"name": "renamed", "data_type": "List", "sort_order": 0},
+                                                       VariableId("folder"))
+    assert track["in_folder_2"].absolute_path == ("renamed", "second")
+    assert track["in_folder_2"].relative_path == ("second",)
+    assert track["in_folder_2"].nearest_list == "folder"
+    assert track["in_folder_2"].descends_from_list
+
+
+def test_variable_outside_track_linked_on_use(tree_spec):
+    track = Track.build(tree_spec, None, "")
+    orphan = track.build_variable({"name": "orphan", "data_type": "Text", "sort_order": 1, "parent": "a_list"},
+                                  VariableId("orphan"))
+    assert orphan.absolute_path == ("a_list", "orphan")
+    assert orphan.relative_path == ("orphan",)
+    assert orphan.accessor.path == ("a_list", "orphan")
+    assert orphan.nearest_list == "a_list"
+
+
+def test_sibling_name_conflict(tree_spec):
+    tree_spec["in_folder_2"]["name"] = "first"
+    with pytest.raises(ValidationError) as exc_info:
+        Track.build(tree_spec, None, "")
+    lines = str(exc_info.value).split("\n")
+    assert lines == [
+        'in_folder_1: Variable "in_folder_1" has a name conflict with sibling "in_folder_2".',
+        'in_folder_2: Variable "in_folder_2" has a name conflict with sibling "in_folder_1".'
+    ]
@@ -0,0 +1,25 @@
+from typing import Any, Type
+
+import pytest
+
+from polytropos.ontology.variable import Primitive
+from polytropos.ontology.variable.__primitive import Integer, Text, Decimal, Ratio, Unary, Binary, Currency, Phone, \
+    Email, URL, Date, EIN
+
+SAMPLES = {
+    int: [0, -3, 12345678901234567890],
+    str: ["a", " padded ", "000000", "X"],
+    float: [0.0, -2.5, float("inf")],
+    bool: [True, False]
+}
+
+@pytest.mark.parametrize("var_class", [Integer, Text, Decimal, Ratio, Unary, Binary, Currency, Phone, Email, URL, Date,
+                                       EIN])
+def test_cast_type_values_unchanged(var_class: Type[Primitive]) -> None:
+    """Cast skips values of a primitive's cast_type, so casting them must return them unchanged."""
+    if var_class.cast_type is None:
+        return
+    for value in SAMPLES[var_class.cast_type]:  # type: Any
+        actual: Any = var_class.cast(value)
+        assert actual == value
+        assert type(actual) is var_class.cast_type
@@ -1,3 +1,4 @@
+import pickle
 from typing import Dict, cast, Callable
 
 import pytest
@@ -81,3 +82,34 @@ def test_nearest_list_not_self(do_nearest_list_test):
 def test_nearest_list_not_from_list_raises(do_nearest_list_test):
     with pytest.raises(AttributeError):
         do_nearest_list_test("Text", "Folder", "Folder", "SHOULD NOT BE CHECKED")
+
+@pytest.fixture()
+def nested_track() -> Track:
+    spec: Dict = {
+        "the_folder": {"data_type": "Folder", "name": "folder", "sort_order": 0},
+        "the_list": {"data_type": "List", "name": "list", "sort_order": 0, "parent": "the_folder"},
+        "the_text": {"data_type": "Text", "name": "text", "sort_order": 0, "parent": "the_list"}
+    }
+    return Track.build(spec, None, "t")
+
+def test_derived_attributes_computed_at_build(nested_track):
+    var: Variable = nested_track["the_text"]
+    assert var.absolute_path == ("folder", "list", "text")
+    assert var.relative_path == ("text",)
+    assert var.descends_from_list
+    assert var.accessor.path == var.absolute_path
+    assert [ancestor.var_id for ancestor in var.ancestors(None)] == ["the_text", "the_list", "the_folder"]
+    assert nested_track["the_folder"].is_ancestor_of(VariableId("the_text"))
+
+def test_variable_is_frozen(nested_track):
+    var: Variable = nested_track["the_text"]
+    assert not hasattr(var, "__dict__")
+    with pytest.raises(AttributeError):
+        var.name = "renamed"
+
+def test_variable_survives_pickling(nested_track):
+    copied: Track = pickle.loads(pickle.dumps(nested_track))
+    var: Variable = copied["the_text"]
+    assert var.absolute_path == ("folder", "list", "text")
+    assert var.nearest_list == "the_list"
+    assert var.track is copied